@@ -8,42 +8,81 @@
 # ed eseguire varie analisi linguistiche, di usabilità, narratologiche e preliminari Griceane.
 #
 # Funzionalità incluse:
-# - Caricamento di file di testo (.txt) come corpus.
+# - Caricamento di file di testo (.txt) come corpus (lettura e tokenizzazione in parallelo su più processi).
+# - Apertura di corpora più grandi della memoria in streaming (file mappati con mmap e letti a blocchi).
+# - Salvataggio e riapertura istantanea del corpus indicizzato in un database SQLite.
+# - Aggiunta e rimozione di documenti con aggiornamento incrementale di conteggi e indici.
 # - Gestione (aggiunta/rimozione) di stopwords.
 # - Analisi di frequenza dei termini.
 # - Generazione di Nuvole di Parole.
-# - Analisi di Collocazioni (N-grammi).
+# - Analisi di Collocazioni (N-grammi) per frequenza o per forza di associazione (PMI, log-likelihood, chi-quadro, t-score, Dice).
 # - KWIC (Parole Chiave nel Contesto).
+# - Concordanze di sottostringhe qualsiasi (frammenti di parola, espressioni, punteggiatura) tramite indice dei suffissi,
+#   con contesto in token o caratteri.
 # - Andamento dei Termini attraverso i documenti o segmenti.
-# - Rete di Co-occorrenze testuali.
+# - Rete di Co-occorrenze testuali (matrice sparsa di id, anche con finestre ampie), esportabile come grafo
+#   GEXF, GraphML o lista di archi, con layout a forze scalabile (richiede numpy) e disegno con matplotlib.
 # - Suddivisione in Frasi e Token (usabilità).
-# - Annotazione Morfosintattica (POS Tagging - usabilità).
-# - Calcolo Indice di Leggibilità Gulpease (globale e per frase - usabilità, specifico italiano).
+# - Annotazione Morfosintattica (POS Tagging - usabilità) a blocchi di frasi su più processi, salvata in cache
+#   in forma colonnare (id token + id tag) e riletta senza nuovo tagging; termini e collocazioni filtrati per
+#   parte del discorso (es. solo nomi, schema 'aggettivi nomi').
+# - Tagger e lemmatizzatore intercambiabili (spaCy, Stanza con modelli italiani; NLTK): il modello si carica una
+#   volta e resta pronto per tutte le analisi; frequenze e collocazioni anche per lemmi invece che per forme.
+# - Calcolo Indice di Leggibilità Gulpease (globale e per frase - usabilità, specifico italiano), con distribuzione
+#   degli indici delle frasi (percentili, istogramma, media mobile lungo il testo, frasi meno leggibili).
+# - Indici di leggibilità (Gulpease, Flesch-Vacca, Flesch-Kincaid, Gunning Fog, SMOG, LIX) calcolati insieme dagli
+#   stessi conteggi per frase (lettere, sillabe italiane, parole, polisillabe, parole lunghe) della segmentazione.
 # - Creazione e Visualizzazione Matrice Attanziale di Greimas (narratologia).
 # - Creazione e Visualizzazione Matrice Funzioni di Propp (narratologia).
 # - Creazione e Visualizzazione Tensori Narrativi (Luigi Usai - narratologia).
-# - Generazione Permutazioni di Funzioni di Propp (trame possibili).
-# - Generazione Combinazioni di Funzioni di Propp (sottoinsiemi di funzioni).
+# - Tensore Narrativo sul corpus: tensore sparso Dimensioni x Segmenti riempito con le co-occorrenze degli
+#   elementi (con sinonimi), con selezione, marginali e contrazioni calcolate in NumPy (anche da riga di comando).
+# - Generazione Permutazioni di Funzioni di Propp (trame possibili), calcolate solo quando lette: accesso diretto
+#   alla trama N, campioni casuali e salvataggio su file anche per 12-15 funzioni e oltre.
+# - Generazione delle sole trame ammissibili secondo vincoli di precedenza e adiacenza (es. Divieto prima di Infrazione),
+#   con potatura durante la ricerca invece di filtrare tutte le permutazioni.
+# - Generazione Combinazioni di Funzioni di Propp (sottoinsiemi di funzioni), con totali in forma chiusa, conteggi
+#   per fase narrativa, accesso diretto al sottoinsieme N e campioni casuali senza elencarli tutti.
 # - Visualizzazione Grafica Sequenza Funzioni di Propp (richiede Graphviz).
+# - Diagrammi in serie di molte sequenze di Propp (da file o dai generatori): processi 'dot' in parallelo,
+#   cache per contenuto del sorgente DOT e fogli SVG riassuntivi.
 # - Analisi Semplificata Indicatori Griceani (Quantità, Modo, Qualità - richiede NLTK).
 # - Salvataggio Dati Narratologici (JSON, SQLite).
 # - Finestra "About" con informazioni sull'autore.
+# - Esecuzione delle analisi in background con barra di avanzamento e annullamento.
+# - Visualizzatore dei risultati a righe virtuali: anche milioni di righe compaiono subito, senza troncamenti,
+#   con scorrimento, ricerca ed esportazione (testo o CSV) dell'intero risultato.
+# - API di analisi utilizzabile senza interfaccia grafica (import StrumentiTestualiUSAI), con risultati strutturati.
+# - Modalità batch a riga di comando senza interfaccia grafica (frequenze, collocazioni, KWIC,
+#   concordanze, co-occorrenze, rete, Gulpease, leggibilità, Grice, POS, tensore narrativo, generatori di Propp) con output JSON, CSV o Parquet.
+#   Esempio: python StrumentiTestualiUSAI.py frequenza cartella_corpus/ --numero 50 --formato csv
 #
 # Dipendenze richieste:
-# - tkinter (standard Python)
+# - tkinter (standard Python) - Solo per l'interfaccia grafica
 # - wordcloud (pip install wordcloud)
 # - matplotlib (pip install matplotlib)
 # - Pillow (PIL) (pip install Pillow) - Per l'immagine nell'About
 # - nltk (pip install nltk) - Per tokenizzazione, POS tagging, Gulpease, Grice
 # - graphviz (pip install graphviz) - Per visualizzazione sequenze Propp
+# - hashlib (standard Python) - Cache dei diagrammi di Propp
+# - numpy (pip install numpy) - Opzionale, per conteggi vettorizzati sul corpus
+# - spacy (pip install spacy; python -m spacy download it_core_news_sm) - Opzionale, POS e lemmi per l'italiano
+# - stanza (pip install stanza; in Python: stanza.download('it')) - Opzionale, alternativa a spaCy per POS e lemmi
+# - pyarrow (pip install pyarrow) - Opzionale, per l'output Parquet della riga di comando
+# - argparse, csv, tempfile (standard Python)
+# - xml.sax.saxutils (standard Python) - Esportazione GEXF/GraphML del grafo
+# - dataclasses, typing (standard Python)
 # - itertools (standard Python)
 # - json (standard Python)
 # - sqlite3 (standard Python)
 # - re (standard Python)
-# - collections (standard Python)
-# - statistics (standard Python)
+# - collections, heapq (standard Python)
+# - statistics, random (standard Python)
 # - math (standard Python)
 # - textwrap (standard Python)
+# - array (standard Python)
+# - threading, concurrent.futures, unicodedata (standard Python)
+# - mmap, codecs (standard Python)
 #
 # Assicurati di scaricare i dati NLTK necessari (punkt, averaged_perceptron_tagger)
 # Eseguendo in un interprete Python:
@@ -59,16 +98,47 @@
 # Riferimento principale delle opere: Harvard Dataverse, DOI:10.7910/DVN/ICOJ19
 #
 
-import tkinter as tk
-from tkinter import filedialog, messagebox, scrolledtext, simpledialog
+# Tkinter è necessario solo per l'interfaccia grafica: la modalità a riga di comando funziona anche senza
+tkinter_disponibile = False
+try:
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, scrolledtext, simpledialog, ttk
+    from tkinter import font as tkfont
+    tkinter_disponibile = True
+except ImportError:
+    pass
 import json
 import sqlite3
+import argparse # Modalità batch a riga di comando
+import csv
+from xml.sax.saxutils import escape, quoteattr # Esportazione dei grafi in GEXF e GraphML
+import tempfile
+import hashlib # Cache dei diagrammi di Propp indicizzata per contenuto
+import base64 # Diagrammi PNG incorporati nei fogli riassuntivi SVG
+import importlib.util # Presenza dei backend di annotazione opzionali senza importarli
+import importlib.metadata
 import itertools
 import re
-from collections import Counter
+import os
+import sys
+import unicodedata
+import bisect
+import heapq
+import fnmatch
+from collections import Counter, defaultdict
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field, fields, asdict, astuple, is_dataclass # Risultati strutturati del motore di analisi
+from typing import Optional
+import codecs
+import mmap # Corpus in streaming: i file restano su disco e vengono letti a blocchi
 import statistics
+import random
 import math
 import textwrap # Per gestire il testo lungo nei nodi graphviz
+import threading
+from concurrent.futures import ThreadPoolExecutor # Analisi in background senza bloccare la GUI
+from concurrent.futures import ProcessPoolExecutor # Caricamento del corpus su tutti i core
+from array import array # Array compatti di interi per i token codificati
 
 # --- Gestione Import Opzionali e Dipendenze ---
 # Controlla la disponibilità delle librerie non standard e dei dati NLTK
@@ -79,8 +149,7 @@ try:
     from PIL import Image, ImageTk
     pil_disponibile = True
 except ImportError:
-    print("Pillow (PIL) non è installato. L'immagine nell'About non sarà visualizzata. Installa con: pip install Pillow")
-
+    print("Pillow (PIL) non è installato. L'immagine nell'About non sarà visualizzata. Installa con: pip install Pillow", file=sys.stderr)
 # NLTK per analisi linguistiche, usabilità e Grice
 nltk_disponibile = False
 nltk_punkt_disponibile = False
@@ -92,36 +161,31 @@ try:
     try:
         nltk.data.find('tokenizers/punkt')
         nltk_punkt_disponibile = True
-    except nltk.downloader.DownloadError:
-        print("Pacchetto NLTK 'punkt' non trovato. Alcune funzionalità (frasi, token, leggibilità, Grice) potrebbero non funzionare.")
-        print("Scaricalo eseguendo in Python: nltk.download('punkt')")
-    except LookupError:
-         print("Pacchetto NLTK 'punkt' non trovato. Alcune funzionalità (frasi, token, leggibilità, Grice) potrebbero non funzionare.")
-         print("Scaricalo eseguendo in Python: nltk.download('punkt')")
-
-    try:
-        nltk.data.find('taggers/averaged_perceptron_tagger')
-        nltk_tagger_disponibile = True
-    except nltk.downloader.DownloadError:
-        print("Pacchetto NLTK 'averaged_perceptron_tagger' non trovato. Il POS tagging potrebbe non funzionare.")
-        print("Scaricalo eseguendo in Python: nltk.download('averaged_perceptron_tagger')")
-    except LookupError:
-        print("Pacchetto NLTK 'averaged_perceptron_tagger' non trovato. Il POS tagging potrebbe non funzionare.")
-        print("Scaricalo eseguendo in Python: nltk.download('averaged_perceptron_tagger')")
-
+    except LookupError: # Le versioni recenti di NLTK non hanno più nltk.downloader.DownloadError
+        print("Pacchetto NLTK 'punkt' non trovato. Alcune funzionalità (frasi, token, leggibilità, Grice) potrebbero non funzionare.", file=sys.stderr)
+        print("Scaricalo eseguendo in Python: nltk.download('punkt')", file=sys.stderr)
+    # Da NLTK 3.9 il modello del tagger si chiama 'averaged_perceptron_tagger_eng'
+    for risorsa_tagger in ('taggers/averaged_perceptron_tagger_eng', 'taggers/averaged_perceptron_tagger'):
+        try:
+            nltk.data.find(risorsa_tagger)
+            nltk_tagger_disponibile = True
+            break
+        except LookupError:
+            pass
+    if not nltk_tagger_disponibile:
+        print("Pacchetto NLTK 'averaged_perceptron_tagger' non trovato. Il POS tagging potrebbe non funzionare.", file=sys.stderr)
+        print("Scaricalo eseguendo in Python: nltk.download('averaged_perceptron_tagger')", file=sys.stderr)
 except ImportError:
-    print("Libreria NLTK non trovata. Le funzionalità di usabilità e Grice non saranno disponibili. Installa con: pip install nltk")
-
+    print("Libreria NLTK non trovata. Le funzionalità di usabilità e Grice non saranno disponibili. Installa con: pip install nltk", file=sys.stderr)
 # Graphviz per visualizzazione Propp
 graphviz_disponibile = False
 try:
     import graphviz
     graphviz_disponibile = True
 except ImportError:
-    print("Libreria 'graphviz' non trovata. La visualizzazione delle sequenze di Propp non sarà disponibile.")
-    print("Installala con: pip install graphviz")
-    print("Inoltre, assicurati che il software Graphviz sia installato sul sistema e nel PATH: https://graphviz.org/download/")
-
+    print("Libreria 'graphviz' non trovata. La visualizzazione delle sequenze di Propp non sarà disponibile.", file=sys.stderr)
+    print("Installala con: pip install graphviz", file=sys.stderr)
+    print("Inoltre, assicurati che il software Graphviz sia installato sul sistema e nel PATH: https://graphviz.org/download/", file=sys.stderr)
 # WordCloud e Matplotlib per nuvola di parole e andamento termini
 wordcloud_disponibile = False
 matplotlib_disponibile = False
@@ -131,12 +195,75 @@ try:
     wordcloud_disponibile = True
     matplotlib_disponibile = True
 except ImportError:
-    print("Librerie 'wordcloud' o 'matplotlib' non trovate. La nuvola di parole e l'andamento termini non saranno disponibili.")
-    print("Installale con: pip install wordcloud matplotlib")
+    print("Librerie 'wordcloud' o 'matplotlib' non trovate. La nuvola di parole e l'andamento termini non saranno disponibili.", file=sys.stderr)
+    print("Installale con: pip install wordcloud matplotlib", file=sys.stderr)
+# NumPy per conteggi vettorizzati sugli identificativi dei token
+numpy_disponibile = False
+try:
+    import numpy as np
+    numpy_disponibile = True
+except ImportError:
+    print("Libreria 'numpy' non trovata. I conteggi sul corpus useranno l'implementazione Python standard (più lenta su corpora grandi).", file=sys.stderr)
+    print("Installala con: pip install numpy", file=sys.stderr)
+# spaCy e Stanza: tagger e lemmatizzatori con modelli per l'italiano. Se ne controlla solo la presenza:
+# importarli (Stanza carica anche PyTorch) richiede secondi, rimandati al primo caricamento del modello
+spacy_disponibile = importlib.util.find_spec("spacy") is not None
+stanza_disponibile = importlib.util.find_spec("stanza") is not None
+# PyArrow per l'esportazione in formato Parquet dalla riga di comando (richiesta solo quando usata)
+pyarrow_disponibile = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pyarrow_disponibile = True
+except ImportError:
+    pass
 
 
 # --- Costanti e Definizioni ---
 
+# Sotto questa soglia di file il caricamento resta nel processo principale:
+# l'avvio dei processi costerebbe più della lettura stessa
+SOGLIA_CARICAMENTO_PARALLELO = 8
+
+# Corpus in streaming: byte di file decodificati e tokenizzati per volta
+DIMENSIONE_BLOCCO_STREAMING = 4 * 1024 * 1024
+# Corpus in streaming: byte di file oltre i quali le analisi che richiedono tutto il testo in memoria
+# (KWIC, frasi, leggibilità, POS...) vengono rifiutate invece di esaurire la RAM. None: nessun limite
+LIMITE_IN_MEMORIA_STREAMING = 512 * 1024 * 1024
+# Corpus in memoria: token per blocco nelle analisi a blocchi (n-grammi, co-occorrenze)
+DIMENSIONE_BLOCCO_ID = 1 << 20
+# Collocazioni: misure di associazione disponibili e frequenza minima dei candidati
+MISURE_ASSOCIAZIONE = ("frequenza", "pmi", "log_likelihood", "chi_quadro", "t_score", "dice")
+FREQUENZA_MINIMA_ASSOCIAZIONE = 3
+# Formati di esportazione della rete di co-occorrenze, per estensione del file
+FORMATI_GRAFO = {".gexf": "gexf", ".graphml": "graphml", ".csv": "csv", ".tsv": "tsv"}
+# Co-occorrenze: triplette COO accumulate prima di ridurle a coppie uniche (circa 16 byte l'una)
+SOGLIA_COMPATTAZIONE_COPPIE = 1 << 23
+# Concordanze per sottostringa: unità di misura del contesto e ampiezza predefinita per ciascuna
+AMPIEZZA_CONTESTO_CONCORDANZE = {"token": 5, "caratteri": 40}
+# Distribuzione dell'indice Gulpease per frase: percentili riportati, fasce dell'istogramma, finestra della media mobile
+PERCENTILI_GULPEASE = (5, 10, 25, 50, 75, 90, 95)
+AMPIEZZA_FASCIA_GULPEASE = 10
+FINESTRA_MEDIA_MOBILE_GULPEASE = 50
+# Annotazione POS: token per blocco di frasi inviato al tagger e soglia (in token) sotto cui si resta nel processo principale
+TOKEN_PER_BLOCCO_POS = 20000
+SOGLIA_POS_PARALLELO = 200000
+# Codici ISO delle lingue di segmentazione NLTK, per scegliere i modelli dei backend di annotazione
+CODICI_LINGUA = {"italian": "it", "english": "en", "french": "fr", "german": "de", "spanish": "es",
+                 "portuguese": "pt", "dutch": "nl"}
+# Categorie grammaticali per i filtri POS: tag Penn Treebank (tagger di NLTK) e Universal Dependencies
+CATEGORIE_POS = {
+    "nomi": ("NN", "NNS", "NNP", "NNPS", "NOUN", "PROPN"),
+    "verbi": ("VB", "VBD", "VBG", "VBN", "VBP", "VBZ", "MD", "VERB", "AUX"),
+    "aggettivi": ("JJ", "JJR", "JJS", "ADJ"),
+    "avverbi": ("RB", "RBR", "RBS", "WRB", "ADV"),
+    "pronomi": ("PRP", "PRP$", "WP", "WP$", "PRON"),
+    "determinanti": ("DT", "PDT", "WDT", "DET"),
+    "preposizioni": ("IN", "TO", "ADP"),
+    "congiunzioni": ("CC", "CCONJ", "SCONJ"),
+    "numeri": ("CD", "NUM"),
+}
+
 # Definizioni delle 31 funzioni di Propp
 FUNZIONI_PROPP = {
     "F1": "Allontanamento (Un membro della famiglia si allontana)",
@@ -172,9 +299,4178 @@ FUNZIONI_PROPP = {
     "F31": "Nozze/Ricompensa (L'eroe si sposa o è ricompensato)"
 }
 
+# Vincoli narratologici predefiniti per le trame generate: valgono solo tra funzioni presenti nella trama,
+# ma le precedenze sono transitive (F8 < F9 < F10 impone F8 prima di F10 anche senza F9).
+# (A, B) in PRECEDENZE_PROPP: A deve venire prima di B; (A, B) in ADIACENZE_PROPP: B segue subito A.
+PRECEDENZE_PROPP = (
+    ("F2", "F3"), ("F4", "F5"), ("F6", "F7"), ("F8", "F9"), ("F9", "F10"), ("F10", "F11"),
+    ("F12", "F13"), ("F13", "F14"), ("F16", "F18"), ("F8", "F19"), ("F11", "F20"),
+    ("F21", "F22"), ("F25", "F26"), ("F24", "F28"), ("F18", "F30"), ("F19", "F31"),
+)
+ADIACENZE_PROPP = (("F6", "F7"), ("F21", "F22"))
+# Le sei fasi in cui Propp raggruppa le funzioni (per i conteggi dei sottoinsiemi)
+FASI_PROPP = {
+    "Preparazione": ("F1", "F2", "F3", "F4", "F5", "F6", "F7"),
+    "Complicazione": ("F8", "F9", "F10"),
+    "Trasferimento": ("F11", "F12", "F13", "F14", "F15"),
+    "Lotta": ("F16", "F17", "F18", "F19"),
+    "Ritorno": ("F20", "F21", "F22"),
+    "Riconoscimento": ("F23", "F24", "F25", "F26", "F27", "F28", "F29", "F30", "F31"),
+}
+
+# Stopwords italiane di default (ampliate)
+STOPWORDS_ITALIANE = frozenset([
+    "a", "ad", "al", "allo", "ai", "agli", "alla", "alle", "anche", "ancora", "aveva", "avevano",
+    "avevo", "avrà", "avrai", "avranno", "avrebbe", "avrebbero", "avrei", "avremmo", "avremo",
+    "avreste", "avresti", "avrete", "avevamo", "avevate", "c", "che", "chi", "ci", "ciò", "coi",
+    "col", "come", "con", "contro", "cui", "da", "dal", "dallo", "dai", "dagli", "dalla",
+    "dalle", "dei", "degli", "del", "dell", "della", "delle", "dello", "dentro", "di", "dice", "dietro",
+    "dire", "disse", "dopo", "dove", "dovrà", "dovrebbe", "dovrei", "dovremmo", "dovremo", "dovreste",
+    "dovresti", "dovrete", "dunque", "e", "è", "ebbe", "ebbero", "ed", "ecco", "era", "erano",
+    "eravamo", "eravate", "ero", "esempio", "esse", "essendo", "essere", "essi", "esso", "faccia",
+    "facciamo", "facciano", "faccio", "facemmo", "facendo", "facesse", "facessero", "facessi",
+    "facessimo", "faceste", "facesti", "faceva", "facevamo", "facevano", "facevate", "fai", "fanno",
+    "farà", "farai", "faranno", "fare", "farebbe", "farebbero", "farei", "faremmo", "faremo",
+    "fareste", "faresti", "farete", "fece", "fecero", "fino", "fosse", "fossero", "fossi", "fossimo",
+    "foste", "fosti", "fra", "fu", "furono", "già", "gli", "ha", "hai", "hanno", "ho", "i", "il",
+    "in", "infatti", "inoltre", "invece", "io", "l", "la", "le", "lei", "li", "lo", "loro", "lui",
+    "ma", "me", "mentre", "mi", "mia", "mie", "miei", "mio", "modo", "molto", "ne", "negli", "nei",
+    "nel", "nell", "nella", "nelle", "nello", "nessuno", "noi", "non", "nostra", "nostre",
+    "nostri", "nostro", "o", "ogni", "oppure", "ora", "per", "perché", "perciò", "però", "più",
+    "poco", "possa", "possano", "posso", "potrebbe", "potrebbero", "potrei", "potremmo", "potremo",
+    "potreste", "potresti", "potrete", "prima", "può", "pure", "qualsiasi", "quando", "quanta",
+    "quante", "quanti", "quanto", "quella", "quelle", "quelli", "quello", "questa", "queste",
+    "questi", "questo", "qui", "quindi", "sarà", "sarai", "saranno", "sarebbe", "sarebbero",
+    "sarei", "saremmo", "saremo", "sareste", "saresti", "sarete", "se", "sé", "secondo", "sembra",
+    "sembrava", "senza", "sette", "sia", "siamo", "siano", "siate", "siete", "significa", "solo",
+    "sono", "sopra", "sotto", "sta", "stai", "stando", "stanno", "starà", "starai", "staranno",
+    "starebbe", "starebbero", "starei", "staremmo", "staremo", "stareste", "staresti", "starete",
+    "stata", "state", "stati", "stato", "stava", "stavamo", "stavano", "stavate", "stessa",
+    "stesse", "stessi", "stesso", "stette", "stettero", "stetti", "stia", "stiamo", "stiano",
+    "stiate", "sto", "su", "sua", "sue", "sugli", "sui", "sul", "sull", "sulla", "sulle", "sullo",
+    "suoi", "suo", "t", "tale", "tali", "tanto", "te", "tempo", "ti", "tra", "tre", "tripla",
+    "triplo", "troppo", "tu", "tua", "tue", "tuoi", "tuo", "tutta", "tuttavia", "tutte", "tutti",
+    "tutto", "un", "una", "uno", "uomo", "va", "vai", "vale", "varie", "verso", "vi", "via", "voi",
+    "volta", "volte", "vostra", "vostre", "vostri", "vostro"
+])
+
 # Lista (molto limitata) di possibili indicatori di "hedging" (copertura/incertezza) per Grice
 HEDGING_TERMS = ["credo", "penso", "forse", "magari", "sembra", "parrebbe", "apparentemente", "in un certo senso", "tipo", "cioè", "insomma"]
 
+# Espressioni regolari precompilate per la tokenizzazione del corpus
+REGEX_PAROLA = re.compile(r'\b\w+\b')
+REGEX_FINE_PAROLA = re.compile(r'[\w\r]*\Z') # Parola (o '\r' di un '\r\n') forse troncata alla fine di un blocco
+REGEX_TOKEN_KWIC = re.compile(r'\b\w+\b|[\.,;!?\'"\(\)]') # Parole e punteggiatura comune (per KWIC)
+PUNTEGGIATURA_KWIC = frozenset('.,;!?\'"()') # Token di punteggiatura riconosciuti da REGEX_TOKEN_KWIC
+REGEX_QUERY_KWIC = re.compile(r'[\w*]+|[\.,;!?\'"\(\)]') # Come REGEX_TOKEN_KWIC, ma con il carattere jolly '*'
+REGEX_SPAZI = re.compile(r'\s+')
+REGEX_NUCLEI_SILLABICI = re.compile(r'[aeiouyàáèéìíòóùú](?:h?[aeiouyàáèéìíòóùú])*') # Gruppi vocalici ('h' muta inclusa)
+VOCALI_FORTI = frozenset('aeoàáèéìíòóùú') # Le vocali accentate non formano dittongo: 'più' come 'paese'
+REGEX_VIRGOLETTE_NLTK = re.compile(r'``|\'\'|"') # Virgolette doppie che il tokenizzatore di NLTK riscrive come `` e ''
+# Indice dei suffissi: ogni spazio (anche '\n' e '\t') diventa ' ', così una frase trova anche le occorrenze
+# spezzate su più righe; '\x00' separa i documenti nel testo indicizzato e non può comparire al loro interno
+BYTE_CONTINUAZIONE_UTF8 = bytes(range(0x80, 0xC0))
+SPAZI_INDICE_SUFFISSI = {codice: ' ' for codice in [0] + [i for i in range(0x3001) if chr(i).isspace()]}
+
+
+# --- Modello del Corpus ---
+
+class Vocabolario:
+    """
+    Associa a ogni forma (minuscola) un identificativo intero progressivo.
+    I documenti vengono memorizzati come array('I') di identificativi: 4 byte per token
+    invece di un oggetto stringa Python per ogni occorrenza.
+    """
+    def __init__(self, forme=None):
+        self.forme = list(forme) if forme else [] # id -> forma
+        self.indice = {forma: i for i, forma in enumerate(self.forme)} # forma -> id
+
+    def __len__(self):
+        return len(self.forme)
+
+    def id_forma(self, forma):
+        """Restituisce l'id della forma, aggiungendola al vocabolario se è nuova."""
+        id_forma = self.indice.get(forma)
+        if id_forma is None:
+            id_forma = len(self.forme)
+            self.indice[forma] = id_forma
+            self.forme.append(forma)
+        return id_forma
+
+    def cerca(self, forma):
+        """Restituisce l'id della forma o None se la forma non compare nel corpus."""
+        return self.indice.get(forma)
+
+    def codifica(self, forme):
+        """Converte una sequenza di forme in un array('I') di identificativi."""
+        id_forma = self.id_forma
+        return array('I', [id_forma(forma) for forma in forme])
+
+    def ids_di(self, forme):
+        """Restituisce l'insieme degli id delle forme presenti nel vocabolario (es. le stopwords)."""
+        return {self.indice[forma] for forma in forme if forma in self.indice}
+
+
+def filtra_ids(ids, ids_esclusi):
+    """Restituisce un nuovo array('I') senza gli id indicati (es. stopwords)."""
+    if not ids_esclusi:
+        return array('I', ids)
+    if numpy_disponibile and len(ids):
+        vettore = np.frombuffer(ids, dtype=np.uintc)
+        filtrati = vettore[~np.isin(vettore, np.fromiter(ids_esclusi, dtype=np.uintc, count=len(ids_esclusi)))]
+        return array('I', filtrati.tobytes())
+    return array('I', [i for i in ids if i not in ids_esclusi])
+
+
+def conta_ids(ids):
+    """Conta le occorrenze di ciascun id; restituisce un Counter {id: frequenza}."""
+    if numpy_disponibile and len(ids):
+        conteggi = np.bincount(np.frombuffer(ids, dtype=np.uintc))
+        presenti = np.flatnonzero(conteggi)
+        return Counter(dict(zip(presenti.tolist(), conteggi[presenti].tolist())))
+    return Counter(ids)
+
+
+def sottrai_conteggi(conteggi, da_sottrarre):
+    """Sottrae 'da_sottrarre' da un Counter sul posto, eliminando le chiavi rimaste senza occorrenze."""
+    for chiave, freq in da_sottrarre.items():
+        if not freq:
+            continue
+        residuo = conteggi.get(chiave, 0) - freq
+        if residuo > 0:
+            conteggi[chiave] = residuo
+        else:
+            conteggi.pop(chiave, None)
+
+
+def piu_frequenti_ordinati(conteggi, num, etichetta):
+    """
+    Come Counter.most_common(num), ma a parità di frequenza in ordine di etichetta(chiave) (es. la forma
+    della parola): l'ordine di inserimento nel Counter cambia tra il conteggio con NumPy e quello in Python puro.
+    Le etichette si calcolano solo per le voci frequenti almeno quanto la num-esima.
+    """
+    if num is not None and num <= 0:
+        return []
+    if num is not None and num < len(conteggi):
+        soglia = heapq.nlargest(num, conteggi.values())[-1]
+        candidate = [voce for voce in conteggi.items() if voce[1] >= soglia]
+    else:
+        candidate = list(conteggi.items())
+    candidate.sort(key=lambda voce: (-voce[1], etichetta(voce[0])))
+    return candidate[:num]
+
+
+def conta_ngrammi(ids, n):
+    """Conta gli n-grammi di id consecutivi; restituisce un Counter {(id1, ..., idn): frequenza}."""
+    if len(ids) < n:
+        return Counter()
+    if numpy_disponibile:
+        vettore = np.frombuffer(ids, dtype=np.uintc).astype(np.int64)
+        num_ngrammi = len(vettore) - n + 1
+        base = int(vettore.max()) + 1
+        if base ** n < 2 ** 63:
+            # Ogni n-gramma diventa un unico intero a 64 bit (numerazione in base |V|)
+            chiavi = np.zeros(num_ngrammi, dtype=np.int64)
+            for i in range(n):
+                chiavi = chiavi * base + vettore[i:i + num_ngrammi]
+            uniche, conteggi = np.unique(chiavi, return_counts=True)
+            ngrammi = np.empty((len(uniche), n), dtype=np.int64)
+            for i in range(n - 1, -1, -1):
+                ngrammi[:, i] = uniche % base
+                uniche = uniche // base
+        else:
+            colonne = np.stack([vettore[i:i + num_ngrammi] for i in range(n)], axis=1)
+            ngrammi, conteggi = np.unique(colonne, axis=0, return_counts=True)
+        return Counter(dict(zip(map(tuple, ngrammi.tolist()), conteggi.tolist())))
+    return Counter(zip(*(ids[i:] for i in range(n))))
+
+
+def conta_cooccorrenze(ids, finestra, co_occorrenze=None, verifica=None):
+    """
+    Conta le coppie di id distinti che compaiono nella stessa finestra di 'finestra' token consecutivi.
+    Ogni coppia è una tupla ordinata (id minore, id maggiore); i conteggi si sommano in 'co_occorrenze'.
+    """
+    if co_occorrenze is None:
+        co_occorrenze = Counter()
+    num_finestre = len(ids) - finestra + 1
+    # Itera attraverso le parole per creare finestre di contesto
+    for i in range(num_finestre):
+        if verifica and i % 20000 == 0: # Verifica l'annullamento ogni tanto
+            verifica()
+        # Considera solo gli id unici all'interno della finestra e ordinali per creare coppie consistenti
+        parole_nella_finestra_uniche = sorted(set(ids[i : i + finestra]))
+
+        # Se ci sono almeno due parole uniche nella finestra, genera tutte le coppie possibili
+        if len(parole_nella_finestra_uniche) < 2: continue
+
+        # Genera tutte le coppie non ordinate di parole uniche nella finestra
+        for j in range(len(parole_nella_finestra_uniche)):
+            for k in range(j + 1, len(parole_nella_finestra_uniche)):
+                co_occorrenze[(parole_nella_finestra_uniche[j], parole_nella_finestra_uniche[k])] += 1
+    return co_occorrenze
+
+
+def con_coda(blocchi, lunghezza_coda):
+    """
+    Ripropone a ogni blocco di id gli ultimi 'lunghezza_coda' id del blocco precedente,
+    così n-grammi e finestre che attraversano il confine tra due blocchi vengono contati una sola volta.
+    """
+    coda = array('I')
+    for blocco in blocchi:
+        ids = coda + blocco if coda else blocco
+        yield ids
+        coda = ids[max(0, len(ids) - lunghezza_coda):] if lunghezza_coda else array('I')
+
+
+def coppie_cooccorrenze(ids, finestra, verifica=None):
+    """
+    Versione vettorizzata (NumPy) di conta_cooccorrenze, con lo stesso risultato: genera, per ogni
+    distanza d < finestra, le coppie COO (chiavi, conteggi) con chiave (id minore << 32) | id maggiore.
+    Ogni finestra contiene una coppia di id una sola volta: la si attribuisce alle ultime occorrenze
+    dei due id nella finestra, per cui la coppia di posizioni (p, p+d) conta le finestre che finiscono
+    tra p+d e p+finestra-1, prima della successiva occorrenza dello stesso id in p o in p+d.
+    Le chiavi non sono ridotte: la stessa coppia può comparire più volte (vedi riduci_coppie).
+    """
+    num_token = len(ids)
+    if finestra < 2 or num_token < finestra:
+        return
+    vettore = np.frombuffer(ids, dtype=np.uintc).astype(np.int64)
+    # Ultima fine di finestra in cui ogni posizione è ancora l'ultima occorrenza del suo id
+    ordine = np.argsort(vettore, kind='stable')
+    stesso_id = vettore[ordine[1:]] == vettore[ordine[:-1]]
+    ultima_fine = np.full(num_token, num_token - 1, dtype=np.int64)
+    ultima_fine[ordine[:-1][stesso_id]] = ordine[1:][stesso_id] - 1
+    for d in range(1, finestra):
+        if verifica:
+            verifica()
+        p = np.arange(num_token - d, dtype=np.int64)
+        prima_fine = np.maximum(p + d, finestra - 1)
+        ultima = np.minimum(np.minimum(ultima_fine[:num_token - d], ultima_fine[d:]), p + finestra - 1)
+        conteggi = ultima - prima_fine + 1
+        a, b = vettore[:num_token - d], vettore[d:]
+        valide = (conteggi > 0) & (a != b)
+        a, b = a[valide], b[valide]
+        yield (np.minimum(a, b) << 32) | np.maximum(a, b), conteggi[valide]
+
+
+def riduci_coppie(parziali):
+    """Unisce liste di coppie COO (chiavi, conteggi) in chiavi ordinate e uniche con i conteggi sommati."""
+    chiavi = np.concatenate([chiavi for chiavi, _ in parziali])
+    conteggi = np.concatenate([conteggi for _, conteggi in parziali])
+    if not len(chiavi):
+        return chiavi, conteggi
+    ordine = np.argsort(chiavi)
+    chiavi, conteggi = chiavi[ordine], conteggi[ordine]
+    inizi = np.flatnonzero(np.concatenate(([True], chiavi[1:] != chiavi[:-1])))
+    return chiavi[inizi], np.add.reduceat(conteggi, inizi)
+
+
+class MatriceCooccorrenze:
+    """
+    Matrice sparsa delle co-occorrenze tra id di parole in formato CSR, triangolare superiore:
+    la riga è l'id minore della coppia, la colonna l'id maggiore. Gli array 'indptr', 'indici'
+    e 'conteggi' sono di NumPy se disponibile (altrimenti array Python). Per compatibilità con
+    il Counter usato in precedenza offre most_common, get, items e l'accesso per coppia.
+    """
+    def __init__(self, dimensione, indptr, indici, conteggi):
+        self.dimensione = dimensione # Numero di righe (id del vocabolario)
+        self.indptr = indptr
+        self.indici = indici
+        self.conteggi = conteggi
+        self._vettoriale = not isinstance(conteggi, array) # Array NumPy
+
+    @classmethod
+    def da_chiavi(cls, chiavi, conteggi, dimensione):
+        """Costruisce la matrice da chiavi (id minore << 32) | id maggiore ordinate e uniche (NumPy)."""
+        righe = chiavi >> 32
+        dimensione = max(dimensione, int(righe[-1]) + 1 if len(righe) else 0)
+        indptr = np.searchsorted(righe, np.arange(dimensione + 1, dtype=np.int64)).astype(np.int64)
+        return cls(dimensione, indptr, (chiavi & 0xFFFFFFFF).astype(np.uintc), conteggi.astype(np.int64))
+
+    @classmethod
+    def da_conteggi(cls, co_occorrenze, dimensione):
+        """Costruisce la matrice da un Counter {(id minore, id maggiore): frequenza}."""
+        coppie = sorted(co_occorrenze.items())
+        if coppie:
+            dimensione = max(dimensione, coppie[-1][0][0] + 1)
+        if numpy_disponibile:
+            chiavi = np.array([(a << 32) | b for (a, b), _ in coppie], dtype=np.int64)
+            return cls.da_chiavi(chiavi, np.array([freq for _, freq in coppie], dtype=np.int64), dimensione)
+        indptr = array('Q', [0]) * (dimensione + 1)
+        for (a, _), _ in coppie:
+            indptr[a + 1] += 1
+        for riga in range(dimensione):
+            indptr[riga + 1] += indptr[riga]
+        return cls(dimensione, indptr, array('I', [b for (_, b), _ in coppie]), array('Q', [freq for _, freq in coppie]))
+
+    def __len__(self):
+        """Numero di coppie distinte (elementi non nulli)."""
+        return len(self.conteggi)
+
+    def _riga(self, posizione):
+        if self._vettoriale:
+            return int(np.searchsorted(self.indptr, posizione, side='right')) - 1
+        return bisect.bisect_right(self.indptr, posizione) - 1
+
+    def _posizione(self, id1, id2):
+        a, b = (id1, id2) if id1 < id2 else (id2, id1)
+        if a >= self.dimensione:
+            return None
+        inizio, fine = int(self.indptr[a]), int(self.indptr[a + 1])
+        if self._vettoriale:
+            posizione = inizio + int(np.searchsorted(self.indici[inizio:fine], b))
+        else:
+            posizione = bisect.bisect_left(self.indici, b, inizio, fine)
+        return posizione if posizione < fine and self.indici[posizione] == b else None
+
+    def get(self, coppia, default=0):
+        posizione = self._posizione(*coppia)
+        return default if posizione is None else int(self.conteggi[posizione])
+
+    def __getitem__(self, coppia):
+        return self.get(coppia)
+
+    def __contains__(self, coppia):
+        return self._posizione(*coppia) is not None
+
+    def items(self):
+        """Coppie ((id minore, id maggiore), frequenza) in ordine di riga e colonna."""
+        for riga in range(self.dimensione):
+            for posizione in range(int(self.indptr[riga]), int(self.indptr[riga + 1])):
+                yield (riga, int(self.indici[posizione])), int(self.conteggi[posizione])
+
+    def totale(self):
+        """Somma di tutti i conteggi."""
+        return int(self.conteggi.sum()) if self._vettoriale else sum(self.conteggi)
+
+    def most_common(self, n=None):
+        """
+        Le 'n' coppie più frequenti (tutte se n è None), a parità di frequenza in ordine di id.
+        Con NumPy la selezione è parziale (argpartition), altrimenti usa uno heap (heapq.nlargest).
+        """
+        num_coppie = len(self)
+        if n is None or n > num_coppie:
+            n = num_coppie
+        if n <= 0:
+            return []
+        if self._vettoriale:
+            candidate = np.arange(num_coppie) if n == num_coppie else np.argpartition(-self.conteggi, n - 1)[:n]
+            # argpartition non garantisce quali tra le coppie a pari merito con l'n-esima vengano scelte
+            soglia = self.conteggi[candidate].min()
+            candidate = np.union1d(candidate, np.flatnonzero(self.conteggi == soglia))
+            scelte = candidate[np.lexsort((candidate, -self.conteggi[candidate]))][:n]
+        else:
+            scelte = heapq.nlargest(n, range(num_coppie), key=self.conteggi.__getitem__)
+        return [((self._riga(int(posizione)), int(self.indici[posizione])), int(self.conteggi[posizione]))
+                for posizione in scelte]
+
+
+class IndicePosizionale:
+    """
+    Indice invertito posizionale: id termine -> array('I') di coppie (documento, posizione)
+    memorizzate in modo alternato. Costruito una volta per corpus, permette ricerche KWIC
+    con costo proporzionale al numero di occorrenze e non alla dimensione del corpus.
+    Supporta frasi di più parole e il carattere jolly '*' (es. 'am*', '*mente').
+    """
+    def __init__(self, vocabolario, ids_documenti):
+        self.vocabolario = vocabolario
+        self.ids_documenti = ids_documenti # Flusso completo (parole e punteggiatura) di ogni documento
+        self.postings = {}
+        self._forme_ordinate = None # (forme ordinate, id corrispondenti) per le ricerche per prefisso
+        for indice_doc, ids in enumerate(ids_documenti):
+            self._indicizza_documento(indice_doc, ids)
+
+    def _indicizza_documento(self, indice_doc, ids):
+        """Aggiunge ai postings le posizioni di tutti i token di un documento."""
+        if numpy_disponibile and len(ids):
+            vettore = np.frombuffer(ids, dtype=np.uintc)
+            ordine = np.argsort(vettore, kind='stable').astype(np.uintc)
+            termini, inizi = np.unique(vettore[ordine], return_index=True)
+            fini = inizi[1:].tolist() + [len(ordine)]
+            for id_termine, inizio, fine in zip(termini.tolist(), inizi.tolist(), fini):
+                coppie = np.empty(2 * (fine - inizio), dtype=np.uintc)
+                coppie[0::2] = indice_doc
+                coppie[1::2] = ordine[inizio:fine]
+                self.postings.setdefault(id_termine, array('I')).frombytes(coppie.tobytes())
+            return
+        posizioni_doc = {}
+        for posizione, id_termine in enumerate(ids):
+            posizioni_doc.setdefault(id_termine, []).append(posizione)
+        for id_termine, posizioni in posizioni_doc.items():
+            self.postings.setdefault(id_termine, array('I')).extend(
+                itertools.chain.from_iterable(zip(itertools.repeat(indice_doc), posizioni)))
+
+    def aggiungi_documento(self, ids):
+        """Indicizza un nuovo documento in coda: i postings restano ordinati per documento."""
+        self.ids_documenti.append(ids)
+        self._indicizza_documento(len(self.ids_documenti) - 1, ids)
+        self._forme_ordinate = None
+
+    def rimuovi_documento(self, indice_doc):
+        """Toglie le occorrenze di un documento e rinumera i documenti successivi."""
+        del self.ids_documenti[indice_doc]
+        for id_termine in list(self.postings):
+            coppie = self.postings[id_termine]
+            if coppie[-2] < indice_doc:
+                continue # Postings ordinati per documento: nessuna occorrenza dal documento rimosso in poi
+            if numpy_disponibile:
+                vettore = np.frombuffer(coppie, dtype=np.uintc).reshape(-1, 2)
+                inizio = int(np.searchsorted(vettore[:, 0], indice_doc))
+                coda = vettore[inizio:]
+                coda = coda[coda[:, 0] != indice_doc]
+                coda[:, 0] -= 1
+                nuove = array('I', vettore[:inizio].tobytes())
+                nuove.frombytes(coda.tobytes())
+            else:
+                nuove = array('I')
+                for doc, posizione in zip(coppie[0::2], coppie[1::2]):
+                    if doc != indice_doc:
+                        nuove.extend((doc - 1 if doc > indice_doc else doc, posizione))
+            if nuove:
+                self.postings[id_termine] = nuove
+            else:
+                del self.postings[id_termine]
+        self._forme_ordinate = None
+
+    def ids_per_modello(self, modello):
+        """Restituisce gli id delle forme indicizzate che corrispondono al modello (minuscolo, con '*' opzionale)."""
+        if '*' not in modello:
+            id_forma = self.vocabolario.cerca(modello)
+            return {id_forma} if id_forma is not None and id_forma in self.postings else set()
+        prefisso = modello.split('*', 1)[0]
+        if self._forme_ordinate is None or len(self._forme_ordinate[0]) != len(self.postings):
+            coppie = sorted((self.vocabolario.forme[i], i) for i in self.postings)
+            self._forme_ordinate = ([forma for forma, _ in coppie], [i for _, i in coppie])
+        forme, ids = self._forme_ordinate
+        # Le forme con il prefisso letterale sono contigue nell'elenco ordinato
+        inizio = bisect.bisect_left(forme, prefisso)
+        fine = bisect.bisect_left(forme, prefisso + '\U0010ffff') if prefisso else len(forme)
+        if modello == prefisso + '*':
+            return set(ids[inizio:fine])
+        return {ids[k] for k in range(inizio, fine) if fnmatch.fnmatchcase(forme[k], modello)}
+
+    def cerca(self, query):
+        """
+        Cerca una parola o una frase (eventualmente con caratteri jolly).
+        Restituisce una lista ordinata di (documento, posizione iniziale, numero di token).
+        """
+        termini = REGEX_QUERY_KWIC.findall(query.lower())
+        if not termini:
+            return []
+        insiemi = [self.ids_per_modello(termine) for termine in termini]
+        if not all(insiemi):
+            return []
+        # Si parte dal termine con meno occorrenze e si verificano gli altri direttamente nei documenti
+        ancora = min(range(len(insiemi)), key=lambda k: sum(len(self.postings[i]) for i in insiemi[k]))
+        risultati = []
+        for id_termine in insiemi[ancora]:
+            coppie = self.postings[id_termine]
+            for indice_doc, posizione in zip(coppie[0::2], coppie[1::2]):
+                inizio = posizione - ancora
+                ids_doc = self.ids_documenti[indice_doc]
+                if inizio < 0 or inizio + len(termini) > len(ids_doc):
+                    continue
+                if all(ids_doc[inizio + k] in insiemi[k] for k in range(len(termini)) if k != ancora):
+                    risultati.append((indice_doc, inizio, len(termini)))
+        risultati.sort()
+        return risultati
+
+
+class SequenzaPigra(Sequence):
+    """Vista a sola lettura che applica 'funzione' a un elemento di 'sequenza' solo quando viene letto (es. contesti KWIC)."""
+    def __init__(self, sequenza, funzione):
+        self._sequenza = sequenza
+        self._funzione = funzione
+
+    def __len__(self):
+        return len(self._sequenza)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        return self._funzione(self._sequenza[indice])
+
+
+def minuscolo_allineato(testo):
+    """
+    Minuscolo e spazi uniformi (SPAZI_INDICE_SUFFISSI) con lo stesso numero di caratteri del testo originale,
+    così una posizione nel testo indicizzato è anche una posizione nel documento.
+    I rari caratteri il cui minuscolo è più lungo (es. 'İ') restano invariati.
+    """
+    minuscolo = testo.lower()
+    if len(minuscolo) != len(testo):
+        minuscolo = ''.join(c.lower() if len(c.lower()) == 1 else c for c in testo)
+    return minuscolo.translate(SPAZI_INDICE_SUFFISSI)
+
+def _gruppi_non_risolti(inizio_gruppo, posizioni):
+    """Le posizioni che appartengono a gruppi di più elementi, dato il vettore booleano degli inizi di gruppo."""
+    fine_gruppo = np.empty(len(inizio_gruppo), dtype=bool)
+    fine_gruppo[:-1] = inizio_gruppo[1:]
+    fine_gruppo[-1] = True
+    return posizioni[~(inizio_gruppo & fine_gruppo)]
+
+def costruisci_array_suffissi(testo, avanzamento=None, verifica=None):
+    """
+    Array dei suffissi di una sequenza di byte: le posizioni iniziali dei suffissi in ordine lessicografico.
+    Raddoppio dei prefissi (Manber-Myers): a ogni passo i suffissi sono ordinati per i primi h byte e
+    il rango di due prefissi lunghi h dà l'ordine per 2h. Con NumPy il primo passo impacchetta in un
+    intero a 64 bit tanti byte quanti ne permette l'alfabeto del testo (circa 10 per un testo italiano)
+    e i passi successivi riordinano solo i suffissi ancora a pari merito, cioè quelli dentro ripetizioni
+    più lunghe del prefisso già confrontato: nel testo comune sono pochi dopo il primo ordinamento.
+    """
+    n = len(testo)
+    if numpy_disponibile:
+        tipo = np.uint32 if n < 1 << 32 else np.int64
+        if n == 0:
+            return np.empty(0, dtype=tipo)
+        simboli = np.frombuffer(testo, dtype=np.uint8)
+        # Codici 1..alfabeto in ordine di byte; 0 è riservato alle posizioni oltre la fine del testo
+        presenti = np.bincount(simboli, minlength=256) > 0
+        codici = np.cumsum(presenti).astype(np.int64)[simboli]
+        bit = int(presenti.sum()).bit_length()
+        h = max(1, 62 // bit)
+        chiave = np.zeros(n, dtype=np.int64)
+        for j in range(h):
+            chiave <<= bit
+            chiave[:max(0, n - j)] |= codici[j:]
+        del codici
+        if avanzamento:
+            avanzamento(None, f"Ordinamento dei suffissi (prefissi di {h:,} byte)...")
+        suffissi = np.argsort(chiave)
+        chiave = chiave[suffissi]
+        inizio_gruppo = np.empty(n, dtype=bool)
+        inizio_gruppo[0] = True
+        np.not_equal(chiave[1:], chiave[:-1], out=inizio_gruppo[1:])
+        del chiave
+        # Rango di un suffisso: posizione nell'array del primo suffisso con lo stesso prefisso di h byte
+        posizioni = np.arange(n, dtype=np.int64)
+        rango = np.empty(n, dtype=np.int64)
+        rango[suffissi] = np.maximum.accumulate(np.where(inizio_gruppo, posizioni, 0))
+        da_ordinare = _gruppi_non_risolti(inizio_gruppo, posizioni)
+        del inizio_gruppo, posizioni
+        while len(da_ordinare):
+            # Si riordinano solo i gruppi di suffissi ancora a pari merito (Larsson-Sadakane)
+            if verifica:
+                verifica()
+            if avanzamento:
+                avanzamento(None, f"Ordinamento dei suffissi (prefissi di {2 * h:,} byte, {len(da_ordinare):,} da ordinare)...")
+            gruppo = suffissi[da_ordinare]
+            seguente = gruppo + h
+            chiave = rango[gruppo] * (n + 1) + np.where(seguente < n, rango[np.minimum(seguente, n - 1)] + 1, 0)
+            del seguente
+            ordine = np.argsort(chiave)
+            gruppo, chiave = gruppo[ordine], chiave[ordine]
+            del ordine
+            suffissi[da_ordinare] = gruppo
+            inizio_gruppo = np.empty(len(gruppo), dtype=bool)
+            inizio_gruppo[0] = True
+            np.not_equal(chiave[1:], chiave[:-1], out=inizio_gruppo[1:])
+            del chiave
+            rango[gruppo] = np.maximum.accumulate(np.where(inizio_gruppo, da_ordinare, 0))
+            da_ordinare = da_ordinare[_gruppi_non_risolti(inizio_gruppo, np.arange(len(gruppo)))]
+            h *= 2
+        return suffissi.astype(tipo, copy=False)
+    rango = [byte + 1 for byte in testo]
+    ordine = list(range(n))
+    h = 1
+    while n:
+        if verifica:
+            verifica()
+        if avanzamento:
+            avanzamento(None, f"Ordinamento dei suffissi (prefissi di {h:,} byte)...")
+        chiavi = [(rango[i], rango[i + h] if i + h < n else 0) for i in range(n)]
+        ordine.sort(key=chiavi.__getitem__)
+        nuovo_rango = [0] * n
+        classe = 0
+        precedente = None
+        for i in ordine:
+            if chiavi[i] != precedente:
+                classe += 1
+                precedente = chiavi[i]
+            nuovo_rango[i] = classe
+        rango = nuovo_rango
+        if classe == n:
+            break
+        h *= 2
+    return array('I', ordine)
+
+
+class IndiceSuffissi:
+    """
+    Indice per sottostringhe arbitrarie (frammenti di parola, frasi, stringhe con punteggiatura):
+    array dei suffissi del testo minuscolo dei documenti, codificato in UTF-8 e separato da '\x00'.
+    Cercare una stringa di m byte è una ricerca binaria sui suffissi, O(m log n) confronti, e
+    le occorrenze sono l'intervallo di suffissi che iniziano con la stringa. La codifica UTF-8
+    mantiene l'ordine dei caratteri e tiene il testo a un byte per carattere latino;
+    l'array occupa 4 byte per byte di testo (8 oltre i 4 GB).
+    """
+    PASSO_CONTINUAZIONI = 256
+    def __init__(self, documenti, avanzamento=None, verifica=None):
+        parti = []
+        self.inizi = array('q') # Offset in byte dell'inizio di ogni documento nel testo indicizzato
+        posizione = 0
+        for indice_doc in range(len(documenti)):
+            if verifica:
+                verifica()
+            if avanzamento:
+                avanzamento(None, f"Lettura documento {indice_doc+1}/{len(documenti)}...")
+            testo = documenti[indice_doc]
+            codificato = minuscolo_allineato(testo).encode('utf-8')
+            self.inizi.append(posizione)
+            parti.append(codificato)
+            posizione += len(codificato) + 1
+        self.testo = b'\x00'.join(parti)
+        del parti
+        # Byte di continuazione UTF-8 prima di ogni multiplo di PASSO_CONTINUAZIONI: da un offset in byte
+        # al numero di caratteri che lo precedono senza decodificare il testo
+        if numpy_disponibile:
+            continuazioni = (np.frombuffer(self.testo, dtype=np.uint8) & 0xC0) == 0x80
+            per_blocco = np.add.reduceat(continuazioni, np.arange(0, len(continuazioni), self.PASSO_CONTINUAZIONI),
+                                         dtype=np.int64) if len(continuazioni) else np.empty(0, dtype=np.int64)
+            self._continuazioni = np.concatenate(([0], np.cumsum(per_blocco)))
+            del continuazioni, per_blocco
+        else:
+            self._continuazioni = array('q', [0])
+            for inizio in range(0, len(self.testo), self.PASSO_CONTINUAZIONI):
+                self._continuazioni.append(self._continuazioni[-1] + self._conta_continuazioni(inizio, inizio + self.PASSO_CONTINUAZIONI))
+        self.suffissi = costruisci_array_suffissi(self.testo, avanzamento, verifica)
+
+    def _conta_continuazioni(self, inizio, fine):
+        tratto = self.testo[inizio:fine]
+        return len(tratto) - len(tratto.translate(None, BYTE_CONTINUAZIONE_UTF8))
+
+    def _caratteri_prima(self, posizione):
+        """Numero di caratteri che precedono l'offset in byte 'posizione' del testo indicizzato."""
+        blocco = posizione // self.PASSO_CONTINUAZIONI
+        inizio = blocco * self.PASSO_CONTINUAZIONI
+        return posizione - int(self._continuazioni[blocco]) - self._conta_continuazioni(inizio, posizione)
+
+    def _intervallo(self, chiave):
+        """Intervallo [inizio, fine) dell'array dei suffissi che iniziano con i byte 'chiave'."""
+        testo, suffissi, m = self.testo, self.suffissi, len(chiave)
+        basso, alto = 0, len(suffissi)
+        while basso < alto:
+            medio = (basso + alto) // 2
+            posizione = int(suffissi[medio])
+            if testo[posizione:posizione + m] < chiave:
+                basso = medio + 1
+            else:
+                alto = medio
+        inizio, alto = basso, len(suffissi)
+        while basso < alto:
+            medio = (basso + alto) // 2
+            posizione = int(suffissi[medio])
+            if testo[posizione:posizione + m] <= chiave:
+                basso = medio + 1
+            else:
+                alto = medio
+        return inizio, basso
+
+    def conta(self, query):
+        """Numero di occorrenze (anche sovrapposte) di 'query', senza distinguere maiuscole e minuscole."""
+        if not query:
+            return 0
+        inizio, fine = self._intervallo(minuscolo_allineato(query).encode('utf-8'))
+        return fine - inizio
+
+    def cerca(self, query):
+        """
+        Restituisce il numero di occorrenze di 'query' e una sequenza pigra, in ordine di testo, di tuple
+        (documento, carattere iniziale, carattere finale) con gli offset nel testo originale del documento.
+        """
+        if not query:
+            return 0, []
+        chiave = minuscolo_allineato(query).encode('utf-8')
+        inizio, fine = self._intervallo(chiave)
+        if numpy_disponibile:
+            posizioni = np.sort(self.suffissi[inizio:fine]).tolist()
+        else:
+            posizioni = sorted(self.suffissi[inizio:fine])
+        caratteri_query = len(query)
+
+        def occorrenza(posizione):
+            indice_doc = bisect.bisect_right(self.inizi, posizione) - 1
+            carattere = self._caratteri_prima(posizione) - self._caratteri_prima(self.inizi[indice_doc])
+            return indice_doc, carattere, carattere + caratteri_query
+        return fine - inizio, SequenzaPigra(posizioni, occorrenza)
+
+
+def contesto_concordanza(testo, inizio, fine, ampiezza, unita="token"):
+    """
+    Contesto sinistro, occorrenza e contesto destro di testo[inizio:fine], con 'ampiezza' token
+    (parole e punteggiatura, come in KWIC) o caratteri per lato; gli a capo diventano spazi.
+    Una parola tagliata dall'occorrenza resta intera nel contesto (es. 'veloce[mente]').
+    """
+    if unita == "caratteri":
+        sinistra = testo[max(0, inizio - ampiezza):inizio]
+        destra = testo[fine:fine + ampiezza]
+    else:
+        inizio_finestra = inizio
+        inizi = []
+        while inizio_finestra > 0 and len(inizi) < ampiezza:
+            # Finestra all'indietro che raddoppia finché contiene abbastanza token
+            inizio_finestra = max(0, inizio - max(64, 2 * (inizio - inizio_finestra)))
+            inizi = [m.start() for m in REGEX_TOKEN_KWIC.finditer(testo, inizio_finestra, inizio)]
+        if ampiezza <= 0:
+            sinistra = ""
+        else:
+            sinistra = testo[inizi[-ampiezza] if len(inizi) >= ampiezza else inizio_finestra:inizio]
+        fine_destra = fine
+        for fine_destra in (m.end() for m in itertools.islice(REGEX_TOKEN_KWIC.finditer(testo, fine), ampiezza)):
+            pass
+        destra = testo[fine:fine_destra]
+    return REGEX_SPAZI.sub(' ', sinistra), REGEX_SPAZI.sub(' ', testo[inizio:fine]), REGEX_SPAZI.sub(' ', destra)
+
+
+def unisci_token_kwic(tokens, spazio_iniziale=False, spazio_finale=False):
+    """Ricostruisce una stringa da token KWIC, senza spazi prima della punteggiatura."""
+    parti = []
+    for k, token in enumerate(tokens):
+        if (k > 0 or spazio_iniziale) and token not in PUNTEGGIATURA_KWIC:
+            parti.append(" ")
+        parti.append(token)
+    if spazio_finale:
+        parti.append(" ")
+    return "".join(parti)
+
+
+def _tokenizzatori_nltk(lingua):
+    """Tokenizzatore di frasi (punkt) per la lingua e tokenizzatore di parole usati da sent_tokenize e word_tokenize."""
+    if hasattr(nltk.tokenize, 'PunktTokenizer'):
+        frasi = nltk.tokenize.PunktTokenizer(lingua) # NLTK >= 3.8.2 (dati 'punkt_tab')
+    else:
+        frasi = nltk.data.load(f'tokenizers/punkt/{lingua}.pickle')
+    parole = getattr(nltk.tokenize, 'NLTKWordTokenizer', nltk.tokenize.TreebankWordTokenizer)()
+    return frasi, parole
+
+
+def sillabe_italiane(parola):
+    """
+    Numero di sillabe di una parola italiana secondo le regole della divisione in sillabe sui gruppi vocalici:
+    ogni vocale forte (a, e, o o accentata) è un nucleo, quindi due vocali forti vicine sono in iato ('po-e-ta'),
+    mentre i e u non accentate formano dittonghi e trittonghi con le vocali vicine ('ie-ri', 'a-iuo-la', 'qui').
+    Gli iati con accento non scritto ('pa-u-ra') contano come dittonghi. Almeno una sillaba per parola.
+    """
+    return max(1, sum(sum(c in VOCALI_FORTI for c in gruppo) or 1 for gruppo in REGEX_NUCLEI_SILLABICI.findall(parola.lower())))
+
+
+# Conteggi di ogni frase raccolti durante la segmentazione: la base di tutti gli indici di leggibilità
+CONTEGGI_FRASE = ('parole', 'lettere', 'sillabe', 'polisillabe', 'parole_lunghe')
+
+class SegmentazioneDocumento:
+    """
+    Frasi e token NLTK di un documento come posizioni nel testo originale, in array di interi: nessuna
+    frase o token viene copiato. I token della frase i vanno da primo_token[i] a primo_token[i+1];
+    per ogni frase sono già contati (CONTEGGI_FRASE) le parole alfabetiche, le loro lettere e sillabe,
+    le parole di almeno 3 sillabe e quelle di più di 6 lettere (Gulpease, Grice, indici di leggibilità).
+    """
+    __slots__ = ('inizi_frasi', 'fini_frasi', 'primo_token', 'inizi_token', 'fini_token') + CONTEGGI_FRASE
+
+    def __init__(self):
+        self.inizi_frasi, self.fini_frasi = array('I'), array('I')
+        self.primo_token = array('I', [0])
+        self.inizi_token, self.fini_token = array('I'), array('I')
+        for conteggio in CONTEGGI_FRASE:
+            setattr(self, conteggio, array('I'))
+
+
+class SegmentazioneCorpus:
+    """
+    Segmentazione NLTK di tutti i documenti per una lingua, calcolata in un solo passaggio: punkt dà le
+    posizioni delle frasi nel documento, il tokenizzatore di parole quelle dei token dentro ogni frase.
+    Suddivisione in frasi e in token, Gulpease e Grice leggono tutti da qui; frasi e token sono estratti
+    dal testo solo quando vengono letti.
+    """
+    def __init__(self, documenti, lingua):
+        self._documenti = documenti # Riferimento alla lista (o colonna SQLite) dei testi del modello
+        self.lingua = lingua
+        self._tokenizzatore_frasi, self._tokenizzatore_parole = _tokenizzatori_nltk(lingua)
+        self._sillabe = {} # Forma minuscola -> sillabe: ogni parola diversa è divisa una volta sola
+        self.documenti_segmentati = [self.segmenta(doc) for doc in documenti]
+        self._aggiorna_indici()
+
+    def segmenta(self, testo):
+        """Posizioni di frasi e token di un testo (SegmentazioneDocumento)."""
+        segmentazione = SegmentazioneDocumento()
+        inizi_token, fini_token = segmentazione.inizi_token, segmentazione.fini_token
+        sillabe_forme = self._sillabe
+        for inizio_frase, fine_frase in self._tokenizzatore_frasi.span_tokenize(testo):
+            parole = lettere = sillabe = polisillabe = parole_lunghe = 0
+            posizione = inizio_frase
+            for token in self._tokenizzatore_parole.tokenize(testo[inizio_frase:fine_frase]):
+                # Il tokenizzatore riscrive le virgolette doppie come `` e '': nel testo sono '"', '``' o "''"
+                if token == '``' or token == "''":
+                    trovato = REGEX_VIRGOLETTE_NLTK.search(testo, posizione, fine_frase)
+                    inizio, fine = (trovato.start(), trovato.end()) if trovato else (-1, -1)
+                else:
+                    inizio = testo.find(token, posizione, fine_frase)
+                    fine = inizio + len(token)
+                if inizio < 0:
+                    continue # Token riscritto in modo non riconducibile al testo: non ha una posizione
+                inizi_token.append(inizio)
+                fini_token.append(fine)
+                posizione = fine
+                if token.isalpha():
+                    forma = token.lower()
+                    sillabe_parola = sillabe_forme.get(forma)
+                    if sillabe_parola is None:
+                        sillabe_parola = sillabe_forme[forma] = sillabe_italiane(forma)
+                    parole += 1
+                    lettere += len(token)
+                    sillabe += sillabe_parola
+                    polisillabe += sillabe_parola >= 3
+                    parole_lunghe += len(token) > 6
+            segmentazione.inizi_frasi.append(inizio_frase)
+            segmentazione.fini_frasi.append(fine_frase)
+            segmentazione.primo_token.append(len(inizi_token))
+            segmentazione.parole.append(parole)
+            segmentazione.lettere.append(lettere)
+            segmentazione.sillabe.append(sillabe)
+            segmentazione.polisillabe.append(polisillabe)
+            segmentazione.parole_lunghe.append(parole_lunghe)
+        return segmentazione
+
+    def aggiungi_documento(self, testo):
+        self.documenti_segmentati.append(self.segmenta(testo))
+        self._aggiorna_indici()
+
+    def rimuovi_documento(self, indice_doc):
+        del self.documenti_segmentati[indice_doc]
+        self._aggiorna_indici()
+
+    def _aggiorna_indici(self):
+        # Prima frase e primo token di ogni documento nella numerazione dell'intero corpus
+        self._prima_frase = list(itertools.accumulate((len(s.inizi_frasi) for s in self.documenti_segmentati), initial=0))
+        self._primo_token = list(itertools.accumulate((len(s.inizi_token) for s in self.documenti_segmentati), initial=0))
+
+    @property
+    def num_frasi(self):
+        return self._prima_frase[-1]
+
+    @property
+    def num_token(self):
+        return self._primo_token[-1]
+
+    @staticmethod
+    def _trova(inizi, indice):
+        """(documento, posizione nel documento) dell'elemento 'indice' del corpus, dati gli inizi per documento."""
+        if not 0 <= indice < inizi[-1]:
+            raise IndexError(indice)
+        indice_doc = bisect.bisect_right(inizi, indice) - 1
+        return indice_doc, indice - inizi[indice_doc]
+
+    def testo_frase(self, indice):
+        indice_doc, i = self._trova(self._prima_frase, indice)
+        segmentazione = self.documenti_segmentati[indice_doc]
+        return self._documenti[indice_doc][segmentazione.inizi_frasi[i]:segmentazione.fini_frasi[i]]
+
+    def token_frase(self, indice):
+        indice_doc, i = self._trova(self._prima_frase, indice)
+        segmentazione = self.documenti_segmentati[indice_doc]
+        testo = self._documenti[indice_doc]
+        da, a = segmentazione.primo_token[i], segmentazione.primo_token[i + 1]
+        return [testo[inizio:fine] for inizio, fine in zip(segmentazione.inizi_token[da:a], segmentazione.fini_token[da:a])]
+
+    def testo_token(self, indice):
+        indice_doc, k = self._trova(self._primo_token, indice)
+        segmentazione = self.documenti_segmentati[indice_doc]
+        return self._documenti[indice_doc][segmentazione.inizi_token[k]:segmentazione.fini_token[k]]
+
+    def token_documento(self, indice_doc):
+        """I token di un documento, come stringhe."""
+        segmentazione = self.documenti_segmentati[indice_doc]
+        testo = self._documenti[indice_doc]
+        return [testo[inizio:fine] for inizio, fine in zip(segmentazione.inizi_token, segmentazione.fini_token)]
+
+    def frasi(self):
+        """Le frasi dell'intero corpus, come sequenza pigra di stringhe."""
+        return SequenzaPigra(range(self.num_frasi), self.testo_frase)
+
+    def parole_per_frase(self):
+        """Per ogni frase, la lista dei suoi token (sequenza pigra)."""
+        return SequenzaPigra(range(self.num_frasi), self.token_frase)
+
+    def token(self):
+        """I token dell'intero corpus, come sequenza pigra di stringhe."""
+        return SequenzaPigra(range(self.num_token), self.testo_token)
+
+    def conteggi_frasi(self, conteggi=('parole', 'lettere')):
+        """I conteggi richiesti (tra CONTEGGI_FRASE) di ogni frase del corpus, come array('I') paralleli."""
+        return tuple(array('I', itertools.chain.from_iterable(getattr(s, conteggio) for s in self.documenti_segmentati))
+                     for conteggio in conteggi)
+
+
+# --- Annotazione POS (corpus annotato in colonne, con cache su disco) ---
+
+def cartella_cache_pos():
+    """
+    Cartella delle annotazioni POS salvate: la variabile d'ambiente STRUMENTI_TESTUALI_CACHE se impostata,
+    altrimenti la cache utente del sistema (LOCALAPPDATA su Windows, XDG_CACHE_HOME o ~/.cache altrove).
+    """
+    base = os.environ.get("STRUMENTI_TESTUALI_CACHE")
+    if not base:
+        cache_utente = os.environ.get("LOCALAPPDATA") if sys.platform == "win32" else os.environ.get("XDG_CACHE_HOME")
+        base = os.path.join(cache_utente or os.path.join(os.path.expanduser("~"), ".cache"), "strumenti_testuali")
+    return os.path.join(base, "pos")
+
+def chiave_annotazione_pos(documenti, lingua, versione_tagger):
+    """Hash SHA-256 dei testi del corpus (nell'ordine), della lingua di segmentazione e della versione del tagger."""
+    impronta = hashlib.sha256(f"{CorpusAnnotatoPOS.FIRMA.decode('ascii')}\n{versione_tagger}\n{lingua}\n{len(documenti)}\n".encode('utf-8'))
+    for testo in documenti:
+        dati = testo.encode('utf-8', 'surrogatepass')
+        impronta.update(len(dati).to_bytes(8, 'little')) # La lunghezza separa i documenti senza ambiguità
+        impronta.update(dati)
+    return impronta.hexdigest()
+
+
+# Backend di annotazione: tagger ed eventuale lemmatizzatore, intercambiabili.
+# In ordine di preferenza per la scelta automatica: prima i modelli con supporto all'italiano.
+BACKEND_ANNOTAZIONE = {} # nome -> classe
+_backend_pronti = {} # (nome, lingua, modello) -> istanza condivisa da tutte le analisi del processo
+_lock_backend = threading.Lock()
+
+def registra_backend_annotazione(classe):
+    """Decoratore: rende un backend (sottoclasse di BackendAnnotazione) selezionabile per nome."""
+    BACKEND_ANNOTAZIONE[classe.nome] = classe
+    return classe
+
+def backend_annotazione(nome=None, lingua="italian", modello=None):
+    """
+    L'istanza condivisa del backend 'nome' per la lingua (e il modello, se indicato): il modello viene caricato
+    alla prima annotazione o con prepara() e resta in memoria per le analisi successive. Senza nome, il primo
+    backend disponibile per la lingua in BACKEND_ANNOTAZIONE. ValueError se il backend non esiste o non è installato.
+    """
+    if nome is None:
+        nome = next((n for n, classe in BACKEND_ANNOTAZIONE.items() if classe.disponibile(lingua, modello)), None)
+        if nome is None:
+            raise ValueError(f"Nessun tagger disponibile per la lingua '{lingua}'. Installa spaCy con il modello della lingua "
+                             "(es. pip install spacy && python -m spacy download it_core_news_sm) oppure i dati NLTK "
+                             "(nltk.download('averaged_perceptron_tagger')).")
+    classe = BACKEND_ANNOTAZIONE.get(nome)
+    if classe is None:
+        raise ValueError(f"Backend di annotazione sconosciuto: '{nome}'. Usa uno tra: {', '.join(BACKEND_ANNOTAZIONE)}.")
+    if not classe.disponibile(lingua, modello):
+        raise ValueError(f"Il backend '{nome}' non è disponibile per la lingua '{lingua}': {classe.installazione}")
+    chiave = (nome, lingua, modello)
+    with _lock_backend:
+        backend = _backend_pronti.get(chiave)
+        if backend is None:
+            backend = _backend_pronti[chiave] = classe(lingua, modello)
+    return backend
+
+def _annota_blocco_pos(specifica, frasi):
+    """Lavoro di un processo del pool: annota un blocco di frasi con il backend (nome, lingua, modello), caricato una volta per processo."""
+    return backend_annotazione(*specifica).annota_frasi(frasi)
+
+
+class BackendAnnotazione:
+    """
+    Tagger (ed eventuale lemmatizzatore) usato da annota_pos_corpus. Riceve frasi già divise in token dalla
+    segmentazione NLTK del corpus, così token e frasi coincidono qualunque sia il backend. Le sottoclassi
+    implementano _carica (il modello, una volta sola) e _annota; si aggiungono con registra_backend_annotazione.
+    """
+    nome = ""
+    descrizione = ""
+    installazione = "" # Come installare libreria e modello, per i messaggi d'errore
+    fornisce_lemmi = False
+    usa_processi = False # True se il modello è leggero da caricare in ogni processo del pool
+
+    def __init__(self, lingua, modello=None):
+        self.lingua = lingua
+        self.modello = modello
+        self._pronto = False
+        self._lock = threading.Lock() # Il caricamento anticipato dalla GUI può sovrapporsi a un'analisi
+
+    @classmethod
+    def disponibile(cls, lingua, modello=None):
+        """True se libreria e modello per la lingua sono installati (senza caricarli)."""
+        return False
+
+    def prepara(self):
+        """Carica il modello se non è già in memoria (da chiamare in anticipo per evitare l'attesa alla prima analisi)."""
+        with self._lock:
+            if not self._pronto:
+                self._carica()
+                self._pronto = True
+        return self
+
+    def versione(self):
+        """Backend, libreria e modello con le loro versioni: fanno parte della chiave delle annotazioni salvate."""
+        raise NotImplementedError
+
+    def annota_frasi(self, frasi):
+        """Per ogni frase (lista di token), la coppia (tag, lemmi): liste parallele ai token, lemmi None se non forniti."""
+        self.prepara()
+        piene = [frase for frase in frasi if frase]
+        annotate = iter(self._annota(piene) if piene else [])
+        return [next(annotate) if frase else ([], [] if self.fornisce_lemmi else None) for frase in frasi]
+
+    def _carica(self):
+        raise NotImplementedError
+
+    def _annota(self, frasi):
+        raise NotImplementedError
+
+
+@registra_backend_annotazione
+class BackendSpacy(BackendAnnotazione):
+    nome = "spacy"
+    descrizione = "spaCy: tag Universal Dependencies e lemmi (per l'italiano il modello it_core_news_sm)"
+    installazione = "pip install spacy && python -m spacy download it_core_news_sm (o il modello della lingua)"
+    fornisce_lemmi = True
+
+    @staticmethod
+    def modello_predefinito(lingua):
+        codice = CODICI_LINGUA.get(lingua)
+        if codice is None:
+            return None
+        return "en_core_web_sm" if codice == "en" else f"{codice}_core_news_sm"
+
+    @classmethod
+    def disponibile(cls, lingua, modello=None):
+        modello = modello or cls.modello_predefinito(lingua)
+        if not spacy_disponibile or not modello:
+            return False
+        if os.path.isdir(modello): # Modello in una cartella invece che installato come pacchetto
+            return True
+        try:
+            return importlib.util.find_spec(modello) is not None
+        except (ImportError, ValueError):
+            return False
+
+    def _carica(self):
+        import spacy
+        # Parser sintattico e riconoscimento delle entità non servono a tag e lemmi
+        self._nlp = spacy.load(self.modello or self.modello_predefinito(self.lingua), exclude=["parser", "ner"])
+
+    def versione(self):
+        # Dal meta.json del modello, senza importarlo né caricarlo: un'annotazione in cache si rilegge subito.
+        # Cartella o pacchetto installato danno la stessa stringa per lo stesso modello
+        modello = self.modello or self.modello_predefinito(self.lingua)
+        cartella = modello
+        if not os.path.isdir(cartella):
+            specifica = importlib.util.find_spec(modello)
+            if specifica is None or not specifica.submodule_search_locations:
+                raise ValueError(f"Modello spaCy '{modello}' non trovato: {self.installazione}")
+            cartella = list(specifica.submodule_search_locations)[0]
+        with open(os.path.join(cartella, "meta.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        return f"spacy-{importlib.metadata.version('spacy')}/{meta.get('lang')}_{meta.get('name')}-{meta.get('version')}"
+
+    def _annota(self, frasi):
+        from spacy.tokens import Doc
+        documenti = self._nlp.pipe((Doc(self._nlp.vocab, words=frase) for frase in frasi), batch_size=256)
+        return [([token.pos_ or token.tag_ or "X" for token in doc], [token.lemma_ or token.text for token in doc]) for doc in documenti]
+
+
+@registra_backend_annotazione
+class BackendStanza(BackendAnnotazione):
+    nome = "stanza"
+    descrizione = "Stanza: tag Universal Dependencies e lemmi (modello neurale, più lento senza GPU)"
+    installazione = "pip install stanza, poi in Python: stanza.download('it') (o il codice della lingua)"
+    fornisce_lemmi = True
+
+    @staticmethod
+    def _cartella_risorse():
+        return os.environ.get("STANZA_RESOURCES_DIR") or os.path.join(os.path.expanduser("~"), "stanza_resources")
+
+    @classmethod
+    def disponibile(cls, lingua, modello=None):
+        codice = modello or CODICI_LINGUA.get(lingua)
+        return stanza_disponibile and codice is not None and os.path.isdir(os.path.join(cls._cartella_risorse(), codice))
+
+    def _carica(self):
+        import stanza
+        self._pipeline = stanza.Pipeline(self.modello or CODICI_LINGUA[self.lingua], dir=self._cartella_risorse(),
+                                         processors="tokenize,pos,lemma", tokenize_pretokenized=True,
+                                         download_method=None, logging_level="WARN")
+
+    def versione(self):
+        return f"stanza-{importlib.metadata.version('stanza')}/{self.modello or CODICI_LINGUA[self.lingua]}"
+
+    def _annota(self, frasi):
+        documento = self._pipeline(frasi)
+        return [([parola.upos for parola in frase.words], [parola.lemma or parola.text for parola in frase.words])
+                for frase in documento.sentences]
+
+
+@registra_backend_annotazione
+class BackendNLTK(BackendAnnotazione):
+    nome = "nltk"
+    descrizione = "NLTK averaged_perceptron_tagger: tag Penn Treebank, addestrato sull'inglese, senza lemmi"
+    installazione = "pip install nltk, poi in Python: nltk.download('averaged_perceptron_tagger')"
+    usa_processi = True
+
+    @classmethod
+    def disponibile(cls, lingua, modello=None):
+        return nltk_disponibile and nltk_tagger_disponibile
+
+    def _carica(self):
+        self._tagger = nltk.tag.PerceptronTagger()
+
+    def versione(self):
+        return f"nltk-{nltk.__version__}/averaged_perceptron_tagger"
+
+    def _annota(self, frasi):
+        return [([tag for _, tag in frase], None) for frase in self._tagger.tag_sents(frasi)]
+
+
+class CorpusAnnotatoPOS(Sequence):
+    """
+    Corpus annotato con le parti del discorso, in colonne: per ogni token l'id della forma (array 'I'),
+    l'id del tag (array 'H') e, se il backend li fornisce, l'id del lemma (array 'I'), più il primo token
+    di ogni frase. Come sequenza restituisce le coppie (token, tag), costruite solo quando vengono lette.
+    Si salva in un file binario (intestazione JSON seguita dagli array) identificato dalla chiave di
+    chiave_annotazione_pos.
+    """
+    FIRMA = b"STU-POS2"
+
+    def __init__(self, chiave, versione_tagger, forme, tag, ids_token, ids_tag, primo_token_frasi, lemmi=None, ids_lemma=None):
+        self.chiave = chiave
+        self.versione_tagger = versione_tagger
+        self.forme = forme # id -> token, con le maiuscole del testo (il tagger ne tiene conto)
+        self.tag = tag # id -> tag
+        self.ids_token = ids_token
+        self.ids_tag = ids_tag # Parallelo a ids_token
+        self.primo_token_frasi = primo_token_frasi # Una voce per frase più il numero totale di token in coda
+        self.lemmi = lemmi # id -> lemma, None se il backend non lemmatizza
+        self.ids_lemma = ids_lemma # Parallelo a ids_token
+        self.dalla_cache = False # True se riletto da disco invece che annotato
+        self._unita = {}
+
+    def __len__(self):
+        return len(self.ids_token)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        return self.forme[self.ids_token[indice]], self.tag[self.ids_tag[indice]]
+
+    @property
+    def num_frasi(self):
+        return len(self.primo_token_frasi) - 1
+
+    def frase(self, indice):
+        """Le coppie (token, tag) di una frase."""
+        return self[self.primo_token_frasi[indice]:self.primo_token_frasi[indice + 1]]
+
+    def lemma(self, indice):
+        return self.lemmi[self.ids_lemma[indice]] if self.ids_lemma is not None else None
+
+    def frequenze_tag(self):
+        """Occorrenze di ciascun tag (Counter tag -> frequenza)."""
+        return Counter({self.tag[id_tag]: freq for id_tag, freq in conta_ids(array('I', self.ids_tag)).items()})
+
+    def ids_tag_di(self, voce):
+        """
+        Id dei tag indicati da una voce di filtro: una categoria di CATEGORIE_POS (es. 'nomi'), uno o più
+        tag separati da '|' (es. 'NN|NNS', anche misti a categorie), oppure '*' per qualsiasi tag (None).
+        """
+        if voce.strip() == '*':
+            return None
+        voluti = set()
+        for parte in voce.split('|'):
+            parte = parte.strip()
+            voluti.update(CATEGORIE_POS.get(parte.lower(), (parte,)))
+        return {id_tag for id_tag, tag in enumerate(self.tag) if tag in voluti}
+
+    def unita(self, lemmi=False):
+        """
+        Le unità contate dalle analisi: (voci distinte in minuscolo, array('I') con l'id della voce di ogni token).
+        Le voci sono le forme oppure, con 'lemmi', i lemmi; calcolate una volta sola per tipo.
+        """
+        if lemmi and self.ids_lemma is None:
+            raise ValueError("L'annotazione non contiene lemmi: usa un backend che lemmatizza (es. spaCy o Stanza).")
+        if lemmi not in self._unita:
+            voci, ids = (self.lemmi, self.ids_lemma) if lemmi else (self.forme, self.ids_token)
+            vocabolario = Vocabolario()
+            mappa = array('I', [vocabolario.id_forma(voce.lower()) for voce in voci])
+            if numpy_disponibile and len(ids):
+                per_token = array('I', np.frombuffer(mappa, dtype=np.uintc)[np.frombuffer(ids, dtype=np.uintc)].tobytes())
+            else:
+                per_token = array('I', [mappa[i] for i in ids])
+            self._unita[lemmi] = (vocabolario.forme, per_token)
+        return self._unita[lemmi]
+
+    def salva(self, percorso):
+        """Scrive l'annotazione su un file temporaneo nella stessa cartella e lo rinomina: mai un file a metà in cache."""
+        intestazione = json.dumps({"chiave": self.chiave, "versione_tagger": self.versione_tagger,
+                                   "ordine_byte": sys.byteorder, "num_token": len(self.ids_token),
+                                   "num_frasi": self.num_frasi, "forme": self.forme, "tag": self.tag, "lemmi": self.lemmi},
+                                  ensure_ascii=False).encode('utf-8')
+        cartella = os.path.dirname(os.path.abspath(percorso))
+        os.makedirs(cartella, exist_ok=True)
+        descrittore, temporaneo = tempfile.mkstemp(prefix=".pos_", suffix=".tmp", dir=cartella)
+        try:
+            with os.fdopen(descrittore, 'wb') as f:
+                f.write(self.FIRMA)
+                f.write(len(intestazione).to_bytes(8, 'little'))
+                f.write(intestazione)
+                self.ids_token.tofile(f)
+                self.ids_tag.tofile(f)
+                self.primo_token_frasi.tofile(f)
+                if self.ids_lemma is not None:
+                    self.ids_lemma.tofile(f)
+            os.replace(temporaneo, percorso)
+        except BaseException:
+            if os.path.exists(temporaneo):
+                os.remove(temporaneo)
+            raise
+
+    @classmethod
+    def carica(cls, percorso):
+        """Rilegge un'annotazione salvata; ValueError (o EOFError se troncato) se il file non è valido."""
+        with open(percorso, 'rb') as f:
+            if f.read(len(cls.FIRMA)) != cls.FIRMA:
+                raise ValueError(f"{percorso} non è un'annotazione POS di Strumenti Testuali in questo formato")
+            metadati = json.loads(f.read(int.from_bytes(f.read(8), 'little')).decode('utf-8'))
+            ids_token, ids_tag, primo_token_frasi = array('I'), array('H'), array('I')
+            ids_token.fromfile(f, metadati["num_token"])
+            ids_tag.fromfile(f, metadati["num_token"])
+            primo_token_frasi.fromfile(f, metadati["num_frasi"] + 1)
+            ids_lemma = None
+            if metadati["lemmi"] is not None:
+                ids_lemma = array('I')
+                ids_lemma.fromfile(f, metadati["num_token"])
+        if metadati["ordine_byte"] != sys.byteorder: # File scritto su una macchina con ordine dei byte diverso
+            for colonna in (ids_token, ids_tag, primo_token_frasi, ids_lemma):
+                if colonna is not None:
+                    colonna.byteswap()
+        return cls(metadati["chiave"], metadati["versione_tagger"], metadati["forme"], metadati["tag"],
+                   ids_token, ids_tag, primo_token_frasi, metadati["lemmi"], ids_lemma)
+
+
+def annota_pos_corpus(modello, lingua, backend=None, cartella=None, max_processi=None, avanzamento=None, verifica=None):
+    """
+    Part-of-speech tagging (e lemmatizzazione, se il backend la fornisce) dell'intero corpus (CorpusAnnotatoPOS),
+    frase per frase sulla segmentazione NLTK della lingua. 'backend' è un BackendAnnotazione o il suo nome
+    (default: il primo disponibile per la lingua). Le frasi vanno al backend a blocchi di circa
+    TOKEN_PER_BLOCCO_POS token: per i backend leggeri su più processi quando il corpus supera
+    SOGLIA_POS_PARALLELO token, per gli altri nel modello già caricato in questo processo.
+    Il risultato è salvato in 'cartella' (default: cartella_cache_pos(); False per non usare la cache)
+    con il nome dato dalla chiave di chiave_annotazione_pos: annotare di nuovo lo stesso corpus con lo
+    stesso backend rilegge il file invece di ripetere l'annotazione.
+    """
+    if not isinstance(backend, BackendAnnotazione):
+        backend = backend_annotazione(backend, lingua)
+    if avanzamento:
+        avanzamento(None, f"Preparazione del backend di annotazione '{backend.nome}'...")
+    versione = backend.versione()
+    chiave = chiave_annotazione_pos(modello.documenti, lingua, versione)
+    percorso = None if cartella is False else os.path.join(cartella or cartella_cache_pos(), f"{chiave}.pos")
+    if percorso and os.path.exists(percorso):
+        try:
+            annotato = CorpusAnnotatoPOS.carica(percorso)
+        except (OSError, EOFError, ValueError, KeyError) as e: # File danneggiato o di un formato precedente
+            print(f"Annotazione POS in cache non leggibile ({e}), nuovo tagging.", file=sys.stderr)
+        else:
+            if annotato.chiave == chiave:
+                annotato.dalla_cache = True
+                return annotato
+
+    if avanzamento:
+        avanzamento(None, "Segmentazione in frasi e token...")
+    # Prima passata: codifica dei token e blocchi di frasi da annotare
+    forme = Vocabolario()
+    ids_token, primo_token_frasi = array('I'), array('I', [0])
+    blocchi, blocco = [], []
+    for frase in modello.segmentazione(lingua).parole_per_frase():
+        ids_token.extend(forme.codifica(frase))
+        primo_token_frasi.append(len(ids_token))
+        blocco.append(frase)
+        if len(ids_token) - primo_token_frasi[-len(blocco) - 1] >= TOKEN_PER_BLOCCO_POS:
+            blocchi.append(blocco)
+            blocco = []
+    if blocco:
+        blocchi.append(blocco)
+
+    tag, lemmi = Vocabolario(), Vocabolario()
+    ids_tag = array('H')
+    ids_lemma = array('I') if backend.fornisce_lemmi else None
+
+    def raccogli(risultati):
+        for annotazioni_blocco in risultati:
+            if verifica:
+                verifica()
+            for tag_frase, lemmi_frase in annotazioni_blocco:
+                ids_tag.extend(tag.id_forma(t) for t in tag_frase)
+                if ids_lemma is not None:
+                    ids_lemma.extend(lemmi.id_forma(lemma) for lemma in lemmi_frase)
+            if avanzamento:
+                avanzamento(len(ids_tag) / len(ids_token), f"Annotazione POS ({backend.nome}): {len(ids_tag):,}/{len(ids_token):,} token...")
+
+    num_processi = min(max_processi or os.cpu_count() or 1, len(blocchi))
+    if not backend.usa_processi or num_processi < 2 or len(ids_token) < SOGLIA_POS_PARALLELO:
+        raccogli(map(backend.annota_frasi, blocchi))
+    else:
+        try:
+            esecutore = ProcessPoolExecutor(max_workers=num_processi)
+        except (OSError, NotImplementedError) as e: # Ambienti senza supporto al multiprocessing
+            print(f"Annotazione POS parallela non disponibile ({e}), annotazione sequenziale.", file=sys.stderr)
+            raccogli(map(backend.annota_frasi, blocchi))
+        else:
+            try:
+                raccogli(esecutore.map(_annota_blocco_pos, itertools.repeat((backend.nome, backend.lingua, backend.modello)), blocchi))
+            finally:
+                # In caso di annullamento i blocchi non ancora avviati vengono scartati
+                esecutore.shutdown(wait=False, cancel_futures=True)
+    if len(ids_tag) != len(ids_token) or (ids_lemma is not None and len(ids_lemma) != len(ids_token)):
+        raise RuntimeError(f"Il backend '{backend.nome}' ha restituito un numero di tag diverso dal numero di token.")
+
+    annotato = CorpusAnnotatoPOS(chiave, versione, forme.forme, tag.forme, ids_token, ids_tag, primo_token_frasi,
+                                 lemmi.forme if ids_lemma is not None else None, ids_lemma)
+    if percorso:
+        try:
+            annotato.salva(percorso)
+        except OSError as e: # Cache non scrivibile: l'annotazione resta valida per questa sessione
+            print(f"Impossibile salvare l'annotazione POS in {percorso}: {e}", file=sys.stderr)
+    return annotato
+
+
+class ModelloCorpusBase:
+    """
+    Analisi che richiedono solo una scansione sequenziale degli id del corpus.
+    Le sottoclassi forniscono 'vocabolario', '_lock', '_cache_frequenze', '_cache_ngrammi',
+    'blocchi_ids', 'blocchi_documento' e 'num_token_documento': ogni analisi tiene in memoria
+    un blocco alla volta più il proprio risultato, sia per il corpus in memoria sia in streaming.
+    """
+    aggiornabile = False # True se il modello supporta aggiungi_documento / rimuovi_documento
+    _indice_suffissi = None # IndiceSuffissi dei documenti, costruito alla prima ricerca per sottostringa
+
+    def frequenze(self, stopwords=None, avanzamento=None):
+        """Restituisce il Counter {id: frequenza} delle parole del corpus, opzionalmente senza stopwords."""
+        chiave = frozenset(stopwords) if stopwords else frozenset()
+        with self._lock:
+            frequenze = self._cache_frequenze.get(chiave)
+            if frequenze is None:
+                if chiave:
+                    # Le stopwords si tolgono dai conteggi completi, senza una nuova scansione
+                    frequenze_complete = self.frequenze(avanzamento=avanzamento) # Completa anche il vocabolario
+                    ids_stopwords = self.vocabolario.ids_di(chiave)
+                    frequenze = Counter({id_parola: freq for id_parola, freq in frequenze_complete.items()
+                                         if id_parola not in ids_stopwords})
+                else:
+                    frequenze = self._conta_frequenze(avanzamento)
+                self._cache_frequenze[chiave] = frequenze
+            return frequenze
+
+    def _conta_frequenze(self, avanzamento=None):
+        """Conta tutte le parole del corpus (stopwords incluse) con una scansione a blocchi."""
+        frequenze = Counter()
+        for ids in self.blocchi_ids(avanzamento=avanzamento):
+            frequenze.update(conta_ids(ids))
+        return frequenze
+
+    def piu_frequenti(self, num_termini, stopwords=None):
+        """Restituisce le coppie (id, frequenza) dei termini più frequenti, stopwords escluse (a pari frequenza, per forma)."""
+        return piu_frequenti_ordinati(self.frequenze(stopwords), num_termini, self.vocabolario.forme.__getitem__)
+
+    def num_parole(self, stopwords=None):
+        """Numero di parole del corpus, opzionalmente senza stopwords."""
+        return sum(self.frequenze(stopwords).values())
+
+    def ngrammi(self, n, stopwords=None, avanzamento=None):
+        """
+        Conta gli n-grammi di parole consecutive (stopwords escluse) scorrendo il corpus a blocchi.
+        La tabella è memorizzata per (n, stopwords) e va trattata in sola lettura.
+        """
+        chiave = (n, frozenset(stopwords) if stopwords else frozenset())
+        frequenze_ngrammi = self._cache_ngrammi.get(chiave)
+        if frequenze_ngrammi is None:
+            frequenze_ngrammi = Counter()
+            for ids in con_coda(self.blocchi_ids(stopwords, avanzamento), n - 1):
+                frequenze_ngrammi.update(conta_ngrammi(ids, n))
+            with self._lock:
+                self._cache_ngrammi[chiave] = frequenze_ngrammi
+        return frequenze_ngrammi
+
+    def cooccorrenze(self, finestra, stopwords=None, avanzamento=None, verifica=None):
+        """
+        Conta le co-occorrenze di coppie di parole in finestre di 'finestra' parole, scorrendo il corpus a blocchi.
+        Restituisce una MatriceCooccorrenze; con NumPy le coppie si accumulano come triplette COO
+        compattate periodicamente, così la memoria dipende dalle coppie distinte e non dalla finestra.
+        """
+        blocchi = con_coda(self.blocchi_ids(stopwords, avanzamento), finestra - 1)
+        if not numpy_disponibile:
+            co_occorrenze = Counter()
+            for ids in blocchi:
+                conta_cooccorrenze(ids, finestra, co_occorrenze, verifica)
+            return MatriceCooccorrenze.da_conteggi(co_occorrenze, len(self.vocabolario.forme))
+
+        parziali, num_parziali = [], 0
+        for ids in blocchi:
+            for chiavi, conteggi in coppie_cooccorrenze(ids, finestra, verifica):
+                parziali.append((chiavi, conteggi))
+                num_parziali += len(chiavi)
+                if num_parziali > SOGLIA_COMPATTAZIONE_COPPIE:
+                    parziali = [riduci_coppie(parziali)]
+                    num_parziali = len(parziali[0][0])
+        if not parziali:
+            parziali = [(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))]
+        return MatriceCooccorrenze.da_chiavi(*riduci_coppie(parziali), len(self.vocabolario.forme))
+
+    def indice_suffissi(self, avanzamento=None, verifica=None):
+        """Restituisce l'indice dei suffissi del testo dei documenti, costruendolo alla prima richiesta."""
+        with self._lock:
+            if self._indice_suffissi is None:
+                self._indice_suffissi = IndiceSuffissi(self.documenti, avanzamento, verifica)
+            return self._indice_suffissi
+
+    def cerca_sottostringa(self, query, ampiezza_contesto, unita="token", avanzamento=None, verifica=None):
+        """
+        Cerca una sottostringa qualsiasi (anche dentro le parole o con punteggiatura) tramite l'indice dei suffissi.
+        Restituisce il numero totale di occorrenze e una sequenza pigra, in ordine di testo, di tuple
+        (documento, carattere iniziale, contesto sinistro, occorrenza, contesto destro) nel testo originale.
+        """
+        totale, occorrenze = self.indice_suffissi(avanzamento, verifica).cerca(query)
+
+        def contesto(occorrenza):
+            indice_doc, inizio, fine = occorrenza
+            # Letture in ordine: ogni documento su disco (o nell'indice SQLite) è letto una volta per gruppo di occorrenze
+            testo = self.documenti[indice_doc]
+            return (indice_doc, inizio) + contesto_concordanza(testo, inizio, fine, ampiezza_contesto, unita)
+        return totale, SequenzaPigra(occorrenze, contesto)
+
+    def occorrenze_per_documento(self, id_parola, avanzamento=None):
+        """Restituisce, per ogni documento, il numero di occorrenze dell'id indicato (stopwords incluse)."""
+        conteggi = []
+        num_documenti = len(self.documenti)
+        for indice_doc in range(num_documenti):
+            if avanzamento:
+                avanzamento(indice_doc / num_documenti, f"Documento {indice_doc+1}/{num_documenti}...")
+            if id_parola is None:
+                conteggi.append(0)
+                continue
+            conteggi.append(sum(ids.count(id_parola) for ids in self.blocchi_documento(indice_doc)))
+        return conteggi
+
+    def occorrenze_per_segmenti(self, indice_doc, id_parola, num_segmenti):
+        """
+        Divide un documento in 'num_segmenti' segmenti di parole della stessa lunghezza
+        (l'ultimo prende le parole rimanenti) e conta le occorrenze dell'id in ciascuno.
+        """
+        conteggi = [0] * num_segmenti
+        if id_parola is None:
+            return conteggi
+        dimensione_segmento = max(1, self.num_token_documento(indice_doc) // num_segmenti)
+        inizio_blocco = 0
+        for ids in self.blocchi_documento(indice_doc):
+            if numpy_disponibile and len(ids):
+                posizioni = (np.flatnonzero(np.frombuffer(ids, dtype=np.uintc) == id_parola) + inizio_blocco).tolist()
+            else:
+                posizioni = [inizio_blocco + k for k, id_token in enumerate(ids) if id_token == id_parola]
+            for posizione in posizioni:
+                conteggi[min(posizione // dimensione_segmento, num_segmenti - 1)] += 1
+            inizio_blocco += len(ids)
+        return conteggi
+
+
+class ModelloCorpus(ModelloCorpusBase):
+    """
+    Rappresentazione tokenizzata del corpus, costruita una sola volta al caricamento
+    e condivisa da tutte le analisi (frequenze, KWIC, andamento, usabilità, Grice).
+    Le tokenizzazioni che dipendono da parametri (stopwords, lingua NLTK) sono
+    calcolate alla prima richiesta e memorizzate per chiave: cambiare le stopwords
+    invalida solo le liste filtrate, mentre aggiungere o rimuovere documenti aggiorna
+    in modo incrementale i risultati già calcolati.
+    """
+    aggiornabile = True
+    def __init__(self, documenti, nomi_file=None, avanzamento=None, tokenizzati=None):
+        self.documenti = documenti # Riferimento (non copia) alla lista dei testi caricati
+        self.nomi_file = list(nomi_file) if nomi_file else []
+        # Le cache sono costruite su richiesta e possono essere chieste da più analisi in background
+        self._lock = threading.RLock()
+        # Forme minuscole per documento, codificate come id: tokenizzazione eseguita una volta sola al caricamento
+        self.vocabolario = Vocabolario()
+        self.ids_documenti = []
+        for i, doc in enumerate(documenti):
+            if avanzamento:
+                avanzamento(i / len(documenti), f"Tokenizzazione documento {i+1}/{len(documenti)}...")
+            if tokenizzati is not None:
+                # Documento già tokenizzato da un processo di caricamento: basta rimappare gli id locali
+                self.ids_documenti.append(self._unisci_tokenizzazione(*tokenizzati[i]))
+            else:
+                self.ids_documenti.append(self.vocabolario.codifica(REGEX_PAROLA.findall(doc.lower())))
+        self._cache_ids_parole = {} # frozenset(stopwords) -> array('I') delle parole filtrate
+        self._lunghezze_parole = {} # frozenset(stopwords) -> numero di parole filtrate di ogni documento
+        self._cache_frequenze = {} # frozenset(stopwords) -> Counter {id: frequenza}
+        self._cache_ngrammi = {} # (n, frozenset(stopwords)) -> Counter {(id1, ..., idn): frequenza}
+        self._inizi_kwic = None # Per documento: array('I') degli offset di carattere dei token KWIC
+        self._indice_kwic = None
+        self._cache_frasi = {} # lingua -> SegmentazioneCorpus (frasi e token NLTK come posizioni nei testi)
+
+    def aggiungi_documento(self, testo, nome=None, tokenizzato=None):
+        """
+        Aggiunge un documento al corpus aggiornando in modo incrementale vocabolario, liste di parole,
+        frequenze, tabelle di n-grammi, indice KWIC e segmentazioni NLTK già calcolati:
+        si contano solo le parole del documento aggiunto, non l'intero corpus.
+        """
+        with self._lock:
+            if tokenizzato is not None:
+                ids = self._unisci_tokenizzazione(*tokenizzato)
+            else:
+                ids = self.vocabolario.codifica(REGEX_PAROLA.findall(testo.lower()))
+            indice_doc = len(self.documenti)
+            self.documenti.append(testo)
+            self.nomi_file.append(nome or f"Doc {indice_doc+1}")
+            self.ids_documenti.append(ids)
+
+            # Liste di parole e tabelle già restituite possono essere lette senza lock da analisi in corso
+            # su altri thread: si costruisce una copia aggiornata e la si sostituisce nella cache
+            conteggi = conta_ids(ids)
+            for chiave, ids_parole in list(self._cache_ids_parole.items()):
+                ids_stopwords = self.vocabolario.ids_di(chiave)
+                nuovi = filtra_ids(ids, ids_stopwords) if ids_stopwords else ids
+                # Nuovi n-grammi: quelli del documento e quelli a cavallo con la fine del corpus
+                for (n, chiave_ngrammi), tabella in list(self._cache_ngrammi.items()):
+                    if chiave_ngrammi == chiave:
+                        aggiornata = tabella.copy()
+                        aggiornata.update(conta_ngrammi(ids_parole[max(0, len(ids_parole) - (n - 1)):] + nuovi, n))
+                        self._cache_ngrammi[n, chiave_ngrammi] = aggiornata
+                self._cache_ids_parole[chiave] = ids_parole + nuovi
+                self._lunghezze_parole[chiave].append(len(nuovi))
+            for chiave, frequenze in list(self._cache_frequenze.items()):
+                ids_stopwords = self.vocabolario.ids_di(chiave)
+                aggiornate = frequenze.copy()
+                aggiornate.update({id_parola: freq for id_parola, freq in conteggi.items() if id_parola not in ids_stopwords})
+                self._cache_frequenze[chiave] = aggiornate
+
+            self._indice_suffissi = None # L'array dei suffissi non si aggiorna: sarà ricostruito alla prossima ricerca
+            if self._indice_kwic is not None:
+                ids_kwic, inizi = self._token_kwic_documento(testo)
+                self._inizi_kwic.append(inizi)
+                self._indice_kwic.aggiungi_documento(ids_kwic)
+            for segmentazione in self._cache_frasi.values():
+                segmentazione.aggiungi_documento(testo)
+            return indice_doc
+
+    def rimuovi_documento(self, indice_doc):
+        """
+        Rimuove un documento dal corpus aggiornando in modo incrementale i risultati già calcolati.
+        Le forme rimaste senza occorrenze restano nel vocabolario (gli id non cambiano), ma spariscono dai conteggi.
+        """
+        with self._lock:
+            ids = self.ids_documenti.pop(indice_doc)
+            del self.documenti[indice_doc]
+            if indice_doc < len(self.nomi_file):
+                del self.nomi_file[indice_doc]
+
+            # Come in aggiungi_documento: copie aggiornate al posto delle strutture già restituite
+            for chiave, ids_parole in list(self._cache_ids_parole.items()):
+                lunghezze = self._lunghezze_parole[chiave]
+                inizio = sum(lunghezze[:indice_doc])
+                fine = inizio + lunghezze.pop(indice_doc)
+                for (n, chiave_ngrammi), tabella in list(self._cache_ngrammi.items()):
+                    if chiave_ngrammi != chiave:
+                        continue
+                    # Gli n-grammi toccati sono tutti nel documento più n-1 parole per lato;
+                    # dopo la rimozione le parole dei due lati diventano adiacenti
+                    prima = ids_parole[max(0, inizio - (n - 1)):inizio]
+                    dopo = ids_parole[fine:fine + n - 1]
+                    rimossi = conta_ngrammi(prima + ids_parole[inizio:fine] + dopo, n)
+                    rimossi.subtract(conta_ngrammi(prima + dopo, n))
+                    aggiornata = tabella.copy()
+                    sottrai_conteggi(aggiornata, rimossi)
+                    self._cache_ngrammi[n, chiave_ngrammi] = aggiornata
+                self._cache_ids_parole[chiave] = ids_parole[:inizio] + ids_parole[fine:]
+            conteggi = conta_ids(ids)
+            for chiave, frequenze in list(self._cache_frequenze.items()):
+                aggiornate = frequenze.copy()
+                sottrai_conteggi(aggiornate, conteggi)
+                self._cache_frequenze[chiave] = aggiornate
+
+            self._indice_suffissi = None
+            if self._indice_kwic is not None:
+                del self._inizi_kwic[indice_doc]
+                self._indice_kwic.rimuovi_documento(indice_doc)
+            for segmentazione in self._cache_frasi.values():
+                segmentazione.rimuovi_documento(indice_doc)
+
+    def _unisci_tokenizzazione(self, forme_locali, ids_locali):
+        """Traduce gli id di un vocabolario locale (vedi tokenizza_documento) negli id del vocabolario del corpus."""
+        mappa = self.vocabolario.codifica(forme_locali)
+        if numpy_disponibile and len(ids_locali):
+            rimappati = np.frombuffer(mappa, dtype=np.uintc)[np.frombuffer(ids_locali, dtype=np.uintc)]
+            return array('I', rimappati.tobytes())
+        return array('I', [mappa[i] for i in ids_locali])
+
+    def ids_parole(self, stopwords=None):
+        """Restituisce gli id delle parole dell'intero corpus (array 'I', da non modificare), opzionalmente senza stopwords."""
+        chiave = frozenset(stopwords) if stopwords else frozenset()
+        with self._lock:
+            ids = self._cache_ids_parole.get(chiave)
+            if ids is None:
+                ids_stopwords = self.vocabolario.ids_di(chiave)
+                ids = array('I')
+                lunghezze = []
+                for ids_doc in self.ids_documenti:
+                    filtrati = filtra_ids(ids_doc, ids_stopwords) if ids_stopwords else ids_doc
+                    ids.extend(filtrati)
+                    lunghezze.append(len(filtrati))
+                self._cache_ids_parole[chiave] = ids
+                self._lunghezze_parole[chiave] = lunghezze # Per aggiornare la lista quando si rimuove un documento
+            return ids
+
+    def blocchi_ids(self, stopwords=None, avanzamento=None):
+        """Restituisce gli id delle parole del corpus (senza stopwords) in blocchi consecutivi di DIMENSIONE_BLOCCO_ID."""
+        ids = self.ids_parole(stopwords)
+        for inizio in range(0, len(ids), DIMENSIONE_BLOCCO_ID):
+            if avanzamento:
+                avanzamento(inizio / len(ids), f"Parole {inizio:,}/{len(ids):,}...")
+            yield ids[inizio:inizio + DIMENSIONE_BLOCCO_ID]
+
+    def blocchi_documento(self, indice_doc):
+        """Restituisce gli id delle parole di un documento (stopwords incluse) come unico blocco."""
+        yield self.ids_documenti[indice_doc]
+
+    def num_token_documento(self, indice_doc):
+        return len(self.ids_documenti[indice_doc])
+
+    def anteprima_documento(self, indice_doc, num_caratteri):
+        """Restituisce i primi caratteri di un documento."""
+        return self.documenti[indice_doc][:num_caratteri]
+
+    def parole(self, stopwords=None):
+        """Restituisce le parole minuscole dell'intero corpus come stringhe, opzionalmente senza stopwords."""
+        forme = self.vocabolario.forme
+        return [forme[i] for i in self.ids_parole(stopwords)]
+
+    def indice_kwic(self):
+        """Restituisce l'indice posizionale dei token KWIC (parole e punteggiatura), costruendolo alla prima richiesta."""
+        with self._lock:
+            if self._indice_kwic is None:
+                ids_kwic = []
+                inizi_kwic = []
+                for doc in self.documenti:
+                    ids, inizi = self._token_kwic_documento(doc)
+                    ids_kwic.append(ids)
+                    inizi_kwic.append(inizi)
+                self._inizi_kwic = inizi_kwic
+                self._indice_kwic = IndicePosizionale(self.vocabolario, ids_kwic)
+            return self._indice_kwic
+
+    def _token_kwic_documento(self, doc):
+        """Codifica i token KWIC (parole e punteggiatura) di un documento: (id, offset di carattere)."""
+        id_forma = self.vocabolario.id_forma
+        ids = array('I')
+        inizi = array('I')
+        for corrispondenza in REGEX_TOKEN_KWIC.finditer(doc):
+            ids.append(id_forma(corrispondenza.group().lower()))
+            inizi.append(corrispondenza.start())
+        return ids, inizi
+
+    def token_originali(self, indice_doc, inizio, fine):
+        """Restituisce i token KWIC [inizio, fine) di un documento nel maiuscolo/minuscolo originale."""
+        testo = self.documenti[indice_doc]
+        inizi = self._inizi_kwic[indice_doc]
+        inizio = max(0, inizio)
+        fine = min(len(inizi), fine)
+        return [REGEX_TOKEN_KWIC.match(testo, inizi[k]).group() for k in range(inizio, fine)]
+
+    def cerca_kwic(self, query, ampiezza_contesto):
+        """
+        Cerca una parola, una frase o un modello con caratteri jolly tramite l'indice posizionale.
+        Restituisce il numero totale di occorrenze e una sequenza pigra di tuple
+        (contesto sinistro, occorrenza, contesto destro) nel testo originale.
+        """
+        occorrenze = self.indice_kwic().cerca(query)
+
+        def contesto(occorrenza):
+            indice_doc, inizio, lunghezza = occorrenza
+            fine = inizio + lunghezza
+            target = self.token_originali(indice_doc, inizio, fine)
+            sinistra = self.token_originali(indice_doc, inizio - ampiezza_contesto, inizio)
+            destra = self.token_originali(indice_doc, fine, fine + ampiezza_contesto)
+            return (unisci_token_kwic(sinistra, spazio_finale=bool(sinistra) and target[0] not in PUNTEGGIATURA_KWIC),
+                    unisci_token_kwic(target),
+                    unisci_token_kwic(destra, spazio_iniziale=True))
+        return len(occorrenze), SequenzaPigra(occorrenze, contesto)
+
+    def anteprima(self, num_caratteri):
+        """Restituisce i primi caratteri del corpus come se i documenti fossero uniti da spazi, senza unirli tutti."""
+        parti = []
+        lunghezza = 0
+        for doc in self.documenti:
+            if lunghezza >= num_caratteri:
+                break
+            parti.append(doc[:num_caratteri - lunghezza])
+            lunghezza += len(parti[-1]) + 1
+        return ' '.join(parti)[:num_caratteri]
+
+    def segmentazione(self, lingua):
+        """Frasi e token NLTK di tutti i documenti (SegmentazioneCorpus), calcolati una volta per lingua."""
+        with self._lock:
+            segmentazione = self._cache_frasi.get(lingua)
+            if segmentazione is None:
+                segmentazione = self._cache_frasi[lingua] = SegmentazioneCorpus(self.documenti, lingua)
+            return segmentazione
+
+    def frasi(self, lingua):
+        """Restituisce le frasi dell'intero corpus (NLTK punkt) per la lingua indicata."""
+        return self.segmentazione(lingua).frasi()
+
+    def parole_per_frase(self, lingua):
+        """Restituisce, per ogni frase, la lista dei token NLTK (parole e punteggiatura)."""
+        return self.segmentazione(lingua).parole_per_frase()
+
+    def token_nltk(self, lingua):
+        """Restituisce i token NLTK dell'intero corpus."""
+        return self.segmentazione(lingua).token()
+
+
+# --- Caricamento Parallelo del Corpus ---
+
+def leggi_file_testo(nome_file):
+    """
+    Legge un file di testo con un solo accesso al disco: i byte vengono decodificati
+    in UTF-8 e, se non validi, in ISO-8859-1, senza rileggere il file.
+    Il testo è normalizzato (fine riga '\\n', forma Unicode NFC).
+    """
+    with open(nome_file, 'rb') as f:
+        grezzo = f.read()
+    try:
+        testo = grezzo.decode('utf-8')
+    except UnicodeDecodeError:
+        testo = grezzo.decode('iso-8859-1')
+    return normalizza_testo(testo)
+
+def normalizza_testo(testo):
+    """Fine riga '\\n' come nella lettura in modalità testo e forma Unicode NFC."""
+    testo = testo.replace('\r\n', '\n').replace('\r', '\n')
+    if not unicodedata.is_normalized('NFC', testo):
+        testo = unicodedata.normalize('NFC', testo) # Accenti composti e scomposti diventano la stessa forma
+    return testo
+
+def tokenizza_documento(testo):
+    """
+    Tokenizza un documento su un vocabolario locale.
+    Restituisce (forme locali, array('I') di id locali), che ModelloCorpus rimappa sul vocabolario globale:
+    dal processo di lavoro torna così ogni forma una sola volta, non una stringa per occorrenza.
+    """
+    locale = Vocabolario()
+    ids = locale.codifica(REGEX_PAROLA.findall(testo.lower()))
+    return locale.forme, ids
+
+def _ingerisci_file(nome_file):
+    """Lavoro di un processo del pool: lettura, decodifica, normalizzazione e tokenizzazione di un file."""
+    # Estrai solo il nome del file dal percorso completo
+    nome_semplice = nome_file.split('/')[-1].split('\\')[-1] # Gestisce sia / che \
+    try:
+        testo = leggi_file_testo(nome_file)
+    except Exception as e:
+        return nome_semplice, None, None, f"{nome_semplice}: {e}"
+    return nome_semplice, testo, tokenizza_documento(testo), None
+
+def carica_file_corpus(nomi_file, avanzamento=None, max_processi=None):
+    """
+    Legge e tokenizza i file del corpus, in parallelo su più processi quando i file sono abbastanza.
+    Restituisce (documenti, nomi, tokenizzati, file problematici); i tokenizzati vanno passati a ModelloCorpus.
+    'avanzamento(frazione, messaggio)' può sollevare un'eccezione per interrompere il caricamento.
+    """
+    nomi_file = list(nomi_file)
+    documenti = []
+    nomi_documenti = []
+    tokenizzati = []
+    problematic_files = []
+
+    def raccogli(risultati):
+        for i, (nome_semplice, testo, tokenizzato, errore) in enumerate(risultati):
+            if avanzamento:
+                avanzamento(i / len(nomi_file), f"Lettura e tokenizzazione file {i+1}/{len(nomi_file)}...")
+            if errore is not None:
+                problematic_files.append(errore)
+                continue
+            documenti.append(testo)
+            nomi_documenti.append(nome_semplice)
+            tokenizzati.append(tokenizzato)
+
+    num_processi = min(max_processi or os.cpu_count() or 1, len(nomi_file))
+    if num_processi < 2 or len(nomi_file) < SOGLIA_CARICAMENTO_PARALLELO:
+        raccogli(map(_ingerisci_file, nomi_file))
+    else:
+        try:
+            esecutore = ProcessPoolExecutor(max_workers=num_processi)
+        except (OSError, NotImplementedError) as e: # Ambienti senza supporto al multiprocessing
+            print(f"Caricamento parallelo non disponibile ({e}), lettura sequenziale.", file=sys.stderr)
+            raccogli(map(_ingerisci_file, nomi_file))
+        else:
+            try:
+                # Blocchi di file per processo: meno andate e ritorni tra processi su corpora di migliaia di file
+                blocco = max(1, len(nomi_file) // (num_processi * 4))
+                raccogli(esecutore.map(_ingerisci_file, nomi_file, chunksize=blocco))
+            finally:
+                # In caso di annullamento i blocchi non ancora avviati vengono scartati
+                esecutore.shutdown(wait=False, cancel_futures=True)
+    return documenti, nomi_documenti, tokenizzati, problematic_files
+
+
+# --- Corpus in Streaming (file su disco) ---
+
+class DocumentiSuDisco(Sequence):
+    """
+    Sequenza di documenti che restano su disco: si comporta come la lista dei testi
+    (len, indice, iterazione), ma legge ogni file solo quando serve.
+    Per le analisi in streaming i file vengono mappati in memoria (mmap) e decodificati a blocchi.
+    """
+    def __init__(self, percorsi):
+        self.percorsi = list(percorsi)
+        self.dimensioni = [os.path.getsize(percorso) for percorso in self.percorsi]
+        self._codifiche = {} # indice -> 'utf-8' o 'iso-8859-1'
+        self._ultimo_letto = (None, None) # L'ultimo documento letto per intero (es. per più risultati KWIC consecutivi)
+
+    def __len__(self):
+        return len(self.percorsi)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        indice_letto, testo = self._ultimo_letto
+        if indice_letto != indice:
+            testo = leggi_file_testo(self.percorsi[indice])
+            self._ultimo_letto = (indice, testo)
+        return testo
+
+    def _blocchi_byte(self, indice, dimensione_blocco):
+        """Restituisce i byte del file a blocchi, attraverso una mappatura in memoria."""
+        if self.dimensioni[indice] == 0:
+            return # mmap non accetta file vuoti
+        with open(self.percorsi[indice], 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mappa:
+            for inizio in range(0, len(mappa), dimensione_blocco):
+                yield mappa[inizio:inizio + dimensione_blocco]
+
+    def codifica(self, indice):
+        """Come leggi_file_testo: UTF-8 se tutto il file è UTF-8 valido, altrimenti ISO-8859-1 (verificato a blocchi)."""
+        codifica = self._codifiche.get(indice)
+        if codifica is None:
+            codifica = 'utf-8'
+            decodificatore = codecs.getincrementaldecoder('utf-8')()
+            try:
+                for blocco in self._blocchi_byte(indice, DIMENSIONE_BLOCCO_STREAMING):
+                    decodificatore.decode(blocco)
+                decodificatore.decode(b'', final=True)
+            except UnicodeDecodeError:
+                codifica = 'iso-8859-1'
+            self._codifiche[indice] = codifica
+        return codifica
+
+    def blocchi_testo(self, indice, dimensione_blocco=None):
+        """
+        Restituisce il testo di un documento a blocchi, senza mai spezzare una parola tra due blocchi:
+        la parola eventualmente troncata alla fine di un blocco viene passata al successivo.
+        """
+        decodificatore = codecs.getincrementaldecoder(self.codifica(indice))()
+        dimensione_blocco = dimensione_blocco or DIMENSIONE_BLOCCO_STREAMING
+        resto = ''
+        for blocco in self._blocchi_byte(indice, dimensione_blocco):
+            testo = resto + decodificatore.decode(blocco)
+            taglio = REGEX_FINE_PAROLA.search(testo).start()
+            resto = testo[taglio:]
+            yield normalizza_testo(testo[:taglio])
+        resto += decodificatore.decode(b'', final=True)
+        if resto:
+            yield normalizza_testo(resto)
+
+    def anteprima(self, indice, num_caratteri):
+        """Restituisce i primi caratteri di un documento leggendo solo l'inizio del file."""
+        # Al massimo 4 byte per carattere in UTF-8
+        blocchi = self.blocchi_testo(indice, max(4 * num_caratteri, 4096))
+        testo = next(blocchi, '')
+        blocchi.close()
+        return testo[:num_caratteri]
+
+
+class ModelloCorpusStreaming(ModelloCorpusBase):
+    """
+    Modello di un corpus troppo grande per la memoria: i documenti restano su disco
+    (DocumentiSuDisco) e vengono tokenizzati a blocchi a ogni analisi. In memoria restano
+    solo il vocabolario e i risultati.
+
+    Restano in streaming: frequenze e termini più frequenti, nuvola di parole, collocazioni
+    (anche per misure di associazione), co-occorrenze e rete, andamento dei termini, tensore
+    narrativo, anteprima.
+    Richiedono invece tutto il testo in memoria: KWIC, concordanze per sottostringa (indice dei
+    suffissi), frasi e token NLTK, Gulpease e leggibilità, analisi griceana, annotazione POS e
+    salvataggio dell'indice SQLite. Alla prima di queste si costruisce un ModelloCorpus
+    (in_memoria), con un avviso su stderr e in 'avanzamento_in_memoria'; oltre 'limite_in_memoria'
+    byte di file l'analisi viene rifiutata con un ValueError.
+    """
+    def __init__(self, documenti, nomi_file=None, limite_in_memoria=LIMITE_IN_MEMORIA_STREAMING):
+        self.documenti = documenti # DocumentiSuDisco
+        self.nomi_file = list(nomi_file) if nomi_file else []
+        self.limite_in_memoria = limite_in_memoria
+        self.avanzamento_in_memoria = None # avanzamento(frazione, messaggio) per il caricamento in memoria (es. barra di stato)
+        self._lock = threading.RLock()
+        self.vocabolario = Vocabolario()
+        self._cache_frequenze = {} # frozenset(stopwords) -> Counter {id: frequenza}
+        self._cache_ngrammi = {} # (n, frozenset(stopwords)) -> Counter
+        self._num_token = {} # indice documento -> numero di parole
+        self._modello_in_memoria = None
+
+    def blocchi_documento(self, indice_doc):
+        """Tokenizza un documento a blocchi, restituendo per ogni blocco l'array('I') degli id delle parole."""
+        for testo in self.documenti.blocchi_testo(indice_doc):
+            parole = REGEX_PAROLA.findall(testo.lower())
+            with self._lock: # Il vocabolario è condiviso tra le analisi in background
+                ids = self.vocabolario.codifica(parole)
+            yield ids
+
+    def blocchi_ids(self, stopwords=None, avanzamento=None):
+        """Scorre tutto il corpus dal disco, restituendo gli id delle parole (senza stopwords) a blocchi."""
+        ids_stopwords = None
+        if stopwords:
+            self.frequenze() # Una prima scansione completa il vocabolario, così tutte le stopwords hanno un id
+            ids_stopwords = self.vocabolario.ids_di(stopwords)
+        byte_totali = sum(self.documenti.dimensioni) or 1
+        byte_letti = 0
+        for indice_doc in range(len(self.documenti)):
+            if avanzamento:
+                avanzamento(byte_letti / byte_totali, f"Lettura documento {indice_doc+1}/{len(self.documenti)}...")
+            for ids in self.blocchi_documento(indice_doc):
+                yield filtra_ids(ids, ids_stopwords) if ids_stopwords else ids
+            byte_letti += self.documenti.dimensioni[indice_doc]
+
+    def num_token_documento(self, indice_doc):
+        numero = self._num_token.get(indice_doc)
+        if numero is None:
+            numero = sum(len(ids) for ids in self.blocchi_documento(indice_doc))
+            self._num_token[indice_doc] = numero
+        return numero
+
+    def anteprima_documento(self, indice_doc, num_caratteri):
+        return self.documenti.anteprima(indice_doc, num_caratteri)
+
+    def anteprima(self, num_caratteri):
+        """Restituisce i primi caratteri del corpus come se i documenti fossero uniti da spazi."""
+        parti = []
+        lunghezza = 0
+        for indice_doc in range(len(self.documenti)):
+            if lunghezza >= num_caratteri:
+                break
+            parti.append(self.documenti.anteprima(indice_doc, num_caratteri - lunghezza))
+            lunghezza += len(parti[-1]) + 1
+        return ' '.join(parti)[:num_caratteri]
+
+    def _avvisa_caricamento(self, cosa, avanzamento):
+        """Prima di tenere tutto il testo in memoria: rifiuta oltre il limite, altrimenti avvisa l'utente."""
+        byte_totali = sum(self.documenti.dimensioni)
+        megabyte = byte_totali / (1024 * 1024)
+        if self.limite_in_memoria is not None and byte_totali > self.limite_in_memoria:
+            raise ValueError(f"Il corpus in streaming ({megabyte:,.0f} MB) supera il limite di "
+                             f"{self.limite_in_memoria / (1024 * 1024):,.0f} MB per caricare in memoria {cosa}. "
+                             "Restano disponibili frequenze, collocazioni, co-occorrenze e andamento dei termini.")
+        messaggio = f"Corpus in streaming: si carica in memoria {cosa} ({megabyte:,.0f} MB di file)..."
+        print(messaggio, file=sys.stderr)
+        if avanzamento:
+            avanzamento(None, messaggio)
+
+    def in_memoria(self, avanzamento=None):
+        """Restituisce (costruendolo alla prima richiesta) il modello completo per le analisi che richiedono tutto il testo."""
+        avanzamento = avanzamento or self.avanzamento_in_memoria
+        with self._lock:
+            if self._modello_in_memoria is None:
+                self._avvisa_caricamento("il testo completo", avanzamento)
+                self._modello_in_memoria = ModelloCorpus(self.documenti, self.nomi_file, avanzamento)
+            return self._modello_in_memoria
+
+    def indice_suffissi(self, avanzamento=None, verifica=None):
+        # Testo e array dei suffissi di tutto il corpus restano in memoria: stesso limite di in_memoria
+        with self._lock:
+            if self._indice_suffissi is None:
+                self._avvisa_caricamento("l'indice delle sottostringhe", avanzamento or self.avanzamento_in_memoria)
+            return super().indice_suffissi(avanzamento, verifica)
+
+    def parole(self, stopwords=None):
+        return self.in_memoria().parole(stopwords)
+
+    def cerca_kwic(self, query, ampiezza_contesto):
+        return self.in_memoria().cerca_kwic(query, ampiezza_contesto)
+
+    def segmentazione(self, lingua):
+        return self.in_memoria().segmentazione(lingua)
+
+    def frasi(self, lingua):
+        return self.in_memoria().frasi(lingua)
+
+    def parole_per_frase(self, lingua):
+        return self.in_memoria().parole_per_frase(lingua)
+
+    def token_nltk(self, lingua):
+        return self.in_memoria().token_nltk(lingua)
+
+
+# --- Indice Persistente del Corpus (SQLite) ---
+
+VERSIONE_INDICE_SQLITE = 1
+
+SCHEMA_INDICE_SQLITE = '''
+    CREATE TABLE metadati (
+        chiave TEXT PRIMARY KEY,
+        valore TEXT
+    );
+    CREATE TABLE documenti (
+        id INTEGER PRIMARY KEY,
+        nome TEXT,
+        num_parole INTEGER NOT NULL,
+        testo TEXT
+    );
+    CREATE TABLE vocabolario (
+        id INTEGER PRIMARY KEY,
+        forma TEXT NOT NULL UNIQUE,
+        frequenza INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX idx_vocabolario_frequenza ON vocabolario (frequenza DESC);
+    CREATE TABLE frequenze_documento (
+        id_parola INTEGER NOT NULL,
+        id_documento INTEGER NOT NULL,
+        frequenza INTEGER NOT NULL,
+        PRIMARY KEY (id_parola, id_documento)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_frequenze_documento ON frequenze_documento (id_documento);
+    CREATE TABLE token_documenti (
+        id_documento INTEGER PRIMARY KEY,
+        ids_parole BLOB NOT NULL,
+        ids_kwic BLOB NOT NULL,
+        inizi_kwic BLOB NOT NULL
+    );
+    CREATE TABLE posizioni (
+        id_forma INTEGER PRIMARY KEY,
+        num_occorrenze INTEGER NOT NULL,
+        coppie BLOB NOT NULL
+    );
+'''
+
+
+def salva_indice_corpus(modello, percorso_db, avanzamento=None):
+    """
+    Salva un ModelloCorpus in un database SQLite: testi, vocabolario con frequenze totali,
+    frequenze per documento, id dei token e postings posizionali KWIC (array('I') come BLOB).
+    Il database viene costruito in un file temporaneo nella stessa cartella e rinominato solo a
+    salvataggio riuscito: un indice esistente resta intatto se la scrittura si interrompe.
+    """
+    cartella = os.path.dirname(os.path.abspath(percorso_db))
+    descrittore, temporaneo = tempfile.mkstemp(prefix=".indice_", suffix=".tmp", dir=cartella)
+    os.close(descrittore) # SQLite apre il file per conto suo: un file vuoto è un database nuovo
+    try:
+        with modello._lock:
+            indice = modello.indice_kwic() # Aggiunge al vocabolario anche le forme della punteggiatura
+            frequenze = modello.frequenze()
+            conn = sqlite3.connect(temporaneo)
+            try:
+                conn.executescript(SCHEMA_INDICE_SQLITE)
+                with conn: # Un'unica transazione: molto più veloce di un commit per riga
+                    conn.executemany("INSERT INTO metadati (chiave, valore) VALUES (?, ?)", [
+                        ("versione", str(VERSIONE_INDICE_SQLITE)),
+                        ("ordine_byte", sys.byteorder),
+                        ("byte_per_id", str(array('I').itemsize)),
+                    ])
+                    num_documenti = len(modello.documenti)
+                    for indice_doc, testo in enumerate(modello.documenti):
+                        if avanzamento:
+                            avanzamento(indice_doc / num_documenti, f"Salvataggio documento {indice_doc+1}/{num_documenti}...")
+                        ids_doc = modello.ids_documenti[indice_doc]
+                        nome = modello.nomi_file[indice_doc] if indice_doc < len(modello.nomi_file) else f"Doc {indice_doc+1}"
+                        conn.execute("INSERT INTO documenti (id, nome, num_parole, testo) VALUES (?, ?, ?, ?)",
+                                     (indice_doc, nome, len(ids_doc), testo))
+                        conn.execute("INSERT INTO token_documenti (id_documento, ids_parole, ids_kwic, inizi_kwic) VALUES (?, ?, ?, ?)",
+                                     (indice_doc, ids_doc.tobytes(), indice.ids_documenti[indice_doc].tobytes(),
+                                      modello._inizi_kwic[indice_doc].tobytes()))
+                        conn.executemany("INSERT INTO frequenze_documento (id_parola, id_documento, frequenza) VALUES (?, ?, ?)",
+                                         ((id_parola, indice_doc, freq) for id_parola, freq in conta_ids(ids_doc).items()))
+                    if avanzamento:
+                        avanzamento(None, "Salvataggio vocabolario e postings...")
+                    conn.executemany("INSERT INTO vocabolario (id, forma, frequenza) VALUES (?, ?, ?)",
+                                     ((id_forma, forma, frequenze.get(id_forma, 0)) for id_forma, forma in enumerate(modello.vocabolario.forme)))
+                    conn.executemany("INSERT INTO posizioni (id_forma, num_occorrenze, coppie) VALUES (?, ?, ?)",
+                                     ((id_forma, len(coppie) // 2, coppie.tobytes()) for id_forma, coppie in indice.postings.items()))
+                conn.execute("ANALYZE") # Statistiche per il pianificatore delle query
+            finally:
+                conn.close()
+        os.replace(temporaneo, percorso_db) # Connessione già chiusa: necessario su Windows
+    except BaseException:
+        if os.path.exists(temporaneo):
+            os.remove(temporaneo)
+        raise
+
+
+class ColonnaSQLite(Sequence):
+    """
+    Una colonna per documento dell'indice SQLite vista come lista (es. testi o id dei token):
+    ogni elemento viene letto solo quando serve. L'ultimo elemento letto resta in memoria,
+    perché le ricerche KWIC visitano le occorrenze documento per documento.
+    """
+    def __init__(self, corpus, tabella, colonna, chiave, converti=None):
+        self._corpus = corpus
+        self._query = f"SELECT {colonna} FROM {tabella} WHERE {chiave} = ?"
+        self._converti = converti
+        self._ultimo_letto = (None, None)
+
+    def __len__(self):
+        return len(self._corpus.nomi_file)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        indice_letto, valore = self._ultimo_letto
+        if indice_letto != indice:
+            valore = self._corpus._interroga(self._query, (indice,))[0][0]
+            if self._converti:
+                valore = self._converti(valore)
+            self._ultimo_letto = (indice, valore)
+        return valore
+
+
+class PostingsSQLite(Mapping):
+    """I postings posizionali dell'indice SQLite come dizionario id forma -> array('I'), letti su richiesta."""
+    def __init__(self, corpus):
+        self._corpus = corpus
+        self._letti = {}
+
+    def __getitem__(self, id_forma):
+        coppie = self._letti.get(id_forma)
+        if coppie is None:
+            righe = self._corpus._interroga("SELECT coppie FROM posizioni WHERE id_forma = ?", (id_forma,))
+            if not righe:
+                raise KeyError(id_forma)
+            coppie = self._corpus._array_ids(righe[0][0])
+            if len(self._letti) >= 256: # Tiene in memoria solo i postings delle ricerche recenti
+                self._letti.clear()
+            self._letti[id_forma] = coppie
+        return coppie
+
+    def __contains__(self, id_forma):
+        return bool(self._corpus._interroga("SELECT 1 FROM posizioni WHERE id_forma = ?", (id_forma,)))
+
+    def __iter__(self):
+        return iter([id_forma for (id_forma,) in self._corpus._interroga("SELECT id_forma FROM posizioni ORDER BY id_forma")])
+
+    def __len__(self):
+        return self._corpus._interroga("SELECT COUNT(*) FROM posizioni")[0][0]
+
+
+class IndicePosizionaleSQLite(IndicePosizionale):
+    """
+    Indice posizionale letto dal database invece che costruito in memoria: la ricerca
+    è quella di IndicePosizionale, ma postings e token dei documenti vengono caricati
+    solo per i termini e i documenti coinvolti, e i caratteri jolly diventano un GLOB indicizzato.
+    """
+    def __init__(self, corpus):
+        self._corpus = corpus
+        self.vocabolario = corpus.vocabolario
+        self.ids_documenti = ColonnaSQLite(corpus, 'token_documenti', 'ids_kwic', 'id_documento', corpus._array_ids)
+        self.postings = PostingsSQLite(corpus)
+
+    def ids_per_modello(self, modello):
+        if '*' not in modello:
+            return super().ids_per_modello(modello)
+        # La query usa solo lettere, cifre e '*', quindi è già un modello GLOB valido;
+        # il prefisso letterale sfrutta l'indice UNIQUE su 'forma'
+        righe = self._corpus._interroga("SELECT v.id FROM vocabolario v JOIN posizioni p ON p.id_forma = v.id "
+                                        "WHERE v.forma GLOB ?", (modello,))
+        return {id_forma for (id_forma,) in righe}
+
+
+class ModelloCorpusSQLite(ModelloCorpus):
+    """
+    Corpus riaperto da un indice SQLite creato con salva_indice_corpus, senza ritokenizzare:
+    all'apertura si leggono solo il vocabolario e l'elenco dei documenti. Frequenze,
+    andamento e KWIC diventano interrogazioni indicizzate; testi e id dei token
+    vengono letti dal database documento per documento quando un'analisi li richiede.
+    """
+    aggiornabile = False # L'indice su disco è in sola lettura
+    def __init__(self, percorso_db):
+        if not os.path.isfile(percorso_db):
+            raise FileNotFoundError(percorso_db)
+        self.percorso_db = percorso_db
+        self._lock = threading.RLock()
+        # La connessione è condivisa dalle analisi in background, sempre sotto self._lock
+        self._connessione = sqlite3.connect(percorso_db, check_same_thread=False)
+        try:
+            metadati = dict(self._interroga("SELECT chiave, valore FROM metadati"))
+        except sqlite3.DatabaseError:
+            raise ValueError(f"Il file '{percorso_db}' non contiene un indice del corpus.")
+        if metadati.get("versione") != str(VERSIONE_INDICE_SQLITE) or metadati.get("byte_per_id") != str(array('I').itemsize):
+            raise ValueError(f"L'indice '{percorso_db}' è stato creato con una versione incompatibile.")
+        self._scambia_byte = metadati.get("ordine_byte") != sys.byteorder
+
+        self.vocabolario = Vocabolario(forma for (forma,) in self._interroga("SELECT forma FROM vocabolario ORDER BY id"))
+        righe = self._interroga("SELECT nome, num_parole FROM documenti ORDER BY id")
+        self.nomi_file = [nome for nome, _ in righe]
+        self._num_parole = [num_parole for _, num_parole in righe]
+        self.documenti = ColonnaSQLite(self, 'documenti', 'testo', 'id')
+        self.ids_documenti = ColonnaSQLite(self, 'token_documenti', 'ids_parole', 'id_documento', self._array_ids)
+        self._inizi_kwic = ColonnaSQLite(self, 'token_documenti', 'inizi_kwic', 'id_documento', self._array_ids)
+        self._indice_kwic = IndicePosizionaleSQLite(self)
+        self._cache_ids_parole = {}
+        self._lunghezze_parole = {}
+        self._cache_frequenze = {}
+        self._cache_ngrammi = {}
+        self._cache_frasi = {}
+
+    def _interroga(self, query, parametri=()):
+        with self._lock:
+            return self._connessione.execute(query, parametri).fetchall()
+
+    def _array_ids(self, dati):
+        ids = array('I')
+        ids.frombytes(dati)
+        if self._scambia_byte: # Indice creato su una macchina con ordine dei byte diverso
+            ids.byteswap()
+        return ids
+
+    def _conta_frequenze(self, avanzamento=None):
+        return Counter(dict(self._interroga("SELECT id, frequenza FROM vocabolario WHERE frequenza > 0")))
+
+    def piu_frequenti(self, num_termini, stopwords=None):
+        """I termini più frequenti scorrendo l'indice sulle frequenze: si leggono solo le prime righe."""
+        ids_stopwords = self.vocabolario.ids_di(stopwords) if stopwords else set()
+        risultato = []
+        with self._lock:
+            for id_parola, freq in self._connessione.execute(
+                    "SELECT id, frequenza FROM vocabolario WHERE frequenza > 0 ORDER BY frequenza DESC, forma"):
+                if id_parola in ids_stopwords:
+                    continue
+                risultato.append((id_parola, freq))
+                if len(risultato) >= num_termini:
+                    break
+        return risultato
+
+    def occorrenze_per_documento(self, id_parola, avanzamento=None):
+        conteggi = [0] * len(self.nomi_file)
+        if id_parola is not None:
+            for indice_doc, freq in self._interroga("SELECT id_documento, frequenza FROM frequenze_documento WHERE id_parola = ?", (id_parola,)):
+                conteggi[indice_doc] = freq
+        return conteggi
+
+    def blocchi_ids(self, stopwords=None, avanzamento=None):
+        """Restituisce gli id delle parole (senza stopwords) documento per documento, senza caricare tutto il corpus."""
+        ids_stopwords = self.vocabolario.ids_di(stopwords) if stopwords else None
+        num_documenti = len(self.nomi_file)
+        for indice_doc in range(num_documenti):
+            if avanzamento:
+                avanzamento(indice_doc / num_documenti, f"Documento {indice_doc+1}/{num_documenti}...")
+            ids = self.ids_documenti[indice_doc]
+            yield filtra_ids(ids, ids_stopwords) if ids_stopwords else ids
+
+    def num_token_documento(self, indice_doc):
+        return self._num_parole[indice_doc]
+
+    def anteprima_documento(self, indice_doc, num_caratteri):
+        return self._interroga("SELECT substr(testo, 1, ?) FROM documenti WHERE id = ?", (num_caratteri, indice_doc))[0][0]
+
+    def anteprima(self, num_caratteri):
+        parti = []
+        lunghezza = 0
+        for indice_doc in range(len(self.nomi_file)):
+            if lunghezza >= num_caratteri:
+                break
+            parti.append(self.anteprima_documento(indice_doc, num_caratteri - lunghezza))
+            lunghezza += len(parti[-1]) + 1
+        return ' '.join(parti)[:num_caratteri]
+
+
+# --- Motore di Analisi (API senza Interfaccia Grafica) ---
+# Funzioni di calcolo condivise dalle finestre Tkinter e dalla modalità a riga di comando, utilizzabili
+# anche importando questo file come modulo (import StrumentiTestualiUSAI). Restituiscono dati
+# strutturati (dataclass, Counter, array); la formattazione del testo spetta a chi le chiama.
+# 'avanzamento' e 'verifica' hanno la stessa forma dei callback del modello del corpus.
+
+@dataclass(frozen=True)
+class FrequenzaTermine:
+    parola: str
+    frequenza: int
+
+@dataclass(frozen=True)
+class Collocazione:
+    parole: tuple
+    frequenza: int
+
+    @property
+    def testo(self) -> str:
+        return " ".join(self.parole)
+
+@dataclass(frozen=True)
+class CollocazioneAssociata(Collocazione):
+    pmi: float # Informazione mutua puntuale (log2 osservate/attese)
+    log_likelihood: float # G² di Dunning
+    chi_quadro: float
+    t_score: float
+    dice: float
+
+@dataclass(frozen=True)
+class CoppiaCooccorrente:
+    parola_1: str # In ordine alfabetico rispetto a parola_2
+    parola_2: str
+    frequenza: int
+
+@dataclass(frozen=True)
+class OccorrenzaKWIC:
+    contesto_sinistro: str
+    parola: str
+    contesto_destro: str
+
+@dataclass(frozen=True)
+class OccorrenzaConcordanza(OccorrenzaKWIC):
+    documento: str
+    posizione: int # Carattere iniziale dell'occorrenza nel documento
+
+@dataclass
+class RisultatoKWIC:
+    query: str
+    occorrenze_totali: int
+    contesti: list # OccorrenzaKWIC (OccorrenzaConcordanza per le sottostringhe), al più 'limite'; una sequenza pigra se pigro
+
+@dataclass
+class AndamentoTermine:
+    termine: str
+    etichette: list # Nomi dei documenti oppure "Seg. 1", "Seg. 2", ...
+    frequenze: list
+    per_segmenti: bool # True: segmenti di un solo documento; False: un valore per documento
+
+@dataclass
+class RisultatoGulpease:
+    lettere: int
+    parole: int
+    frasi: int
+    indice: Optional[float] # None se mancano parole o frasi
+    interpretazione: Optional[str]
+
+@dataclass
+class GulpeaseFrase:
+    frase: int # Numero progressivo, a partire da 1
+    testo: str
+    lettere: int
+    parole: int
+    indice: Optional[float] # None per le frasi senza parole alfabetiche
+    interpretazione: Optional[str]
+
+@dataclass
+class DistribuzioneGulpease:
+    frasi: int # Frasi con almeno una parola alfabetica: le altre non hanno indice
+    media: Optional[float]
+    deviazione_standard: Optional[float]
+    percentili: dict = field(default_factory=dict) # {percentile: indice}
+    istogramma: list = field(default_factory=list) # [(da, a, frasi)] in fasce di AMPIEZZA_FASCIA_GULPEASE punti
+    fasce: dict = field(default_factory=dict) # {interpretazione: frasi}, dalla più difficile
+    finestra: int = FINESTRA_MEDIA_MOBILE_GULPEASE
+    media_mobile: list = field(default_factory=list) # [(ultima frase della finestra, media)] lungo il testo
+    peggiori: list = field(default_factory=list) # GulpeaseFrase meno leggibili, dalla più difficile
+
+@dataclass
+class IndiciLeggibilita:
+    documento: str # Nome del documento, oppure "Corpus" per l'intero corpus
+    frasi: int
+    parole: int # Parole alfabetiche
+    lettere: int
+    sillabe: int
+    polisillabe: int # Parole di almeno 3 sillabe
+    parole_lunghe: int # Parole di più di 6 lettere
+    gulpease: Optional[float] # None se mancano parole o frasi, come per tutti gli indici
+    gulpease_frasi: Optional[float] # Media degli indici Gulpease delle singole frasi
+    flesch_vacca: Optional[float]
+    flesch_kincaid: Optional[float]
+    gunning_fog: Optional[float]
+    smog: Optional[float]
+    lix: Optional[float]
+
+@dataclass
+class ProblemaFrase:
+    frase: int
+    parole: int
+    tipo: str # "lunga", "breve" o "solo_punteggiatura"
+    testo: str
+
+@dataclass
+class RisultatoGriceano:
+    frasi: int
+    token: int
+    lunghezza_media: Optional[float] # None se non ci sono parole alfabetiche
+    problemi_quantita_modo: list = field(default_factory=list) # ProblemaFrase
+    ripetizioni: list = field(default_factory=list) # Parole ripetute consecutivamente, ordinate
+    indicatori_hedging: list = field(default_factory=list) # Termini di HEDGING_TERMS trovati, ordinati
+
+def file_corpus(percorsi, estensione=".txt", ricorsivo=False) -> list:
+    """Espande cartelle e file nell'elenco ordinato dei file del corpus (dalle cartelle solo quelli con 'estensione')."""
+    nomi_file = []
+    for percorso in percorsi:
+        if os.path.isdir(percorso):
+            trovati = []
+            if ricorsivo:
+                for cartella, sottocartelle, file_cartella in os.walk(percorso):
+                    sottocartelle.sort()
+                    trovati.extend(os.path.join(cartella, nome) for nome in file_cartella)
+            else:
+                trovati = [os.path.join(percorso, nome) for nome in os.listdir(percorso)]
+            nomi_file.extend(sorted(nome for nome in trovati
+                                    if os.path.isfile(nome) and nome.lower().endswith(estensione.lower())))
+        elif os.path.isfile(percorso):
+            nomi_file.append(percorso)
+        else:
+            raise FileNotFoundError(f"Percorso non trovato: {percorso}")
+    return nomi_file
+
+def apri_corpus(percorsi, estensione=".txt", ricorsivo=False, streaming=False, max_processi=None, avanzamento=None,
+                limite_in_memoria=LIMITE_IN_MEMORIA_STREAMING):
+    """
+    Costruisce il modello del corpus da file e cartelle, oppure riapre un indice SQLite (.db)
+    salvato con salva_indice_corpus. Restituisce (modello, problemi), dove 'problemi' elenca
+    i file non caricati. Con streaming=True i file restano su disco e vengono letti a blocchi;
+    'limite_in_memoria' (byte, None senza limite) vale per le analisi che richiedono tutto il testo.
+    """
+    if isinstance(percorsi, (str, os.PathLike)):
+        percorsi = [percorsi]
+    percorsi = [os.fspath(percorso) for percorso in percorsi]
+    if len(percorsi) == 1 and percorsi[0].lower().endswith(".db") and os.path.isfile(percorsi[0]):
+        return ModelloCorpusSQLite(percorsi[0]), []
+
+    nomi_file = file_corpus(percorsi, estensione, ricorsivo)
+    if not nomi_file:
+        raise ValueError(f"Nessun file '{estensione}' trovato nei percorsi indicati.")
+
+    if streaming:
+        leggibili = [nome for nome in nomi_file if os.access(nome, os.R_OK)]
+        problemi = [f"{os.path.basename(nome)}: file non trovato o non leggibile" for nome in nomi_file if nome not in leggibili]
+        modello = ModelloCorpusStreaming(DocumentiSuDisco(leggibili), [os.path.basename(nome) for nome in leggibili],
+                                         limite_in_memoria)
+        # Le frequenze complete (e quindi il vocabolario) si calcolano una volta, leggendo i file a blocchi
+        modello.frequenze(avanzamento=avanzamento)
+        return modello, problemi
+
+    documenti, nomi_documenti, tokenizzati, problemi = carica_file_corpus(nomi_file, avanzamento=avanzamento, max_processi=max_processi)
+    if not documenti:
+        raise ValueError("Nessun documento del corpus è stato caricato correttamente.")
+    return ModelloCorpus(documenti, nomi_documenti, tokenizzati=tokenizzati, avanzamento=avanzamento), problemi
+
+def termini_piu_frequenti(modello, num_termini, stopwords=None) -> list:
+    """I 'num_termini' termini più frequenti (FrequenzaTermine), stopwords escluse."""
+    forme = modello.vocabolario.forme
+    return [FrequenzaTermine(forme[id_parola], freq) for id_parola, freq in modello.piu_frequenti(num_termini, stopwords)]
+
+def frequenze_termini(modello, stopwords=None) -> Counter:
+    """Frequenze di tutti i termini del corpus come Counter parola -> frequenza (es. per la nuvola di parole)."""
+    forme = modello.vocabolario.forme
+    return Counter({forme[id_parola]: freq for id_parola, freq in modello.frequenze(stopwords).items()})
+
+def collocazioni_piu_frequenti(modello, n, num_collocazioni, stopwords=None, avanzamento=None) -> list:
+    """
+    Gli n-grammi più frequenti (Collocazione) sulla sequenza di parole senza stopwords, a pari frequenza
+    in ordine alfabetico. Il conteggio avviene sugli id dei token; le stringhe si ricostruiscono solo
+    per i candidati al risultato.
+    """
+    forme = modello.vocabolario.forme
+    frequenze_colloc = modello.ngrammi(n, stopwords, avanzamento=avanzamento)
+    return [Collocazione(tuple(forme[i] for i in ngramma_ids), freq)
+            for ngramma_ids, freq in piu_frequenti_ordinati(frequenze_colloc, num_collocazioni,
+                                                            lambda ngramma_ids: tuple(forme[i] for i in ngramma_ids))]
+
+def misure_associazione(osservate, freq_prime, freq_ultime, num_ngrammi):
+    """
+    Misure di associazione dalla tabella di contingenza 2x2 di ogni candidato: 'osservate' sono le
+    occorrenze dell'n-gramma, 'freq_prime' quelle della sua prima parte (la prima parola; per n > 2
+    l'(n-1)-gramma iniziale), 'freq_ultime' quelle dell'ultima parola, su 'num_ngrammi' n-grammi.
+    Con NumPy gli argomenti sono array e il calcolo è vettorizzato su tutti i candidati;
+    restituisce un dizionario misura -> array (o lista, senza NumPy).
+    """
+    if not numpy_disponibile:
+        misure = {misura: [] for misura in MISURE_ASSOCIAZIONE[1:]}
+        for o11, r1, c1 in zip(osservate, freq_prime, freq_ultime):
+            for misura, valore in zip(MISURE_ASSOCIAZIONE[1:], _misure_associazione_coppia(o11, r1, c1, num_ngrammi)):
+                misure[misura].append(valore)
+        return misure
+
+    o11 = np.asarray(osservate, dtype=np.float64)
+    r1 = np.asarray(freq_prime, dtype=np.float64)
+    c1 = np.asarray(freq_ultime, dtype=np.float64)
+    n = float(num_ngrammi)
+    # Le parti marginali e il totale vengono da conteggi diversi: le celle si limitano a valori non negativi
+    o12 = np.maximum(r1 - o11, 0)
+    o21 = np.maximum(c1 - o11, 0)
+    o22 = np.maximum(n - r1 - c1 + o11, 0)
+    r2, c2 = n - r1, n - c1
+    e11, e12, e21, e22 = r1 * c1 / n, r1 * c2 / n, r2 * c1 / n, r2 * c2 / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pmi = np.log2(o11 / e11)
+        log_likelihood = 2 * sum(np.where(o > 0, o * np.log(o / e), 0.0)
+                                 for o, e in ((o11, e11), (o12, e12), (o21, e21), (o22, e22)))
+        denominatore = r1 * r2 * c1 * c2
+        chi_quadro = np.where(denominatore > 0, n * (o11 * o22 - o12 * o21) ** 2 / denominatore, 0.0)
+        t_score = (o11 - e11) / np.sqrt(o11)
+        dice = 2 * o11 / (r1 + c1)
+    return {"pmi": pmi, "log_likelihood": log_likelihood, "chi_quadro": chi_quadro, "t_score": t_score, "dice": dice}
+
+def _misure_associazione_coppia(o11, r1, c1, n):
+    """misure_associazione per un singolo candidato, senza NumPy (stesso ordine di MISURE_ASSOCIAZIONE[1:])."""
+    o12, o21, o22 = max(r1 - o11, 0), max(c1 - o11, 0), max(n - r1 - c1 + o11, 0)
+    r2, c2 = n - r1, n - c1
+    e11, e12, e21, e22 = r1 * c1 / n, r1 * c2 / n, r2 * c1 / n, r2 * c2 / n
+    pmi = math.log2(o11 / e11)
+    log_likelihood = 2 * sum(o * math.log(o / e) for o, e in ((o11, e11), (o12, e12), (o21, e21), (o22, e22)) if o > 0)
+    denominatore = r1 * r2 * c1 * c2
+    chi_quadro = n * (o11 * o22 - o12 * o21) ** 2 / denominatore if denominatore > 0 else 0.0
+    t_score = (o11 - e11) / math.sqrt(o11)
+    dice = 2 * o11 / (r1 + c1)
+    return pmi, log_likelihood, chi_quadro, t_score, dice
+
+def collocazioni_per_associazione(modello, n, num_collocazioni, misura="log_likelihood", frequenza_minima=FREQUENZA_MINIMA_ASSOCIAZIONE,
+                                  stopwords=None, avanzamento=None) -> list:
+    """
+    Gli n-grammi (CollocazioneAssociata) con la maggiore forza di associazione secondo 'misura'
+    (vedi MISURE_ASSOCIAZIONE), a parità di punteggio i più frequenti, poi in ordine alfabetico. I candidati sotto
+    'frequenza_minima' vengono scartati prima del calcolo, che avviene sugli id e non sulle stringhe.
+    """
+    if misura not in MISURE_ASSOCIAZIONE:
+        raise ValueError(f"Misura di associazione sconosciuta: '{misura}'. Valori ammessi: {', '.join(MISURE_ASSOCIAZIONE)}")
+    frequenze_ngrammi = modello.ngrammi(n, stopwords, avanzamento=avanzamento)
+    candidati = [(ngramma, freq) for ngramma, freq in frequenze_ngrammi.items() if freq >= frequenza_minima]
+    if not candidati:
+        return []
+    num_ngrammi = modello.num_parole(stopwords) - n + 1
+    frequenze_parole = modello.frequenze(stopwords)
+    # Prima parte dell'n-gramma: la prima parola per i bigrammi, altrimenti l'(n-1)-gramma iniziale
+    frequenze_prime = frequenze_parole if n == 2 else modello.ngrammi(n - 1, stopwords)
+    chiave_prima = (lambda ngramma: ngramma[0]) if n == 2 else (lambda ngramma: ngramma[:-1])
+    osservate = [freq for _, freq in candidati]
+    freq_prime = [frequenze_prime.get(chiave_prima(ngramma), 0) for ngramma, _ in candidati]
+    freq_ultime = [frequenze_parole.get(ngramma[-1], 0) for ngramma, _ in candidati]
+    misure = misure_associazione(osservate, freq_prime, freq_ultime, num_ngrammi)
+
+    punteggi = osservate if misura == "frequenza" else misure[misura]
+    num_collocazioni = min(num_collocazioni, len(candidati))
+    forme = modello.vocabolario.forme
+    # Ultimo criterio le forme, non la posizione nel Counter: l'ordine di inserimento cambia tra NumPy e Python puro
+    etichetta = lambda i: tuple(forme[id_parola] for id_parola in candidati[i][0])
+    if numpy_disponibile:
+        punteggi = np.nan_to_num(np.asarray(punteggi, dtype=np.float64), nan=-np.inf)
+        frequenze = np.asarray(osservate)
+        scelte = np.argpartition(-punteggi, num_collocazioni - 1)[:num_collocazioni] if num_collocazioni < len(candidati) else np.arange(len(candidati))
+        # Includi tutti i candidati a pari merito con l'ultimo scelto, poi ordina per punteggio, frequenza e forme
+        scelte = np.union1d(scelte, np.flatnonzero(punteggi == punteggi[scelte].min()))
+        scelte = sorted(scelte.tolist(), key=lambda i: (-punteggi[i], -frequenze[i], etichetta(i)))[:num_collocazioni]
+    else:
+        scelte = heapq.nsmallest(num_collocazioni, range(len(candidati)),
+                                 key=lambda i: (-punteggi[i], -osservate[i], etichetta(i)))
+    return [CollocazioneAssociata(tuple(forme[id_parola] for id_parola in candidati[i][0]), osservate[i],
+                                  *(float(misure[nome][i]) for nome in MISURE_ASSOCIAZIONE[1:]))
+            for i in scelte]
+
+def cooccorrenze_piu_frequenti(modello, finestra, num_coppie, stopwords=None, avanzamento=None, verifica=None) -> list:
+    """Le coppie di termini (CoppiaCooccorrente) più frequenti entro 'finestra' parole, stopwords escluse."""
+    forme = modello.vocabolario.forme
+    co_occorrenze = modello.cooccorrenze(finestra, stopwords, avanzamento=avanzamento, verifica=verifica)
+    return [CoppiaCooccorrente(*sorted((forme[id1], forme[id2])), freq)
+            for (id1, id2), freq in co_occorrenze.most_common(num_coppie)]
+
+@dataclass
+class GrafoCooccorrenze:
+    """Rete pesata e non orientata delle co-occorrenze: nodo i = parole[i], arco k = (sorgenti[k], destinazioni[k], pesi[k])."""
+    parole: list
+    frequenze: list # Frequenza di ogni parola nel corpus (stopwords escluse)
+    sorgenti: list # Array NumPy se disponibile
+    destinazioni: list
+    pesi: list
+    posizioni: Optional[list] = None # Coordinate (x, y) per nodo, dopo calcola_layout_grafo
+
+    @property
+    def num_nodi(self) -> int:
+        return len(self.parole)
+
+    @property
+    def num_archi(self) -> int:
+        return len(self.pesi)
+
+def grafo_cooccorrenze(modello, finestra, stopwords=None, peso_minimo=1, archi_per_nodo=None,
+                       avanzamento=None, verifica=None) -> GrafoCooccorrenze:
+    """
+    Costruisce la rete delle co-occorrenze dalla matrice sparsa del modello, potata in due modi:
+    scarta gli archi con peso inferiore a 'peso_minimo' e, con 'archi_per_nodo', tiene un arco solo
+    se è tra i 'archi_per_nodo' più pesanti di almeno uno dei suoi due estremi. Restano solo i nodi con archi.
+    """
+    matrice = modello.cooccorrenze(finestra, stopwords, avanzamento=avanzamento, verifica=verifica)
+    if numpy_disponibile:
+        righe = np.repeat(np.arange(matrice.dimensione, dtype=np.int64), np.diff(matrice.indptr))
+        colonne = matrice.indici.astype(np.int64)
+        pesi = matrice.conteggi
+        tenuti = pesi >= peso_minimo
+        righe, colonne, pesi = righe[tenuti], colonne[tenuti], pesi[tenuti]
+        if archi_per_nodo is not None and len(pesi):
+            # Ogni arco compare una volta per estremo; il rango è la posizione tra gli archi del nodo per peso decrescente
+            estremi = np.concatenate((righe, colonne))
+            archi = np.concatenate((np.arange(len(pesi)), np.arange(len(pesi))))
+            ordine = np.lexsort((archi, -np.concatenate((pesi, pesi)), estremi))
+            estremi_ordinati = estremi[ordine]
+            inizi_gruppo = np.flatnonzero(np.concatenate(([True], estremi_ordinati[1:] != estremi_ordinati[:-1])))
+            lunghezze = np.diff(np.concatenate((inizi_gruppo, [len(ordine)])))
+            rango = np.arange(len(ordine)) - np.repeat(inizi_gruppo, lunghezze)
+            tenuti = np.zeros(len(pesi), dtype=bool)
+            tenuti[archi[ordine][rango < archi_per_nodo]] = True
+            righe, colonne, pesi = righe[tenuti], colonne[tenuti], pesi[tenuti]
+        ids_nodi, rinumerati = np.unique(np.concatenate((righe, colonne)), return_inverse=True)
+        sorgenti, destinazioni = rinumerati[:len(righe)], rinumerati[len(righe):]
+        ids_nodi = ids_nodi.tolist()
+    else:
+        archi = [coppia_peso for coppia_peso in matrice.items() if coppia_peso[1] >= peso_minimo]
+        if archi_per_nodo is not None:
+            incidenti = {}
+            for indice_arco, ((a, b), peso) in enumerate(archi):
+                incidenti.setdefault(a, []).append(indice_arco)
+                incidenti.setdefault(b, []).append(indice_arco)
+            scelti = set()
+            for indici_archi in incidenti.values():
+                scelti.update(heapq.nsmallest(archi_per_nodo, indici_archi, key=lambda i: (-archi[i][1], i)))
+            archi = [archi[i] for i in sorted(scelti)]
+        ids_nodi = sorted({id_parola for (a, b), _ in archi for id_parola in (a, b)})
+        numero_nodo = {id_parola: i for i, id_parola in enumerate(ids_nodi)}
+        sorgenti = array('I', [numero_nodo[a] for (a, _), _ in archi])
+        destinazioni = array('I', [numero_nodo[b] for (_, b), _ in archi])
+        pesi = array('Q', [peso for _, peso in archi])
+    forme = modello.vocabolario.forme
+    frequenze = modello.frequenze(stopwords)
+    return GrafoCooccorrenze([forme[i] for i in ids_nodi], [frequenze.get(i, 0) for i in ids_nodi], sorgenti, destinazioni, pesi)
+
+def calcola_layout_grafo(grafo, iterazioni=50, seme=0, avanzamento=None, verifica=None):
+    """
+    Layout a forze (Fruchterman-Reingold) in stile Barnes-Hut, vettorizzato con NumPy: la repulsione
+    tra tutti i nodi è approssimata raggruppandoli in una griglia; le celle lontane si respingono tra
+    loro come masse concentrate nel centro, i nodi vicini tramite i centri delle nove celle attorno.
+    Il costo per iterazione è O(celle² + nodi + archi) invece di O(nodi²).
+    Salva e restituisce le posizioni (array nodi x 2, coordinate tra 0 e 1).
+    """
+    if not numpy_disponibile:
+        raise RuntimeError("Il layout del grafo richiede NumPy. Installalo con: pip install numpy")
+    num_nodi = grafo.num_nodi
+    generatore = np.random.default_rng(seme)
+    posizioni = generatore.random((num_nodi, 2))
+    if num_nodi < 2:
+        grafo.posizioni = posizioni
+        return posizioni
+    sorgenti = np.asarray(grafo.sorgenti, dtype=np.int64)
+    destinazioni = np.asarray(grafo.destinazioni, dtype=np.int64)
+    # Pesi degli archi compressi (logaritmo) perché le coppie molto frequenti non schiaccino il resto
+    pesi = np.log1p(np.asarray(grafo.pesi, dtype=np.float64))
+    pesi /= pesi.max() if len(pesi) else 1.0
+    distanza_ideale = 1.0 / math.sqrt(num_nodi)
+    lato_griglia = int(min(32, max(4, math.sqrt(num_nodi) / 3))) # Al più 1024 celle: il campo lontano costa celle²
+    minima_distanza2 = (distanza_ideale * 0.01) ** 2
+    # Coppie di celle non adiacenti (né la stessa cella né una delle otto attorno): fisse per tutta la simulazione
+    griglia_xy = np.stack(np.divmod(np.arange(lato_griglia * lato_griglia), lato_griglia), axis=1)
+    celle_lontane = (np.abs(griglia_xy[:, None, :] - griglia_xy[None, :, :]) > 1).any(axis=2)
+    temperatura = 0.1
+    for iterazione in range(iterazioni):
+        if verifica:
+            verifica()
+        if avanzamento:
+            avanzamento(iterazione / iterazioni, f"Layout: iterazione {iterazione+1}/{iterazioni}...")
+        spostamenti = np.zeros_like(posizioni)
+
+        # Repulsione: i nodi si raggruppano in celle di una griglia (centro di massa e numero di nodi per cella)
+        minimo = posizioni.min(axis=0)
+        ampiezza = np.maximum(posizioni.max(axis=0) - minimo, 1e-9)
+        celle_xy = np.minimum(((posizioni - minimo) / ampiezza * lato_griglia).astype(np.int64), lato_griglia - 1)
+        celle = celle_xy[:, 0] * lato_griglia + celle_xy[:, 1]
+        masse = np.bincount(celle, minlength=lato_griglia * lato_griglia).astype(np.float64)
+        centri = np.stack([np.bincount(celle, weights=posizioni[:, asse], minlength=lato_griglia * lato_griglia)
+                           for asse in (0, 1)], axis=1) / np.maximum(masse, 1)[:, None]
+
+        # Campo lontano: forza tra celle non adiacenti, applicata a tutti i nodi della cella.
+        # Con W[i, j] = massa_j / d²_ij la forza sulla cella i è centro_i * sum_j W[i, j] - (W @ centri)[i]
+        distanze2 = np.maximum((centri[:, None, 0] - centri[None, :, 0]) ** 2 + (centri[:, None, 1] - centri[None, :, 1]) ** 2,
+                               minima_distanza2)
+        intensita = celle_lontane * masse[None, :] / distanze2
+        forza_celle = centri * intensita.sum(axis=1)[:, None] - intensita @ centri
+        spostamenti += forza_celle[celle] * distanza_ideale ** 2
+
+        # Campo vicino: ogni nodo è respinto dai centri di massa della propria cella (senza sé stesso) e delle otto adiacenti
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                vicine_xy = celle_xy + (dx, dy)
+                valide = ((vicine_xy >= 0) & (vicine_xy < lato_griglia)).all(axis=1)
+                vicine = np.where(valide, vicine_xy[:, 0] * lato_griglia + vicine_xy[:, 1], 0)
+                massa = np.where(valide, masse[vicine], 0.0)
+                centro = centri[vicine]
+                if dx == 0 and dy == 0:
+                    massa = massa - 1
+                    centro = (centro * masse[vicine][:, None] - posizioni) / np.maximum(massa, 1)[:, None]
+                differenze = posizioni - centro
+                distanze2 = np.maximum((differenze ** 2).sum(axis=1), minima_distanza2)
+                spostamenti += differenze * (distanza_ideale ** 2 * massa / distanze2)[:, None]
+
+        # Attrazione lungo gli archi: d²/k, pesata
+        differenze = posizioni[sorgenti] - posizioni[destinazioni]
+        distanze = np.sqrt((differenze ** 2).sum(axis=1))
+        forze = (differenze * (distanze * pesi / distanza_ideale)[:, None])
+        for asse in (0, 1):
+            spostamenti[:, asse] -= np.bincount(sorgenti, weights=forze[:, asse], minlength=num_nodi)
+            spostamenti[:, asse] += np.bincount(destinazioni, weights=forze[:, asse], minlength=num_nodi)
+
+        # Leggera gravità verso il centro, così le componenti isolate non si allontanano all'infinito
+        spostamenti += (posizioni.mean(axis=0) - posizioni) * (distanza_ideale * 0.1)
+
+        # Spostamento limitato dalla temperatura, che si raffredda linearmente
+        lunghezze = np.maximum(np.sqrt((spostamenti ** 2).sum(axis=1)), 1e-12)
+        posizioni += spostamenti * (np.minimum(lunghezze, temperatura) / lunghezze)[:, None]
+        temperatura = 0.1 * (1 - (iterazione + 1) / iterazioni) + 1e-4
+
+    minimo = posizioni.min(axis=0)
+    posizioni = (posizioni - minimo) / np.maximum(posizioni.max(axis=0) - minimo, 1e-9)
+    grafo.posizioni = posizioni
+    return posizioni
+
+def _scrivi_gexf(grafo, f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<gexf xmlns="http://gexf.net/1.3" xmlns:viz="http://gexf.net/1.3/viz" version="1.3">\n')
+    f.write('  <graph mode="static" defaultedgetype="undirected">\n')
+    f.write('    <attributes class="node"><attribute id="0" title="frequenza" type="long"/></attributes>\n')
+    f.write('    <nodes>\n')
+    for i, (parola, frequenza) in enumerate(zip(grafo.parole, grafo.frequenze)):
+        posizione = ""
+        if grafo.posizioni is not None:
+            x, y = grafo.posizioni[i]
+            posizione = f'<viz:position x="{x * 1000:.3f}" y="{y * 1000:.3f}" z="0.0"/>'
+        f.write(f'      <node id="{i}" label={quoteattr(parola)}><attvalues><attvalue for="0" value="{frequenza}"/></attvalues>{posizione}</node>\n')
+    f.write('    </nodes>\n    <edges>\n')
+    for k, (sorgente, destinazione, peso) in enumerate(zip(grafo.sorgenti, grafo.destinazioni, grafo.pesi)):
+        f.write(f'      <edge id="{k}" source="{sorgente}" target="{destinazione}" weight="{peso}"/>\n')
+    f.write('    </edges>\n  </graph>\n</gexf>\n')
+
+def _scrivi_graphml(grafo, f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+    f.write('  <key id="label" for="node" attr.name="label" attr.type="string"/>\n')
+    f.write('  <key id="frequenza" for="node" attr.name="frequenza" attr.type="long"/>\n')
+    if grafo.posizioni is not None:
+        f.write('  <key id="x" for="node" attr.name="x" attr.type="double"/>\n')
+        f.write('  <key id="y" for="node" attr.name="y" attr.type="double"/>\n')
+    f.write('  <key id="weight" for="edge" attr.name="weight" attr.type="long"/>\n')
+    f.write('  <graph id="cooccorrenze" edgedefault="undirected">\n')
+    for i, (parola, frequenza) in enumerate(zip(grafo.parole, grafo.frequenze)):
+        posizione = ""
+        if grafo.posizioni is not None:
+            x, y = grafo.posizioni[i]
+            posizione = f'<data key="x">{x:.6f}</data><data key="y">{y:.6f}</data>'
+        f.write(f'    <node id="n{i}"><data key="label">{escape(parola)}</data><data key="frequenza">{frequenza}</data>{posizione}</node>\n')
+    for sorgente, destinazione, peso in zip(grafo.sorgenti, grafo.destinazioni, grafo.pesi):
+        f.write(f'    <edge source="n{sorgente}" target="n{destinazione}"><data key="weight">{peso}</data></edge>\n')
+    f.write('  </graph>\n</graphml>\n')
+
+def _scrivi_lista_archi(grafo, f, separatore):
+    scrittore = csv.writer(f, delimiter=separatore)
+    scrittore.writerow(["sorgente", "destinazione", "peso"])
+    parole = grafo.parole
+    for sorgente, destinazione, peso in zip(grafo.sorgenti, grafo.destinazioni, grafo.pesi):
+        scrittore.writerow([parole[sorgente], parole[destinazione], int(peso)])
+
+def scrivi_grafo(grafo, percorso, formato=None):
+    """Salva il grafo in GEXF, GraphML o come lista di archi (CSV/TSV); il formato si deduce dall'estensione se non indicato."""
+    formato = formato or FORMATI_GRAFO.get(os.path.splitext(percorso)[1].lower())
+    if formato not in FORMATI_GRAFO.values():
+        raise ValueError(f"Formato del grafo non riconosciuto per '{percorso}'. Estensioni ammesse: {', '.join(FORMATI_GRAFO)}")
+    with open(percorso, 'w', encoding='utf-8', newline='') as f:
+        if formato == "gexf":
+            _scrivi_gexf(grafo, f)
+        elif formato == "graphml":
+            _scrivi_graphml(grafo, f)
+        else:
+            _scrivi_lista_archi(grafo, f, "," if formato == "csv" else "\t")
+
+def figura_grafo(grafo, titolo="Rete di Co-occorrenze", etichette_max=60):
+    """
+    Figura matplotlib del grafo con le posizioni calcolate (vedi calcola_layout_grafo): archi con
+    trasparenza proporzionale al peso, nodi di dimensione proporzionale alla frequenza, etichette
+    solo per le 'etichette_max' parole più frequenti.
+    """
+    from matplotlib.collections import LineCollection
+    posizioni = np.asarray(grafo.posizioni)
+    sorgenti = np.asarray(grafo.sorgenti, dtype=np.int64)
+    destinazioni = np.asarray(grafo.destinazioni, dtype=np.int64)
+    pesi = np.log1p(np.asarray(grafo.pesi, dtype=np.float64))
+    frequenze = np.asarray(grafo.frequenze, dtype=np.float64)
+
+    figura = plt.figure(figsize=(12, 12))
+    assi = figura.add_subplot(1, 1, 1)
+    if len(pesi):
+        colori = np.zeros((len(pesi), 4))
+        colori[:, 2] = 0.5
+        colori[:, 3] = 0.05 + 0.5 * pesi / pesi.max()
+        assi.add_collection(LineCollection(np.stack((posizioni[sorgenti], posizioni[destinazioni]), axis=1),
+                                           colors=colori, linewidths=0.5))
+    dimensioni = 2 + 60 * np.sqrt(frequenze / frequenze.max()) if len(frequenze) else []
+    assi.scatter(posizioni[:, 0], posizioni[:, 1], s=dimensioni, c='dodgerblue', edgecolors='none', zorder=2)
+    for i in np.argsort(-frequenze)[:etichette_max]:
+        assi.annotate(grafo.parole[i], posizioni[i], fontsize=8, ha='center', va='bottom', zorder=3)
+    assi.set_title(f"{titolo} ({grafo.num_nodi} nodi, {grafo.num_archi} archi)", fontsize=14)
+    assi.set_axis_off()
+    figura.tight_layout()
+    return figura
+
+def cerca_kwic(modello, query, ampiezza_contesto, limite=None, pigro=False) -> RisultatoKWIC:
+    """
+    Occorrenze di 'query' (parole, frasi, '*' come jolly) con 'ampiezza_contesto' token a sinistra e a destra.
+    Con pigro=True i contesti sono una sequenza pigra: ogni contesto è estratto dal testo solo quando viene letto.
+    """
+    occorrenze_totali, contesti = modello.cerca_kwic(query.strip(), ampiezza_contesto)
+    contesti = SequenzaPigra(_primi(contesti, limite), lambda contesto: OccorrenzaKWIC(*contesto))
+    return RisultatoKWIC(query, occorrenze_totali, contesti if pigro else list(contesti))
+
+def _primi(sequenza, limite):
+    """I primi 'limite' elementi di una sequenza (tutti se None), senza leggerli."""
+    if limite is None or limite >= len(sequenza):
+        return sequenza
+    return SequenzaPigra(range(max(0, limite)), sequenza.__getitem__)
+
+def cerca_concordanza(modello, query, ampiezza_contesto=None, unita="token", limite=None, pigro=False,
+                      avanzamento=None, verifica=None) -> RisultatoKWIC:
+    """
+    Concordanza di una sottostringa qualsiasi (frammenti di parola, espressioni di più parole, punteggiatura),
+    senza distinguere maiuscole e minuscole, con 'ampiezza_contesto' token o caratteri per lato.
+    La prima ricerca costruisce l'indice dei suffissi del corpus, le successive costano O(m log n).
+    Con pigro=True i contesti sono una sequenza pigra, come in cerca_kwic.
+    """
+    if unita not in AMPIEZZA_CONTESTO_CONCORDANZE:
+        raise ValueError(f"Unità del contesto non valida: '{unita}'. Usa una tra {', '.join(AMPIEZZA_CONTESTO_CONCORDANZE)}.")
+    if ampiezza_contesto is None:
+        ampiezza_contesto = AMPIEZZA_CONTESTO_CONCORDANZE[unita]
+    occorrenze_totali, contesti = modello.cerca_sottostringa(query, ampiezza_contesto, unita, avanzamento, verifica)
+    nomi = modello.nomi_file
+
+    def occorrenza(contesto):
+        indice_doc, inizio, sinistra, testo, destra = contesto
+        return OccorrenzaConcordanza(sinistra, testo, destra, nomi[indice_doc] if indice_doc < len(nomi) else f"Doc {indice_doc+1}", inizio)
+    contesti = SequenzaPigra(_primi(contesti, limite), occorrenza)
+    return RisultatoKWIC(query, occorrenze_totali, contesti if pigro else list(contesti))
+
+def andamento_termine(modello, termine, num_segmenti=None, avanzamento=None) -> AndamentoTermine:
+    """
+    Occorrenze di 'termine' documento per documento oppure, con 'num_segmenti', nei segmenti
+    di uguale lunghezza dell'unico documento (al più un segmento per parola; l'ultimo prende il resto).
+    """
+    id_termine = modello.vocabolario.cerca(termine.strip().lower())
+    if num_segmenti is not None:
+        num_segmenti = min(num_segmenti, modello.num_token_documento(0))
+        frequenze = modello.occorrenze_per_segmenti(0, id_termine, num_segmenti) if num_segmenti else []
+        return AndamentoTermine(termine, [f"Seg. {i+1}" for i in range(num_segmenti)], frequenze, True)
+    frequenze = modello.occorrenze_per_documento(id_termine, avanzamento=avanzamento)
+    nomi_file = modello.nomi_file
+    etichette = [nomi_file[i] if nomi_file and i < len(nomi_file) else f"Doc {i+1}" for i in range(len(frequenze))]
+    return AndamentoTermine(termine, etichette, frequenze, False)
+
+def annotazione_pos(modello, lingua, backend=None, avanzamento=None, verifica=None) -> CorpusAnnotatoPOS:
+    """
+    Coppie (token, tag) del backend di annotazione (default: il primo disponibile per la lingua, vedi
+    backend_annotazione), come sequenza pigra sul corpus annotato: vedi annota_pos_corpus per l'annotazione
+    a blocchi e la cache su disco.
+    """
+    return annota_pos_corpus(modello, lingua, backend, avanzamento=avanzamento, verifica=verifica)
+
+def leggi_schema_pos(testo) -> list:
+    """
+    Schema di un filtro POS: una voce per posizione, separate da spazi (es. 'aggettivi nomi', 'NN|NNS * nomi').
+    Ogni voce è una categoria di CATEGORIE_POS, uno o più tag separati da '|', oppure '*' (qualsiasi tag).
+    """
+    schema = testo.replace(',', ' ').split()
+    if not schema:
+        raise ValueError("Schema POS vuoto: indica almeno una categoria (es. 'nomi') o un tag (es. 'NN').")
+    return schema
+
+def _maschera_tag(ids_tag, insieme):
+    """Vettore booleano (NumPy) dei token il cui tag è nell'insieme di id (None = qualsiasi)."""
+    if insieme is None:
+        return np.ones(len(ids_tag), dtype=bool)
+    return np.isin(ids_tag, np.fromiter(insieme, dtype=np.uint16, count=len(insieme)))
+
+def _voci_escluse_pos(voci, stopwords):
+    """Id delle voci mai contate: punteggiatura e simboli (nessun carattere di parola) e stopwords."""
+    return {i for i, voce in enumerate(voci) if not REGEX_PAROLA.search(voce) or (stopwords and voce in stopwords)}
+
+def termini_per_pos(annotato, voce, num_termini, stopwords=None, lemmi=False) -> list:
+    """
+    I 'num_termini' termini (in minuscolo, FrequenzaTermine) più frequenti tra i token con un tag della voce
+    (es. 'nomi', 'JJ|JJR', '*'; vedi CorpusAnnotatoPOS.ids_tag_di), stopwords e punteggiatura escluse.
+    Con 'lemmi' conta i lemmi invece delle forme. A pari frequenza viene prima il termine comparso prima nel corpus.
+    """
+    ids_tag = annotato.ids_tag_di(voce)
+    voci, per_token = annotato.unita(lemmi)
+    esclusi = _voci_escluse_pos(voci, stopwords)
+    if numpy_disponibile and len(annotato):
+        selezionati = np.frombuffer(per_token, dtype=np.uintc)[_maschera_tag(np.frombuffer(annotato.ids_tag, dtype=np.uint16), ids_tag)]
+        conteggi = np.bincount(selezionati, minlength=len(voci))
+        if esclusi:
+            conteggi[list(esclusi)] = 0
+        ordine = np.argsort(-conteggi, kind='stable')[:num_termini]
+        return [FrequenzaTermine(voci[i], int(conteggi[i])) for i in ordine.tolist() if conteggi[i]]
+    conteggi = Counter(id_voce for id_voce, id_tag in zip(per_token, annotato.ids_tag) if ids_tag is None or id_tag in ids_tag)
+    migliori = heapq.nsmallest(num_termini, ((-freq, i) for i, freq in conteggi.items() if i not in esclusi))
+    return [FrequenzaTermine(voci[i], -freq) for freq, i in migliori]
+
+def collocazioni_per_pos(annotato, schema, num_collocazioni, stopwords=None, lemmi=False) -> list:
+    """
+    Gli n-grammi (Collocazione, in minuscolo) più frequenti di token consecutivi nella stessa frase il cui
+    i-esimo token ha un tag della i-esima voce dello schema (es. ['aggettivi', 'nomi']; vedi leggi_schema_pos).
+    Sono scartati gli n-grammi che contengono una stopword o punteggiatura. Con 'lemmi' gli n-grammi sono
+    di lemmi invece che di forme. A pari frequenza, ordine degli id delle voci.
+    """
+    n = len(schema)
+    insiemi = [annotato.ids_tag_di(voce) for voce in schema]
+    voci, per_token = annotato.unita(lemmi)
+    esclusi = _voci_escluse_pos(voci, stopwords)
+    num_candidati = len(annotato) - n + 1
+    if num_candidati <= 0:
+        return []
+    if numpy_disponibile:
+        tag = np.frombuffer(annotato.ids_tag, dtype=np.uint16)
+        token = np.frombuffer(per_token, dtype=np.uintc)
+        ammessi = ~np.isin(token, np.fromiter(esclusi, dtype=np.uintc, count=len(esclusi))) if esclusi else np.ones(len(token), dtype=bool)
+        validi = np.ones(num_candidati, dtype=bool)
+        for k, insieme in enumerate(insiemi):
+            validi &= _maschera_tag(tag[k:k + num_candidati], insieme) & ammessi[k:k + num_candidati]
+        # Primo e ultimo token dell'n-gramma nella stessa frase
+        primi = np.frombuffer(annotato.primo_token_frasi, dtype=np.uintc)
+        frase_token = np.repeat(np.arange(len(primi) - 1), np.diff(primi))
+        validi &= frase_token[:num_candidati] == frase_token[n - 1:]
+        inizi = np.flatnonzero(validi)
+        if not len(inizi):
+            return []
+        ngrammi, conteggi = np.unique(np.stack([token[inizi + k] for k in range(n)], axis=1), axis=0, return_counts=True)
+        ordine = np.argsort(-conteggi, kind='stable')[:num_collocazioni] # np.unique ordina già gli n-grammi per id
+        return [Collocazione(tuple(voci[i] for i in ngrammi[r].tolist()), int(conteggi[r])) for r in ordine.tolist()]
+    ids_tag, primi = annotato.ids_tag, annotato.primo_token_frasi
+    conteggi = Counter()
+    for f in range(annotato.num_frasi):
+        for i in range(primi[f], primi[f + 1] - n + 1):
+            if all((insiemi[k] is None or ids_tag[i + k] in insiemi[k]) and per_token[i + k] not in esclusi for k in range(n)):
+                conteggi[tuple(per_token[i:i + n])] += 1
+    migliori = heapq.nsmallest(num_collocazioni, ((-freq, ngramma) for ngramma, freq in conteggi.items()))
+    return [Collocazione(tuple(voci[i] for i in ngramma), -freq) for freq, ngramma in migliori]
+
+def indice_gulpease(num_frasi, num_parole, num_lettere) -> float:
+    """
+    Indice Gulpease, limitato all'intervallo 0-100 (0 se non ci sono parole).
+    Formula: G = 89 + ( (Frasi * 300) - (Lettere * 10) ) / Parole
+    """
+    if num_parole <= 0:
+        return 0
+    return max(0, min(100, 89 + ((num_frasi * 300) - (num_lettere * 10)) / num_parole))
+
+def interpreta_gulpease(indice, estesa=True) -> str:
+    """Fascia di difficoltà dell'indice Gulpease (estesa: con il livello di istruzione del lettore)."""
+    if indice >= 80: return "Molto facile (lettori con licenza elementare)" if estesa else "Molto facile"
+    if indice >= 60: return "Facile (lettori con licenza media inferiore)" if estesa else "Facile"
+    if indice >= 40: return "Abbastanza difficile (lettori con licenza media superiore)" if estesa else "Abb. difficile"
+    return "Difficile (lettori con laurea)" if estesa else "Difficile"
+
+def analisi_gulpease(modello) -> RisultatoGulpease:
+    """Indice Gulpease globale del corpus (segmentazione italiana, solo parole alfabetiche)."""
+    segmentazione = modello.segmentazione('italian')
+    parole, lettere = segmentazione.conteggi_frasi() # Contate durante la segmentazione: nessuna nuova lettura dei token
+    num_parole = sum(parole)
+    num_frasi = segmentazione.num_frasi if num_parole else 0
+    num_lettere = sum(lettere)
+    indice = indice_gulpease(num_frasi, num_parole, num_lettere) if num_parole and num_frasi else None
+    return RisultatoGulpease(num_lettere, num_parole, num_frasi, indice,
+                             interpreta_gulpease(indice) if indice is not None else None)
+
+def indici_gulpease_frasi(parole, lettere):
+    """
+    Indice Gulpease di ogni frase (una frase, 'parole' parole alfabetiche e 'lettere' lettere) in un solo passo
+    NumPy, con la stessa aritmetica di indice_gulpease: array float64, NaN per le frasi senza parole.
+    """
+    parole = np.asarray(parole, dtype=np.float64)
+    lettere = np.asarray(lettere, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        indici = np.clip(89 + (300 - lettere * 10) / parole, 0, 100)
+    indici[parole == 0] = np.nan
+    return indici
+
+def _indici_gulpease_segmentazione(segmentazione):
+    """(parole, lettere, indici) di ogni frase: con NumPy gli indici sono calcolati tutti insieme, senza, uno per frase."""
+    parole, lettere = segmentazione.conteggi_frasi()
+    if numpy_disponibile:
+        # Gli array('I') sono letti da NumPy senza copia
+        return parole, lettere, indici_gulpease_frasi(np.frombuffer(parole, dtype=np.uintc), np.frombuffer(lettere, dtype=np.uintc))
+    return parole, lettere, [indice_gulpease(1, p, l) if p else None for p, l in zip(parole, lettere)]
+
+def _gulpease_frase(segmentazione, parole, lettere, indici, i):
+    indice = indici[i]
+    indice = None if indice is None or indice != indice else float(indice) # NaN: frase senza parole
+    return GulpeaseFrase(i + 1, segmentazione.testo_frase(i), lettere[i], parole[i], indice,
+                         interpreta_gulpease(indice, estesa=False) if indice is not None else None)
+
+def analisi_gulpease_per_frase(modello, verifica=None) -> Sequence:
+    """
+    Indice Gulpease (GulpeaseFrase) di ogni frase del corpus, con segmentazione italiana.
+    Gli indici sono calcolati tutti insieme; le GulpeaseFrase sono create solo quando lette (sequenza pigra).
+    """
+    segmentazione = modello.segmentazione('italian')
+    if verifica is not None:
+        verifica()
+    parole, lettere, indici = _indici_gulpease_segmentazione(segmentazione)
+    return SequenzaPigra(range(len(parole)), lambda i: _gulpease_frase(segmentazione, parole, lettere, indici, i))
+
+def distribuzione_gulpease(modello, finestra=FINESTRA_MEDIA_MOBILE_GULPEASE, peggiori=10) -> DistribuzioneGulpease:
+    """
+    Distribuzione dell'indice Gulpease delle frasi del corpus: media, percentili, istogramma, frasi per fascia
+    di difficoltà, media mobile su 'finestra' frasi consecutive lungo il testo e le 'peggiori' frasi meno leggibili
+    (selezione parziale, senza ordinare tutte le frasi). Con NumPy ogni passo è vettoriale.
+    """
+    segmentazione = modello.segmentazione('italian')
+    parole, lettere, indici = _indici_gulpease_segmentazione(segmentazione)
+    etichette_fasce = [interpreta_gulpease(soglia, estesa=False) for soglia in (0, 40, 60, 80)]
+    limiti = list(range(0, 100, AMPIEZZA_FASCIA_GULPEASE))
+
+    if numpy_disponibile:
+        posizioni = np.flatnonzero(~np.isnan(indici))
+        validi = indici[posizioni]
+        if not len(validi):
+            return DistribuzioneGulpease(0, None, None, finestra=finestra)
+        percentili = dict(zip(PERCENTILI_GULPEASE, np.percentile(validi, PERCENTILI_GULPEASE).tolist()))
+        conteggi = np.bincount(np.minimum(validi // AMPIEZZA_FASCIA_GULPEASE, len(limiti) - 1).astype(np.intp), minlength=len(limiti))
+        per_fascia = np.bincount(np.searchsorted([40, 60, 80], validi, side='right'), minlength=4)
+        ampiezza = min(finestra, len(validi))
+        cumulata = np.concatenate(([0.0], np.cumsum(validi)))
+        medie = (cumulata[ampiezza:] - cumulata[:-ampiezza]) / ampiezza
+        media_mobile = list(zip((posizioni[ampiezza - 1:] + 1).tolist(), medie.tolist()))
+        k = min(peggiori, len(validi))
+        candidati = np.array([], dtype=np.intp)
+        if k:
+            # Selezione parziale del k-esimo indice più basso; a parità di indice contano le frasi che vengono prima
+            soglia = np.partition(validi, k - 1)[k - 1]
+            minori = np.flatnonzero(validi < soglia)
+            candidati = np.concatenate((minori, np.flatnonzero(validi == soglia)[:k - len(minori)]))
+            candidati = candidati[np.lexsort((candidati, validi[candidati]))]
+        distribuzione = DistribuzioneGulpease(len(validi), float(validi.mean()), float(validi.std()), percentili,
+                                              list(zip(limiti, [d + AMPIEZZA_FASCIA_GULPEASE for d in limiti], conteggi.tolist())),
+                                              dict(zip(etichette_fasce, per_fascia.tolist())), finestra, media_mobile)
+        frasi_peggiori = posizioni[candidati].tolist()
+    else:
+        posizioni = [i for i, indice in enumerate(indici) if indice is not None]
+        validi = [indici[i] for i in posizioni]
+        if not validi:
+            return DistribuzioneGulpease(0, None, None, finestra=finestra)
+        quantili = statistics.quantiles(validi, n=100, method='inclusive') if len(validi) > 1 else [validi[0]] * 99
+        conteggi = [0] * len(limiti)
+        per_fascia = [0] * 4
+        for indice in validi:
+            conteggi[min(int(indice // AMPIEZZA_FASCIA_GULPEASE), len(limiti) - 1)] += 1
+            per_fascia[bisect.bisect_right([40, 60, 80], indice)] += 1
+        ampiezza = min(finestra, len(validi))
+        somma = sum(validi[:ampiezza])
+        media_mobile = [(posizioni[ampiezza - 1] + 1, somma / ampiezza)]
+        for j in range(ampiezza, len(validi)):
+            somma += validi[j] - validi[j - ampiezza]
+            media_mobile.append((posizioni[j] + 1, somma / ampiezza))
+        distribuzione = DistribuzioneGulpease(len(validi), statistics.fmean(validi), statistics.pstdev(validi),
+                                              {p: quantili[p - 1] for p in PERCENTILI_GULPEASE},
+                                              [(da, da + AMPIEZZA_FASCIA_GULPEASE, n) for da, n in zip(limiti, conteggi)],
+                                              dict(zip(etichette_fasce, per_fascia)), finestra, media_mobile)
+        frasi_peggiori = [posizioni[j] for j in heapq.nsmallest(peggiori, range(len(validi)), key=lambda j: (validi[j], j))]
+
+    distribuzione.peggiori = [_gulpease_frase(segmentazione, parole, lettere, indici, i) for i in frasi_peggiori]
+    return distribuzione
+
+# Indici calcolati da analisi_leggibilita: nome, formula e come leggerli
+INDICI_LEGGIBILITA = {
+    "gulpease": ("Gulpease", "89 + (300 frasi - 10 lettere) / parole", "0-100, più alto = più facile (italiano)"),
+    "gulpease_frasi": ("Gulpease medio delle frasi", "media dell'indice Gulpease di ogni frase",
+                       "0-100, più alto = più facile; pesa allo stesso modo frasi brevi e lunghe"),
+    "flesch_vacca": ("Flesch-Vacca", "206 - 65 sillabe / parole - parole / frasi",
+                     "adattamento italiano del Flesch, circa 0-100, più alto = più facile"),
+    "flesch_kincaid": ("Flesch-Kincaid", "0,39 parole / frasi + 11,8 sillabe / parole - 15,59",
+                       "anni di scolarità (scala statunitense), più alto = più difficile"),
+    "gunning_fog": ("Gunning Fog", "0,4 (parole / frasi + 100 polisillabe / parole)",
+                    "anni di scolarità, più alto = più difficile"),
+    "smog": ("SMOG", "1,043 radice(polisillabe x 30 / frasi) + 3,1291",
+             "anni di scolarità, più alto = più difficile; attendibile da 30 frasi in su"),
+    "lix": ("LIX", "parole / frasi + 100 parole lunghe / parole",
+            "< 30 molto facile, 30-40 facile, 40-50 medio, 50-60 difficile, > 60 molto difficile"),
+}
+
+def calcola_indici_leggibilita(frasi, parole, lettere, sillabe, polisillabe, parole_lunghe) -> dict:
+    """
+    Tutti gli indici di INDICI_LEGGIBILITA (tranne la media per frase) dagli stessi conteggi di base;
+    None se mancano frasi o parole. Polisillabe: parole di almeno 3 sillabe; parole lunghe: più di 6 lettere.
+    """
+    if not frasi or not parole:
+        return dict.fromkeys(("gulpease", "flesch_vacca", "flesch_kincaid", "gunning_fog", "smog", "lix"))
+    parole_per_frase = parole / frasi
+    sillabe_per_parola = sillabe / parole
+    return {
+        "gulpease": indice_gulpease(frasi, parole, lettere),
+        "flesch_vacca": 206 - 65 * sillabe_per_parola - parole_per_frase,
+        "flesch_kincaid": 0.39 * parole_per_frase + 11.8 * sillabe_per_parola - 15.59,
+        "gunning_fog": 0.4 * (parole_per_frase + 100 * polisillabe / parole),
+        "smog": 1.043 * math.sqrt(polisillabe * 30 / frasi) + 3.1291,
+        "lix": parole_per_frase + 100 * parole_lunghe / parole,
+    }
+
+def _media_gulpease_frasi(parole, lettere):
+    """Media degli indici Gulpease delle frasi con almeno una parola (None se non ce ne sono)."""
+    if numpy_disponibile:
+        indici = indici_gulpease_frasi(np.frombuffer(parole, dtype=np.uintc), np.frombuffer(lettere, dtype=np.uintc))
+        validi = indici[~np.isnan(indici)]
+        return float(validi.mean()) if len(validi) else None
+    indici = [indice_gulpease(1, p, l) for p, l in zip(parole, lettere) if p]
+    return statistics.fmean(indici) if indici else None
+
+def analisi_leggibilita(modello, per_documento=False) -> list:
+    """
+    Indici di leggibilità (IndiciLeggibilita) dell'intero corpus e, con 'per_documento', di ogni documento.
+    Tutti gli indici vengono dagli stessi conteggi per frase (CONTEGGI_FRASE), raccolti una volta sola
+    durante la segmentazione italiana: aggiungere un indice non costa un'altra lettura del testo.
+    """
+    segmentazione = modello.segmentazione('italian')
+    nomi = modello.nomi_file
+
+    def indici(documento, documenti_segmentati):
+        conteggi = {conteggio: array('I', itertools.chain.from_iterable(getattr(s, conteggio) for s in documenti_segmentati))
+                    for conteggio in CONTEGGI_FRASE}
+        frasi = sum(len(s.inizi_frasi) for s in documenti_segmentati)
+        totali = {conteggio: sum(valori) for conteggio, valori in conteggi.items()}
+        return IndiciLeggibilita(documento, frasi, **totali, gulpease_frasi=_media_gulpease_frasi(conteggi['parole'], conteggi['lettere']),
+                                 **calcola_indici_leggibilita(frasi, **totali))
+
+    risultati = [indici("Corpus", segmentazione.documenti_segmentati)]
+    if per_documento:
+        risultati += [indici(nomi[i] if i < len(nomi) else f"Doc {i+1}", [documento_segmentato])
+                      for i, documento_segmentato in enumerate(segmentazione.documenti_segmentati)]
+    return risultati
+
+def analisi_griceana(modello, lingua, verifica=None) -> RisultatoGriceano:
+    """
+    Indicatori superficiali di possibili violazioni delle massime di Grice (Quantità, Modo, Qualità).
+    Le soglie sulla lunghezza delle frasi sono relative alla media del testo analizzato.
+    """
+    segmentazione = modello.segmentazione(lingua)
+    frasi = segmentazione.frasi()
+    if not frasi:
+        return RisultatoGriceano(0, 0, None)
+
+    risultato = RisultatoGriceano(len(frasi), segmentazione.num_token, None)
+
+    # Quantità e Modo: lunghezza delle frasi in parole alfabetiche, già contate durante la segmentazione
+    lunghezze = segmentazione.conteggi_frasi()[0]
+    if lunghezze and sum(lunghezze) > 0:
+        media = sum(lunghezze) / len(lunghezze)
+        risultato.lunghezza_media = media
+        soglia_lunga = media * 1.5
+        soglia_breve = media * 0.5
+        for i, lunghezza in enumerate(lunghezze):
+            if verifica is not None and i % 5000 == 0:
+                verifica()
+            if lunghezza > soglia_lunga and lunghezza > 15: # Soglia minima per evitare frasi corte "lunghe" rispetto alla media bassa
+                tipo = "lunga"
+            elif lunghezza < soglia_breve and 0 < lunghezza < 4:
+                tipo = "breve"
+            elif lunghezza == 0 and frasi[i].strip(): # Solo punteggiatura o simboli
+                tipo = "solo_punteggiatura"
+            else:
+                continue
+            risultato.problemi_quantita_modo.append(ProblemaFrase(i + 1, lunghezza, tipo, frasi[i]))
+
+    # Ripetizioni consecutive della stessa parola (indicatore grezzo di Modo/Quantità)
+    ripetizioni, token_minuscoli, precedente = set(), set(), None
+    for indice_doc in range(len(segmentazione.documenti_segmentati)):
+        if verifica is not None:
+            verifica()
+        for token in segmentazione.token_documento(indice_doc):
+            token = token.lower()
+            token_minuscoli.add(token)
+            if token.isalpha():
+                if token == precedente:
+                    ripetizioni.add(token)
+                precedente = token
+    risultato.ripetizioni = sorted(ripetizioni)
+
+    # Qualità: termini di incertezza/hedging
+    risultato.indicatori_hedging = sorted(termine for termine in HEDGING_TERMS if termine in token_minuscoli)
+    return risultato
+
+def leggi_dimensioni_tensore(testo):
+    """
+    Legge le dimensioni di un Tensore Narrativo, una per riga nel formato 'NomeDimensione: Elemento1, Elemento2...'
+    (righe vuote e commenti '#' ignorati). Un elemento può indicare sinonimi con '|' (es. 'Eroe|Ivan|Principe'):
+    nel corpus conta ciascuna delle sue parole. Restituisce {dimensione: [elementi]}; ValueError se ci sono errori.
+    """
+    dimensioni, errori = {}, []
+    for riga in testo.split('\n'):
+        riga = riga.strip()
+        if not riga or riga.startswith('#'):
+            continue
+        if ':' not in riga:
+            errori.append(f"Formato riga non valido: '{riga}' (deve contenere ':')")
+            continue
+        nome, elementi = riga.split(':', 1)
+        nome = nome.strip()
+        elementi = [elemento.strip() for elemento in elementi.split(',') if elemento.strip()]
+        if nome and elementi:
+            dimensioni[nome] = elementi
+        else:
+            errori.append(f"Formato riga non valido: '{riga}' (deve essere NomeDimensione: Elemento1, Elemento2...)")
+    if errori:
+        raise ValueError("Errori nel formato delle dimensioni/elementi:\n" + "\n".join(errori))
+    return dimensioni
+
+def _coppie_con_chiave_uguale(chiavi_a, chiavi_b):
+    """Indici (i, j) di tutte le coppie con chiavi_a[i] == chiavi_b[j] (join per ordinamento, senza cicli Python)."""
+    ordine_b = np.argsort(chiavi_b, kind='stable')
+    ordinate_b = chiavi_b[ordine_b]
+    sinistra = np.searchsorted(ordinate_b, chiavi_a, 'left')
+    ripetizioni = np.searchsorted(ordinate_b, chiavi_a, 'right') - sinistra
+    indici_a = np.repeat(np.arange(len(chiavi_a)), ripetizioni)
+    # Per ogni elemento di a, le posizioni consecutive delle sue corrispondenze in b ordinato
+    scarti = np.arange(len(indici_a)) - np.repeat(np.cumsum(ripetizioni) - ripetizioni, ripetizioni)
+    return indici_a, ordine_b[np.repeat(sinistra, ripetizioni) + scarti]
+
+class TensoreNarrativo:
+    """
+    Tensore Narrativo sparso a N dimensioni in formato COO: 'coordinate' (nnz x N, interi) e 'valori' (nnz)
+    descrivono le sole celle non nulle, 'etichette' gli elementi di ogni dimensione. Sezioni, marginalizzazioni
+    e contrazioni sono operazioni vettorizzate NumPy sulle celle non nulle e restituiscono nuovi tensori:
+    il costo dipende da quante celle sono piene, non dal prodotto delle dimensioni.
+    """
+    def __init__(self, dimensioni, etichette, coordinate, valori):
+        self.dimensioni = list(dimensioni)
+        self.etichette = [list(e) for e in etichette]
+        self.coordinate = np.asarray(coordinate, dtype=np.int64).reshape(-1, len(self.dimensioni))
+        self.valori = np.asarray(valori)
+        self._compatta()
+
+    @property
+    def forma(self):
+        return tuple(len(etichette) for etichette in self.etichette)
+
+    @property
+    def nnz(self):
+        return len(self.valori)
+
+    def totale(self):
+        return self.valori.sum().item() if self.nnz else 0
+
+    def _compatta(self):
+        """Somma le celle con le stesse coordinate, toglie gli zeri e ordina le celle per coordinate."""
+        if not self.nnz:
+            return
+        if self.dimensioni and math.prod(self.forma) < 2**62:
+            lineari = np.ravel_multi_index(self.coordinate.T, self.forma)
+            uniche, inverso = np.unique(lineari, return_inverse=True)
+            coordinate = np.stack(np.unravel_index(uniche, self.forma), axis=1).reshape(-1, len(self.dimensioni))
+        else: # Troppe celle possibili per un indice lineare a 64 bit
+            coordinate, inverso = np.unique(self.coordinate, axis=0, return_inverse=True)
+        valori = np.zeros(len(coordinate), dtype=self.valori.dtype)
+        np.add.at(valori, inverso.reshape(-1), self.valori)
+        non_nulli = valori != 0
+        self.coordinate, self.valori = coordinate[non_nulli].astype(np.int64), valori[non_nulli]
+
+    def asse(self, dimensione):
+        """Posizione di una dimensione, dal nome o dall'indice."""
+        if isinstance(dimensione, int):
+            return dimensione
+        try:
+            return self.dimensioni.index(dimensione)
+        except ValueError:
+            raise ValueError(f"Dimensione sconosciuta: '{dimensione}' (disponibili: {', '.join(self.dimensioni)})") from None
+
+    def _indici_elementi(self, asse, elementi):
+        posizioni = {etichetta: i for i, etichetta in enumerate(self.etichette[asse])}
+        try:
+            return [elemento if isinstance(elemento, int) else posizioni[elemento] for elemento in elementi]
+        except KeyError as e:
+            raise ValueError(f"Elemento {e} non presente nella dimensione '{self.dimensioni[asse]}'") from None
+
+    def seleziona(self, dimensione, elementi):
+        """Sezione: tiene solo gli elementi indicati (etichette o indici) di una dimensione, nell'ordine dato."""
+        asse = self.asse(dimensione)
+        indici = np.asarray(self._indici_elementi(asse, elementi), dtype=np.int64)
+        nuovo_indice = np.full(self.forma[asse], -1, dtype=np.int64)
+        nuovo_indice[indici] = np.arange(len(indici))
+        rinumerati = nuovo_indice[self.coordinate[:, asse]]
+        tenute = rinumerati >= 0
+        coordinate = self.coordinate[tenute].copy()
+        coordinate[:, asse] = rinumerati[tenute]
+        etichette = list(self.etichette)
+        etichette[asse] = [self.etichette[asse][i] for i in indici.tolist()]
+        return TensoreNarrativo(self.dimensioni, etichette, coordinate, self.valori[tenute])
+
+    def fissa(self, dimensione, elemento):
+        """Sezione a un solo elemento: la dimensione scompare (es. il sotto-tensore di un personaggio)."""
+        asse = self.asse(dimensione)
+        return self.seleziona(asse, [elemento]).marginalizza(asse)
+
+    def marginalizza(self, *dimensioni):
+        """Somma lungo le dimensioni indicate, che scompaiono dal risultato."""
+        assi = {self.asse(dimensione) for dimensione in dimensioni}
+        restanti = [i for i in range(len(self.dimensioni)) if i not in assi]
+        return TensoreNarrativo([self.dimensioni[i] for i in restanti], [self.etichette[i] for i in restanti],
+                                self.coordinate[:, restanti], self.valori)
+
+    def mantieni(self, *dimensioni):
+        """Marginale sulle sole dimensioni indicate (tutte le altre vengono sommate), nell'ordine dato."""
+        assi = [self.asse(dimensione) for dimensione in dimensioni]
+        return TensoreNarrativo([self.dimensioni[i] for i in assi], [self.etichette[i] for i in assi],
+                                self.coordinate[:, assi], self.valori)
+
+    def pesa(self, dimensione, pesi):
+        """Contrazione con un vettore di pesi (uno per elemento della dimensione), che scompare dal risultato."""
+        asse = self.asse(dimensione)
+        pesi = np.asarray(pesi)
+        if len(pesi) != self.forma[asse]:
+            raise ValueError(f"Servono {self.forma[asse]} pesi per la dimensione '{self.dimensioni[asse]}'")
+        restanti = [i for i in range(len(self.dimensioni)) if i != asse]
+        return TensoreNarrativo([self.dimensioni[i] for i in restanti], [self.etichette[i] for i in restanti],
+                                self.coordinate[:, restanti], self.valori * pesi[self.coordinate[:, asse]])
+
+    def contrai(self, altro, dimensione, dimensione_altro=None):
+        """
+        Contrazione tensoriale: somma dei prodotti lungo una dimensione comune (stessi elementi, es. i segmenti).
+        Il risultato ha le altre dimensioni di questo tensore seguite da quelle dell'altro.
+        """
+        asse = self.asse(dimensione)
+        asse_altro = altro.asse(dimensione if dimensione_altro is None else dimensione_altro)
+        if self.etichette[asse] != altro.etichette[asse_altro]:
+            raise ValueError("Le dimensioni da contrarre devono avere gli stessi elementi nello stesso ordine.")
+        indici, indici_altro = _coppie_con_chiave_uguale(self.coordinate[:, asse], altro.coordinate[:, asse_altro])
+        restanti = [i for i in range(len(self.dimensioni)) if i != asse]
+        restanti_altro = [i for i in range(len(altro.dimensioni)) if i != asse_altro]
+        dimensioni = [self.dimensioni[i] for i in restanti]
+        # Nomi ripetuti (es. contrazione di un tensore con se stesso) distinti con un apice
+        dimensioni += [nome + "'" * (nome in dimensioni) for nome in (altro.dimensioni[i] for i in restanti_altro)]
+        coordinate = np.concatenate((self.coordinate[indici][:, restanti], altro.coordinate[indici_altro][:, restanti_altro]), axis=1)
+        return TensoreNarrativo(dimensioni, [self.etichette[i] for i in restanti] + [altro.etichette[i] for i in restanti_altro],
+                                coordinate, self.valori[indici] * altro.valori[indici_altro])
+
+    def valore(self, *elementi):
+        """Valore di una cella, dalle etichette (o dagli indici) dei suoi elementi."""
+        posizione = [self._indici_elementi(asse, [elemento])[0] for asse, elemento in enumerate(elementi)]
+        trovate = np.flatnonzero((self.coordinate == posizione).all(axis=1))
+        return self.valori[trovate[0]].item() if len(trovate) else 0
+
+    def denso(self, max_celle=10_000_000):
+        """Il tensore come ndarray denso (solo se ha al più 'max_celle' celle)."""
+        if math.prod(self.forma) > max_celle:
+            raise ValueError(f"Tensore troppo grande per la forma densa: {' x '.join(map(str, self.forma))} celle")
+        denso = np.zeros(self.forma, dtype=self.valori.dtype)
+        denso[tuple(self.coordinate.T)] = self.valori
+        return denso
+
+    def celle(self, ordina=True):
+        """Sequenza pigra delle celle non nulle (etichette, valore), dalla più grande se 'ordina'."""
+        ordine = np.argsort(-self.valori, kind='stable') if ordina else np.arange(self.nnz)
+        return SequenzaPigra(ordine, lambda i: (tuple(self.etichette[asse][k] for asse, k in enumerate(self.coordinate[i].tolist())),
+                                                self.valori[i].item()))
+
+
+def costruisci_tensore_narrativo(modello, dimensioni, lunghezza_segmento=None, presenza=False, avanzamento=None, verifica=None):
+    """
+    Riempie un TensoreNarrativo {dimensione: [elementi]} x Segmenti dalle co-occorrenze nel corpus: un segmento
+    è un documento oppure, con 'lunghezza_segmento', un tratto di quel numero di parole. La cella
+    (e1, ..., eN, s) vale il prodotto delle occorrenze di ciascun elemento nel segmento s (il numero di
+    combinazioni di menzioni che co-occorrono), oppure 1 con 'presenza'. Occorrenze e combinazioni sono
+    calcolate con NumPy sugli id dei token, un blocco alla volta.
+    """
+    if not numpy_disponibile:
+        raise RuntimeError("Il Tensore Narrativo richiede NumPy. Installalo con: pip install numpy")
+    if not dimensioni:
+        raise ValueError("Definisci almeno una dimensione del Tensore Narrativo.")
+    nomi = list(dimensioni)
+    elementi = [list(dimensioni[nome]) for nome in nomi]
+    # Parole (minuscole) di ogni elemento: il nome e gli eventuali sinonimi separati da '|'
+    forme = [[(i, alias) for i, elemento in enumerate(elementi_dim) for alias in
+              {parola for parte in elemento.lower().split('|') for parola in REGEX_PAROLA.findall(parte)}]
+             for elementi_dim in elementi]
+    # Ogni parola identifica un solo elemento della sua dimensione: con la ricerca ordinata per id
+    # una parola ripetuta verrebbe contata per uno solo degli elementi che la elencano
+    for nome, elementi_dim, forme_dim in zip(nomi, elementi, forme):
+        elementi_alias = defaultdict(list)
+        for i, alias in forme_dim:
+            elementi_alias[alias].append(elementi_dim[i])
+        ripetuti = sorted((alias, elementi_alias[alias]) for alias in elementi_alias if len(elementi_alias[alias]) > 1)
+        if ripetuti:
+            raise ValueError(f"Nella dimensione '{nome}' alcune parole sono elencate per più elementi: " +
+                             "; ".join(f"'{alias}' in {', '.join(repr(e) for e in elementi_ripetuti)}" for alias, elementi_ripetuti in ripetuti) +
+                             ". Ogni parola deve indicare un solo elemento della dimensione.")
+
+    def risolvi():
+        """Per ogni dimensione, id (ordinati) delle parole già nel vocabolario e l'elemento di ciascuno."""
+        risolte = []
+        for forme_dim in forme:
+            coppie = sorted((modello.vocabolario.cerca(forma), i) for i, forma in forme_dim
+                            if modello.vocabolario.cerca(forma) is not None)
+            risolte.append((np.array([c[0] for c in coppie], dtype=np.int64), np.array([c[1] for c in coppie], dtype=np.int64)))
+        return risolte
+
+    eventi = [([], []) for _ in nomi] # Per dimensione: blocchi di (segmento, elemento) delle occorrenze
+    etichette_segmenti = []
+    num_documenti = len(modello.documenti)
+    risolte, dimensione_vocabolario = risolvi(), len(modello.vocabolario)
+    for indice_doc in range(num_documenti):
+        if verifica:
+            verifica()
+        if avanzamento:
+            avanzamento(indice_doc / num_documenti, f"Documento {indice_doc+1}/{num_documenti}...")
+        primo_segmento, inizio_blocco = len(etichette_segmenti), 0
+        for ids in modello.blocchi_documento(indice_doc):
+            if len(modello.vocabolario) != dimensione_vocabolario: # Corpus in streaming: nuove forme in questo blocco
+                risolte, dimensione_vocabolario = risolvi(), len(modello.vocabolario)
+            if len(ids):
+                token = np.frombuffer(ids, dtype=np.uintc).astype(np.int64)
+                for (ids_elementi, elementi_id), (segmenti_dim, elementi_dim) in zip(risolte, eventi):
+                    if not len(ids_elementi):
+                        continue
+                    posizioni = np.minimum(np.searchsorted(ids_elementi, token), len(ids_elementi) - 1)
+                    trovate = np.flatnonzero(ids_elementi[posizioni] == token)
+                    segmenti = (primo_segmento + (trovate + inizio_blocco) // lunghezza_segmento if lunghezza_segmento
+                                else np.full(len(trovate), primo_segmento, dtype=np.int64))
+                    segmenti_dim.append(segmenti)
+                    elementi_dim.append(elementi_id[posizioni[trovate]])
+            inizio_blocco += len(ids)
+        nome_doc = modello.nomi_file[indice_doc] if indice_doc < len(modello.nomi_file) else f"Doc {indice_doc+1}"
+        nome_doc = os.path.basename(nome_doc)
+        if lunghezza_segmento:
+            num_segmenti = max(1, -(-inizio_blocco // lunghezza_segmento))
+            etichette_segmenti += [f"{nome_doc} [{k+1}]" for k in range(num_segmenti)]
+        else:
+            etichette_segmenti.append(nome_doc)
+
+    # Occorrenze per (segmento, elemento) in ogni dimensione, poi unione sui segmenti dimensione per dimensione
+    celle_segmenti = np.arange(len(etichette_segmenti), dtype=np.int64)
+    celle_coordinate = np.zeros((len(etichette_segmenti), 0), dtype=np.int64)
+    celle_valori = np.ones(len(etichette_segmenti), dtype=np.int64)
+    for (segmenti_dim, elementi_dim), elementi_dimensione in zip(eventi, elementi):
+        segmenti = np.concatenate(segmenti_dim) if segmenti_dim else np.zeros(0, dtype=np.int64)
+        codici = segmenti * len(elementi_dimensione) + (np.concatenate(elementi_dim) if elementi_dim else segmenti)
+        codici, conteggi = np.unique(codici, return_counts=True)
+        segmenti, elementi_trovati = np.divmod(codici, len(elementi_dimensione))
+        indici, indici_dim = _coppie_con_chiave_uguale(celle_segmenti, segmenti)
+        celle_segmenti = celle_segmenti[indici]
+        celle_coordinate = np.concatenate((celle_coordinate[indici], elementi_trovati[indici_dim, None]), axis=1)
+        celle_valori = celle_valori[indici] * (1 if presenza else conteggi[indici_dim])
+    if avanzamento:
+        avanzamento(1.0, f"Celle non nulle: {len(celle_valori):,}")
+    return TensoreNarrativo(nomi + ["Segmenti"], elementi + [etichette_segmenti],
+                            np.concatenate((celle_coordinate, celle_segmenti[:, None]), axis=1), celle_valori)
+
+
+def _valida_codici_propp(codici, funzioni_di_riferimento, descrizione=""):
+    """Normalizza i codici in maiuscolo e verifica che esistano nel set di funzioni di riferimento."""
+    codici = [codice.upper() for codice in codici]
+    invalid_codes = [codice for codice in codici if codice not in funzioni_di_riferimento]
+    if invalid_codes:
+        raise ValueError(f"Uno o più codici funzione{descrizione} non sono validi nel set di riferimento: {', '.join(invalid_codes)}")
+    return codici
+
+class SequenzaProppPerRango(Sequence):
+    """
+    Base dei generatori di Propp ad accesso per rango: le sottoclassi definiscono 'codici', 'numero'
+    (il totale, anche oltre sys.maxsize dove len() non funziona), codici_di, rango_di, descrizione e
+    righe(inizio, numero), che genera coppie (rango, codici) senza tenere in memoria i risultati.
+    """
+    ELEMENTO, ELEMENTI = "trama", "trame" # Per colonne CSV e messaggi
+
+    def __len__(self):
+        return self.numero
+
+    def _verifica_rango(self, rango):
+        if rango < 0:
+            rango += self.numero
+        if not 0 <= rango < self.numero:
+            raise IndexError(f"Rango fuori intervallo: {rango}")
+        return rango
+
+    def __getitem__(self, rango):
+        if isinstance(rango, slice):
+            return [self[i] for i in range(*rango.indices(self.numero))]
+        return self.descrizione(self.codici_di(rango))
+
+    def __contains__(self, elemento):
+        try:
+            self.index(elemento)
+        except ValueError:
+            return False
+        return True
+
+    def campione(self, numero, seme=None):
+        """Ranghi distinti di 'numero' elementi scelti a caso (uniformemente), in ordine crescente."""
+        generatore = random.Random(seme)
+        numero = min(numero, self.numero)
+        if self.numero <= sys.maxsize:
+            return sorted(generatore.sample(range(self.numero), numero))
+        scelti = set()
+        while len(scelti) < numero: # Oltre sys.maxsize 'numero' è sempre una frazione minima del totale
+            scelti.add(generatore.randrange(self.numero))
+        return sorted(scelti)
+
+
+class PermutazioniPropp(SequenzaProppPerRango):
+    """
+    Tutte le trame (permutazioni) di un insieme di codici di Propp, senza generarle in anticipo.
+    L'iterazione le produce una alla volta in ordine lessicografico rispetto all'ordine dei codici dati;
+    l'indicizzazione calcola direttamente la trama di rango r (unranking con il sistema numerico
+    fattoriale, O(n²)), e rango_di fa il contrario. Così anche 15 funzioni (oltre un bilione di trame)
+    si possono scorrere, campionare o scrivere su disco a tratti senza occupare memoria.
+    Ogni elemento è la trama come descrizioni unite da ' -> '.
+    """
+    def __init__(self, codici, funzioni=None):
+        self.funzioni = funzioni if funzioni is not None else FUNZIONI_PROPP
+        self.codici = tuple(_valida_codici_propp(codici, self.funzioni)) # Errori subito, non alla prima iterazione
+        self.numero = math.factorial(len(self.codici)) # Come len(), ma anche oltre sys.maxsize (più di 20 codici)
+
+    def descrizione(self, codici):
+        """Trama di una sequenza di codici."""
+        return " -> ".join(self.funzioni[codice] for codice in codici)
+
+    def _posizioni_di(self, rango):
+        """Posizioni (nei codici dati) della permutazione di rango 'rango': le cifre fattoriali scelgono tra le rimanenti."""
+        rimanenti = list(range(len(self.codici)))
+        posizioni = []
+        for restanti in range(len(self.codici) - 1, -1, -1):
+            cifra, rango = divmod(rango, math.factorial(restanti))
+            posizioni.append(rimanenti.pop(cifra))
+        return posizioni
+
+    def codici_di(self, rango):
+        """Codici della trama di rango 'rango' (0 = i codici nell'ordine dato)."""
+        return tuple(self.codici[posizione] for posizione in self._posizioni_di(self._verifica_rango(rango)))
+
+    def rango_di(self, codici):
+        """Rango di una sequenza di codici (ValueError se non è una permutazione dei codici dati)."""
+        codici = [codice.upper() for codice in codici]
+        rimanenti = list(self.codici)
+        if len(codici) != len(rimanenti):
+            raise ValueError("La sequenza deve contenere tutti e soli i codici della permutazione.")
+        rango = 0
+        for restanti, codice in zip(range(len(codici) - 1, -1, -1), codici):
+            try:
+                cifra = rimanenti.index(codice)
+            except ValueError:
+                raise ValueError(f"Il codice '{codice}' non fa parte (o è ripetuto più volte) della permutazione.") from None
+            rango += cifra * math.factorial(restanti)
+            del rimanenti[cifra]
+        return rango
+
+    def __iter__(self):
+        return (self.descrizione(permutazione) for permutazione in itertools.permutations(self.codici))
+
+    def index(self, trama, *argomenti):
+        """Rango di una trama (descrizioni unite da ' -> '), senza scorrere le permutazioni."""
+        codici_per_descrizione = {self.funzioni[codice]: codice for codice in self.codici}
+        try:
+            codici = [codici_per_descrizione[descrizione] for descrizione in str(trama).split(" -> ")]
+        except KeyError:
+            raise ValueError(f"{trama!r} non è una trama di questa permutazione") from None
+        return self.rango_di(codici)
+
+    def righe(self, inizio=0, numero=None):
+        """
+        Genera (rango, codici) dal rango 'inizio' in poi, al più 'numero' righe: si calcola la prima
+        permutazione e poi la successiva in ordine lessicografico, in O(n) ammortizzato per riga.
+        """
+        if self.numero == 0 or inizio >= self.numero:
+            return
+        posizioni = self._posizioni_di(self._verifica_rango(inizio))
+        rango = inizio % self.numero
+        fine = self.numero if numero is None else min(self.numero, rango + numero)
+        while rango < fine:
+            yield rango, tuple(self.codici[posizione] for posizione in posizioni)
+            rango += 1
+            # Permutazione successiva: il suffisso decrescente più lungo si inverte dopo lo scambio col perno
+            perno = len(posizioni) - 2
+            while perno >= 0 and posizioni[perno] > posizioni[perno + 1]:
+                perno -= 1
+            if perno < 0:
+                return
+            scambio = len(posizioni) - 1
+            while posizioni[scambio] < posizioni[perno]:
+                scambio -= 1
+            posizioni[perno], posizioni[scambio] = posizioni[scambio], posizioni[perno]
+            posizioni[perno + 1:] = reversed(posizioni[perno + 1:])
+
+
+
+class TrameProppVincolate(PermutazioniPropp):
+    """
+    Le sole trame (permutazioni) che rispettano vincoli di precedenza ('A' prima di 'B') e di adiacenza
+    ('B' subito dopo 'A'). Le funzioni legate da adiacenze diventano un unico blocco; le trame sono costruite
+    con backtracking, provando a ogni passo solo i blocchi i cui predecessori obbligati sono già in trama,
+    così i prefissi impossibili non vengono mai estesi (al posto di n! permutazioni filtrate dopo).
+    Il numero delle trame si conta per ricorsione memoizzata sulle funzioni ancora da collocare, separando
+    i gruppi di funzioni che non hanno vincoli tra loro (si combinano con un coefficiente binomiale): ne segue
+    anche l'accesso diretto alla trama di rango r, con la stessa interfaccia di PermutazioniPropp.
+    """
+    def __init__(self, codici, precedenze=PRECEDENZE_PROPP, adiacenze=ADIACENZE_PROPP, funzioni=None):
+        self.funzioni = funzioni if funzioni is not None else FUNZIONI_PROPP
+        self.codici = tuple(_valida_codici_propp(codici, self.funzioni))
+        if len(set(self.codici)) != len(self.codici):
+            raise ValueError("Ogni funzione può comparire una sola volta nella trama.")
+        noti = {**FUNZIONI_PROPP, **self.funzioni} # Le regole predefinite valgono anche con funzioni personalizzate
+        self.precedenze = [tuple(_valida_codici_propp(coppia, noti, " nei vincoli")) for coppia in precedenze]
+        self.adiacenze = [tuple(_valida_codici_propp(coppia, noti, " nei vincoli")) for coppia in adiacenze]
+        indici = {codice: i for i, codice in enumerate(self.codici)}
+        self._impossibile = False
+
+        # Precedenze transitive tra le funzioni della trama (l'adiacenza implica la precedenza)
+        successori = defaultdict(set)
+        for prima, dopo in itertools.chain(self.precedenze, self.adiacenze):
+            successori[prima].add(dopo)
+        prima_di = [0] * len(self.codici) # Per ogni funzione, maschera delle funzioni che devono precederla
+        for codice in list(successori): # Anche le funzioni assenti: un ciclo rende comunque i vincoli contraddittori
+            visitati, da_visitare = set(), list(successori[codice])
+            while da_visitare:
+                dopo = da_visitare.pop()
+                if dopo == codice:
+                    raise ValueError(f"Vincoli contraddittori: {codice} dovrebbe precedere se stessa.")
+                if dopo not in visitati:
+                    visitati.add(dopo)
+                    da_visitare.extend(successori[dopo])
+                    if codice in indici and dopo in indici:
+                        prima_di[indici[dopo]] |= 1 << indici[codice]
+
+        # Blocchi: catene di adiacenze tra funzioni della trama, collocate sempre insieme
+        segue, precede = {}, {}
+        for prima, dopo in self.adiacenze:
+            if prima in indici and dopo in indici:
+                i, j = indici[prima], indici[dopo]
+                if segue.get(i, j) != j or precede.get(j, i) != i:
+                    self._impossibile = True # Due funzioni diverse dovrebbero seguire (o precedere) subito la stessa
+                segue[i], precede[j] = j, i
+        self._blocchi = []
+        for i in range(len(self.codici)):
+            if i not in precede:
+                blocco = [i]
+                while blocco[-1] in segue:
+                    blocco.append(segue[blocco[-1]])
+                self._blocchi.append(tuple(blocco))
+        blocco_di = {i: b for b, blocco in enumerate(self._blocchi) for i in blocco}
+        self._prima = [0] * len(self._blocchi) # Per ogni blocco, maschera dei blocchi che devono precederlo
+        for b, blocco in enumerate(self._blocchi):
+            for posizione, i in enumerate(blocco):
+                for k in range(len(self.codici)):
+                    if prima_di[i] >> k & 1:
+                        if blocco_di[k] == b and blocco.index(k) > posizione:
+                            self._impossibile = True
+                        elif blocco_di[k] != b:
+                            self._prima[b] |= 1 << blocco_di[k]
+        # Due blocchi che si precedono a vicenda (es. A<<B con A<C<B): nessuna trama possibile
+        for b in range(len(self._blocchi)):
+            if any(self._prima[c] >> b & 1 for c in range(len(self._blocchi)) if self._prima[b] >> c & 1):
+                self._impossibile = True
+        # Blocchi legati da un vincolo in un senso o nell'altro: servono per separare i gruppi indipendenti
+        self._legati = [self._prima[b] | sum(1 << c for c in range(len(self._blocchi)) if self._prima[c] >> b & 1)
+                        for b in range(len(self._blocchi))]
+        self._estensioni_memo = {}
+        self._verifica_conteggio = None
+        self._numero = None
+
+    @property
+    def numero(self):
+        if self._numero is None:
+            self._numero = self.conta()
+        return self._numero
+
+    def conta(self, verifica=None):
+        """Numero di trame che rispettano i vincoli (memoizzato; 'verifica' permette di annullare il calcolo)."""
+        if self._numero is None:
+            self._verifica_conteggio = verifica
+            self._numero = self._completamenti(0)
+        return self._numero
+
+    def _candidati(self, maschera, da=0):
+        """Blocchi collocabili quando quelli in 'maschera' sono già in trama (dal blocco 'da' in poi)."""
+        for b in range(da, len(self._blocchi)):
+            if not maschera >> b & 1 and not self._prima[b] & ~maschera:
+                yield b
+
+    def _completamenti(self, maschera):
+        """Trame complete che estendono un prefisso con i blocchi di 'maschera'."""
+        if self._impossibile:
+            return 0
+        return self._estensioni(((1 << len(self._blocchi)) - 1) & ~maschera)
+
+    def _estensioni(self, restanti):
+        """Ordinamenti validi dei blocchi in 'restanti' (i loro predecessori esterni sono già collocati)."""
+        if not restanti & (restanti - 1): # Zero o un blocco
+            return 1
+        risultato = self._estensioni_memo.get(restanti)
+        if risultato is None:
+            if self._verifica_conteggio and len(self._estensioni_memo) % 10000 == 0:
+                self._verifica_conteggio()
+            # Gruppo di blocchi legati da vincoli al primo dei restanti
+            gruppo, frontiera = 0, restanti & -restanti
+            while frontiera:
+                gruppo |= frontiera
+                nuovi = 0
+                while frontiera:
+                    b = (frontiera & -frontiera).bit_length() - 1
+                    nuovi |= self._legati[b]
+                    frontiera &= frontiera - 1
+                frontiera = nuovi & restanti & ~gruppo
+            if gruppo != restanti: # Gruppi indipendenti: si contano a parte e si intercalano liberamente
+                altri = restanti & ~gruppo
+                risultato = (math.comb(bin(restanti).count("1"), bin(gruppo).count("1"))
+                             * self._estensioni(gruppo) * self._estensioni(altri))
+            else:
+                risultato = sum(self._estensioni(restanti & ~(1 << b)) for b in self._candidati(~restanti))
+            self._estensioni_memo[restanti] = risultato
+        return risultato
+
+    def _blocchi_di(self, rango):
+        """Sequenza dei blocchi della trama di rango 'rango'."""
+        percorso, maschera = [], 0
+        while len(percorso) < len(self._blocchi):
+            for b in self._candidati(maschera):
+                completamenti = self._completamenti(maschera | 1 << b)
+                if rango < completamenti:
+                    break
+                rango -= completamenti
+            percorso.append(b)
+            maschera |= 1 << b
+        return percorso
+
+    def _posizioni_di(self, rango):
+        return [i for b in self._blocchi_di(rango) for i in self._blocchi[b]]
+
+    def rango_di(self, codici):
+        indici = {codice: i for i, codice in enumerate(self.codici)}
+        codici = [codice.upper() for codice in codici]
+        if sorted(codici) != sorted(self.codici):
+            raise ValueError("La sequenza deve contenere tutti e soli i codici della trama.")
+        posizioni = [indici[codice] for codice in codici]
+        rango, maschera, inizio = 0, 0, 0
+        while inizio < len(posizioni):
+            candidati = list(self._candidati(maschera))
+            b = next((b for b in candidati if self._blocchi[b][0] == posizioni[inizio]), None)
+            if b is None or tuple(posizioni[inizio:inizio + len(self._blocchi[b])]) != self._blocchi[b]:
+                posizione = f"dopo {codici[inizio - 1]}" if inizio else "all'inizio"
+                raise ValueError(f"La sequenza non rispetta i vincoli: {codici[inizio]} non può stare {posizione}.")
+            rango += sum(self._completamenti(maschera | 1 << c) for c in candidati if c < b)
+            maschera |= 1 << b
+            inizio += len(self._blocchi[b])
+        return rango
+
+    def _percorri(self, percorso=()):
+        """
+        Backtracking dai blocchi dati (un prefisso valido o una trama completa, esclusa) in poi:
+        genera le trame complete, come sequenze di blocchi, nell'ordine dei ranghi.
+        """
+        if self._impossibile:
+            return
+        percorso = list(percorso)
+        maschera = sum(1 << b for b in percorso)
+        # A ogni profondità, il primo candidato ancora da provare (la trama di partenza è già stata emessa)
+        prossimi = [b + 1 for b in percorso] + [len(self._blocchi) if percorso else 0]
+        while True:
+            profondita = len(percorso)
+            if profondita == len(self._blocchi):
+                if prossimi[-1] == 0: # Appena completata (non la trama di partenza)
+                    yield tuple(percorso)
+                b = None
+            else:
+                b = next(self._candidati(maschera, prossimi[profondita]), None)
+            if b is None: # Nessuna estensione possibile: si torna indietro
+                if not percorso:
+                    return
+                prossimi.pop()
+                maschera ^= 1 << percorso.pop()
+                continue
+            prossimi[profondita] = b + 1
+            percorso.append(b)
+            maschera |= 1 << b
+            prossimi.append(0)
+
+    def __iter__(self):
+        return (self.descrizione(self.codici[i] for b in percorso for i in self._blocchi[b]) for percorso in self._percorri())
+
+    def righe(self, inizio=0, numero=None):
+        if inizio > 0: # Senza conteggio quando si parte dall'inizio
+            if inizio >= self.numero:
+                return
+            percorso = self._blocchi_di(inizio)
+            successive = itertools.chain([tuple(percorso)], self._percorri(percorso))
+        else:
+            successive = self._percorri()
+        for rango, percorso in enumerate(itertools.islice(successive, numero), inizio):
+            yield rango, tuple(self.codici[i] for b in percorso for i in self._blocchi[b])
+
+
+def leggi_vincoli_propp(testo):
+    """
+    Legge vincoli scritti come 'F2<F3' (F2 prima di F3) e 'F6<<F7' (F7 subito dopo F6), separati da virgole;
+    sono ammesse catene come 'F8<F9<F10'. Restituisce (precedenze, adiacenze).
+    """
+    precedenze, adiacenze = [], []
+    for voce in re.split(r"[,;\n]", testo or ""):
+        voce = re.sub(r"\s+", "", voce).upper()
+        if not voce:
+            continue
+        parti = re.split(r"(<<|<)", voce)
+        if len(parti) < 3 or not all(parti[0::2]):
+            raise ValueError(f"Vincolo non valido: '{voce}' (usa 'F2<F3' per la precedenza o 'F6<<F7' per l'adiacenza)")
+        for prima, operatore, dopo in zip(parti[0:-1:2], parti[1::2], parti[2::2]):
+            (adiacenze if operatore == "<<" else precedenze).append((prima, dopo))
+    return precedenze, adiacenze
+
+def formatta_vincoli_propp(precedenze, adiacenze):
+    """Inverso di leggi_vincoli_propp."""
+    return ", ".join([f"{prima}<{dopo}" for prima, dopo in precedenze] + [f"{prima}<<{dopo}" for prima, dopo in adiacenze])
+
+
+def genera_trame_propp(codici, funzioni=None):
+    """
+    Permutazioni (l'ordine conta) dei codici di Propp come descrizioni unite da ' -> ',
+    generate solo quando lette (vedi PermutazioniPropp). Usa FUNZIONI_PROPP se 'funzioni' è None.
+    """
+    return PermutazioniPropp(codici, funzioni)
+
+def scrivi_risultati_propp(sequenza, percorso, inizio=0, numero=None, ranghi=None, avanzamento=None, verifica=None):
+    """
+    Scrive in CSV (numero, codici, trama o sottoinsieme) gli elementi di una SequenzaProppPerRango dal rango
+    'inizio' (al più 'numero'), oppure quelli dei 'ranghi' indicati (es. un campione), uno alla volta
+    e senza tenerli in memoria. Il numero di riga è il rango + 1. Restituisce il numero di righe scritte.
+    """
+    if ranghi is not None:
+        righe = ((rango, sequenza.codici_di(rango)) for rango in ranghi)
+        totale = len(ranghi)
+    else:
+        righe = sequenza.righe(inizio, numero)
+        totale = max(0, min(sequenza.numero - inizio, sequenza.numero if numero is None else numero))
+    scritte = 0
+    with open(percorso, 'w', encoding='utf-8', newline='') as f:
+        scrittore = csv.writer(f)
+        scrittore.writerow(["numero", "codici", sequenza.ELEMENTO])
+        for rango, codici in righe:
+            scrittore.writerow([rango + 1, ",".join(codici), sequenza.descrizione(codici)])
+            scritte += 1
+            if scritte % 10000 == 0:
+                if verifica:
+                    verifica()
+                if avanzamento:
+                    avanzamento(scritte / totale, f"{sequenza.ELEMENTI.capitalize()} scritte: {scritte:,}/{totale:,}")
+    return scritte
+
+class CombinazioniPropp(SequenzaProppPerRango):
+    """
+    Tutti i sottoinsiemi (combinazioni) di k codici di Propp, senza generarli in anticipo: il totale è C(n, k)
+    in forma chiusa e il sottoinsieme di rango r si calcola direttamente con il sistema numerico combinatorio,
+    nello stesso ordine di itertools.combinations. Ogni elemento è il sottoinsieme come descrizioni
+    ordinate e unite da ', '.
+    """
+    ELEMENTO, ELEMENTI = "sottoinsieme", "sottoinsiemi"
+
+    def __init__(self, codici, numero_funzioni_da_scegliere, funzioni=None):
+        self.funzioni = funzioni if funzioni is not None else FUNZIONI_PROPP
+        self.codici = tuple(_valida_codici_propp(codici, self.funzioni, " nella lista dei disponibili"))
+        if numero_funzioni_da_scegliere > len(self.codici):
+            raise ValueError("Il numero di funzioni da scegliere non può essere maggiore delle funzioni disponibili.")
+        self.k = numero_funzioni_da_scegliere
+        self.numero = math.comb(len(self.codici), self.k)
+
+    def descrizione(self, codici):
+        """Sottoinsieme di codici come descrizioni ordinate alfabeticamente."""
+        return ", ".join(sorted(self.funzioni[codice] for codice in codici))
+
+    def _posizioni_di(self, rango):
+        """Posizioni (crescenti) del sottoinsieme di rango 'rango': ogni posizione salta i blocchi di combinazioni precedenti."""
+        posizioni, candidata = [], 0
+        for mancanti in range(self.k, 0, -1):
+            while True:
+                blocco = math.comb(len(self.codici) - candidata - 1, mancanti - 1) # Combinazioni che iniziano da 'candidata'
+                if rango < blocco:
+                    break
+                rango -= blocco
+                candidata += 1
+            posizioni.append(candidata)
+            candidata += 1
+        return posizioni
+
+    def codici_di(self, rango):
+        """Codici del sottoinsieme di rango 'rango' (0 = i primi k codici dati)."""
+        return tuple(self.codici[posizione] for posizione in self._posizioni_di(self._verifica_rango(rango)))
+
+    def rango_di(self, codici):
+        """Rango di un sottoinsieme di codici, in qualunque ordine (ValueError se non è uno dei sottoinsiemi)."""
+        indici = {codice: i for i, codice in enumerate(self.codici)}
+        try:
+            posizioni = sorted({indici[codice.upper()] for codice in codici})
+        except KeyError as e:
+            raise ValueError(f"Il codice {e} non fa parte delle funzioni disponibili.") from None
+        if len(posizioni) != self.k or len(posizioni) != len(codici):
+            raise ValueError(f"Il sottoinsieme deve contenere {self.k} codici diversi.")
+        rango, precedente = 0, -1
+        for mancanti, posizione in zip(range(self.k, 0, -1), posizioni):
+            rango += sum(math.comb(len(self.codici) - candidata - 1, mancanti - 1) for candidata in range(precedente + 1, posizione))
+            precedente = posizione
+        return rango
+
+    def __iter__(self):
+        return (self.descrizione(combinazione) for combinazione in itertools.combinations(self.codici, self.k))
+
+    def index(self, sottoinsieme, *argomenti):
+        """Rango di un sottoinsieme (descrizioni unite da ', ', anche se contengono virgole)."""
+        resto, codici = str(sottoinsieme), []
+        while resto:
+            codice = next((codice for codice in self.codici if codice not in codici and
+                           (resto == self.funzioni[codice] or resto.startswith(self.funzioni[codice] + ", "))), None)
+            if codice is None:
+                raise ValueError(f"{sottoinsieme!r} non è un sottoinsieme di queste funzioni")
+            codici.append(codice)
+            resto = resto[len(self.funzioni[codice]) + 2:]
+        return self.rango_di(codici)
+
+    def righe(self, inizio=0, numero=None):
+        """Genera (rango, codici) dal rango 'inizio' in poi, passando alla combinazione successiva in O(k)."""
+        if inizio >= self.numero:
+            return
+        posizioni = self._posizioni_di(self._verifica_rango(inizio))
+        rango = inizio % self.numero
+        fine = self.numero if numero is None else min(self.numero, rango + numero)
+        n, k = len(self.codici), self.k
+        while rango < fine:
+            yield rango, tuple(self.codici[posizione] for posizione in posizioni)
+            rango += 1
+            # Successiva: si incrementa l'ultima posizione che può ancora avanzare e si ricompattano le seguenti
+            i = k - 1
+            while i >= 0 and posizioni[i] == n - k + i:
+                i -= 1
+            if i < 0:
+                return
+            posizioni[i] += 1
+            posizioni[i + 1:] = range(posizioni[i] + 1, posizioni[i] + k - i)
+
+
+def genera_sottoinsiemi_propp(codici, numero_funzioni_da_scegliere, funzioni=None):
+    """
+    Combinazioni (l'ordine non conta) di 'numero_funzioni_da_scegliere' codici di Propp come descrizioni
+    ordinate e unite da ', ', generate solo quando lette (vedi CombinazioniPropp).
+    """
+    return CombinazioniPropp(codici, numero_funzioni_da_scegliere, funzioni)
+
+
+def conta_combinazioni_per_fasi(codici, k, minimi=None, massimi=None, fasi=None):
+    """
+    Sottoinsiemi di k codici che prendono da ogni fase (FASI_PROPP, per default) almeno minimi[fase]
+    e al più massimi[fase] funzioni, contati senza enumerarli: programmazione dinamica sul numero di funzioni
+    scelte, una fase alla volta, in O(fasi · k²). I codici fuori da ogni fase sono senza limiti.
+    """
+    fasi = fasi if fasi is not None else FASI_PROPP
+    minimi, massimi = minimi or {}, massimi or {}
+    codici = set(codici)
+    gruppi = [(fase, sum(1 for codice in codici_fase if codice in codici)) for fase, codici_fase in fasi.items()]
+    gruppi.append((None, len(codici) - sum(dimensione for _, dimensione in gruppi)))
+    modi = [1] + [0] * k # modi[j]: scelte di j funzioni dalle fasi già considerate
+    for fase, dimensione in gruppi:
+        minimo, massimo = minimi.get(fase, 0), min(massimi.get(fase, dimensione), dimensione)
+        nuovi = [0] * (k + 1)
+        for j, conteggio in enumerate(modi):
+            if conteggio:
+                for presi in range(minimo, min(massimo, k - j) + 1):
+                    nuovi[j + presi] += conteggio * math.comb(dimensione, presi)
+        modi = nuovi
+    return modi[k]
+
+@dataclass
+class StatisticheCombinazioniPropp:
+    funzioni: int # n, funzioni disponibili
+    scelte: int # k
+    combinazioni: int # C(n, k): sottoinsiemi, l'ordine non conta
+    disposizioni: int # n!/(n-k)!: sequenze di k funzioni diverse, l'ordine conta
+    per_funzione: int # Sottoinsiemi che contengono una data funzione: C(n-1, k-1)
+    per_fase: dict # Fase -> sottoinsiemi con almeno una sua funzione (solo fasi con funzioni disponibili)
+    con_tutte_le_fasi: int # Sottoinsiemi con almeno una funzione di ogni fase presente
+
+def statistiche_combinazioni_propp(codici, k, funzioni=None):
+    """Conteggi in forma chiusa (e per programmazione dinamica sulle fasi) dei sottoinsiemi di k codici."""
+    combinazioni = CombinazioniPropp(codici, k, funzioni)
+    n = len(combinazioni.codici)
+    presenti = set(combinazioni.codici)
+    dimensioni = {fase: sum(1 for codice in codici_fase if codice in presenti) for fase, codici_fase in FASI_PROPP.items()}
+    dimensioni = {fase: dimensione for fase, dimensione in dimensioni.items() if dimensione}
+    return StatisticheCombinazioniPropp(
+        funzioni=n, scelte=k, combinazioni=combinazioni.numero, disposizioni=math.perm(n, k),
+        per_funzione=math.comb(n - 1, k - 1) if k else 0,
+        per_fase={fase: combinazioni.numero - math.comb(n - dimensione, k) for fase, dimensione in dimensioni.items()},
+        con_tutte_le_fasi=conta_combinazioni_per_fasi(presenti, k, minimi=dict.fromkeys(dimensioni, 1)))
+
+
+def digrafo_sequenza_propp(codici, funzioni=None):
+    """graphviz.Digraph di una sequenza di funzioni di Propp (nodi da sinistra a destra, uno per funzione)."""
+    funzioni_di_riferimento = funzioni if funzioni is not None else FUNZIONI_PROPP
+    dot = graphviz.Digraph(comment=f"Sequenza Funzioni di Propp: {', '.join(codici)}")
+    dot.attr(rankdir='LR') # Layout da Sinistra a Destra
+    dot.attr('node', shape='box', style='rounded,filled', fillcolor='lightblue', fontname='Arial', fontsize='10')
+    dot.attr('edge', fontname='Arial', fontsize='9', color='gray')
+    previous_node_id = None
+    for i, code in enumerate(codici):
+        function_description = funzioni_di_riferimento.get(code, f"Sconosciuta ({code})")
+        label = f"{code}\n{textwrap.fill(function_description, width=25)}" # width ridotto per nodi più compatti
+        node_id = f"node_user_{i}"
+        dot.node(node_id, label)
+        if previous_node_id is not None:
+            dot.edge(previous_node_id, node_id)
+        previous_node_id = node_id
+    return dot
+
+def leggi_sequenze_propp(percorso):
+    """
+    Sequenze di codici da un file: un CSV con colonna 'codici' (come quelli salvati dai generatori di Propp)
+    oppure un file di testo con una sequenza per riga (codici separati da virgole o spazi; '#' per i commenti).
+    Genera (numero, codici) una riga alla volta.
+    """
+    with open(percorso, 'r', encoding='utf-8', newline='') as f:
+        prima_riga = f.readline()
+        f.seek(0)
+        if "codici" in next(csv.reader([prima_riga]), []):
+            for i, riga in enumerate(csv.DictReader(f), 1):
+                codici = _codici_propp_da_testo(riga.get("codici") or "")
+                if codici:
+                    yield int(riga["numero"]) if (riga.get("numero") or "").isdigit() else i, codici
+            return
+        numero = 0
+        for riga in f:
+            codici = _codici_propp_da_testo(riga.split("#", 1)[0])
+            if codici:
+                numero += 1
+                yield numero, codici
+
+def _codici_propp_da_testo(testo):
+    return tuple(codice.upper() for codice in re.split(r"[\s,;]+", testo) if codice)
+
+@dataclass
+class RisultatoDiagrammiPropp:
+    cartella: str
+    diagrammi: list # (numero, codici, nome del file nella cartella, True se già presente in cache)
+    renderizzati: int
+    dalla_cache: int
+    fogli_contatti: list # Percorsi dei fogli SVG riassuntivi (vuota se non richiesti)
+
+# Diagrammi per foglio riassuntivo e dimensioni (in pixel) di ciascuna cella
+DIAGRAMMI_PER_FOGLIO = 200
+CELLA_FOGLIO_CONTATTI = (640, 170)
+
+def renderizza_sequenze_propp(sequenze, cartella, formato="svg", funzioni=None, processi=None, colonne=3,
+                              fogli_contatti=True, avanzamento=None, verifica=None, totale=None):
+    """
+    Disegna con Graphviz molte sequenze di Propp ((numero, codici), es. da righe() di un generatore o da
+    leggi_sequenze_propp) in 'cartella', lanciando più processi 'dot' in parallelo. Ogni file prende il nome
+    dall'hash del sorgente DOT e del formato: una sequenza già disegnata (anche in un'esecuzione precedente)
+    non viene ridisegnata. Con fogli_contatti (formati svg e png), scrive anche fogli SVG autonomi che
+    affiancano i diagrammi, incorporati, con numero e codici di ciascuno.
+    """
+    os.makedirs(cartella, exist_ok=True)
+    processi = processi or os.cpu_count() or 1
+    diagrammi, in_corso = [], {}
+    renderizzati = dalla_cache = 0
+
+    def disegna(dot, percorso):
+        dati = dot.pipe(format=formato) # Un processo 'dot' per diagramma: i thread attendono in parallelo
+        descrittore, temporaneo = tempfile.mkstemp(prefix=".propp_", suffix=".tmp", dir=cartella)
+        with os.fdopen(descrittore, 'wb') as f:
+            f.write(dati)
+        os.replace(temporaneo, percorso) # Mai un file a metà in cache se il disegno viene interrotto
+
+    def raccogli(futuro):
+        nonlocal renderizzati
+        futuro.result() # Propaga gli errori di Graphviz (es. 'dot' non trovato)
+        renderizzati += 1
+
+    with ThreadPoolExecutor(max_workers=processi, thread_name_prefix="graphviz") as esecutore:
+        try:
+            for numero, codici in sequenze:
+                if verifica:
+                    verifica()
+                dot = digrafo_sequenza_propp(codici, funzioni)
+                impronta = hashlib.sha256(f"{formato}\n{dot.source}".encode('utf-8')).hexdigest()[:20]
+                nome = f"propp_{impronta}.{formato}"
+                percorso = os.path.join(cartella, nome)
+                gia_presente = nome in in_corso or os.path.exists(percorso)
+                if gia_presente:
+                    dalla_cache += 1
+                else:
+                    in_corso[nome] = esecutore.submit(disegna, dot, percorso)
+                diagrammi.append((numero, tuple(codici), nome, gia_presente))
+                if len(in_corso) >= 4 * processi: # Al più qualche diagramma in coda per processo
+                    completati = [nome for nome, futuro in in_corso.items() if futuro.done()] or [next(iter(in_corso))]
+                    for nome in completati:
+                        raccogli(in_corso.pop(nome))
+                if avanzamento and len(diagrammi) % 20 == 0:
+                    avanzamento(len(diagrammi) / totale if totale else None,
+                                f"Diagrammi: {len(diagrammi):,} ({dalla_cache:,} già in cache)")
+            for futuro in in_corso.values():
+                raccogli(futuro)
+        except BaseException:
+            for futuro in in_corso.values():
+                futuro.cancel()
+            raise
+
+    fogli = []
+    if fogli_contatti and diagrammi and formato in TIPI_IMMAGINE_FOGLIO:
+        for inizio in range(0, len(diagrammi), DIAGRAMMI_PER_FOGLIO):
+            percorso_foglio = os.path.join(cartella, f"foglio_contatti_{inizio // DIAGRAMMI_PER_FOGLIO + 1:03d}.svg")
+            _scrivi_foglio_contatti_propp(percorso_foglio, diagrammi[inizio:inizio + DIAGRAMMI_PER_FOGLIO], colonne, cartella)
+            fogli.append(percorso_foglio)
+    return RisultatoDiagrammiPropp(cartella, diagrammi, renderizzati, dalla_cache, fogli)
+
+# Fogli riassuntivi: formati dei diagrammi che si possono incorporare in un SVG (il PDF no)
+TIPI_IMMAGINE_FOGLIO = {"svg": "image/svg+xml", "png": "image/png"}
+REGEX_APERTURA_SVG = re.compile(r'<svg\b[^>]*>', re.IGNORECASE)
+REGEX_ATTRIBUTO_SVG = re.compile(r'([\w:-]+)\s*=\s*"([^"]*)"')
+
+def _svg_incorporato(sorgente, prefisso, x, y, larghezza, altezza):
+    """
+    Il contenuto di un file SVG (es. prodotto da Graphviz) come <svg> annidato nella cella indicata, scalato
+    mantenendo le proporzioni. Gli id ricevono 'prefisso', così non si scontrano con quelli degli altri diagrammi.
+    """
+    apertura = REGEX_APERTURA_SVG.search(sorgente)
+    chiusura = sorgente.rfind('</svg>')
+    if apertura is None or chiusura < apertura.end():
+        return ""
+    attributi = dict(REGEX_ATTRIBUTO_SVG.findall(apertura.group(0)))
+    riquadro = attributi.get("viewBox")
+    if riquadro is None: # Senza viewBox: dimensioni originali (es. '62pt'), con l'unità di misura tolta
+        dimensioni = [re.match(r'[\d.]*', attributi.get(nome, "")).group() or "0" for nome in ("width", "height")]
+        riquadro = f"0 0 {dimensioni[0]} {dimensioni[1]}"
+    contenuto = sorgente[apertura.end():chiusura]
+    contenuto = re.sub(r'\bid="', f'id="{prefisso}', contenuto)
+    contenuto = contenuto.replace('url(#', f'url(#{prefisso}').replace('href="#', f'href="#{prefisso}')
+    return (f'<svg x="{x}" y="{y}" width="{larghezza}" height="{altezza}" viewBox={quoteattr(riquadro)} '
+            f'preserveAspectRatio="xMidYMid meet">{contenuto}</svg>\n')
+
+def _scrivi_foglio_contatti_propp(percorso, diagrammi, colonne, cartella):
+    """
+    Foglio SVG a griglia: ogni cella contiene un diagramma con numero e codici sopra. I diagrammi sono
+    incorporati nel foglio (SVG annidati, PNG come URI 'data:'), che resta valido anche spostato da solo
+    o aperto come immagine, dove i browser non caricano file esterni.
+    """
+    larghezza, altezza = CELLA_FOGLIO_CONTATTI
+    margine, didascalia = 10, 18
+    righe = math.ceil(len(diagrammi) / colonne)
+    with open(percorso, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+                f'width="{colonne * (larghezza + margine) + margine}" height="{righe * (altezza + margine) + margine}" '
+                f'font-family="Arial" font-size="12">\n<rect width="100%" height="100%" fill="white"/>\n')
+        for i, (numero, codici, nome, _) in enumerate(diagrammi):
+            x = margine + (i % colonne) * (larghezza + margine)
+            y = margine + (i // colonne) * (altezza + margine)
+            etichetta = escape(f"{numero}. {', '.join(codici)}")
+            f.write(f'<rect x="{x}" y="{y}" width="{larghezza}" height="{altezza}" fill="none" stroke="#cccccc"/>\n'
+                    f'<text x="{x + 5}" y="{y + 14}">{etichetta}</text>\n')
+            cella = (x + 5, y + didascalia, larghezza - 10, altezza - didascalia - 5)
+            formato = os.path.splitext(nome)[1].lstrip('.').lower()
+            percorso_diagramma = os.path.join(cartella, nome)
+            if formato == "svg":
+                with open(percorso_diagramma, 'r', encoding='utf-8') as diagramma:
+                    f.write(_svg_incorporato(diagramma.read(), f"d{i}_", *cella))
+            else:
+                with open(percorso_diagramma, 'rb') as diagramma:
+                    uri = f"data:{TIPI_IMMAGINE_FOGLIO[formato]};base64,{base64.b64encode(diagramma.read()).decode('ascii')}"
+                f.write(f'<image x="{cella[0]}" y="{cella[1]}" width="{cella[2]}" height="{cella[3]}" '
+                        f'href="{uri}" xlink:href="{uri}"/>\n')
+        f.write('</svg>\n')
+
 
 # --- Classi per Funzionalità Specifiche ---
 
@@ -183,6 +4479,7 @@ class FunzioniUsability:
     def __init__(self, app_ref):
         self.app_ref = app_ref
         self.lingua_analisi = "italian" # Default per funzioni come Gulpease
+        self.nome_backend_annotazione = None # Tagger/lemmatizzatore per POS e lemmi (None: il primo disponibile per la lingua)
 
     def imposta_lingua_analisi(self):
         """Permette all'utente di impostare la lingua per le analisi che la supportano."""
@@ -201,7 +4498,47 @@ class FunzioniUsability:
             else:
                 messagebox.showwarning("Lingua non Supportata", f"Lingua '{lingua_scelta}' non supportata o riconosciuta.\nMantengo: {self.lingua_analisi}", parent=self.app_ref.root)
 
-    def _check_corpus_e_nltk(self, check_punkt=False, check_tagger=False):
+    def imposta_backend_annotazione(self):
+        """Sceglie il tagger/lemmatizzatore per POS e lemmi e ne carica il modello in background, pronto per le analisi."""
+        disponibili = [nome for nome, classe in BACKEND_ANNOTAZIONE.items() if classe.disponibile(self.lingua_analisi)]
+        descrizioni = "\n".join(f"- {nome}: {classe.descrizione}" + ("" if nome in disponibili else " [non installato]")
+                                for nome, classe in BACKEND_ANNOTAZIONE.items())
+        scelta = simpledialog.askstring("Tagger e Lemmatizzatore",
+                                        f"Backend per l'annotazione POS e i lemmi (lingua: {self.lingua_analisi}):\n{descrizioni}\n\n"
+                                        "Lascia vuoto per la scelta automatica (il primo disponibile).",
+                                        initialvalue=self.nome_backend_annotazione or (disponibili[0] if disponibili else ""),
+                                        parent=self.app_ref.root)
+        if scelta is None:
+            return
+        nome = scelta.strip().lower() or None
+        try:
+            backend = backend_annotazione(nome, self.lingua_analisi)
+        except ValueError as e:
+            messagebox.showerror("Backend Non Disponibile", str(e), parent=self.app_ref.root)
+            return
+        self.nome_backend_annotazione = nome
+
+        def calcola(controllo):
+            controllo.aggiorna(None, f"Caricamento del modello '{backend.nome}'...")
+            return backend.prepara() # Il modello resta in memoria per tutte le analisi successive
+
+        def mostra(backend):
+            self.app_ref._display_output("Tagger e Lemmatizzatore",
+                                         f"Backend di annotazione: {backend.nome} ({backend.descrizione})\n"
+                                         f"Lingua: {backend.lingua}. Lemmi: {'sì' if backend.fornisce_lemmi else 'no'}. Modello caricato.")
+
+        self.app_ref.esecutore.avvia("Caricamento tagger", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Caricamento Tagger"))
+
+    def _backend_annotazione(self):
+        """Il backend scelto per la lingua corrente, o None (con un messaggio) se non è disponibile."""
+        try:
+            return backend_annotazione(self.nome_backend_annotazione, self.lingua_analisi)
+        except ValueError as e:
+            messagebox.showerror("Tagger Non Disponibile", str(e), parent=self.app_ref.root)
+            return None
+
+    def _check_corpus_e_nltk(self, check_punkt=False):
         """Controlla se il corpus è caricato e se NLTK e i suoi componenti sono disponibili."""
         if not self.app_ref.corpus_testuale:
             messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.app_ref.root)
@@ -212,9 +4549,6 @@ class FunzioniUsability:
         if check_punkt and not nltk_punkt_disponibile:
             messagebox.showerror("Dipendenza NLTK Mancante", "Il pacchetto 'punkt' di NLTK è necessario per questa funzionalità.\nScaricalo eseguendo in Python: nltk.download('punkt')", parent=self.app_ref.root)
             return False
-        if check_tagger and not nltk_tagger_disponibile:
-            messagebox.showerror("Dipendenza NLTK Mancante", "Il pacchetto 'averaged_perceptron_tagger' di NLTK è necessario per questa funzionalità.\nScaricalo eseguendo in Python: nltk.download('averaged_perceptron_tagger')", parent=self.app_ref.root)
-            return False
         return True
 
     def subdividi_in_frasi(self):
@@ -222,85 +4556,130 @@ class FunzioniUsability:
         if not self._check_corpus_e_nltk(check_punkt=True):
             return
 
-        testo_completo = ' '.join(self.app_ref.corpus_testuale)
-        try:
-            frasi = nltk.sent_tokenize(testo_completo, language=self.lingua_analisi)
-            output_str = f"Suddivisione in Frasi (Lingua: {self.lingua_analisi}):\n"
-            output_str += "-------------------------------------------------\n"
-            if not frasi:
-                output_str += "Nessuna frase trovata."
-            else:
-                 # Limita la visualizzazione per testi molto lunghi
-                 max_frasi_visualizzate = 500
-                 for i, frase in enumerate(frasi):
-                     if i >= max_frasi_visualizzate:
-                         output_str += f"\n... e altre {len(frasi) - max_frasi_visualizzate} frasi non visualizzate."
-                         break
-                     output_str += f"Frase {i+1}: {frase}\n"
-
-            self.app_ref._display_output("Suddivisione in Frasi", output_str)
-        except Exception as e:
-            messagebox.showerror("Errore Suddivisione Frasi", f"Errore: {e}", parent=self.app_ref.root)
-            self.app_ref._display_output("Errore Suddivisione Frasi", f"Errore: {e}")
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.lingua_analisi
+
+        def calcola(controllo):
+            controllo.aggiorna(None, "Suddivisione in frasi...")
+            return modello.frasi(lingua)
+
+        def mostra(frasi):
+            intestazione = [f"Suddivisione in Frasi (Lingua: {lingua}):", "-------------------------------------------------"]
+            # Tutte le frasi: il visualizzatore formatta solo quelle visibili
+            self.app_ref._display_righe("Suddivisione in Frasi", frasi, intestazione + ([] if frasi else ["Nessuna frase trovata."]),
+                                        formatta=lambda i, frase: f"Frase {i+1}: {frase}")
+
+        self.app_ref.esecutore.avvia("Suddivisione in frasi", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Suddivisione Frasi"))
 
     def subdividi_in_token(self):
         """Suddivide il corpus in token e li visualizza."""
         if not self._check_corpus_e_nltk(check_punkt=True):
             return
 
-        testo_completo = ' '.join(self.app_ref.corpus_testuale)
-        try:
-            # word_tokenize usa 'punkt' internamente e può prendere un argomento 'language'.
-            tokens = nltk.word_tokenize(testo_completo, language=self.lingua_analisi)
-            output_str = f"Suddivisione in Token (Lingua: {self.lingua_analisi}):\n"
-            output_str += "--------------------------------------------------\n"
-            if not tokens:
-                output_str += "Nessun token trovato."
-            else:
-                 # Limita la visualizzazione per testi molto lunghi
-                 max_tokens_visualizzati = 1000
-                 display_tokens = tokens[:max_tokens_visualizzati]
-                 output_str += ", ".join(display_tokens)
-                 if len(tokens) > max_tokens_visualizzati:
-                     output_str += f"\n... e altri {len(tokens) - max_tokens_visualizzati} token non visualizzati."
-
-            self.app_ref._display_output("Suddivisione in Token", output_str)
-        except Exception as e:
-            messagebox.showerror("Errore Suddivisione Token", f"Errore: {e}", parent=self.app_ref.root)
-            self.app_ref._display_output("Errore Suddivisione Token", f"Errore: {e}")
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.lingua_analisi
+
+        def calcola(controllo):
+            controllo.aggiorna(None, "Suddivisione in token...")
+            # Token NLTK (punkt + treebank) già calcolati e memorizzati dal modello del corpus
+            return modello.token_nltk(lingua)
+
+        def mostra(tokens):
+            intestazione = [f"Suddivisione in Token (Lingua: {lingua}):", "--------------------------------------------------"]
+            self.app_ref._display_righe("Suddivisione in Token", tokens, intestazione + ([] if tokens else ["Nessun token trovato."]),
+                                        formatta=lambda i, token: f"{i+1}. {token}")
+
+        self.app_ref.esecutore.avvia("Suddivisione in token", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Suddivisione Token"))
 
     def annotazione_pos(self):
-        """Esegue il Part-of-Speech tagging sul corpus e visualizza i risultati."""
-        if not self._check_corpus_e_nltk(check_punkt=True, check_tagger=True):
+        """Esegue il Part-of-Speech tagging sul corpus (o lo rilegge dalla cache) e visualizza i risultati."""
+        if not self._check_corpus_e_nltk(check_punkt=True): # La segmentazione in frasi e token è sempre quella di NLTK
+            return
+        backend = self._backend_annotazione()
+        if backend is None:
             return
 
-        testo_completo = ' '.join(self.app_ref.corpus_testuale)
-        try:
-            tokens = nltk.word_tokenize(testo_completo, language=self.lingua_analisi)
-            # nltk.pos_tag usa il tagger 'averaged_perceptron_tagger'.
-            # Per l'italiano, i risultati potrebbero non essere ottimali senza un modello specifico.
-            # Usiamo quello di default e avvisiamo l'utente.
-            tagged_tokens = nltk.pos_tag(tokens) # Non c'è un argomento 'language' diretto per il tagger qui
-
-            output_str = f"Annotazione Morfosintattica (POS Tagging - Lingua: {self.lingua_analisi}):\n"
-            output_str += "-------------------------------------------------------------------\n"
-            if not tagged_tokens:
-                output_str += "Nessun token da annotare."
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.lingua_analisi
+
+        def calcola(controllo):
+            controllo.aggiorna(None, "Annotazione POS in corso...")
+            return annotazione_pos(modello, lingua, backend, avanzamento=controllo.aggiorna, verifica=controllo.verifica)
+
+        def mostra(annotato):
+            intestazione = [f"Annotazione Morfosintattica (POS Tagging - Lingua: {lingua}, Backend: {backend.nome}):",
+                            f"Token annotati: {len(annotato):,} in {annotato.num_frasi:,} frasi"
+                            + (" (annotazione riletta dalla cache)" if annotato.dalla_cache else ""),
+                            "-------------------------------------------------------------------"]
+            piede = []
+            if backend.nome == "nltk" and lingua != "english":
+                # Il tagger predefinito di NLTK non ha un modello per l'italiano: avvisiamo l'utente
+                piede = ["", "Nota: Il tagger predefinito di NLTK ('averaged_perceptron_tagger') è ottimizzato per l'inglese.",
+                         "Per l'italiano scegli un backend con un modello italiano (es. spaCy) da 'Imposta Tagger e Lemmatizzatore'."]
+            if annotato.ids_lemma is not None:
+                formatta = lambda i, token_tag: f"{token_tag[0]} [{token_tag[1]}] {annotato.lemma(i)}"
             else:
-                # Limita la visualizzazione
-                max_tagged_visualizzati = 500
-                for i, (token, tag) in enumerate(tagged_tokens):
-                    if i >= max_tagged_visualizzati:
-                        output_str += f"\n... e altri {len(tagged_tokens) - max_tagged_visualizzati} token non visualizzati."
-                        break
-                    output_str += f"{token} [{tag}]\n"
-
-            output_str += "\nNota: Il tagger predefinito di NLTK ('averaged_perceptron_tagger') è ottimizzato per l'inglese."
-            output_str += "\nPer l'italiano, i risultati potrebbero non essere ottimali senza un modello specifico addestrato."
-            self.app_ref._display_output("Annotazione POS", output_str)
-        except Exception as e:
-            messagebox.showerror("Errore Annotazione POS", f"Errore: {e}", parent=self.app_ref.root)
-            self.app_ref._display_output("Errore Annotazione POS", f"Errore: {e}")
+                formatta = lambda i, token_tag: f"{token_tag[0]} [{token_tag[1]}]"
+            self.app_ref._display_righe("Annotazione POS", annotato, intestazione + ([] if annotato else ["Nessun token da annotare."]),
+                                        piede, formatta=formatta)
+
+        self.app_ref.esecutore.avvia("Annotazione POS", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Annotazione POS"))
+
+    def frequenza_per_pos(self):
+        """
+        Termini più frequenti di una parte del discorso (es. 'nomi') o collocazioni che seguono uno schema
+        di tag (es. 'aggettivi nomi'), per forme o per lemmi, sull'annotazione POS del corpus (calcolata una
+        volta e riletta dalla cache).
+        """
+        if not self._check_corpus_e_nltk(check_punkt=True):
+            return
+        backend = self._backend_annotazione()
+        if backend is None:
+            return
+        testo_schema = simpledialog.askstring(
+            "Filtro POS", "Parte del discorso (es. 'nomi', 'verbi', 'NN|NNS', '*' per tutte) per i termini,\n"
+            "oppure uno schema per le collocazioni (es. 'aggettivi nomi', 'nomi * nomi'):\n\n"
+            f"Categorie: {', '.join(CATEGORIE_POS)}", parent=self.app_ref.root, initialvalue="nomi")
+        if not testo_schema:
+            return
+        try:
+            schema = leggi_schema_pos(testo_schema)
+        except ValueError as e:
+            messagebox.showerror("Schema POS Non Valido", str(e), parent=self.app_ref.root)
+            return
+        num_risultati = simpledialog.askinteger("Numero Risultati", "Quanti risultati più frequenti vuoi visualizzare?",
+                                                parent=self.app_ref.root, minvalue=1, initialvalue=20)
+        if num_risultati is None:
+            return
+        lemmi = backend.fornisce_lemmi and messagebox.askyesno(
+            "Forme o Lemmi", "Contare i lemmi invece delle forme? (es. 'case' e 'casa' contano come 'casa')",
+            parent=self.app_ref.root)
+
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.lingua_analisi
+        stopwords = frozenset(self.app_ref.stopwords) # Copia stabile per il thread in background
+
+        def calcola(controllo):
+            annotato = annota_pos_corpus(modello, lingua, backend, avanzamento=controllo.aggiorna, verifica=controllo.verifica)
+            controllo.aggiorna(None, "Conteggio per parte del discorso...")
+            if len(schema) == 1:
+                return [f"{termine.parola}: {termine.frequenza}"
+                        for termine in termini_per_pos(annotato, schema[0], num_risultati, stopwords, lemmi)]
+            return [f"{colloc.testo}: {colloc.frequenza}"
+                    for colloc in collocazioni_per_pos(annotato, schema, num_risultati, stopwords, lemmi)]
+
+        def mostra(righe):
+            tipo = ("lemmi" if lemmi else "termini") if len(schema) == 1 else ("collocazioni di lemmi" if lemmi else "collocazioni")
+            output_str = f"I {num_risultati} {tipo} più frequenti per lo schema POS '{' '.join(schema)}' (stopwords escluse):\n"
+            output_str += "--------------------------------------------------\n"
+            output_str += "\n".join(righe) if righe else "Nessun risultato: nessun token con i tag richiesti."
+            self.app_ref._display_output("Frequenza per Parte del Discorso", output_str)
+
+        self.app_ref.esecutore.avvia("Frequenza per parte del discorso", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Filtro POS"))
 
     def calcola_gulpease_globale(self):
         """
@@ -315,67 +4694,40 @@ class FunzioniUsability:
         if not self._check_corpus_e_nltk(check_punkt=True): # Necessario per frasi e parole
             return
 
-        testo_completo = ' '.join(self.app_ref.corpus_testuale)
-        try:
-            # Tokenizzazione parole (solo alfabetiche)
-            # Forziamo italiano per la tokenizzazione specifica per Gulpease
-            parole_raw = nltk.word_tokenize(testo_completo.lower(), language='italian')
-            parole = [p for p in parole_raw if p.isalpha()]
-
-            num_parole = len(parole)
-            if num_parole == 0:
-                self.app_ref._display_output("Indice Gulpease", "Nessuna parola alfabetica valida trovata per il calcolo.")
-                messagebox.showwarning("Indice Gulpease", "Nessuna parola valida trovata per il calcolo.", parent=self.app_ref.root)
-                return
-
-            # Tokenizzazione frasi
-            # Forziamo italiano per la tokenizzazione specifica per Gulpease
-            frasi = nltk.sent_tokenize(testo_completo, language='italian')
-            num_frasi = len(frasi)
-            if num_frasi == 0:
-                self.app_ref._display_output("Indice Gulpease", "Nessuna frase trovata per il calcolo.")
-                messagebox.showwarning("Indice Gulpease", "Nessuna frase trovata per il calcolo.", parent=self.app_ref.root)
-                return
-
-            num_lettere = sum(len(p) for p in parole)
-
-            # Formula Gulpease: G = 89 + ( ( (Frasi * 100) / Parole * 3 ) - ( (Lettere * 100) / Parole * 10 ) ) / 100
-            # Semplificata: G = 89 + (Frasi * 300 / Parole) - (Lettere * 10 / Parole)
-            # G = 89 + ( (Frasi * 300) - (Lettere * 10) ) / Parole
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.lingua_analisi
 
-            # Evita divisione per zero, anche se num_parole > 0 è già stato controllato
-            if num_parole > 0:
-                gulpease_index = 89 + ( (num_frasi * 300) - (num_lettere * 10) ) / num_parole
-            else:
-                 gulpease_index = 0 # O altro valore indicativo
-
-            # Cap e Floor dell'indice
-            gulpease_index = max(0, min(100, gulpease_index))
-
-            interpretazione = ""
-            if gulpease_index >= 80: interpretazione = "Molto facile (lettori con licenza elementare)"
-            elif gulpease_index >= 60: interpretazione = "Facile (lettori con licenza media inferiore)"
-            elif gulpease_index >= 40: interpretazione = "Abbastanza difficile (lettori con licenza media superiore)"
-            else: interpretazione = "Difficile (lettori con laurea)"
+        def calcola(controllo):
+            controllo.aggiorna(None, "Calcolo indice Gulpease...")
+            risultato = analisi_gulpease(modello)
+            if risultato.parole == 0:
+                return ("Indice Gulpease", "Nessuna parola alfabetica valida trovata per il calcolo.",
+                        "Nessuna parola valida trovata per il calcolo.")
+            if risultato.frasi == 0:
+                return ("Indice Gulpease", "Nessuna frase trovata per il calcolo.",
+                        "Nessuna frase trovata per il calcolo.")
 
             output_str = f"Indice di Leggibilità Globale Gulpease (per l'italiano):\n"
             output_str += "-------------------------------------------------------\n"
-            output_str += f"Numero di Lettere (alfabetiche): {num_lettere}\n"
-            output_str += f"Numero di Parole (alfabetiche): {num_parole}\n"
-            output_str += f"Numero di Frasi: {num_frasi}\n"
-            output_str += f"Indice Gulpease: {gulpease_index:.2f}\n"
-            output_str += f"Interpretazione: {interpretazione}\n\n"
+            output_str += f"Numero di Lettere (alfabetiche): {risultato.lettere}\n"
+            output_str += f"Numero di Parole (alfabetiche): {risultato.parole}\n"
+            output_str += f"Numero di Frasi: {risultato.frasi}\n"
+            output_str += f"Indice Gulpease: {risultato.indice:.2f}\n"
+            output_str += f"Interpretazione: {risultato.interpretazione}\n\n"
             output_str += "Scala di riferimento Gulpease:\n"
             output_str += "  > 80: Molto facile\n  60-80: Facile\n  40-60: Abbastanza difficile\n  < 40: Difficile\n"
-            if self.lingua_analisi != "italian":
-                 output_str += f"\nATTENZIONE: Calcolato usando metriche italiane su testo potenzialmente non italiano ('{self.lingua_analisi}')."
-
+            if lingua != "italian":
+                 output_str += f"\nATTENZIONE: Calcolato usando metriche italiane su testo potenzialmente non italiano ('{lingua}')."
+            return ("Indice Gulpease Globale", output_str, None)
 
-            self.app_ref._display_output("Indice Gulpease Globale", output_str)
+        def mostra(risultato):
+            titolo, output_str, avviso = risultato
+            self.app_ref._display_output(titolo, output_str)
+            if avviso:
+                messagebox.showwarning("Indice Gulpease", avviso, parent=self.app_ref.root)
 
-        except Exception as e:
-            messagebox.showerror("Errore Gulpease", f"Errore durante il calcolo dell'indice Gulpease: {e}", parent=self.app_ref.root)
-            self.app_ref._display_output("Errore Gulpease", f"Errore: {e}")
+        self.app_ref.esecutore.avvia("Indice Gulpease", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Gulpease"))
 
     def analisi_leggibilita_per_frase(self):
         """
@@ -391,62 +4743,102 @@ class FunzioniUsability:
         if not self._check_corpus_e_nltk(check_punkt=True):
             return
 
-        testo_completo = ' '.join(self.app_ref.corpus_testuale)
-        try:
-            frasi_originali = nltk.sent_tokenize(testo_completo, language='italian') # Forziamo italiano
-            if not frasi_originali:
-                self.app_ref._display_output("Leggibilità per Frase", "Nessuna frase trovata.")
-                messagebox.showwarning("Leggibilità per Frase", "Nessuna frase trovata.", parent=self.app_ref.root)
-                return
-
-            output_str = f"Analisi Leggibilità per Frase (Indice Gulpease - per l'italiano):\n"
-            output_str += "-----------------------------------------------------------------\n"
-
-            risultati_frasi = []
-            # Limita la visualizzazione per evitare output eccessivi
-            max_frasi_visualizzate = 300
-            for i, frase_txt in enumerate(frasi_originali):
-                if i >= max_frasi_visualizzate:
-                    risultati_frasi.append(f"\n--- (Visualizzazione limitata alle prime {max_frasi_visualizzate} frasi) ---")
-                    break
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.lingua_analisi
 
-                parole_raw_frase = nltk.word_tokenize(frase_txt.lower(), language='italian')
-                parole_frase = [p for p in parole_raw_frase if p.isalpha()]
+        def calcola(controllo):
+            controllo.aggiorna(None, "Segmentazione in frasi...")
+            risultati = analisi_gulpease_per_frase(modello, verifica=controllo.verifica)
+            controllo.aggiorna(None, "Distribuzione della leggibilità...")
+            return risultati, distribuzione_gulpease(modello)
 
-                num_parole_frase = len(parole_frase)
-                if num_parole_frase == 0:
-                    risultati_frasi.append(f"Frase {i+1}: \"{frase_txt[:70]}...\" - Indice Gulpease: N/A (0 parole)")
-                    continue
+        def formatta(i, risultato):
+            if risultato.indice is None:
+                return f"Frase {i+1}: \"{risultato.testo[:70]}...\" - Indice Gulpease: N/A (0 parole)\n"
+            return (f"Frase {i+1}: \"{risultato.testo[:70]}...\"\n  Indice Gulpease: {risultato.indice:.2f} ({risultato.interpretazione}) "
+                    f"[L:{risultato.lettere}, P:{risultato.parole}]\n")
 
-                num_lettere_frase = sum(len(p) for p in parole_frase)
+        def mostra(risultato):
+            risultati, distribuzione = risultato
+            if not risultati:
+                self.app_ref._display_output("Leggibilità per Frase", "Nessuna frase trovata.")
+                messagebox.showwarning("Leggibilità per Frase", "Nessuna frase trovata.", parent=self.app_ref.root)
+                return
+            intestazione = ["Analisi Leggibilità per Frase (Indice Gulpease - per l'italiano):",
+                            "-----------------------------------------------------------------"]
+            intestazione += self._righe_distribuzione_gulpease(distribuzione, len(risultati))
+            intestazione += ["", "Indice di ogni frase:", ""]
+            piede = [] if lingua == "italian" else [f"ATTENZIONE: Calcolato usando metriche italiane su testo potenzialmente non italiano ('{lingua}')."]
+            self.app_ref._display_righe("Leggibilità per Frase (Gulpease)", risultati, intestazione, piede, formatta)
 
-                # Gulpease per una singola frase (num_frasi = 1)
-                # Evita divisione per zero, anche se num_parole_frase > 0 è già stato controllato
-                if num_parole_frase > 0:
-                    gulpease_frase = 89 + ( (1 * 300) - (num_lettere_frase * 10) ) / num_parole_frase
-                else:
-                    gulpease_frase = 0 # O altro valore indicativo
+        self.app_ref.esecutore.avvia("Leggibilità per frase", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Leggibilità per Frase"))
 
-                gulpease_frase = max(0, min(100, gulpease_frase))
+    def calcola_indici_leggibilita(self):
+        """
+        Calcola insieme tutti gli indici di leggibilità (Gulpease, Flesch-Vacca, Flesch-Kincaid, Gunning Fog,
+        SMOG, LIX) del corpus e di ogni documento, dagli stessi conteggi di base. Segmentazione italiana.
+        """
+        if self.lingua_analisi != "italian":
+            messagebox.showwarning("Lingua non Adatta", "Sillabe e frasi sono calcolate con le regole dell'italiano. "
+                                   f"La lingua attualmente impostata è '{self.lingua_analisi}'. "
+                                   "I risultati potrebbero non essere attendibili.", parent=self.app_ref.root)
 
-                interpretazione_frase = ""
-                if gulpease_frase >= 80: interpretazione_frase = "Molto facile"
-                elif gulpease_frase >= 60: interpretazione_frase = "Facile"
-                elif gulpease_frase >= 40: interpretazione_frase = "Abb. difficile"
-                else: interpretazione_frase = "Difficile"
+        if not self._check_corpus_e_nltk(check_punkt=True):
+            return
 
-                risultati_frasi.append(f"Frase {i+1}: \"{frase_txt[:70]}...\"\n  Indice Gulpease: {gulpease_frase:.2f} ({interpretazione_frase}) "
-                                       f"[L:{num_lettere_frase}, P:{num_parole_frase}]")
+        modello = self.app_ref._get_modello_corpus()
 
-            output_str += "\n\n".join(risultati_frasi)
-            if self.lingua_analisi != "italian":
-                 output_str += f"\n\nATTENZIONE: Calcolato usando metriche italiane su testo potenzialmente non italiano ('{self.lingua_analisi}')."
+        def calcola(controllo):
+            controllo.aggiorna(None, "Conteggi e indici di leggibilità...")
+            return analisi_leggibilita(modello, per_documento=len(modello.documenti) > 1)
 
-            self.app_ref._display_output("Leggibilità per Frase (Gulpease)", output_str)
+        def formatta(i, risultato):
+            valori = ", ".join(f"{INDICI_LEGGIBILITA[nome][0]} {getattr(risultato, nome):.1f}"
+                               for nome in INDICI_LEGGIBILITA if getattr(risultato, nome) is not None)
+            return f"{risultato.documento} ({risultato.frasi:,} frasi, {risultato.parole:,} parole): {valori or 'N/A'}"
 
-        except Exception as e:
-            messagebox.showerror("Errore Leggibilità per Frase", f"Errore: {e}", parent=self.app_ref.root)
-            self.app_ref._display_output("Errore Leggibilità per Frase", f"Errore: {e}")
+        def mostra(risultati):
+            corpus = risultati[0]
+            if not corpus.parole or not corpus.frasi:
+                self.app_ref._display_output("Indici di Leggibilità", "Nessuna frase con parole alfabetiche trovata per il calcolo.")
+                return
+            intestazione = ["Indici di Leggibilità del Corpus (conteggi con regole italiane):",
+                            "-----------------------------------------------------------------",
+                            f"Frasi: {corpus.frasi:,}, parole: {corpus.parole:,}, lettere: {corpus.lettere:,}, sillabe: {corpus.sillabe:,}",
+                            f"Parole di almeno 3 sillabe: {corpus.polisillabe:,}, parole di più di 6 lettere: {corpus.parole_lunghe:,}", ""]
+            for nome, (etichetta, formula, lettura) in INDICI_LEGGIBILITA.items():
+                valore = getattr(corpus, nome)
+                intestazione += [f"{etichetta}: {valore:.2f}" if valore is not None else f"{etichetta}: N/A",
+                                 f"    {formula}  ({lettura})"]
+            intestazione += ["", f"Interpretazione Gulpease: {interpreta_gulpease(corpus.gulpease)}"]
+            if len(risultati) > 1:
+                intestazione += ["", "Per documento:", "--------------"]
+            self.app_ref._display_righe("Indici di Leggibilità", risultati[1:], intestazione, formatta=formatta)
+
+        self.app_ref.esecutore.avvia("Indici di leggibilità", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Indici di Leggibilità"))
+
+    @staticmethod
+    def _righe_distribuzione_gulpease(distribuzione, num_frasi, larghezza_barra=40, punti_andamento=20):
+        """Riepilogo testuale di una DistribuzioneGulpease: statistiche, istogramma, andamento e frasi peggiori."""
+        if not distribuzione.frasi:
+            return ["Nessuna frase con parole alfabetiche: distribuzione non disponibile."]
+        righe = [f"Frasi: {num_frasi:,} (con indice: {distribuzione.frasi:,})",
+                 f"Media: {distribuzione.media:.2f} (deviazione standard: {distribuzione.deviazione_standard:.2f})",
+                 "Percentili: " + ", ".join(f"{p}°: {valore:.1f}" for p, valore in distribuzione.percentili.items()),
+                 "Fasce: " + ", ".join(f"{fascia} {n:,} ({n / distribuzione.frasi:.0%})" for fascia, n in distribuzione.fasce.items()),
+                 "", "Istogramma dell'indice:"]
+        massimo = max(n for _, _, n in distribuzione.istogramma) or 1
+        righe += [f"  {da:3d}-{a:<3d} {'#' * round(n / massimo * larghezza_barra):<{larghezza_barra}} {n:,}"
+                  for da, a, n in distribuzione.istogramma]
+        righe += ["", f"Andamento lungo il testo (media mobile su {min(distribuzione.finestra, distribuzione.frasi)} frasi):"]
+        passo = max(1, len(distribuzione.media_mobile) // punti_andamento)
+        righe += [f"  Frase {frase:>7,}: {media:5.1f} {'#' * round(media / 100 * larghezza_barra)}"
+                  for frase, media in distribuzione.media_mobile[::passo]]
+        righe += ["", f"Le {len(distribuzione.peggiori)} frasi meno leggibili:"]
+        righe += [f"  Frase {frase.frase:,} ({frase.indice:.1f}): \"{frase.testo[:70]}...\"" for frase in distribuzione.peggiori]
+        return righe
 
 
 class FunzioniNarratologia:
@@ -456,6 +4848,7 @@ class FunzioniNarratologia:
         self.matrice_greimas_data = None
         self.matrice_propp_data_utente = None # Dati Propp definiti dall'utente
         self.tensori_narrativi_data = None
+        self.tensore_narrativo = None # Ultimo TensoreNarrativo calcolato sul corpus
 
     def get_propp_function_description(self, code):
         """Restituisce la descrizione completa di una funzione di Propp dato il suo codice."""
@@ -620,30 +5013,14 @@ class FunzioniNarratologia:
 
 
         def salva_dati_tensori():
-            input_text = text_area.get(1.0, tk.END).strip()
-            lines = input_text.split('\n')
-            new_tensori_data = {}
-            errors = []
-            for line in lines:
-                line = line.strip()
-                if not line or line.startswith('#'): continue # Salta righe vuote o commenti
-                if ':' in line:
-                    dim_name, elements_str = line.split(':', 1)
-                    dim_name = dim_name.strip()
-                    elements = [e.strip() for e in elements_str.split(',') if e.strip()] # Filtra elementi vuoti
-                    if dim_name and elements:
-                         new_tensori_data[dim_name] = elements
-                    else:
-                        errors.append(f"Formato riga non valido: '{line}' (deve essere NomeDimensione: Elemento1, Elemento2...)")
-                else:
-                    errors.append(f"Formato riga non valido: '{line}' (deve contenere ':')")
-
-            if errors:
-                error_msg = "Errori nel formato delle dimensioni/elementi:\n" + "\n".join(errors)
-                messagebox.showerror("Errore Formato", error_msg, parent=dialog)
+            try:
+                new_tensori_data = leggi_dimensioni_tensore(text_area.get(1.0, tk.END).strip())
+            except ValueError as e:
+                messagebox.showerror("Errore Formato", str(e), parent=dialog)
                 return
 
             self.tensori_narrativi_data = new_tensori_data
+            self.tensore_narrativo = None # Le dimensioni sono cambiate: il tensore va ricalcolato
             output_str = "Tensori Narrativi (Luigi Usai - Definiti dall'Utente):\n"
             output_str += "-------------------------------------------------------\n"
             if not self.tensori_narrativi_data:
@@ -662,6 +5039,60 @@ class FunzioniNarratologia:
 
         self.app_ref.root.wait_window(dialog)
 
+    def calcola_tensore_narrativo(self):
+        """
+        Riempie i Tensori Narrativi definiti dall'utente con le co-occorrenze dei loro elementi nel corpus:
+        un tensore sparso Dimensioni x Segmenti che si può poi tagliare, sommare e contrarre (TensoreNarrativo).
+        """
+        if not self.tensori_narrativi_data:
+            messagebox.showwarning("Tensori Non Definiti", "Definisci prima le dimensioni dei Tensori Narrativi.", parent=self.app_ref.root)
+            return
+        if not self.app_ref.corpus_testuale:
+            messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.app_ref.root)
+            return
+        if not numpy_disponibile:
+            messagebox.showerror("NumPy Mancante", "La libreria NumPy è necessaria per il Tensore Narrativo.\nInstallala con: pip install numpy",
+                                 parent=self.app_ref.root)
+            return
+
+        lunghezza_segmento = simpledialog.askinteger("Segmenti del Tensore",
+                                                     "Parole per segmento narrativo (0 = un segmento per documento):",
+                                                     parent=self.app_ref.root, minvalue=0, initialvalue=200)
+        if lunghezza_segmento is None:
+            return
+        dimensioni_input = simpledialog.askstring("Dimensioni da Mostrare",
+                                                  "Dimensioni da mantenere, separate da virgola (vuoto = tutte, Segmenti inclusi).\n"
+                                                  f"Disponibili: {', '.join(self.tensori_narrativi_data)}, Segmenti",
+                                                  parent=self.app_ref.root)
+        if dimensioni_input is None:
+            return
+        da_mantenere = [d.strip() for d in dimensioni_input.split(',') if d.strip()]
+
+        modello = self.app_ref._get_modello_corpus()
+        dimensioni = dict(self.tensori_narrativi_data)
+
+        def calcola(controllo):
+            tensore = costruisci_tensore_narrativo(modello, dimensioni, lunghezza_segmento or None,
+                                                   avanzamento=controllo.aggiorna, verifica=controllo.verifica)
+            return tensore, (tensore.mantieni(*da_mantenere) if da_mantenere else tensore)
+
+        def mostra(risultato):
+            self.tensore_narrativo, vista = risultato
+            tensore = self.tensore_narrativo
+            intestazione = [f"Tensore Narrativo ({' x '.join(f'{d} {n}' for d, n in zip(tensore.dimensioni, tensore.forma))}):",
+                            f"Celle non nulle: {tensore.nnz:,}, co-occorrenze totali: {tensore.totale():,}", ""]
+            for dimensione in dimensioni:
+                # Marginale di ogni dimensione: quanto pesa ciascun elemento sommando su tutte le altre
+                marginale = tensore.mantieni(dimensione).celle()
+                intestazione.append(f"{dimensione}: " + ", ".join(f"{etichette[0]} {valore:,}" for etichette, valore in marginale))
+            intestazione += ["", f"Celle ({' x '.join(vista.dimensioni)}), dalla più alta:",
+                             "--------------------------------------------------"]
+            self.app_ref._display_righe("Tensore Narrativo", vista.celle(), intestazione + ([] if vista.nnz else ["Nessuna co-occorrenza trovata."]),
+                                        formatta=lambda i, cella: f"{' x '.join(cella[0])}: {cella[1]:,}")
+
+        self.app_ref.esecutore.avvia("Tensore narrativo", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Tensore Narrativo"))
+
 
     # --- Funzioni Core di Generazione Propp (Spostate qui o chiamate da qui) ---
     # Queste funzioni non dipendono direttamente dalla GUI, ma usano le definizioni FUNZIONI_PROPP
@@ -671,53 +5102,31 @@ class FunzioniNarratologia:
         Genera tutte le possibili sequenze ordinate (permutazioni)
         di un dato sottoinsieme di funzioni di Propp. L'ordine conta.
         Usa le funzioni standard o quelle utente se definite.
+        Le trame sono calcolate solo quando lette (PermutazioniPropp), non tutte in anticipo.
         """
-        # Usa le funzioni utente se definite, altrimenti le standard
-        funzioni_di_riferimento = self.matrice_propp_data_utente if self.matrice_propp_data_utente is not None else FUNZIONI_PROPP
-
-        if not all(codice.upper() in funzioni_di_riferimento for codice in lista_codici_funzioni):
-            invalid_codes = [c.upper() for c in lista_codici_funzioni if c.upper() not in funzioni_di_riferimento]
-            raise ValueError(f"Uno o più codici funzione non sono validi nel set di riferimento: {', '.join(invalid_codes)}")
+        return genera_trame_propp(lista_codici_funzioni, self.matrice_propp_data_utente)
 
-        permutazioni = list(itertools.permutations([cod.upper() for cod in lista_codici_funzioni]))
-
-        trame_generate = []
-        for p in permutazioni:
-            # Usa la descrizione dal set di riferimento
-            trama = [funzioni_di_riferimento.get(codice, f"Sconosciuta ({codice})") for codice in p]
-            trame_generate.append(" -> ".join(trama))
-        return trame_generate
+    def genera_trame_vincolate(self, lista_codici_funzioni, precedenze=PRECEDENZE_PROPP, adiacenze=ADIACENZE_PROPP):
+        """
+        Come genera_permutazioni_funzioni, ma solo le trame che rispettano i vincoli di precedenza
+        e di adiacenza (per default quelli narratologici di PRECEDENZE_PROPP e ADIACENZE_PROPP).
+        """
+        return TrameProppVincolate(lista_codici_funzioni, precedenze, adiacenze, self.matrice_propp_data_utente)
 
     def genera_combinazioni_funzioni(self, lista_codici_funzioni_disponibili, numero_funzioni_da_scegliere):
         """
         Genera tutti i possibili sottoinsiemi non ordinati (combinazioni)
         di funzioni di Propp da una lista più ampia. L'ordine NON conta.
         Usa le funzioni standard o quelle utente se definite.
+        I sottoinsiemi sono calcolati solo quando letti (CombinazioniPropp), non tutti in anticipo.
         """
-        # Usa le funzioni utente se definite, altrimenti le standard
-        funzioni_di_riferimento = self.matrice_propp_data_utente if self.matrice_propp_data_utente is not None else FUNZIONI_PROPP
-
-
-        if not all(codice.upper() in funzioni_di_riferimento for codice in lista_codici_funzioni_disponibili):
-             invalid_codes = [c.upper() for c in lista_codici_funzioni_disponibili if c.upper() not in funzioni_di_riferimento]
-             raise ValueError(f"Uno o più codici funzione nella lista dei disponibili non sono validi nel set di riferimento: {', '.join(invalid_codes)}")
-
-        if numero_funzioni_da_scegliere > len(lista_codici_funzioni_disponibili):
-            raise ValueError("Il numero di funzioni da scegliere non può essere maggiore delle funzioni disponibili.")
-
-        combinazioni = list(itertools.combinations([cod.upper() for cod in lista_codici_funzioni_disponibili], numero_funzioni_da_scegliere))
-
-        sottoinsiemi_generati = []
-        for c in combinazioni:
-            # Usa la descrizione dal set di riferimento e ordina per coerenza di visualizzazione
-            sottoinsieme = sorted([funzioni_di_riferimento.get(codice, f"Sconosciuta ({codice})") for codice in c])
-            sottoinsiemi_generati.append(", ".join(sottoinsieme))
-        return sottoinsiemi_generati
+        return genera_sottoinsiemi_propp(lista_codici_funzioni_disponibili, numero_funzioni_da_scegliere,
+                                         self.matrice_propp_data_utente)
 
     # --- Interfacce GUI per Generatori Propp ---
 
-    def _mostra_risultati_generatore_propp(self, titolo, risultati, max_visualizzati=200):
-        """Helper per visualizzare risultati potenzialmente lunghi in una nuova finestra."""
+    def _mostra_risultati_generatore_propp(self, titolo, risultati, riepilogo=None):
+        """Mostra tutti i risultati in una nuova finestra, con un visualizzatore che legge solo le righe visibili."""
         if not risultati:
             self.app_ref._display_output(titolo, "Nessun risultato generato.")
             messagebox.showinfo(titolo, "Nessun risultato da visualizzare.", parent=self.app_ref.root)
@@ -729,24 +5138,74 @@ class FunzioniNarratologia:
         result_window.transient(self.app_ref.root)
         result_window.grab_set()
 
-        tk.Label(result_window, text=f"{titolo} (Prime {max_visualizzati} occorrenze se più lunghe):", font=("Arial", 12)).pack(pady=5)
-
-        text_area = scrolledtext.ScrolledText(result_window, wrap=tk.WORD, width=90, height=25)
-        text_area.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        tk.Label(result_window, text=titolo, font=("Arial", 12)).pack(pady=5)
+        tk.Button(result_window, text="Chiudi", command=result_window.destroy).pack(side=tk.BOTTOM, pady=10)
+
+        visualizzatore = VisualizzatoreRisultati(result_window, self.app_ref.esecutore, altezza=25)
+        if isinstance(risultati, SequenzaProppPerRango):
+            # Risultati calcolati per rango: salto diretto, campionamento e salvataggio di tratti senza generarli tutti
+            azioni = tk.Frame(result_window)
+            azioni.pack(side=tk.BOTTOM, pady=(0, 5))
+            tk.Button(azioni, text="Vai al Numero...",
+                      command=lambda: self._vai_a_risultato_propp(result_window, visualizzatore, risultati)).pack(side=tk.LEFT, padx=5)
+            tk.Button(azioni, text="Campione Casuale...",
+                      command=lambda: self._campione_risultati_propp(result_window, risultati)).pack(side=tk.LEFT, padx=5)
+            tk.Button(azioni, text="Salva su File...",
+                      command=lambda: self._salva_risultati_propp(result_window, risultati)).pack(side=tk.LEFT, padx=5)
+            if graphviz_disponibile and isinstance(risultati, PermutazioniPropp):
+                tk.Button(azioni, text="Diagrammi...",
+                          command=lambda: self._diagrammi_risultati_propp(result_window, risultati)).pack(side=tk.LEFT, padx=5)
+        visualizzatore.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+        visualizzatore.mostra("", risultati, formatta=lambda i, item: f"{i+1}. {item}")
+
+        numero = risultati.numero if isinstance(risultati, SequenzaProppPerRango) else len(risultati)
+        self.app_ref._display_output(titolo, riepilogo or f"{numero:,} risultati generati (scorribili ed esportabili nella finestra dei risultati).")
+
+    def _vai_a_risultato_propp(self, finestra, visualizzatore, sequenza):
+        numero = simpledialog.askinteger("Vai al Numero", f"Numero ({sequenza.ELEMENTO}, 1-{sequenza.numero:,}):",
+                                         parent=finestra, minvalue=1, maxvalue=sequenza.numero)
+        if numero is not None:
+            visualizzatore.vai_alla_riga(numero - 1)
+
+    def _campione_risultati_propp(self, finestra, sequenza):
+        numero = simpledialog.askinteger("Campione Casuale", f"Quanti elementi ({sequenza.ELEMENTI}) estrarre a caso?", parent=finestra,
+                                         minvalue=1, maxvalue=min(sequenza.numero, 1000000), initialvalue=min(sequenza.numero, 100))
+        if numero is None:
+            return
+        ranghi = sequenza.campione(numero)
+        self._mostra_risultati_generatore_propp(f"Campione di {numero:,} {sequenza.ELEMENTI} su {sequenza.numero:,}",
+                                                SequenzaPigra(ranghi, lambda rango: f"[{sequenza.ELEMENTO} {rango+1:,}] {sequenza[rango]}"))
+
+    def _salva_risultati_propp(self, finestra, sequenza):
+        inizio = simpledialog.askinteger("Salva su File", f"Dal numero (1-{sequenza.numero:,}):", parent=finestra,
+                                         minvalue=1, maxvalue=sequenza.numero, initialvalue=1)
+        if inizio is None:
+            return
+        numero = simpledialog.askinteger("Salva su File", f"Quanti elementi ({sequenza.ELEMENTI}) salvare? (0 = tutti i successivi)",
+                                         parent=finestra, minvalue=0, initialvalue=min(sequenza.numero - inizio + 1, 1000000))
+        if numero is None:
+            return
+        percorso = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[("CSV", "*.csv")],
+                                                title=f"Salva {sequenza.ELEMENTI.capitalize()} di Propp", parent=finestra)
+        if not percorso:
+            return
 
-        output_str = ""
-        for i, item in enumerate(risultati):
-            if i >= max_visualizzati:
-                output_str += f"\n... e altri {len(risultati) - max_visualizzati} risultati."
-                break
-            output_str += f"{i+1}. {item}\n"
+        def calcola(controllo):
+            return scrivi_risultati_propp(sequenza, percorso, inizio - 1, numero or None,
+                                          avanzamento=controllo.aggiorna, verifica=controllo.verifica)
 
-        text_area.insert(tk.END, output_str)
-        text_area.config(state=tk.DISABLED)
+        self.app_ref.esecutore.avvia(f"Salvataggio {sequenza.ELEMENTI} Propp", calcola,
+                                     al_termine=lambda scritte: messagebox.showinfo("Salvataggio Completato", f"Righe salvate ({sequenza.ELEMENTI}): {scritte:,}\nFile: {percorso}",
+                                                                                    parent=self.app_ref.root),
+                                     in_errore=self._errore_generatore_propp)
 
-        tk.Button(result_window, text="Chiudi", command=result_window.destroy).pack(pady=10)
-        self.app_ref._display_output(titolo, f"Visualizzati {min(len(risultati), max_visualizzati)} risultati su {len(risultati)} totali.")
 
+    def _errore_generatore_propp(self, e):
+        """Mostra gli errori sollevati dai generatori eseguiti in background."""
+        if isinstance(e, ValueError):
+            messagebox.showerror("Errore Input", str(e), parent=self.app_ref.root)
+        else:
+            messagebox.showerror("Errore Inatteso", f"Si è verificato un errore: {e}", parent=self.app_ref.root)
 
     def genera_permutazioni_propp(self):
         """Genera permutazioni di funzioni di Propp scelte dall'utente (GUI)."""
@@ -760,20 +5219,66 @@ class FunzioniNarratologia:
         lista_codici_funzioni = [cod.strip().upper() for cod in codici_input.split(',')]
 
         try:
-            if len(lista_codici_funzioni) > 8: # Limite consigliato per evitare troppe permutazioni (8! = 40320)
-                 if not messagebox.askyesno("Attenzione", f"Stai per generare permutazioni per {len(lista_codici_funzioni)} funzioni. Questo potrebbe richiedere molto tempo e memoria ({math.factorial(len(lista_codici_funzioni)):,} permutazioni stimate). Continuare?", parent=self.app_ref.root):
-                    return
+            # Nessun limite al numero di codici: le trame sono calcolate solo quando visualizzate o salvate
+            def calcola(controllo):
+                controllo.aggiorna(None, "Generazione permutazioni...")
+                return self.genera_permutazioni_funzioni(lista_codici_funzioni)
 
-            trame_generate = self.genera_permutazioni_funzioni(lista_codici_funzioni)
+            def mostra(trame_generate):
+                titolo_output = f"Trame Generate (Permutazioni di: {', '.join(lista_codici_funzioni)}) - {trame_generate.numero:,} totali"
+                self._mostra_risultati_generatore_propp(titolo_output, trame_generate)
 
-            titolo_output = f"Trame Generate (Permutazioni di: {', '.join(lista_codici_funzioni)}) - {len(trame_generate)} totali"
-            self._mostra_risultati_generatore_propp(titolo_output, trame_generate)
+            self.app_ref.esecutore.avvia("Permutazioni Propp", calcola, al_termine=mostra,
+                                         in_errore=self._errore_generatore_propp)
 
         except ValueError as e:
             messagebox.showerror("Errore Input", str(e), parent=self.app_ref.root)
         except Exception as e:
             messagebox.showerror("Errore Inatteso", f"Si è verificato un errore: {e}", parent=self.app_ref.root)
 
+    def genera_trame_vincolate_propp(self):
+        """Genera le sole trame che rispettano vincoli di precedenza e adiacenza tra funzioni di Propp (GUI)."""
+        codici_input = simpledialog.askstring("Genera Trame Vincolate (Propp)",
+                                               "Inserisci i codici delle funzioni di Propp separati da virgola (es. F2,F3,F8,F11,F16,F18):",
+                                               parent=self.app_ref.root)
+        if not codici_input:
+            return
+        lista_codici_funzioni = [cod.strip().upper() for cod in codici_input.split(',') if cod.strip()]
+
+        vincoli_input = simpledialog.askstring("Vincoli Narratologici",
+                                                "Vincoli tra le funzioni, separati da virgola:\n"
+                                                "  F2<F3   F2 viene prima di F3 (anche non subito)\n"
+                                                "  F6<<F7  F7 segue subito F6\n"
+                                                "Contano solo i vincoli tra funzioni presenti nella trama (le precedenze sono transitive).",
+                                                initialvalue=formatta_vincoli_propp(PRECEDENZE_PROPP, ADIACENZE_PROPP),
+                                                parent=self.app_ref.root)
+        if vincoli_input is None:
+            return
+
+        try:
+            precedenze, adiacenze = leggi_vincoli_propp(vincoli_input)
+
+            def calcola(controllo):
+                controllo.aggiorna(None, "Conteggio trame vincolate...")
+                trame = self.genera_trame_vincolate(lista_codici_funzioni, precedenze, adiacenze)
+                trame.conta(verifica=controllo.verifica) # In background: il visualizzatore ne chiede subito il numero
+                return trame
+
+            def mostra(trame):
+                if not trame.numero:
+                    messagebox.showinfo("Nessuna Trama", "Nessuna sequenza delle funzioni scelte rispetta tutti i vincoli.",
+                                        parent=self.app_ref.root)
+                    return
+                titolo_output = (f"Trame Vincolate ({', '.join(trame.codici)}) - {trame.numero:,} valide su "
+                                 f"{math.factorial(len(trame.codici)):,} permutazioni")
+                self._mostra_risultati_generatore_propp(titolo_output, trame)
+
+            self.app_ref.esecutore.avvia("Trame vincolate Propp", calcola, al_termine=mostra,
+                                         in_errore=self._errore_generatore_propp)
+
+        except ValueError as e:
+            messagebox.showerror("Errore Input", str(e), parent=self.app_ref.root)
+
     def genera_combinazioni_propp(self):
         """Genera combinazioni di funzioni di Propp da un set disponibile (GUI)."""
         codici_disponibili_input = simpledialog.askstring("Genera Sottoinsiemi Propp (Combinazioni)",
@@ -795,12 +5300,24 @@ class FunzioniNarratologia:
             if numero_da_scegliere is None:
                 return
 
-            combinazioni = self.genera_combinazioni_funzioni(lista_codici_disponibili, numero_da_scegliere)
-
-
-            titolo_output = (f"Sottoinsiemi Generati (Combinazioni di {numero_da_scegliere} da: "
-                             f"{', '.join(lista_codici_disponibili)}) - {len(combinazioni)} totali")
-            self._mostra_risultati_generatore_propp(titolo_output, combinazioni)
+            def calcola(controllo):
+                controllo.aggiorna(None, "Generazione combinazioni...")
+                return self.genera_combinazioni_funzioni(lista_codici_disponibili, numero_da_scegliere)
+
+            def mostra(combinazioni):
+                titolo_output = (f"Sottoinsiemi Generati (Combinazioni di {numero_da_scegliere} da: "
+                                 f"{', '.join(lista_codici_disponibili)}) - {combinazioni.numero:,} totali")
+                statistiche = statistiche_combinazioni_propp(combinazioni.codici, numero_da_scegliere, combinazioni.funzioni)
+                riepilogo = [f"Sottoinsiemi di {statistiche.scelte} funzioni su {statistiche.funzioni}: {statistiche.combinazioni:,}",
+                             f"Sequenze ordinate di {statistiche.scelte} funzioni diverse: {statistiche.disposizioni:,}",
+                             f"Sottoinsiemi che contengono una data funzione: {statistiche.per_funzione:,}",
+                             f"Sottoinsiemi con almeno una funzione di ogni fase presente: {statistiche.con_tutte_le_fasi:,}",
+                             "", "Sottoinsiemi con almeno una funzione della fase:"]
+                riepilogo += [f"  {fase}: {conteggio:,}" for fase, conteggio in statistiche.per_fase.items()]
+                self._mostra_risultati_generatore_propp(titolo_output, combinazioni, "\n".join(riepilogo))
+
+            self.app_ref.esecutore.avvia("Combinazioni Propp", calcola, al_termine=mostra,
+                                         in_errore=self._errore_generatore_propp)
 
         except ValueError as e:
             messagebox.showerror("Errore Input", str(e), parent=self.app_ref.root)
@@ -841,22 +5358,7 @@ class FunzioniNarratologia:
             return
 
         try:
-            dot = graphviz.Digraph(comment="Sequenza Funzioni di Propp (Utente)")
-            dot.attr(rankdir='LR') # Layout da Sinistra a Destra
-            dot.attr('node', shape='box', style='rounded,filled', fillcolor='lightblue', fontname='Arial', fontsize='10')
-            dot.attr('edge', fontname='Arial', fontsize='9', color='gray')
-
-            previous_node_id = None
-            for i, code in enumerate(propp_codes_sequence):
-                # Usa la descrizione dal set di riferimento
-                function_description = funzioni_di_riferimento.get(code, f"Sconosciuta ({code})")
-                label = f"{code}\n{textwrap.fill(function_description, width=25)}" # width ridotto per nodi più compatti
-                node_id = f"node_user_{i}"
-
-                dot.node(node_id, label)
-                if previous_node_id is not None:
-                    dot.edge(previous_node_id, node_id)
-                previous_node_id = node_id
+            dot = digrafo_sequenza_propp(propp_codes_sequence, funzioni_di_riferimento)
 
             # Chiedi dove salvare
             file_path = filedialog.asksaveasfilename(
@@ -903,6 +5405,81 @@ class FunzioniNarratologia:
             self.app_ref._display_output("Errore Visualizzazione Propp", f"Errore: {e}")
 
 
+    def visualizza_sequenze_propp_in_serie(self):
+        """
+        Disegna in una cartella i diagrammi di molte sequenze di Propp (da un file o dalle permutazioni
+        di alcuni codici), in parallelo e riusando quelli già disegnati, con un foglio SVG riassuntivo.
+        """
+        if not graphviz_disponibile:
+            messagebox.showerror("Graphviz non disponibile",
+                                 "La libreria Graphviz e il software 'dot' sono necessari per questa funzionalità.\n"
+                                 "Installali e assicurati che 'dot' sia nel PATH di sistema.",
+                                 parent=self.app_ref.root)
+            return
+        if messagebox.askyesno("Sequenze da Disegnare",
+                               "Leggere le sequenze da un file?\n(Sì: file di testo con una sequenza per riga, oppure un CSV "
+                               "salvato dai generatori di Propp; No: permutazioni di alcuni codici)", parent=self.app_ref.root):
+            percorso_sequenze = filedialog.askopenfilename(title="File di Sequenze di Propp", parent=self.app_ref.root,
+                                                           filetypes=[("Testo o CSV", "*.txt *.csv"), ("Tutti i file", "*.*")])
+            if not percorso_sequenze:
+                return
+            sequenze, totale = leggi_sequenze_propp(percorso_sequenze), None
+        else:
+            codici_input = simpledialog.askstring("Permutazioni da Disegnare",
+                                                   "Codici delle funzioni di Propp separati da virgola (es. F8,F11,F14,F16,F18):",
+                                                   parent=self.app_ref.root)
+            if not codici_input:
+                return
+            try:
+                permutazioni = self.genera_permutazioni_funzioni([cod.strip().upper() for cod in codici_input.split(',') if cod.strip()])
+            except ValueError as e:
+                messagebox.showerror("Errore Input", str(e), parent=self.app_ref.root)
+                return
+            self._diagrammi_risultati_propp(self.app_ref.root, permutazioni)
+            return
+        self._avvia_diagrammi_propp(self.app_ref.root, sequenze, totale)
+
+    def _diagrammi_risultati_propp(self, finestra, sequenza):
+        """Disegna un tratto consecutivo di trame di un generatore di Propp."""
+        inizio = simpledialog.askinteger("Diagrammi delle Trame", f"Dalla trama numero (1-{sequenza.numero:,}):", parent=finestra,
+                                         minvalue=1, maxvalue=sequenza.numero, initialvalue=1)
+        if inizio is None:
+            return
+        numero = simpledialog.askinteger("Diagrammi delle Trame", "Quante trame disegnare?", parent=finestra,
+                                         minvalue=1, initialvalue=min(sequenza.numero - inizio + 1, 100))
+        if numero is None:
+            return
+        numero = min(numero, sequenza.numero - inizio + 1)
+        righe = ((rango + 1, codici) for rango, codici in sequenza.righe(inizio - 1, numero))
+        self._avvia_diagrammi_propp(finestra, righe, numero)
+
+    def _avvia_diagrammi_propp(self, finestra, sequenze, totale):
+        cartella = filedialog.askdirectory(title="Cartella dei Diagrammi", parent=finestra)
+        if not cartella:
+            return
+
+        def calcola(controllo):
+            return renderizza_sequenze_propp(sequenze, cartella, funzioni=self.matrice_propp_data_utente, totale=totale,
+                                             avanzamento=controllo.aggiorna, verifica=controllo.verifica)
+
+        def mostra(risultato):
+            righe = [f"{numero}. {', '.join(codici)} -> {nome}{' (cache)' if in_cache else ''}"
+                     for numero, codici, nome, in_cache in risultato.diagrammi]
+            piede = ["", f"Diagrammi disegnati: {risultato.renderizzati:,}, già presenti in cache: {risultato.dalla_cache:,}"]
+            piede += [f"Foglio riassuntivo: {percorso}" for percorso in risultato.fogli_contatti]
+            self.app_ref._display_righe(f"Diagrammi Propp in {risultato.cartella}", righe, piede=piede)
+
+        def errore(e):
+            if isinstance(e, graphviz.backend.execute.ExecutableNotFound):
+                messagebox.showerror("Errore Graphviz",
+                                     "Eseguibile Graphviz (dot) non trovato.\n"
+                                     "Assicurati che Graphviz sia installato e che la directory 'bin' sia nel PATH di sistema.",
+                                     parent=self.app_ref.root)
+            else:
+                self._errore_generatore_propp(e)
+
+        self.app_ref.esecutore.avvia("Diagrammi Propp", calcola, al_termine=mostra, in_errore=errore)
+
     def salva_dati_narratologici_json(self):
         """Salva i dati narratologici (Greimas, Propp Utente, Tensori) in un file JSON."""
         if not self.matrice_greimas_data and not self.matrice_propp_data_utente and not self.tensori_narrativi_data:
@@ -960,6 +5537,7 @@ class FunzioniNarratologia:
                 caricati.append("Matrice Propp (Utente)")
             if "tensori_narrativi" in dati_caricati:
                 self.tensori_narrativi_data = dati_caricati["tensori_narrativi"]
+                self.tensore_narrativo = None
                 caricati.append("Tensori Narrativi")
 
             if caricati:
@@ -1094,6 +5672,7 @@ class FunzioniNarratologia:
                 caricati.append("Matrice Propp (Utente)")
             if "Tensori Narrativi" in dati_caricati:
                 self.tensori_narrativi_data = dati_caricati["Tensori Narrativi"]
+                self.tensore_narrativo = None
                 caricati.append("Tensori Narrativi")
 
             if caricati:
@@ -1149,102 +5728,481 @@ class FunzioniGrice:
         if not self._check_corpus_e_nltk(check_punkt=True):
              return
 
-        testo_completo = ' '.join(self.app_ref.corpus_testuale)
+        modello = self.app_ref._get_modello_corpus()
+        lingua = self.app_ref.funzioni_usability.lingua_analisi
+        testo_completo = modello.anteprima(101) # Basta l'inizio del testo per l'intestazione
 
         self.app_ref._display_output("Analisi Griceana Semplificata", "Esecuzione analisi Griceana semplificata...")
-        output_str = "--- Analisi Griceana Semplificata ---\n"
-        output_str += f"Testo analizzato (primi 100 caratteri): \"{testo_completo[:100]}...\"" if len(testo_completo) > 100 else f"Testo analizzato: \"{testo_completo}\""
-        output_str += "\n(Nota: Questa analisi è MOLTO semplificata e basata su indicatori superficiali. Non è un'analisi pragmatica completa.)\n"
-        output_str += "----------------------------------------------------------------------------------------------------\n"
 
+        def calcola(controllo):
+            output_str = "--- Analisi Griceana Semplificata ---\n"
+            output_str += f"Testo analizzato (primi 100 caratteri): \"{testo_completo[:100]}...\"" if len(testo_completo) > 100 else f"Testo analizzato: \"{testo_completo}\""
+            output_str += "\n(Nota: Questa analisi è MOLTO semplificata e basata su indicatori superficiali. Non è un'analisi pragmatica completa.)\n"
+            output_str += "----------------------------------------------------------------------------------------------------\n"
 
-        try:
-            # Usa la lingua impostata nelle funzioni di usabilità
-            sentences = nltk.sent_tokenize(testo_completo, language=self.app_ref.funzioni_usability.lingua_analisi)
-            num_sentences = len(sentences)
-            output_str += f"\nNumero di frasi: {num_sentences}"
-
-            if num_sentences == 0:
-                output_str += "\nNessuna frase trovata per l'analisi."
-                self.app_ref._display_output("Analisi Griceana Semplificata", output_str)
-                return
 
-            # Usa la lingua impostata per la tokenizzazione
-            all_words = nltk.word_tokenize(testo_completo, language=self.app_ref.funzioni_usability.lingua_analisi)
-            num_words = len(all_words)
-            output_str += f"\nNumero totale di token (parole e punteggiatura): {num_words}"
-
-            # Indicatori per la Massima della Quantità e del Modo (Concisezza/Prolissità)
-            # Consideriamo solo le parole alfabetiche per la lunghezza media delle frasi
-            sentence_word_lengths = []
-            for s in sentences:
-                words_in_sentence = [w for w in nltk.word_tokenize(s, language=self.app_ref.funzioni_usability.lingua_analisi) if w.isalpha()]
-                sentence_word_lengths.append(len(words_in_sentence))
-
-
-            if sentence_word_lengths and sum(sentence_word_lengths) > 0: # Assicura che ci siano parole in totale
-                avg_sentence_length = sum(sentence_word_lengths) / len(sentence_word_lengths)
-                output_str += f"\nLunghezza media delle frasi (solo parole alfabetiche): {avg_sentence_length:.2f}"
-
-                # Semplici soglie per identificare frasi "troppo lunghe" o "troppo corte"
-                # Queste soglie sono arbitrarie e dipendono dal tipo di testo!
-                long_sentence_threshold = avg_sentence_length * 1.5
-                short_sentence_threshold = avg_sentence_length * 0.5
-
-                potential_quantity_manner_issues = []
-                for i, s_len in enumerate(sentence_word_lengths):
-                    original_sentence = sentences[i]
-                    if s_len > long_sentence_threshold and s_len > 15: # Soglia minima per evitare frasi corte "lunghe" rispetto alla media bassa
-                         potential_quantity_manner_issues.append(f"Frase {i+1} ({s_len} parole): Potrebbe essere troppo lunga o prolissa. \"{original_sentence[:70]}...\"")
-                    elif s_len < short_sentence_threshold and s_len > 0 and s_len < 4: # Soglia massima per evitare frasi vuote/cortissime
-                         potential_quantity_manner_issues.append(f"Frase {i+1} ({s_len} parole): Potrebbe essere troppo breve o poco informativa. \"{original_sentence[:70]}...\"")
-                    elif s_len == 0 and original_sentence.strip(): # Frase non vuota ma senza parole alfabetiche (es. solo punteggiatura)
-                         potential_quantity_manner_issues.append(f"Frase {i+1} (0 parole): Contiene solo punteggiatura o simboli. \"{original_sentence[:70]}...\"")
-
-
-                if potential_quantity_manner_issues:
-                    output_str += "\n\nPotenziali problemi di Quantità o Modo (basati sulla lunghezza delle frasi):"
-                    for issue in potential_quantity_manner_issues:
-                        output_str += f"\n- {issue}"
+            try:
+                # Usa la lingua impostata nelle funzioni di usabilità
+                risultato = analisi_griceana(modello, lingua, verifica=controllo.verifica)
+                output_str += f"\nNumero di frasi: {risultato.frasi}"
+
+                if risultato.frasi == 0:
+                    output_str += "\nNessuna frase trovata per l'analisi."
+                    return output_str, None
+
+                output_str += f"\nNumero totale di token (parole e punteggiatura): {risultato.token}"
+
+                # Indicatori per la Massima della Quantità e del Modo (Concisezza/Prolissità)
+                if risultato.lunghezza_media is not None:
+                    output_str += f"\nLunghezza media delle frasi (solo parole alfabetiche): {risultato.lunghezza_media:.2f}"
+
+                    descrizioni_problemi = {
+                        "lunga": "Potrebbe essere troppo lunga o prolissa.",
+                        "breve": "Potrebbe essere troppo breve o poco informativa.",
+                        "solo_punteggiatura": "Contiene solo punteggiatura o simboli.",
+                    }
+                    if risultato.problemi_quantita_modo:
+                        output_str += "\n\nPotenziali problemi di Quantità o Modo (basati sulla lunghezza delle frasi):"
+                        for problema in risultato.problemi_quantita_modo:
+                            output_str += (f"\n- Frase {problema.frase} ({problema.parole} parole): "
+                                           f"{descrizioni_problemi[problema.tipo]} \"{problema.testo[:70]}...\"")
+                    else:
+                        output_str += "\n\nLunghezza delle frasi nella norma (secondo questo semplice indicatore)."
                 else:
-                    output_str += "\n\nLunghezza delle frasi nella norma (secondo questo semplice indicatore)."
-            else:
-                 output_str += "\n\nNon è stato possibile calcolare la lunghezza media delle frasi (nessuna parola alfabetica trovata)."
+                     output_str += "\n\nNon è stato possibile calcolare la lunghezza media delle frasi (nessuna parola alfabetica trovata)."
 
 
-            # Ripetizioni semplici (potenziale violazione Quantità: Eccessivamente informativo? o Modo: Non conciso?)
-            # Qui cerchiamo solo parole alfabetiche ripetute immediatamente vicine, un indicatore molto grossolano
-            alpha_words_lower = [w.lower() for w in all_words if w.isalpha()]
-            repeated_words = [alpha_words_lower[i] for i in range(len(alpha_words_lower)-1) if alpha_words_lower[i] == alpha_words_lower[i+1]]
-            if repeated_words:
-                output_str += f"\n\nPotenziali ripetizioni consecutive di parole (indicatore grezzo di Modo/Quantità): {set(repeated_words)}"
-                output_str += "\n(Nota: Un'analisi vera richiederebbe il confronto tra frasi e una comprensione della retorica e del contesto.)"
-            else:
-                output_str += "\n\nNessuna ripetizione consecutiva di parole alfabetiche trovata."
+                # Ripetizioni semplici (potenziale violazione Quantità: Eccessivamente informativo? o Modo: Non conciso?)
+                if risultato.ripetizioni:
+                    output_str += f"\n\nPotenziali ripetizioni consecutive di parole (indicatore grezzo di Modo/Quantità): {set(risultato.ripetizioni)}"
+                    output_str += "\n(Nota: Un'analisi vera richiederebbe il confronto tra frasi e una comprensione della retorica e del contesto.)"
+                else:
+                    output_str += "\n\nNessuna ripetizione consecutiva di parole alfabetiche trovata."
 
 
-            # Indicatori per la Massima della Qualità (Incertezza/Hedging - MOLTO LIMITATO)
-            hedging_indicators_found = []
-            words_lower = [w.lower() for w in all_words]
-            for term in HEDGING_TERMS:
-                if term in words_lower:
-                    hedging_indicators_found.append(term)
+                # Indicatori per la Massima della Qualità (Incertezza/Hedging - MOLTO LIMITATO)
+                if risultato.indicatori_hedging:
+                    output_str += f"\n\nPotenziali indicatori di incertezza/hedging (potenziale rilevanza per la Massima di Qualità): {set(risultato.indicatori_hedging)}"
+                    output_str += "\n(Nota: La presenza di questi termini non significa necessariamente falsità, ma esitazione, mancanza di certezza o strategia retorica.)"
+                else:
+                    output_str += "\n\nNessun indicatore superficiale di incertezza/hedging trovato."
 
-            if hedging_indicators_found:
-                output_str += f"\n\nPotenziali indicatori di incertezza/hedging (potenziale rilevanza per la Massima di Qualità): {set(hedging_indicators_found)}"
-                output_str += "\n(Nota: La presenza di questi termini non significa necessariamente falsità, ma esitazione, mancanza di certezza o strategia retorica.)"
-            else:
-                output_str += "\n\nNessun indicatore superficiale di incertezza/hedging trovato."
+                output_str += "\n\n--- Analisi Completata (Ricorda le Grandi Limitazioni) ---"
+                output_str += "\nUna vera analisi Griceana richiede comprensione del contesto, intenzione, common sense e modelli linguistici molto avanzati."
+
+            except AnalisiAnnullata:
+                raise
+            except Exception as e:
+                output_str += f"\n\nSi è verificato un errore durante l'analisi Griceana: {e}"
+                return output_str, e
+            return output_str, None
 
-            output_str += "\n\n--- Analisi Completata (Ricorda le Grandi Limitazioni) ---"
-            output_str += "\nUna vera analisi Griceana richiede comprensione del contesto, intenzione, common sense e modelli linguistici molto avanzati."
+        def mostra(risultato):
+            output_str, errore = risultato
+            if errore is not None:
+                messagebox.showerror("Errore Analisi Griceana", f"Si è verificato un errore: {errore}", parent=self.app_ref.root)
+            self.app_ref._display_output("Analisi Griceana Semplificata", output_str)
 
+        self.app_ref.esecutore.avvia("Analisi griceana", calcola, al_termine=mostra,
+                                     in_errore=self.app_ref._errore_analisi("Errore Analisi Griceana"))
 
-        except Exception as e:
-            output_str += f"\n\nSi è verificato un errore durante l'analisi Griceana: {e}"
-            messagebox.showerror("Errore Analisi Griceana", f"Si è verificato un errore: {e}", parent=self.app_ref.root)
 
-        self.app_ref._display_output("Analisi Griceana Semplificata", output_str)
+# --- Esecuzione delle Analisi in Background ---
+
+class AnalisiAnnullata(Exception):
+    """Sollevata all'interno di un'analisi in background quando l'utente ne chiede l'annullamento."""
+
+
+class ControlloAnalisi:
+    """
+    Oggetto passato alle funzioni eseguite in background: permette di riportare l'avanzamento
+    e di accorgersi di una richiesta di annullamento. Non tocca mai i widget Tk.
+    """
+    def __init__(self, descrizione):
+        self.descrizione = descrizione
+        self.frazione = None # Avanzamento 0..1, None se indeterminato
+        self.messaggio = descrizione
+        self._evento_annullamento = threading.Event()
+
+    def annulla(self):
+        self._evento_annullamento.set()
+
+    def annullata(self):
+        return self._evento_annullamento.is_set()
+
+    def verifica(self):
+        """Interrompe l'analisi (sollevando AnalisiAnnullata) se l'utente l'ha annullata."""
+        if self._evento_annullamento.is_set():
+            raise AnalisiAnnullata(self.descrizione)
+
+    def aggiorna(self, frazione=None, messaggio=None):
+        """Registra l'avanzamento (letto dalla GUI al prossimo controllo) e verifica l'annullamento."""
+        self.frazione = frazione
+        if messaggio:
+            self.messaggio = messaggio
+        self.verifica()
+
+
+class EsecutoreAnalisi:
+    """
+    Esegue le analisi su un pool di thread, così il mainloop di Tk resta reattivo.
+    I risultati tornano alla GUI tramite polling con root.after: le callback
+    al_termine/in_errore sono sempre eseguite nel thread di Tk.
+    """
+    INTERVALLO_POLLING_MS = 100
+
+    def __init__(self, root, al_cambio_stato=None, max_thread=4):
+        self.root = root
+        self.al_cambio_stato = al_cambio_stato # Chiamata (nel thread Tk) con la lista dei ControlloAnalisi attivi
+        self._pool = ThreadPoolExecutor(max_workers=max_thread, thread_name_prefix="analisi")
+        self._attive = [] # (future, controllo, al_termine, in_errore)
+        self._polling_attivo = False
+        self._locale = threading.local() # Il ControlloAnalisi dell'analisi in esecuzione in ogni thread del pool
+
+    def avvia(self, descrizione, funzione, *args, al_termine=None, in_errore=None, **kwargs):
+        """
+        Esegue funzione(controllo, *args, **kwargs) in background.
+        al_termine(risultato) e in_errore(eccezione) vengono chiamate nel thread di Tk.
+        """
+        controllo = ControlloAnalisi(descrizione)
+        future = self._pool.submit(self._esegui, funzione, controllo, *args, **kwargs)
+        self._attive.append((future, controllo, al_termine, in_errore))
+        if not self._polling_attivo:
+            self._polling_attivo = True
+            self.root.after(self.INTERVALLO_POLLING_MS, self._controlla)
+        self._notifica_stato()
+        return controllo
+
+    def _esegui(self, funzione, controllo, *args, **kwargs):
+        self._locale.controllo = controllo
+        try:
+            return funzione(controllo, *args, **kwargs)
+        finally:
+            self._locale.controllo = None
+
+    def aggiorna_analisi_corrente(self, frazione=None, messaggio=None):
+        """
+        Avanzamento dell'analisi eseguita nel thread chiamante, per il codice che non riceve il ControlloAnalisi
+        (es. il corpus in streaming che si carica in memoria). Fuori dal pool non fa nulla.
+        """
+        controllo = getattr(self._locale, "controllo", None)
+        if controllo is not None:
+            controllo.aggiorna(frazione, messaggio)
+
+    def annulla_tutte(self):
+        """Chiede l'annullamento di tutte le analisi in corso."""
+        for _, controllo, _, _ in self._attive:
+            controllo.annulla()
+
+    def controlli_attivi(self):
+        return [controllo for _, controllo, _, _ in self._attive]
+
+    def chiudi(self):
+        self.annulla_tutte()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _notifica_stato(self):
+        if self.al_cambio_stato:
+            self.al_cambio_stato(self.controlli_attivi())
+
+    def _controlla(self):
+        """Consegna alla GUI i risultati delle analisi terminate (eseguito nel thread di Tk)."""
+        # Un solo done() per analisi: una che termina durante lo smistamento resta in _attive per il giro successivo
+        terminate, attive = [], []
+        for voce in self._attive:
+            (terminate if voce[0].done() else attive).append(voce)
+        self._attive = attive
+        for future, controllo, al_termine, in_errore in terminate:
+            try:
+                risultato = future.result()
+            except AnalisiAnnullata:
+                continue # Annullata dall'utente: nessun risultato da mostrare
+            except Exception as e:
+                if in_errore:
+                    in_errore(e)
+                else:
+                    messagebox.showerror("Errore Analisi", f"Errore durante '{controllo.descrizione}': {e}", parent=self.root)
+                continue
+            if al_termine:
+                try:
+                    al_termine(risultato)
+                except Exception as e: # Un errore nella visualizzazione non deve fermare il polling delle altre analisi
+                    messagebox.showerror("Errore Visualizzazione", f"Errore nel mostrare i risultati di '{controllo.descrizione}': {e}", parent=self.root)
+        self._notifica_stato()
+        if self._attive:
+            self.root.after(self.INTERVALLO_POLLING_MS, self._controlla)
+        else:
+            self._polling_attivo = False
+
+
+# --- Visualizzazione Paginata dei Risultati ---
+
+class RighePigre:
+    """
+    Righe di un risultato lette solo quando servono: da una sequenza con accesso diretto
+    (lista, array, colonna dell'indice SQLite) oppure da un generatore, consumato a pagine
+    e memorizzato man mano. Il visualizzatore legge solo le righe visibili; ricerca ed
+    esportazione le scorrono tutte, anche da un thread in background.
+    """
+    PAGINA = 1000
+
+    def __init__(self, sorgente, totale=None):
+        self._lock = threading.Lock()
+        if isinstance(sorgente, Sequence):
+            self._lette = sorgente
+            self._iteratore = None
+            # 'numero' per le sequenze più lunghe di sys.maxsize (es. PermutazioniPropp), dove len() non funziona
+            self.totale = getattr(sorgente, "numero", None) or len(sorgente)
+        else:
+            self._lette = []
+            self._iteratore = iter(sorgente)
+            self.totale = totale # Numero di righe, se noto prima di esaurire il generatore
+
+    @property
+    def completa(self):
+        """True quando tutte le righe sono disponibili (sequenza o generatore esaurito)."""
+        return self._iteratore is None
+
+    def disponibili(self):
+        """Numero di righe leggibili senza consumare il generatore."""
+        return len(self._lette)
+
+    def carica_fino_a(self, numero):
+        """Consuma il generatore finché ci sono almeno 'numero' righe o finché si esaurisce."""
+        with self._lock:
+            if self._iteratore is not None and len(self._lette) < numero:
+                self._lette.extend(itertools.islice(self._iteratore, numero - len(self._lette)))
+                if len(self._lette) < numero:
+                    self._iteratore = None
+                    self.totale = len(self._lette)
+            return len(self._lette)
+
+    def riga(self, indice):
+        """La riga 'indice', o None se il risultato ne ha di meno."""
+        if indice < 0 or self.carica_fino_a(indice + 1) <= indice:
+            return None
+        return self._lette[indice]
+
+    def __iter__(self):
+        indice = 0
+        while indice < self.carica_fino_a(indice + self.PAGINA):
+            disponibili = len(self._lette)
+            for k in range(indice, disponibili):
+                yield self._lette[k]
+            indice = disponibili
+
+
+class VisualizzatoreRisultati:
+    """
+    Area dei risultati virtualizzata: il widget Text contiene solo le righe visibili, lette su
+    richiesta da RighePigre, così un risultato di milioni di righe compare subito e senza troncamenti.
+    Scorrimento con barra, rotella e tasti pagina; ricerca testuale (a cicli, senza bloccare la GUI);
+    esportazione dell'intero risultato in testo o CSV.
+    """
+    RIGHE_PER_CICLO_RICERCA = 20000 # Righe esaminate tra un aggiornamento della GUI e l'altro
+
+    def __init__(self, genitore, esecutore=None, altezza=10, font=("Arial", 10)):
+        self.esecutore = esecutore
+        self.cornice = tk.Frame(genitore)
+        barra = tk.Frame(self.cornice)
+        barra.pack(side=tk.TOP, fill=tk.X)
+        self.etichetta = tk.Label(barra, anchor="w", font=("Arial", 9))
+        self.etichetta.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        tk.Button(barra, text="Esporta...", command=self.esporta, font=("Arial", 9)).pack(side=tk.RIGHT, padx=2)
+        tk.Button(barra, text="Trova", command=self.trova, font=("Arial", 9)).pack(side=tk.RIGHT, padx=2)
+        self.campo_ricerca = tk.Entry(barra, width=25)
+        self.campo_ricerca.pack(side=tk.RIGHT, padx=2)
+        self.campo_ricerca.bind("<Return>", lambda evento: self.trova())
+
+        self.barra_scorrimento = tk.Scrollbar(self.cornice, orient=tk.VERTICAL, command=self._scorri)
+        self.barra_scorrimento.pack(side=tk.RIGHT, fill=tk.Y)
+        self.testo = tk.Text(self.cornice, wrap=tk.WORD, height=altezza, width=100, font=font)
+        self.testo.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.testo.tag_configure("trovata", background="yellow")
+        self.testo.config(state=tk.DISABLED)
+        self._altezza_riga = max(1, tkfont.Font(font=self.testo['font']).metrics('linespace'))
+        self.testo.bind("<Configure>", lambda evento: self._disegna())
+        for evento in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.testo.bind(evento, self._rotella)
+        self.testo.bind("<Prior>", lambda evento: self._scorri("scroll", -1, "pages"))
+        self.testo.bind("<Next>", lambda evento: self._scorri("scroll", 1, "pages"))
+        self.testo.bind("<Control-Home>", lambda evento: self._vai_a(0))
+
+        self._generazione_ricerca = 0 # Incrementato a ogni nuova ricerca o nuovo risultato: ferma i cicli precedenti
+        self.mostra("", [])
+
+    def pack(self, **opzioni):
+        self.cornice.pack(**opzioni)
+
+    def mostra(self, titolo, righe, intestazione=(), piede=(), formatta=None, totale=None):
+        """
+        Mostra un risultato: 'righe' è una sequenza, un generatore o un RighePigre; formatta(indice, riga)
+        produce il testo di ogni riga (str(riga) se None). 'intestazione' e 'piede' sono righe fisse
+        mostrate prima e dopo i risultati; 'totale' è il numero di righe di un generatore, se noto.
+        """
+        self.titolo = titolo
+        self.righe = righe if isinstance(righe, RighePigre) else RighePigre(righe, totale)
+        self.intestazione = ([f"--- {titolo} ---", ""] if titolo else []) + list(intestazione)
+        self.piede = list(piede)
+        self.formatta = formatta or (lambda indice, riga: str(riga))
+        self.prima = 0
+        self.riga_trovata = None
+        self._generazione_ricerca += 1
+        self._disegna()
+
+    def _testo_riga(self, indice):
+        """Testo della riga virtuale 'indice' (intestazione, risultati, piede), o None oltre la fine."""
+        if indice < len(self.intestazione):
+            return self.intestazione[indice]
+        indice -= len(self.intestazione)
+        riga = self.righe.riga(indice)
+        if riga is not None:
+            return self.formatta(indice, riga)
+        indice -= self.righe.totale or 0
+        return self.piede[indice] if self.righe.completa and 0 <= indice < len(self.piede) else None
+
+    def _num_righe(self):
+        """Righe virtuali totali, o quelle lette finora (più una pagina) se il generatore non è esaurito."""
+        if self.righe.totale is not None:
+            return len(self.intestazione) + self.righe.totale + len(self.piede)
+        return len(self.intestazione) + self.righe.disponibili() + RighePigre.PAGINA
+
+    def _righe_visibili(self):
+        return max(1, self.testo.winfo_height() // self._altezza_riga)
+
+    def _disegna(self):
+        visibili = self._righe_visibili()
+        self.testo.config(state=tk.NORMAL)
+        self.testo.delete("1.0", tk.END)
+        for indice in range(self.prima, self.prima + visibili):
+            testo = self._testo_riga(indice)
+            if testo is None:
+                break
+            self.testo.insert(tk.END, testo + "\n", ("trovata",) if indice == self.riga_trovata else ())
+        self.testo.config(state=tk.DISABLED)
+
+        num_righe = max(1, self._num_righe())
+        self.barra_scorrimento.set(self.prima / num_righe, min(1.0, (self.prima + visibili) / num_righe))
+        if not self.titolo:
+            conteggio = ""
+        elif self.righe.totale is not None:
+            conteggio = f"{self.titolo} - righe: {self.righe.totale:,}"
+        else:
+            conteggio = f"{self.titolo} - righe: almeno {self.righe.disponibili():,} (lette durante lo scorrimento)"
+        self.etichetta.config(text=conteggio)
+
+    def vai_alla_riga(self, indice):
+        """Mostra in cima la riga di risultato 'indice' (0 = la prima dopo l'intestazione)."""
+        self._vai_a(len(self.intestazione) + indice)
+
+    def _vai_a(self, indice):
+        visibili = self._righe_visibili()
+        if self.righe.totale is None:
+            # Generatore non esaurito: si leggono le righe fino a quelle richieste
+            self.righe.carica_fino_a(indice - len(self.intestazione) + visibili)
+        self.prima = max(0, min(indice, self._num_righe() - visibili))
+        self._disegna()
+
+    def _scorri(self, azione, quantita, unita=None):
+        """Comando della barra di scorrimento: ('moveto', frazione) o ('scroll', n, 'units'/'pages')."""
+        if azione == "moveto":
+            self._vai_a(int(float(quantita) * self._num_righe()))
+        else:
+            passo = self._righe_visibili() if unita == "pages" else 1
+            self._vai_a(self.prima + int(quantita) * passo)
+        return "break"
+
+    def _rotella(self, evento):
+        if evento.num == 4 or evento.delta > 0:
+            self._vai_a(self.prima - 3)
+        else:
+            self._vai_a(self.prima + 3)
+        return "break"
+
+    def trova(self):
+        """Cerca il testo (senza distinguere maiuscole e minuscole) dalla riga dopo l'ultima trovata, ricominciando dall'inizio."""
+        cercato = self.campo_ricerca.get().strip().lower()
+        if not cercato:
+            return
+        self._generazione_ricerca += 1
+        inizio = self.riga_trovata + 1 if self.riga_trovata is not None else self.prima
+        self._cerca(cercato, inizio, inizio, False, self._generazione_ricerca)
+
+    def _cerca(self, cercato, indice, inizio, ricominciata, generazione):
+        if generazione != self._generazione_ricerca:
+            return # Ricerca sostituita da una nuova o dal cambio di risultato
+        for _ in range(self.RIGHE_PER_CICLO_RICERCA):
+            if ricominciata and indice >= inizio:
+                self.etichetta.config(text=f"'{cercato}' non trovato.")
+                return
+            testo = self._testo_riga(indice)
+            if testo is None:
+                if ricominciata or inizio == 0:
+                    self.etichetta.config(text=f"'{cercato}' non trovato.")
+                    return
+                indice, ricominciata = 0, True
+                continue
+            if cercato in testo.lower():
+                self.riga_trovata = indice
+                self._vai_a(indice)
+                return
+            indice += 1
+        self.etichetta.config(text=f"Ricerca di '{cercato}'... (riga {indice:,})")
+        self.cornice.after(1, self._cerca, cercato, indice, inizio, ricominciata, generazione)
+
+    def esporta(self):
+        """Salva tutte le righe del risultato (non solo quelle visibili) in un file di testo o CSV."""
+        percorso = filedialog.asksaveasfilename(
+            defaultextension=".txt",
+            filetypes=[("File di Testo", "*.txt"), ("CSV", "*.csv")],
+            title="Esporta Risultati",
+            parent=self.cornice
+        )
+        if not percorso:
+            return
+        righe, intestazione, piede, formatta = self.righe, self.intestazione, self.piede, self.formatta
+
+        def scrivi(controllo):
+            controllo.aggiorna(None, f"Esportazione in {os.path.basename(percorso)}...")
+            numero = 0
+            with open(percorso, 'w', encoding='utf-8', newline='') as f:
+                if percorso.lower().endswith(".csv"):
+                    scrittore = csv.writer(f)
+                    for numero, riga in enumerate(righe, 1):
+                        if numero % 10000 == 0:
+                            controllo.verifica()
+                        if is_dataclass(riga):
+                            if numero == 1:
+                                scrittore.writerow([campo.name for campo in fields(riga)])
+                            scrittore.writerow(astuple(riga))
+                        elif isinstance(riga, (tuple, list)):
+                            scrittore.writerow(riga)
+                        else:
+                            scrittore.writerow([riga])
+                else:
+                    for testo in intestazione:
+                        f.write(testo + "\n")
+                    for numero, riga in enumerate(righe, 1):
+                        if numero % 10000 == 0:
+                            controllo.verifica()
+                        f.write(formatta(numero - 1, riga) + "\n")
+                    for testo in piede:
+                        f.write(testo + "\n")
+            return numero
+
+        def fatto(numero):
+            messagebox.showinfo("Esportazione Completata", f"{numero:,} righe salvate in {percorso}", parent=self.cornice)
+
+        def errore(e):
+            messagebox.showerror("Errore Esportazione", f"Errore: {e}", parent=self.cornice)
+
+        if self.esecutore:
+            self.esecutore.avvia("Esportazione risultati", scrivi, al_termine=fatto, in_errore=errore)
+        else:
+            try:
+                fatto(scrivi(ControlloAnalisi("Esportazione risultati")))
+            except Exception as e:
+                errore(e)
 
 
 # --- Classe Principale dell'Applicazione GUI ---
@@ -1257,55 +6215,36 @@ class StrumentiTestualiUsai:
         self.root.geometry("900x750") # Dimensione iniziale finestra leggermente più grande
         self.corpus_testuale = []
         self.nomi_file_corpus = []
-        self.stopwords = set([ # Stopwords italiane di default (ampliate)
-            "a", "ad", "al", "allo", "ai", "agli", "alla", "alle", "anche", "ancora", "aveva", "avevano",
-            "avevo", "avrà", "avrai", "avranno", "avrebbe", "avrebbero", "avrei", "avremmo", "avremo",
-            "avreste", "avresti", "avrete", "avevamo", "avevate", "c", "che", "chi", "ci", "ciò", "coi",
-            "col", "come", "con", "contro", "cui", "da", "dal", "dallo", "dai", "dagli", "dalla",
-            "dalle", "dei", "degli", "del", "dell", "della", "delle", "dello", "dentro", "di", "dice", "dietro",
-            "dire", "disse", "dopo", "dove", "dovrà", "dovrebbe", "dovrei", "dovremmo", "dovremo", "dovreste",
-            "dovresti", "dovrete", "dunque", "e", "è", "ebbe", "ebbero", "ed", "ecco", "era", "erano",
-            "eravamo", "eravate", "ero", "esempio", "esse", "essendo", "essere", "essi", "esso", "faccia",
-            "facciamo", "facciano", "faccio", "facemmo", "facendo", "facesse", "facessero", "facessi",
-            "facessimo", "faceste", "facesti", "faceva", "facevamo", "facevano", "facevate", "fai", "fanno",
-            "farà", "farai", "faranno", "fare", "farebbe", "farebbero", "farei", "faremmo", "faremo",
-            "fareste", "faresti", "farete", "fece", "fecero", "fino", "fosse", "fossero", "fossi", "fossimo",
-            "foste", "fosti", "fra", "fu", "furono", "già", "gli", "ha", "hai", "hanno", "ho", "i", "il",
-            "in", "infatti", "inoltre", "invece", "io", "l", "la", "le", "lei", "li", "lo", "loro", "lui",
-            "ma", "me", "mentre", "mi", "mia", "mie", "miei", "mio", "modo", "molto", "ne", "negli", "nei",
-            "nel", "nell", "nella", "nelle", "nello", "nessuno", "noi", "non", "nostra", "nostre",
-            "nostri", "nostro", "o", "ogni", "oppure", "ora", "per", "perché", "perciò", "però", "più",
-            "poco", "possa", "possano", "posso", "potrebbe", "potrebbero", "potrei", "potremmo", "potremo",
-            "potreste", "potresti", "potrete", "prima", "può", "pure", "qualsiasi", "quando", "quanta",
-            "quante", "quanti", "quanto", "quella", "quelle", "quelli", "quello", "questa", "queste",
-            "questi", "questo", "qui", "quindi", "sarà", "sarai", "saranno", "sarebbe", "sarebbero",
-            "sarei", "saremmo", "saremo", "sareste", "saresti", "sarete", "se", "sé", "secondo", "sembra",
-            "sembrava", "senza", "sette", "sia", "siamo", "siano", "siate", "siete", "significa", "solo",
-            "sono", "sopra", "sotto", "sta", "stai", "stando", "stanno", "starà", "starai", "staranno",
-            "starebbe", "starebbero", "starei", "staremmo", "staremo", "stareste", "staresti", "starete",
-            "stata", "state", "stati", "stato", "stava", "stavamo", "stavano", "stavate", "stessa",
-            "stesse", "stessi", "stesso", "stette", "stettero", "stetti", "stia", "stiamo", "stiano",
-            "stiate", "sto", "su", "sua", "sue", "sugli", "sui", "sul", "sull", "sulla", "sulle", "sullo",
-            "suoi", "suo", "t", "tale", "tali", "tanto", "te", "tempo", "ti", "tra", "tre", "tripla",
-            "triplo", "troppo", "tu", "tua", "tue", "tuoi", "tuo", "tutta", "tuttavia", "tutte", "tutti",
-            "tutto", "un", "una", "uno", "uomo", "va", "vai", "vale", "varie", "verso", "vi", "via", "voi",
-            "volta", "volte", "vostra", "vostre", "vostri", "vostro"
-        ])
+        self._modello_corpus = None # Modello tokenizzato condiviso, ricostruito solo quando cambia il corpus
+        self.stopwords = set(STOPWORDS_ITALIANE) # Stopwords italiane di default (ampliate)
 
         # Inizializza le classi per le funzionalità specifiche, passando il riferimento alla finestra principale
         self.funzioni_usability = FunzioniUsability(self)
         self.funzioni_narratologia = FunzioniNarratologia(self)
         self.funzioni_grice = FunzioniGrice(self)
 
+        # Pool di thread per le analisi lunghe; i risultati tornano alla GUI tramite root.after
+        self.esecutore = EsecutoreAnalisi(self.root, al_cambio_stato=self._aggiorna_stato_analisi)
+        self._avanzamento_indeterminato = False
+
         self.crea_interfaccia()
+        self.root.protocol("WM_DELETE_WINDOW", self._chiudi_applicazione)
+
+    def _get_modello_corpus(self):
+        """Restituisce il modello tokenizzato del corpus, ricostruendolo solo se il corpus è cambiato."""
+        if self._modello_corpus is None or self._modello_corpus.documenti is not self.corpus_testuale:
+            self._modello_corpus = ModelloCorpus(self.corpus_testuale, self.nomi_file_corpus)
+        return self._modello_corpus
 
     def _get_processed_words(self, remove_stopwords=True, specific_text=None):
         """Ottiene una lista di parole dal corpus o da un testo specifico, opzionalmente rimuovendo le stopwords."""
-        testo_da_processare = ' '.join(self.corpus_testuale) if specific_text is None else specific_text
-        if not testo_da_processare:
+        if specific_text is None:
+            # Il corpus caricato è già tokenizzato nel modello: nessuna nuova tokenizzazione
+            return self._get_modello_corpus().parole(self.stopwords if remove_stopwords else None)
+        if not specific_text:
             return []
         # Usa re per trovare sequenze alfabetiche, più robusto della semplice split
-        parole = re.findall(r'\b\w+\b', testo_da_processare.lower())
+        parole = REGEX_PAROLA.findall(specific_text.lower())
         if remove_stopwords:
             parole = [parola for parola in parole if parola not in self.stopwords]
         return parole
@@ -1320,6 +6259,11 @@ class StrumentiTestualiUsai:
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="File", menu=file_menu)
         file_menu.add_command(label="Carica Corpus Testuale (.txt)...", command=self.carica_corpus)
+        file_menu.add_command(label="Aggiungi Documenti al Corpus...", command=self.aggiungi_documenti)
+        file_menu.add_command(label="Rimuovi Documenti dal Corpus...", command=self.rimuovi_documenti)
+        file_menu.add_command(label="Apri Corpus in Streaming (file molto grandi)...", command=self.carica_corpus_streaming)
+        file_menu.add_command(label="Salva Indice del Corpus (SQLite)...", command=self.salva_indice_corpus)
+        file_menu.add_command(label="Apri Indice del Corpus (SQLite)...", command=self.apri_indice_corpus)
         file_menu.add_separator()
         # Sottomenu per Salvataggio Dati Narratologici
         salva_dati_narr_menu = tk.Menu(file_menu, tearoff=0)
@@ -1333,7 +6277,7 @@ class StrumentiTestualiUsai:
         carica_dati_narr_menu.add_command(label="Carica da Database SQLite...", command=self.funzioni_narratologia.carica_dati_narratologici_db)
 
         file_menu.add_separator()
-        file_menu.add_command(label="Esci", command=self.root.quit)
+        file_menu.add_command(label="Esci", command=self._chiudi_applicazione)
 
         # -- Menu Strumenti Linguistici --
         strumenti_linguistici_menu = tk.Menu(menubar, tearoff=0)
@@ -1348,6 +6292,7 @@ class StrumentiTestualiUsai:
 
         strumenti_linguistici_menu.add_command(label="Collocazioni (N-grammi)...", command=self.collocazioni)
         strumenti_linguistici_menu.add_command(label="KWIC (Parole Chiave nel Contesto)...", command=self.kwic)
+        strumenti_linguistici_menu.add_command(label="Concordanze (Sottostringhe)...", command=self.concordanze)
         strumenti_linguistici_menu.add_command(label="Rete Co-occorrenze (Testuale)...", command=self.vista_rete)
 
 
@@ -1357,6 +6302,7 @@ class StrumentiTestualiUsai:
         # La lingua è usata da diverse funzioni NLTK
         if nltk_disponibile:
              usability_menu.add_command(label="Imposta Lingua Analisi...", command=self.funzioni_usability.imposta_lingua_analisi)
+             usability_menu.add_command(label="Imposta Tagger e Lemmatizzatore...", command=self.funzioni_usability.imposta_backend_annotazione)
              usability_menu.add_separator()
 
         # Controlla disponibilità NLTK Punkt prima di aggiungere
@@ -1366,9 +6312,11 @@ class StrumentiTestualiUsai:
             # Gulpease è specifico italiano, ma richiede punkt
             usability_menu.add_command(label="Indice Leggibilità Gulpease (Globale)...", command=self.funzioni_usability.calcola_gulpease_globale)
             usability_menu.add_command(label="Analisi Leggibilità per Frase (Gulpease)...", command=self.funzioni_usability.analisi_leggibilita_per_frase)
-        # Controlla disponibilità NLTK Tagger prima di aggiungere (richiede anche punkt)
-        if nltk_disponibile and nltk_punkt_disponibile and nltk_tagger_disponibile:
+            usability_menu.add_command(label="Indici di Leggibilità (Gulpease, Flesch, Fog, SMOG...)...", command=self.funzioni_usability.calcola_indici_leggibilita)
+        # Controlla disponibilità di un tagger (NLTK, spaCy o Stanza) prima di aggiungere (richiede anche punkt)
+        if nltk_disponibile and nltk_punkt_disponibile and (nltk_tagger_disponibile or spacy_disponibile or stanza_disponibile):
              usability_menu.add_command(label="Annotazione Morfosintattica (POS)...", command=self.funzioni_usability.annotazione_pos)
+             usability_menu.add_command(label="Termini e Collocazioni per Parte del Discorso (POS)...", command=self.funzioni_usability.frequenza_per_pos)
 
         # -- Menu Narratologia --
         narratologia_menu = tk.Menu(menubar, tearoff=0)
@@ -1376,12 +6324,15 @@ class StrumentiTestualiUsai:
         narratologia_menu.add_command(label="Definisci Matrice Greimas...", command=self.funzioni_narratologia.crea_matrice_greimas)
         narratologia_menu.add_command(label="Definisci Funzioni di Propp (Personalizzate)...", command=self.funzioni_narratologia.crea_matrice_propp)
         narratologia_menu.add_command(label="Definisci Tensori Narrativi (Luigi Usai)...", command=self.funzioni_narratologia.crea_tensori_narrativi)
+        narratologia_menu.add_command(label="Calcola Tensore Narrativo sul Corpus...", command=self.funzioni_narratologia.calcola_tensore_narrativo)
         narratologia_menu.add_separator()
         narratologia_menu.add_command(label="Genera Trame (Permutazioni Propp)...", command=self.funzioni_narratologia.genera_permutazioni_propp)
+        narratologia_menu.add_command(label="Genera Trame Vincolate (Precedenze/Adiacenze Propp)...", command=self.funzioni_narratologia.genera_trame_vincolate_propp)
         narratologia_menu.add_command(label="Genera Sottoinsiemi (Combinazioni Propp)...", command=self.funzioni_narratologia.genera_combinazioni_propp)
         # Controlla disponibilità Graphviz prima di aggiungere
         if graphviz_disponibile:
              narratologia_menu.add_command(label="Visualizza Sequenza Propp (Grafico)...", command=self.funzioni_narratologia.visualizza_sequenza_propp_input)
+             narratologia_menu.add_command(label="Visualizza Molte Sequenze Propp (Diagrammi in Serie)...", command=self.funzioni_narratologia.visualizza_sequenze_propp_in_serie)
 
 
         # -- Menu Analisi Avanzate --
@@ -1397,6 +6348,16 @@ class StrumentiTestualiUsai:
         menubar.add_cascade(label="About", menu=about_menu)
         about_menu.add_command(label="Informazioni su...", command=self.mostra_about)
 
+        # Barra di stato per le analisi in background (avanzamento e annullamento)
+        barra_stato = tk.Frame(self.root, bd=1, relief=tk.SUNKEN)
+        barra_stato.pack(side=tk.BOTTOM, fill=tk.X)
+        self.etichetta_stato = tk.Label(barra_stato, text="Pronto.", anchor="w", font=("Arial", 9))
+        self.etichetta_stato.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        self.pulsante_annulla = tk.Button(barra_stato, text="Annulla", command=self.esecutore.annulla_tutte, state=tk.DISABLED, font=("Arial", 9))
+        self.pulsante_annulla.pack(side=tk.RIGHT, padx=5, pady=2)
+        self.barra_avanzamento = ttk.Progressbar(barra_stato, length=200, mode='determinate', maximum=1.0)
+        self.barra_avanzamento.pack(side=tk.RIGHT, padx=5, pady=2)
+
         # Area di testo per visualizzare il corpus
         corpus_frame = tk.LabelFrame(self.root, text="Corpus Caricato", padx=5, pady=5)
         corpus_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5,5))
@@ -1408,10 +6369,10 @@ class StrumentiTestualiUsai:
         # Area di testo per visualizzare l'output delle analisi
         output_frame = tk.LabelFrame(self.root, text="Risultati Analisi", padx=5, pady=5)
         output_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(5,10))
-        self.output_area = scrolledtext.ScrolledText(output_frame, wrap=tk.WORD, height=10, width=100, font=("Arial", 10))
-        self.output_area.pack(fill=tk.BOTH, expand=True)
-        self.output_area.insert(tk.END, "L'output delle analisi verrà visualizzato qui.\n")
-        self.output_area.config(state=tk.DISABLED)
+        # Visualizzatore virtualizzato: anche i risultati molto lunghi sono mostrati per intero, riga per riga
+        self.visualizzatore = VisualizzatoreRisultati(output_frame, self.esecutore)
+        self.visualizzatore.pack(fill=tk.BOTH, expand=True)
+        self.visualizzatore.mostra("", ["L'output delle analisi verrà visualizzato qui."])
 
     def mostra_about(self):
         """Mostra la finestra di About con le informazioni sull'autore e il progetto."""
@@ -1475,12 +6436,58 @@ class StrumentiTestualiUsai:
         close_button.pack(pady=15)
 
 
+    def _aggiorna_stato_analisi(self, controlli):
+        """Aggiorna barra di avanzamento, messaggio e pulsante Annulla in base alle analisi attive."""
+        if not controlli:
+            self.etichetta_stato.config(text="Pronto.")
+            self.pulsante_annulla.config(state=tk.DISABLED)
+            if self._avanzamento_indeterminato:
+                self.barra_avanzamento.stop()
+                self.barra_avanzamento.config(mode='determinate')
+                self._avanzamento_indeterminato = False
+            self.barra_avanzamento['value'] = 0
+            return
+
+        principale = controlli[0]
+        testo = principale.messaggio
+        if len(controlli) > 1:
+            testo = f"{len(controlli)} analisi in corso - {testo}"
+        self.etichetta_stato.config(text=testo)
+        self.pulsante_annulla.config(state=tk.NORMAL)
+        if principale.frazione is None:
+            if not self._avanzamento_indeterminato:
+                self.barra_avanzamento.config(mode='indeterminate')
+                self.barra_avanzamento.start(15)
+                self._avanzamento_indeterminato = True
+        else:
+            if self._avanzamento_indeterminato:
+                self.barra_avanzamento.stop()
+                self.barra_avanzamento.config(mode='determinate')
+                self._avanzamento_indeterminato = False
+            self.barra_avanzamento['value'] = principale.frazione
+
+    def _errore_analisi(self, titolo):
+        """Restituisce una callback che mostra l'errore di un'analisi in background (messaggio e area di output)."""
+        def mostra_errore(e):
+            messagebox.showerror(titolo, f"Errore: {e}", parent=self.root)
+            self._display_output(titolo, f"Errore: {e}")
+        return mostra_errore
+
+    def _chiudi_applicazione(self):
+        """Annulla le analisi in corso e chiude la finestra principale."""
+        self.esecutore.chiudi()
+        self.root.destroy()
+
     def _display_output(self, title, content):
-        """Visualizza l'output formattato nell'area di testo dedicata."""
-        self.output_area.config(state=tk.NORMAL)
-        self.output_area.delete(1.0, tk.END)
-        self.output_area.insert(tk.END, f"--- {title} ---\n\n{content}")
-        self.output_area.config(state=tk.DISABLED)
+        """Visualizza l'output formattato nell'area dei risultati."""
+        self.visualizzatore.mostra(title, content.split("\n"))
+
+    def _display_righe(self, title, righe, intestazione=(), piede=(), formatta=None, totale=None):
+        """
+        Visualizza un risultato riga per riga senza costruire un'unica stringa: le righe (lista, sequenza
+        o generatore) sono formattate e lette solo quando diventano visibili. Vedi VisualizzatoreRisultati.mostra.
+        """
+        self.visualizzatore.mostra(title, righe, intestazione, piede, formatta, totale)
 
     def carica_corpus(self):
         """Permette all'utente di selezionare e caricare uno o più file di testo nel corpus."""
@@ -1491,37 +6498,116 @@ class StrumentiTestualiUsai:
         if not nomi_file:
             return
 
-        self.corpus_testuale = []
-        self.nomi_file_corpus = []
-        self.area_testo.config(state=tk.NORMAL)
-        self.area_testo.delete(1.0, tk.END)
+        # Lettura e tokenizzazione in background: la finestra resta reattiva anche su corpora grandi
+        self.esecutore.avvia("Caricamento corpus", self._leggi_corpus, nomi_file,
+                             al_termine=self._mostra_corpus_caricato,
+                             in_errore=self._errore_analisi("Errore Caricamento Corpus"))
 
-        problematic_files = []
-        success_count = 0
+    def carica_corpus_streaming(self):
+        """
+        Apre un corpus lasciando i file su disco: le analisi di frequenza, collocazioni,
+        co-occorrenze e andamento leggono i file a blocchi e usano memoria limitata.
+        """
+        nomi_file = filedialog.askopenfilenames(
+            title="Seleziona file di testo (.txt) da analizzare in streaming",
+            filetypes=[("File di testo", "*.txt"), ("Tutti i file", "*.*")]
+        )
+        if not nomi_file:
+            return
+
+        self.esecutore.avvia("Apertura corpus in streaming", self._apri_corpus_streaming, nomi_file,
+                             al_termine=self._mostra_corpus_caricato,
+                             in_errore=self._errore_analisi("Errore Caricamento Corpus"))
 
+    def _apri_corpus_streaming(self, controllo, nomi_file):
+        """Registra i file del corpus in streaming e ne costruisce il vocabolario con una prima scansione (in background)."""
+        percorsi = []
+        nomi_documenti = []
+        problematic_files = []
         for nome_file in nomi_file:
-            try:
-                # Tenta di leggere con codifica UTF-8, poi ISO-8859-1 se fallisce
-                try:
-                    with open(nome_file, 'r', encoding='utf-8') as f:
-                        contenuto = f.read()
-                except UnicodeDecodeError:
-                     with open(nome_file, 'r', encoding='iso-8859-1') as f:
-                        contenuto = f.read()
-
-                self.corpus_testuale.append(contenuto)
-                # Estrai solo il nome del file dal percorso completo
-                nome_semplice = nome_file.split('/')[-1].split('\\')[-1] # Gestisce sia / che \
-                self.nomi_file_corpus.append(nome_semplice)
-                # Mostra solo i primi N caratteri del contenuto nell'area di testo del corpus per non sovraccaricare la GUI
-                anteprima_contenuto = contenuto[:2000] + '...' if len(contenuto) > 2000 else contenuto
-                self.area_testo.insert(tk.END, f"--- Contenuto di: {self.nomi_file_corpus[-1]} ---\n{anteprima_contenuto}\n\n")
-                success_count += 1
-            except Exception as e:
-                nome_semplice = nome_file.split('/')[-1].split('\\')[-1]
-                problematic_files.append(f"{nome_semplice}: {e}")
+            nome_semplice = nome_file.split('/')[-1].split('\\')[-1] # Gestisce sia / che \
+            if os.path.isfile(nome_file) and os.access(nome_file, os.R_OK):
+                percorsi.append(nome_file)
+                nomi_documenti.append(nome_semplice)
+            else:
+                problematic_files.append(f"{nome_semplice}: file non trovato o non leggibile")
+        modello = ModelloCorpusStreaming(DocumentiSuDisco(percorsi), nomi_documenti)
+        # Le frequenze complete (e quindi il vocabolario) si calcolano una volta, leggendo i file a blocchi
+        modello.frequenze(avanzamento=lambda frazione, messaggio: controllo.aggiorna(frazione, f"Indicizzazione: {messaggio}"))
+        return modello, problematic_files
+
+    def salva_indice_corpus(self):
+        """Salva il corpus tokenizzato e indicizzato in un database SQLite, da riaprire senza ritokenizzare."""
+        if not self.corpus_testuale:
+            messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
+            return
 
-        self.area_testo.config(state=tk.DISABLED)
+        modello = self._get_modello_corpus()
+        if isinstance(modello, ModelloCorpusSQLite):
+            messagebox.showinfo("Indice del Corpus", f"Il corpus è già un indice SQLite:\n{modello.percorso_db}", parent=self.root)
+            return
+
+        db_path = filedialog.asksaveasfilename(
+            defaultextension=".db",
+            filetypes=[("File Database SQLite", "*.db"), ("Tutti i file", "*.*")],
+            title="Salva Indice del Corpus in Database SQLite",
+            parent=self.root
+        )
+        if not db_path:
+            return
+
+        def calcola(controllo):
+            # Il corpus in streaming va prima tokenizzato per intero (postings KWIC compresi)
+            modello_da_salvare = modello.in_memoria(controllo.aggiorna) if isinstance(modello, ModelloCorpusStreaming) else modello
+            salva_indice_corpus(modello_da_salvare, db_path, avanzamento=controllo.aggiorna)
+            return len(modello_da_salvare.documenti)
+
+        def mostra(num_documenti):
+            messagebox.showinfo("Salvataggio Indice", f"Indice di {num_documenti} documenti salvato con successo:\n{db_path}", parent=self.root)
+            self._display_output("Salvataggio Indice", f"Indice del corpus ({num_documenti} documenti) salvato in {db_path}")
+
+        self.esecutore.avvia("Salvataggio indice SQLite", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Salvataggio Indice"))
+
+    def apri_indice_corpus(self):
+        """Riapre un corpus salvato come indice SQLite: vocabolario ed elenco dei documenti vengono letti subito, il resto su richiesta."""
+        db_path = filedialog.askopenfilename(
+            filetypes=[("File Database SQLite", "*.db"), ("Tutti i file", "*.*")],
+            title="Apri Indice del Corpus da Database SQLite",
+            parent=self.root
+        )
+        if not db_path:
+            return
+
+        def calcola(controllo):
+            controllo.aggiorna(None, "Apertura indice SQLite...")
+            return ModelloCorpusSQLite(db_path), []
+
+        self.esecutore.avvia("Apertura indice SQLite", calcola, al_termine=self._mostra_corpus_caricato,
+                             in_errore=self._errore_analisi("Errore Apertura Indice"))
+
+    def _leggi_corpus(self, controllo, nomi_file):
+        """Legge i file e costruisce il modello del corpus (eseguito in background, senza accesso alla GUI)."""
+        # Lettura, decodifica e tokenizzazione in parallelo su più processi
+        documenti, nomi_documenti, tokenizzati, problematic_files = carica_file_corpus(
+            nomi_file, avanzamento=lambda frazione, messaggio: controllo.aggiorna(frazione * 0.8, messaggio))
+
+        # Unione dei risultati per documento nel modello condiviso da tutte le analisi
+        modello = ModelloCorpus(documenti, nomi_documenti, tokenizzati=tokenizzati,
+                                avanzamento=lambda frazione, messaggio: controllo.aggiorna(0.8 + frazione * 0.2, messaggio))
+        return modello, problematic_files
+
+    def _mostra_corpus_caricato(self, risultato):
+        """Installa il corpus letto in background e ne mostra un'anteprima (eseguito nel thread di Tk)."""
+        modello, problematic_files = risultato
+        self.corpus_testuale = modello.documenti
+        self.nomi_file_corpus = list(modello.nomi_file)
+        self._modello_corpus = modello
+        if isinstance(modello, ModelloCorpusStreaming):
+            # Avviso e avanzamento nella barra di stato se un'analisi carica in memoria tutto il corpus
+            modello.avanzamento_in_memoria = self.esecutore.aggiorna_analisi_corrente
+        success_count = len(self.corpus_testuale)
+        self._aggiorna_anteprima_corpus()
 
         if success_count > 0:
             messagebox.showinfo("Corpus Caricato", f"{success_count} file caricati con successo nel corpus.", parent=self.root)
@@ -1535,6 +6621,116 @@ class StrumentiTestualiUsai:
                  self._display_output("Errore Caricamento Corpus", "Nessun file è stato caricato correttamente.")
 
 
+    def _aggiorna_anteprima_corpus(self):
+        """Mostra nell'area del corpus l'inizio di ogni documento caricato."""
+        modello = self._get_modello_corpus()
+        self.area_testo.config(state=tk.NORMAL)
+        self.area_testo.delete(1.0, tk.END)
+        for indice_doc, nome_semplice in enumerate(self.nomi_file_corpus):
+            # Mostra solo i primi N caratteri del contenuto nell'area di testo del corpus per non sovraccaricare la GUI
+            contenuto = modello.anteprima_documento(indice_doc, 2001)
+            anteprima_contenuto = contenuto[:2000] + '...' if len(contenuto) > 2000 else contenuto
+            self.area_testo.insert(tk.END, f"--- Contenuto di: {nome_semplice} ---\n{anteprima_contenuto}\n\n")
+        self.area_testo.config(state=tk.DISABLED)
+
+    def _modello_aggiornabile(self):
+        """Restituisce il modello del corpus se supporta aggiunte e rimozioni, altrimenti avvisa e restituisce None."""
+        modello = self._get_modello_corpus()
+        if not modello.aggiornabile:
+            messagebox.showwarning("Corpus non Modificabile",
+                                   "Il corpus aperto in streaming o da un indice SQLite è in sola lettura.\n"
+                                   "Carica i file con 'Carica Corpus Testuale' per poterlo modificare.", parent=self.root)
+            return None
+        return modello
+
+    def aggiungi_documenti(self):
+        """Aggiunge file al corpus già caricato senza rileggere né ricalcolare i documenti esistenti."""
+        modello = self._modello_aggiornabile()
+        if modello is None:
+            return
+        nomi_file = filedialog.askopenfilenames(
+            title="Seleziona file di testo (.txt) da aggiungere al corpus",
+            filetypes=[("File di testo", "*.txt"), ("Tutti i file", "*.*")]
+        )
+        if not nomi_file:
+            return
+
+        def calcola(controllo):
+            documenti, nomi_documenti, tokenizzati, problematic_files = carica_file_corpus(
+                nomi_file, avanzamento=lambda frazione, messaggio: controllo.aggiorna(frazione * 0.8, messaggio))
+            for i, (testo, nome, tokenizzato) in enumerate(zip(documenti, nomi_documenti, tokenizzati)):
+                controllo.aggiorna(0.8 + 0.2 * i / len(documenti), f"Aggiornamento del corpus: {nome}...")
+                modello.aggiungi_documento(testo, nome, tokenizzato)
+            return nomi_documenti, problematic_files
+
+        def mostra(risultato):
+            nomi_aggiunti, problematic_files = risultato
+            self.nomi_file_corpus = list(modello.nomi_file)
+            self._aggiorna_anteprima_corpus()
+            if nomi_aggiunti:
+                messagebox.showinfo("Documenti Aggiunti", f"{len(nomi_aggiunti)} file aggiunti al corpus ({len(self.corpus_testuale)} documenti totali).", parent=self.root)
+                self._display_output("Documenti Aggiunti", f"{len(nomi_aggiunti)} file aggiunti.\nNomi: {', '.join(nomi_aggiunti)}")
+            if problematic_files:
+                messagebox.showwarning("Problemi nel Caricamento",
+                                       f"Alcuni file non sono stati caricati o hanno causato errori:\n" +
+                                       "\n".join(problematic_files), parent=self.root)
+
+        self.esecutore.avvia("Aggiunta documenti", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Aggiunta Documenti"))
+
+    def rimuovi_documenti(self):
+        """Permette di scegliere i documenti da togliere dal corpus, aggiornando i risultati in modo incrementale."""
+        if not self.corpus_testuale:
+            messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
+            return
+        modello = self._modello_aggiornabile()
+        if modello is None:
+            return
+
+        rm_window = tk.Toplevel(self.root)
+        rm_window.title("Rimuovi Documenti")
+        rm_window.geometry("450x450")
+        rm_window.transient(self.root)
+        rm_window.grab_set()
+
+        tk.Label(rm_window, text="Seleziona i documenti da rimuovere:", font=("Arial", 11, "bold")).pack(pady=(10,2))
+
+        doc_listbox_frame = tk.Frame(rm_window)
+        doc_listbox_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+        doc_scrollbar = tk.Scrollbar(doc_listbox_frame, orient=tk.VERTICAL)
+        doc_listbox = tk.Listbox(doc_listbox_frame, yscrollcommand=doc_scrollbar.set, selectmode=tk.EXTENDED, font=("Arial", 10))
+        doc_scrollbar.config(command=doc_listbox.yview)
+        doc_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        doc_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        for i, nome in enumerate(self.nomi_file_corpus):
+            doc_listbox.insert(tk.END, f"{i+1}. {nome}")
+
+        def rimuovi_selezionati():
+            # Dal fondo, così gli indici dei documenti ancora da rimuovere non cambiano
+            indici = sorted(doc_listbox.curselection(), reverse=True)
+            if not indici:
+                messagebox.showwarning("Nessuna Selezione", "Seleziona almeno un documento da rimuovere.", parent=rm_window)
+                return
+            nomi_rimossi = [self.nomi_file_corpus[i] for i in sorted(indici)]
+            rm_window.destroy()
+
+            def calcola(controllo):
+                for k, indice_doc in enumerate(indici):
+                    controllo.aggiorna(k / len(indici), f"Rimozione documento {k+1}/{len(indici)}...")
+                    modello.rimuovi_documento(indice_doc)
+                return nomi_rimossi
+
+            def mostra(nomi_rimossi):
+                self.nomi_file_corpus = list(modello.nomi_file)
+                self._aggiorna_anteprima_corpus()
+                self._display_output("Documenti Rimossi", f"{len(nomi_rimossi)} documenti rimossi ({len(self.corpus_testuale)} rimasti).\nNomi: {', '.join(nomi_rimossi)}")
+
+            self.esecutore.avvia("Rimozione documenti", calcola, al_termine=mostra,
+                                 in_errore=self._errore_analisi("Errore Rimozione Documenti"))
+
+        tk.Button(rm_window, text="Rimuovi Selezionati", command=rimuovi_selezionati).pack(pady=5)
+        tk.Button(rm_window, text="Chiudi", command=rm_window.destroy).pack(pady=(0,10))
+
     def gestione_stopword(self):
         """Gestisce l'aggiunta, rimozione e caricamento di stopwords."""
         sw_window = tk.Toplevel(self.root)
@@ -1606,41 +6802,8 @@ class StrumentiTestualiUsai:
 
 
         def load_default_stopwords():
-            # Lista di stopwords italiane predefinite (può essere caricata da un file esterno in futuro)
-            default_ita_sw = set([
-                "a", "ad", "al", "allo", "ai", "agli", "alla", "alle", "anche", "ancora", "aveva", "avevano",
-                "avevo", "avrà", "avrai", "avranno", "avrebbe", "avrebbero", "avrei", "avremmo", "avremo",
-                "avreste", "avresti", "avrete", "avevamo", "avevate", "c", "che", "chi", "ci", "ciò", "coi",
-                "col", "come", "con", "contro", "cui", "da", "dal", "dallo", "dai", "dagli", "dalla",
-                "dalle", "dei", "degli", "del", "dell", "della", "delle", "dello", "dentro", "di", "dice", "dietro",
-                "dire", "disse", "dopo", "dove", "dovrà", "dovrebbe", "dovrei", "dovremmo", "dovremo", "dovreste",
-                "dovresti", "dovrete", "dunque", "e", "è", "ebbe", "ebbero", "ed", "ecco", "era", "erano",
-                "eravamo", "eravate", "ero", "esempio", "esse", "essendo", "essere", "essi", "esso", "faccia",
-                "facciamo", "facciano", "faccio", "facemmo", "facendo", "facesse", "facessero", "facessi",
-                "facessimo", "faceste", "facesti", "faceva", "facevamo", "facevano", "facevate", "fai", "fanno",
-                "farà", "farai", "faranno", "fare", "farebbe", "farebbero", "farei", "faremmo", "faremo",
-                "fareste", "faresti", "farete", "fece", "fecero", "fino", "fosse", "fossero", "fossi", "fossimo",
-                "foste", "fosti", "fra", "fu", "furono", "già", "gli", "ha", "hai", "hanno", "ho", "i", "il",
-                "in", "infatti", "inoltre", "invece", "io", "l", "la", "le", "lei", "li", "lo", "loro", "lui",
-                "ma", "me", "mentre", "mi", "mia", "mie", "miei", "mio", "modo", "molto", "ne", "negli", "nei",
-                "nel", "nell", "nella", "nelle", "nello", "nessuno", "noi", "non", "nostra", "nostre",
-                "nostri", "nostro", "o", "ogni", "oppure", "ora", "per", "perché", "perciò", "però", "più",
-                "poco", "possa", "possano", "posso", "potrebbe", "potrebbero", "potrei", "potremmo", "potremo",
-                "potreste", "potresti", "potrete", "prima", "può", "pure", "qualsiasi", "quando", "quanta",
-                "quante", "quanti", "quanto", "quella", "quelle", "quelli", "quello", "questa", "queste",
-                "questi", "questo", "qui", "quindi", "sarà", "sarai", "saranno", "sarebbe", "sarebbero",
-                "sarei", "saremmo", "saremo", "sareste", "saresti", "sarete", "se", "sé", "secondo", "sembra",
-                "sembrava", "senza", "sette", "sia", "siamo", "siano", "siate", "siete", "significa", "solo",
-                "sono", "sopra", "sotto", "sta", "stai", "stando", "stanno", "starà", "starai", "staranno",
-                "starebbe", "starebbero", "starei", "staremmo", "staremo", "stareste", "staresti", "starete",
-                "stata", "state", "stati", "stato", "stava", "stavamo", "stavano", "stavate", "stessa",
-                "stesse", "stessi", "stesso", "stette", "stettero", "stetti", "stia", "stiamo", "stiano",
-                "stiate", "sto", "su", "sua", "sue", "sugli", "sui", "sul", "sull", "sulla", "sulle", "sullo",
-                "suoi", "suo", "t", "tale", "tali", "tanto", "te", "tempo", "ti", "tra", "tre", "tripla",
-                "triplo", "troppo", "tu", "tua", "tue", "tuoi", "tuo", "tutta", "tuttavia", "tutte", "tutti",
-                "tutto", "un", "una", "uno", "uomo", "va", "vai", "vale", "varie", "verso", "vi", "via", "voi",
-                "volta", "volte", "vostra", "vostre", "vostri", "vostro"
-            ])
+            # (può essere caricata da un file esterno in futuro)
+            default_ita_sw = STOPWORDS_ITALIANE # Lista di stopwords italiane predefinite
             self.stopwords.update(default_ita_sw) # Aggiunge le default senza rimuovere quelle esistenti
             # Aggiorna la listbox
             items = sorted(list(self.stopwords))
@@ -1668,23 +6831,31 @@ class StrumentiTestualiUsai:
             messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
             return
 
-        parole = self._get_processed_words(remove_stopwords=True)
-        if not parole:
-            self._display_output("Frequenza Termini", "Il corpus non contiene parole valide dopo il filtraggio delle stopwords.")
-            messagebox.showinfo("Frequenza Termini", "Nessuna parola da analizzare dopo la rimozione delle stopwords.", parent=self.root)
-            return
-
-        frequenze = Counter(parole)
         num_termini = simpledialog.askinteger("Numero Termini", "Quanti termini più frequenti vuoi visualizzare?",
                                               parent=self.root, minvalue=1, initialvalue=20)
         if num_termini is None:
             return
 
-        output_str = f"I {num_termini} termini più frequenti (stopwords escluse):\n"
-        output_str += "--------------------------------------------------\n"
-        for parola, freq in frequenze.most_common(num_termini):
-            output_str += f"{parola}: {freq}\n"
-        self._display_output("Frequenza Termini", output_str)
+        modello = self._get_modello_corpus()
+        stopwords = frozenset(self.stopwords) # Copia stabile per il thread in background
+
+        def calcola(controllo):
+            # Conteggio sugli id dei token (memorizzato nel modello, o interrogazione indicizzata sull'indice SQLite)
+            return termini_piu_frequenti(modello, num_termini, stopwords)
+
+        def mostra(piu_frequenti):
+            if not piu_frequenti:
+                self._display_output("Frequenza Termini", "Il corpus non contiene parole valide dopo il filtraggio delle stopwords.")
+                messagebox.showinfo("Frequenza Termini", "Nessuna parola da analizzare dopo la rimozione delle stopwords.", parent=self.root)
+                return
+            output_str = f"I {num_termini} termini più frequenti (stopwords escluse):\n"
+            output_str += "--------------------------------------------------\n"
+            for termine in piu_frequenti:
+                output_str += f"{termine.parola}: {termine.frequenza}\n"
+            self._display_output("Frequenza Termini", output_str)
+
+        self.esecutore.avvia("Frequenza termini", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Frequenza Termini"))
 
     def nuvola_parole(self):
         """Genera e visualizza una nuvola di parole dal corpus (stopwords escluse)."""
@@ -1696,15 +6867,21 @@ class StrumentiTestualiUsai:
             messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
             return
 
-        parole = self._get_processed_words(remove_stopwords=True)
-        if not parole:
-            self._display_output("Nuvola di Parole", "Nessuna parola da visualizzare (corpus vuoto o solo stopwords).")
-            messagebox.showwarning("Attenzione", "Il corpus è vuoto o non contiene parole valide dopo la rimozione delle stopwords.", parent=self.root)
-            return
+        modello = self._get_modello_corpus()
+        stopwords = frozenset(self.stopwords)
 
-        frequenze = Counter(parole)
+        def calcola(controllo):
+            return frequenze_termini(modello, stopwords)
+
+        # Il conteggio avviene in background; il disegno con matplotlib resta nel thread di Tk
+        self.esecutore.avvia("Nuvola di parole", calcola, al_termine=self._mostra_nuvola_parole,
+                             in_errore=self._errore_analisi("Errore WordCloud"))
+
+    def _mostra_nuvola_parole(self, frequenze):
+        """Disegna la nuvola di parole dalle frequenze calcolate in background."""
         if not frequenze:
-            messagebox.showwarning("Attenzione", "Nessuna frequenza da visualizzare per la nuvola di parole.", parent=self.root)
+            self._display_output("Nuvola di Parole", "Nessuna parola da visualizzare (corpus vuoto o solo stopwords).")
+            messagebox.showwarning("Attenzione", "Il corpus è vuoto o non contiene parole valide dopo la rimozione delle stopwords.", parent=self.root)
             return
 
         try:
@@ -1728,7 +6905,7 @@ class StrumentiTestualiUsai:
 
 
     def collocazioni(self):
-        """Calcola e visualizza le collocazioni (N-grammi) più frequenti nel corpus (stopwords escluse)."""
+        """Calcola e visualizza le collocazioni (N-grammi) più frequenti o più associate nel corpus (stopwords escluse)."""
         if not self.corpus_testuale:
             messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
             return
@@ -1741,26 +6918,59 @@ class StrumentiTestualiUsai:
                                              parent=self.root, minvalue=1, initialvalue=10)
         if num_colloc is None: return
 
-        parole = self._get_processed_words(remove_stopwords=True)
-        if len(parole) < n_gram_size:
-            self._display_output("Collocazioni", f"Testo insufficiente per formare {n_gram_size}-grammi dopo la rimozione delle stopwords.")
-            messagebox.showinfo("Collocazioni", f"Non ci sono abbastanza parole ({len(parole)}) per creare {n_gram_size}-grammi.", parent=self.root)
+        misura = simpledialog.askstring("Misura di Associazione",
+                                        "Ordina le collocazioni per:\n" + ", ".join(MISURE_ASSOCIAZIONE),
+                                        parent=self.root, initialvalue="frequenza")
+        if misura is None: return
+        misura = misura.strip().lower()
+        if misura not in MISURE_ASSOCIAZIONE:
+            messagebox.showerror("Misura non Valida", f"Misura '{misura}' non riconosciuta.\nValori ammessi: {', '.join(MISURE_ASSOCIAZIONE)}", parent=self.root)
             return
+        frequenza_minima = 1
+        if misura != "frequenza":
+            frequenza_minima = simpledialog.askinteger("Frequenza Minima",
+                                                       "Frequenza minima delle collocazioni candidate (le più rare hanno misure poco affidabili):",
+                                                       parent=self.root, minvalue=1, initialvalue=FREQUENZA_MINIMA_ASSOCIAZIONE)
+            if frequenza_minima is None: return
+
+        modello = self._get_modello_corpus()
+        stopwords = frozenset(self.stopwords)
+
+        def calcola(controllo):
+            num_parole = modello.num_parole(stopwords)
+            if num_parole < n_gram_size:
+                return num_parole, None
+            avanzamento = lambda frazione, messaggio: controllo.aggiorna(frazione, f"Conteggio {n_gram_size}-grammi: {messaggio}")
+            # Conta gli N-grammi come tuple di id (le stringhe si ricostruiscono solo per quelli visualizzati)
+            if misura == "frequenza":
+                return num_parole, collocazioni_piu_frequenti(modello, n_gram_size, num_colloc, stopwords, avanzamento=avanzamento)
+            return num_parole, collocazioni_per_associazione(modello, n_gram_size, num_colloc, misura, frequenza_minima,
+                                                             stopwords, avanzamento=avanzamento)
+
+        def mostra(risultato):
+            num_parole, piu_frequenti = risultato
+            if piu_frequenti is None:
+                self._display_output("Collocazioni", f"Testo insufficiente per formare {n_gram_size}-grammi dopo la rimozione delle stopwords.")
+                messagebox.showinfo("Collocazioni", f"Non ci sono abbastanza parole ({num_parole}) per creare {n_gram_size}-grammi.", parent=self.root)
+                return
+            if not piu_frequenti:
+                self._display_output("Collocazioni", "Nessuna collocazione trovata (possibile dopo filtraggio).")
+                return
+            if misura == "frequenza":
+                output_str = f"Le {num_colloc} {n_gram_size}-grammi più frequenti (stopwords escluse):\n"
+                output_str += "--------------------------------------------------\n"
+                for colloc in piu_frequenti:
+                    output_str += f"'{colloc.testo}': {colloc.frequenza}\n"
+            else:
+                output_str = (f"Le {num_colloc} {n_gram_size}-grammi più associati per {misura} "
+                              f"(frequenza minima {frequenza_minima}, stopwords escluse):\n")
+                output_str += "--------------------------------------------------\n"
+                for colloc in piu_frequenti:
+                    output_str += f"'{colloc.testo}': {getattr(colloc, misura):.3f} (frequenza {colloc.frequenza})\n"
+            self._display_output("Collocazioni", output_str)
 
-        # Genera gli N-grammi
-        ngrams_list = [" ".join(parole[i:i+n_gram_size]) for i in range(len(parole)-n_gram_size+1)]
-
-        if not ngrams_list:
-            self._display_output("Collocazioni", "Nessuna collocazione trovata (possibile dopo filtraggio).")
-            return
-
-        frequenze_colloc = Counter(ngrams_list)
-
-        output_str = f"Le {num_colloc} {n_gram_size}-grammi più frequenti (stopwords escluse):\n"
-        output_str += "--------------------------------------------------\n"
-        for colloc, freq in frequenze_colloc.most_common(num_colloc):
-            output_str += f"'{colloc}': {freq}\n"
-        self._display_output("Collocazioni", output_str)
+        self.esecutore.avvia("Collocazioni", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Collocazioni"))
 
 
     def kwic(self):
@@ -1769,7 +6979,10 @@ class StrumentiTestualiUsai:
             messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
             return
 
-        parola_chiave = simpledialog.askstring("Parola Chiave (KWIC)", "Inserisci la parola chiave da cercare:", parent=self.root)
+        parola_chiave = simpledialog.askstring("Parola Chiave (KWIC)",
+                                               "Inserisci la parola chiave o la frase da cercare.\n"
+                                               "Usa * come carattere jolly (es. am*, amore eterno, *mente):",
+                                               parent=self.root)
         if not parola_chiave:
             return
 
@@ -1777,61 +6990,65 @@ class StrumentiTestualiUsai:
                                                  parent=self.root, minvalue=1, maxvalue=20, initialvalue=5)
         if contesto_size is None: return
 
-        parola_chiave_lower = parola_chiave.strip().lower()
-        results_kwic = []
-        max_results_display = 200 # Limita il numero di risultati visualizzati
-
-        testo_completo_originale = ' '.join(self.corpus_testuale)
-        # Tokenizza mantenendo la punteggiatura per un contesto più fedele
-        tokens_original_case = re.findall(r'\b\w+\b|[\.,;!?\'"\(\)]', testo_completo_originale) # Aggiunti altri segni di punteggiatura/simboli comuni
-        tokens_lower_case = [t.lower() for t in tokens_original_case]
-
-        found_count = 0
-        for i, token_lower in enumerate(tokens_lower_case):
-            if token_lower == parola_chiave_lower:
-                found_count +=1
-                if found_count > max_results_display:
-                    results_kwic.append(f"\n--- (Visualizzazione limitata ai primi {max_results_display} risultati su {found_count-1} trovati) ---")
-                    break
+        modello = self._get_modello_corpus()
 
-                start_idx = max(0, i - contesto_size)
-                end_idx = min(len(tokens_original_case), i + contesto_size + 1)
-
-                contesto_sx_list = tokens_original_case[start_idx:i]
-                parola_target = tokens_original_case[i]
-                contesto_dx_list = tokens_original_case[i+1:end_idx]
-
-                # Ricostruisci le stringhe di contesto gestendo spazi e punteggiatura
-                contesto_sx_str = ""
-                for k_idx, k_tok in enumerate(contesto_sx_list):
-                    contesto_sx_str += k_tok
-                    # Aggiungi spazio solo se non è l'ultimo token e il token successivo non è punteggiatura
-                    if k_idx < len(contesto_sx_list) -1 and not re.match(r'^[\.,;!?\'"\(\)]$', contesto_sx_list[k_idx+1]):
-                         contesto_sx_str += " "
-                    # Aggiungi spazio se è l'ultimo token SX e la parola target non è punteggiatura
-                    elif k_idx == len(contesto_sx_list) -1 and not re.match(r'^[\.,;!?\'"\(\)]$', parola_target):
-                        contesto_sx_str += " "
-
-                contesto_dx_str = ""
-                for k_idx, k_tok in enumerate(contesto_dx_list):
-                     # Aggiungi spazio prima del token DX solo se non è il primo token DX e il token precedente non è punteggiatura
-                    if k_idx > 0 and not re.match(r'^[\.,;!?\'"\(\)]$', k_tok) and not re.match(r'^[\.,;!?\'"\(\)]$', contesto_dx_list[k_idx-1]):
-                        contesto_dx_str += " "
-                    # Aggiungi spazio prima del primo token DX se la parola target non è punteggiatura
-                    elif k_idx == 0 and not re.match(r'^[\.,;!?\'"\(\)]$', k_tok) and not re.match(r'^[\.,;!?\'"\(\)]$', parola_target):
-                         contesto_dx_str += " "
-                    contesto_dx_str += k_tok
-
-
-                results_kwic.append(f"...{contesto_sx_str}[{parola_target}]{contesto_dx_str}...")
-
-        if results_kwic:
-            output_str = f"KWIC per '{parola_chiave}' (contesto: {contesto_size} token, {found_count} occorrenze trovate):\n\n" + "\n".join(results_kwic)
-        else:
-            output_str = f"Nessuna occorrenza trovata per '{parola_chiave}' nel corpus."
-        self._display_output(f"KWIC: {parola_chiave}", output_str)
+        def calcola(controllo):
+            controllo.aggiorna(None, f"Ricerca KWIC di '{parola_chiave}'...")
+            # L'indice posizionale (costruito alla prima ricerca) fornisce direttamente le occorrenze;
+            # i contesti sono estratti dal testo solo quando il visualizzatore mostra le loro righe
+            return cerca_kwic(modello, parola_chiave, contesto_size, pigro=True)
+
+        def mostra(risultato):
+            if not risultato.occorrenze_totali:
+                self._display_output(f"KWIC: {parola_chiave}", f"Nessuna occorrenza trovata per '{parola_chiave}' nel corpus.")
+                return
+            self._display_righe(f"KWIC: {parola_chiave}", risultato.contesti,
+                                [f"KWIC per '{parola_chiave}' (contesto: {contesto_size} token, {risultato.occorrenze_totali} occorrenze trovate):", ""],
+                                formatta=lambda i, occorrenza: f"...{occorrenza.contesto_sinistro}[{occorrenza.parola}]{occorrenza.contesto_destro}...")
+
+        self.esecutore.avvia(f"KWIC: {parola_chiave}", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore KWIC"))
 
 
+    def concordanze(self):
+        """Concordanza di una sottostringa qualsiasi (frammenti di parola, espressioni, punteggiatura) tramite l'indice dei suffissi."""
+        if not self.corpus_testuale:
+            messagebox.showwarning("Corpus Vuoto", "Per favore, carica prima un corpus testuale.", parent=self.root)
+            return
+
+        query = simpledialog.askstring("Sottostringa (Concordanze)",
+                                       "Inserisci la sequenza di caratteri da cercare (anche parte di parola,\n"
+                                       "più parole o punteggiatura; maiuscole e minuscole sono equivalenti):",
+                                       parent=self.root)
+        if not query:
+            return
+
+        in_token = messagebox.askyesno("Unità del Contesto", "Misurare il contesto in token?\n(No = in caratteri)", parent=self.root)
+        unita = "token" if in_token else "caratteri"
+        ampiezza = simpledialog.askinteger("Dimensione Contesto", f"Quanti {unita} di contesto visualizzare prima e dopo l'occorrenza?",
+                                           parent=self.root, minvalue=1, maxvalue=20 if in_token else 200,
+                                           initialvalue=AMPIEZZA_CONTESTO_CONCORDANZE[unita])
+        if ampiezza is None: return
+
+        modello = self._get_modello_corpus()
+
+        def calcola(controllo):
+            controllo.aggiorna(None, f"Concordanze di '{query}'...")
+            # L'indice dei suffissi è costruito alla prima ricerca e riusato dalle successive
+            return cerca_concordanza(modello, query, ampiezza, unita, pigro=True,
+                                     avanzamento=controllo.aggiorna, verifica=controllo.verifica)
+
+        def mostra(risultato):
+            if not risultato.occorrenze_totali:
+                self._display_output(f"Concordanze: {query}", f"Nessuna occorrenza trovata per '{query}' nel corpus.")
+                return
+            self._display_righe(f"Concordanze: {query}", risultato.contesti,
+                                [f"Concordanze per '{query}' (contesto: {ampiezza} {unita}, {risultato.occorrenze_totali} occorrenze trovate):", ""],
+                                formatta=lambda i, occorrenza: f"{occorrenza.documento}: ...{occorrenza.contesto_sinistro}[{occorrenza.parola}]{occorrenza.contesto_destro}...")
+
+        self.esecutore.avvia(f"Concordanze: {query}", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Concordanze"))
+
     def andamento(self):
         """Visualizza l'andamento della frequenza di un termine attraverso i documenti o segmenti di un singolo documento."""
         if not matplotlib_disponibile:
@@ -1845,9 +7062,7 @@ class StrumentiTestualiUsai:
         parola_chiave = simpledialog.askstring("Andamento Termine", "Inserisci la parola chiave per l'analisi dell'andamento:", parent=self.root)
         if not parola_chiave: return
 
-        parola_chiave_lower = parola_chiave.strip().lower()
-        frequencies = []
-        segment_labels = []
+        modello = self._get_modello_corpus()
 
         if len(self.corpus_testuale) == 1:
             # Analisi per segmenti all'interno di un singolo documento
@@ -1855,84 +7070,71 @@ class StrumentiTestualiUsai:
                                                  parent=self.root, minvalue=2, maxvalue=100, initialvalue=10)
             if num_chunks is None: return
 
-            # Ottieni tutte le parole del documento (senza rimuovere stopwords per mantenere la lunghezza originale)
-            words_in_doc = re.findall(r'\b\w+\b', self.corpus_testuale[0].lower())
-
-            if not words_in_doc:
-                self._display_output("Andamento Termine", "Il documento selezionato è vuoto o non contiene parole.")
-                messagebox.showwarning("Andamento Termine", "Il documento selezionato è vuoto o non contiene parole.", parent=self.root)
-                return
-
-            if len(words_in_doc) < num_chunks :
-                 # Se il numero di parole è inferiore al numero di segmenti richiesti, adatta il numero di segmenti
-                 messagebox.showwarning("Segmenti Eccessivi", f"Il documento contiene solo {len(words_in_doc)} parole. Non può essere diviso in {num_chunks} segmenti. Verrà usato un segmento per parola (max {len(words_in_doc)} segmenti).", parent=self.root)
-                 num_chunks = len(words_in_doc)
-                 if num_chunks < 1:
-                     self._display_output("Andamento Termine", "Il documento non ha parole per creare segmenti.")
-                     return
-
-            # Calcola la dimensione approssimativa di ogni segmento
-            chunk_size = max(1, len(words_in_doc) // num_chunks)
-
-            for i in range(num_chunks):
-                # Definisci gli indici di inizio e fine per il segmento corrente
-                start_idx = i * chunk_size
-                # L'ultimo segmento prende tutte le parole rimanenti
-                end_idx = (i + 1) * chunk_size if i < num_chunks - 1 else len(words_in_doc)
-                chunk = words_in_doc[start_idx:end_idx]
-
-                if chunk: # Assicurati che il segmento non sia vuoto
-                    frequencies.append(chunk.count(parola_chiave_lower))
-                    segment_labels.append(f"Seg. {i+1}")
-
-            if not frequencies:
-                self._display_output("Andamento Termine", f"La parola '{parola_chiave}' non è stata trovata o i segmenti erano vuoti.")
-                messagebox.showinfo("Andamento Termine", f"La parola '{parola_chiave}' non è stata trovata o i segmenti erano vuoti.", parent=self.root)
-                return
-
-            plot_title = f"Andamento di '{parola_chiave}' (Doc. '{self.nomi_file_corpus[0]}' in {num_chunks} segmenti)"
+            def calcola(controllo):
+                controllo.aggiorna(None, f"Andamento di '{parola_chiave}'...")
+                # Conta tutte le parole del documento (senza rimuovere stopwords per mantenere la lunghezza originale)
+                num_parole_doc = modello.num_token_documento(0)
+                if num_parole_doc == 0:
+                    return None
+                # Se il numero di parole è inferiore al numero di segmenti richiesti, si usa un segmento per parola;
+                # segmenti di uguale lunghezza, l'ultimo prende tutte le parole rimanenti
+                andamento = andamento_termine(modello, parola_chiave, num_segmenti=num_chunks)
+                return andamento.frequenze, andamento.etichette, num_parole_doc
+
+            nome_documento = self.nomi_file_corpus[0]
+            plot_title = lambda num_segmenti: f"Andamento di '{parola_chiave}' (Doc. '{nome_documento}' in {num_segmenti} segmenti)"
             plot_xlabel = "Segmento del Testo"
             plot_type = 'line' # Grafico a linea per l'andamento sequenziale
 
         else:
-            # Analisi attraverso documenti multipli
-            for i, testo_doc in enumerate(self.corpus_testuale):
-                # Ottieni tutte le parole del documento (senza rimuovere stopwords per contare su base totale)
-                parole_doc = re.findall(r'\b\w+\b', testo_doc.lower())
-                frequencies.append(parole_doc.count(parola_chiave_lower))
-                segment_labels.append(self.nomi_file_corpus[i] if self.nomi_file_corpus and i < len(self.nomi_file_corpus) else f"Doc {i+1}")
-
-            plot_title = f"Andamento di '{parola_chiave}' attraverso i Documenti Caricati"
+            def calcola(controllo):
+                # Analisi attraverso documenti multipli (senza rimuovere stopwords per contare su base totale)
+                andamento = andamento_termine(
+                    modello, parola_chiave, avanzamento=lambda frazione, messaggio: controllo.aggiorna(frazione, f"Andamento di '{parola_chiave}': {messaggio}"))
+                return andamento.frequenze, andamento.etichette, None
+
+            plot_title = lambda num_documenti: f"Andamento di '{parola_chiave}' attraverso i Documenti Caricati"
             plot_xlabel = "Documento"
             plot_type = 'bar' # Grafico a barre per confronto tra documenti
 
-        # Controlla se la parola chiave è stata trovata almeno una volta in tutto il corpus
-        if not frequencies or all(f == 0 for f in frequencies):
-            self._display_output("Andamento Termine", f"Nessuna occorrenza di '{parola_chiave}' trovata nel corpus per il grafico.")
-            messagebox.showinfo("Andamento Termine", f"La parola '{parola_chiave}' non è stata trovata nel corpus.", parent=self.root)
-            return
-
-        # Genera il grafico
-        plt.figure(figsize=(12, 7))
-        if plot_type == 'line':
-            plt.plot(segment_labels, frequencies, marker='o', linestyle='-', color='dodgerblue')
-        else: # plot_type == 'bar'
-            plt.bar(segment_labels, frequencies, color='skyblue')
-
-        plt.title(plot_title, fontsize=14)
-        plt.xlabel(plot_xlabel, fontsize=12)
-        plt.ylabel("Frequenza Assoluta", fontsize=12)
-        # Ruota le etichette sull'asse x se sono molte per evitare sovrapposizioni
-        if len(segment_labels) > 10:
-             plt.xticks(rotation=45, ha="right", fontsize=10)
-        else:
-             plt.xticks(fontsize=10)
+        def mostra(risultato):
+            if risultato is None:
+                self._display_output("Andamento Termine", "Il documento selezionato è vuoto o non contiene parole.")
+                messagebox.showwarning("Andamento Termine", "Il documento selezionato è vuoto o non contiene parole.", parent=self.root)
+                return
+            frequencies, segment_labels, num_parole_doc = risultato
+            if num_parole_doc is not None and num_parole_doc < num_chunks:
+                messagebox.showwarning("Segmenti Eccessivi", f"Il documento contiene solo {num_parole_doc} parole. Non può essere diviso in {num_chunks} segmenti. Verrà usato un segmento per parola (max {num_parole_doc} segmenti).", parent=self.root)
+            # Controlla se la parola chiave è stata trovata almeno una volta in tutto il corpus
+            if not frequencies or all(f == 0 for f in frequencies):
+                self._display_output("Andamento Termine", f"Nessuna occorrenza di '{parola_chiave}' trovata nel corpus per il grafico.")
+                messagebox.showinfo("Andamento Termine", f"La parola '{parola_chiave}' non è stata trovata nel corpus.", parent=self.root)
+                return
+
+            # Genera il grafico (matplotlib va usato nel thread di Tk)
+            plt.figure(figsize=(12, 7))
+            if plot_type == 'line':
+                plt.plot(segment_labels, frequencies, marker='o', linestyle='-', color='dodgerblue')
+            else: # plot_type == 'bar'
+                plt.bar(segment_labels, frequencies, color='skyblue')
+
+            plt.title(plot_title(len(segment_labels)), fontsize=14)
+            plt.xlabel(plot_xlabel, fontsize=12)
+            plt.ylabel("Frequenza Assoluta", fontsize=12)
+            # Ruota le etichette sull'asse x se sono molte per evitare sovrapposizioni
+            if len(segment_labels) > 10:
+                 plt.xticks(rotation=45, ha="right", fontsize=10)
+            else:
+                 plt.xticks(fontsize=10)
+
+            plt.yticks(fontsize=10)
+            plt.grid(axis='y', linestyle='--')
+            plt.tight_layout() # Adatta il layout per evitare tagli
+            plt.show()
+            self._display_output("Andamento Termine", f"Grafico dell'andamento di '{parola_chiave}' generato e visualizzato.")
 
-        plt.yticks(fontsize=10)
-        plt.grid(axis='y', linestyle='--')
-        plt.tight_layout() # Adatta il layout per evitare tagli
-        plt.show()
-        self._display_output("Andamento Termine", f"Grafico dell'andamento di '{parola_chiave}' generato e visualizzato.")
+        self.esecutore.avvia(f"Andamento: {parola_chiave}", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Andamento Termine"))
 
 
     def vista_rete(self):
@@ -1943,7 +7145,7 @@ class StrumentiTestualiUsai:
 
         window_size = simpledialog.askinteger("Finestra di Contesto (Co-occorrenze)",
                                               "Inserisci la dimensione della finestra di contesto (numero di parole vicine da considerare):",
-                                              parent=self.root, minvalue=2, maxvalue=10, initialvalue=3)
+                                              parent=self.root, minvalue=2, maxvalue=100, initialvalue=3)
         if window_size is None: return
 
         num_cooc = simpledialog.askinteger("Numero Co-occorrenze",
@@ -1951,47 +7153,633 @@ class StrumentiTestualiUsai:
                                            parent=self.root, minvalue=1, initialvalue=15)
         if num_cooc is None: return
 
-        # Ottieni le parole processate (minuscolo, senza stopwords)
-        parole = self._get_processed_words(remove_stopwords=True)
-        if len(parole) < window_size:
-            self._display_output("Rete Co-occorrenze", f"Non ci sono abbastanza parole nel corpus (dopo rimozione stopwords) per analizzare le co-occorrenze con una finestra di dimensione {window_size}.")
-            messagebox.showinfo("Rete Co-occorrenze", "Testo insufficiente per l'analisi delle co-occorrenze.", parent=self.root)
-            return
+        modello = self._get_modello_corpus()
+        stopwords = frozenset(self.stopwords)
 
-        co_occurrences = Counter()
-        # Itera attraverso le parole per creare finestre di contesto
-        for i in range(len(parole) - window_size + 1):
-            window_segment = parole[i : i + window_size]
-            # Considera solo le parole uniche all'interno della finestra e ordinale per creare coppie consistenti
-            parole_nella_finestra_uniche = sorted(list(set(window_segment)))
+        def calcola(controllo):
+            # Conta sulle parole processate (minuscolo, senza stopwords)
+            if modello.num_parole(stopwords) < window_size:
+                return None
 
-            # Se ci sono almeno due parole uniche nella finestra, genera tutte le coppie possibili
-            if len(parole_nella_finestra_uniche) < 2: continue
+            return cooccorrenze_piu_frequenti(modello, window_size, num_cooc, stopwords,
+                                              avanzamento=lambda frazione, messaggio: controllo.aggiorna(frazione, f"Co-occorrenze: {messaggio}"),
+                                              verifica=controllo.verifica)
 
-            # Genera tutte le coppie non ordinate di parole uniche nella finestra
-            for j in range(len(parole_nella_finestra_uniche)):
-                for k in range(j + 1, len(parole_nella_finestra_uniche)):
-                    pair = tuple(sorted((parole_nella_finestra_uniche[j], parole_nella_finestra_uniche[k])))
-                    co_occurrences[pair] += 1
+        def mostra(piu_frequenti):
+            if piu_frequenti is None:
+                self._display_output("Rete Co-occorrenze", f"Non ci sono abbastanza parole nel corpus (dopo rimozione stopwords) per analizzare le co-occorrenze con una finestra di dimensione {window_size}.")
+                messagebox.showinfo("Rete Co-occorrenze", "Testo insufficiente per l'analisi delle co-occorrenze.", parent=self.root)
+                return
+            if not piu_frequenti:
+                self._display_output("Rete Co-occorrenze", "Nessuna co-occorrenza trovata con i parametri specificati.")
+                messagebox.showinfo("Rete Co-occorrenze", "Nessuna co-occorrenza trovata.", parent=self.root)
+                return
 
-        if not co_occurrences:
-            self._display_output("Rete Co-occorrenze", "Nessuna co-occorrenza trovata con i parametri specificati.")
-            messagebox.showinfo("Rete Co-occorrenze", "Nessuna co-occorrenza trovata.", parent=self.root)
+            output_str = f"Le {num_cooc} coppie di termini co-occorrenti più frequenti (finestra: {window_size} parole, stopwords escluse):\n"
+            output_str += "--------------------------------------------------------------------------------------\n"
+            for coppia in piu_frequenti:
+                output_str += f"('{coppia.parola_1}', '{coppia.parola_2}'): {coppia.frequenza}\n"
+
+            self._display_output("Rete di Co-occorrenze", output_str)
+            if messagebox.askyesno("Rete di Co-occorrenze",
+                                   "Analisi delle co-occorrenze completata. I risultati sono nell'area di output.\n\n"
+                                   "Vuoi costruire il grafo della rete per esportarlo (GEXF, GraphML, lista di archi) o visualizzarlo?",
+                                   parent=self.root):
+                self._grafo_cooccorrenze(modello, window_size, stopwords)
+
+        self.esecutore.avvia("Rete co-occorrenze", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Rete Co-occorrenze"))
+
+    def _grafo_cooccorrenze(self, modello, window_size, stopwords):
+        """Costruisce il grafo potato delle co-occorrenze, ne calcola il layout e lo salva e/o lo visualizza."""
+        archi_per_nodo = simpledialog.askinteger("Archi per Parola",
+                                                 "Quanti archi più pesanti tenere per ogni parola? (0 = tutti)",
+                                                 parent=self.root, minvalue=0, initialvalue=5)
+        if archi_per_nodo is None: return
+        peso_minimo = simpledialog.askinteger("Peso Minimo", "Numero minimo di co-occorrenze per tenere un arco:",
+                                              parent=self.root, minvalue=1, initialvalue=2)
+        if peso_minimo is None: return
+        percorso = filedialog.asksaveasfilename(
+            defaultextension=".gexf",
+            filetypes=[("GEXF (Gephi)", "*.gexf"), ("GraphML", "*.graphml"), ("Lista di archi CSV", "*.csv"), ("Lista di archi TSV", "*.tsv")],
+            title="Salva il Grafo (Annulla per visualizzarlo soltanto)",
+            parent=self.root
+        )
+        visualizza = numpy_disponibile and matplotlib_disponibile
+        if not percorso and not visualizza:
+            messagebox.showinfo("Grafo Co-occorrenze", "Per visualizzare il grafo servono 'numpy' e 'matplotlib'.", parent=self.root)
             return
 
-        output_str = f"Le {num_cooc} coppie di termini co-occorrenti più frequenti (finestra: {window_size} parole, stopwords escluse):\n"
-        output_str += "--------------------------------------------------------------------------------------\n"
-        for (p1, p2), freq in co_occurrences.most_common(num_cooc):
-            output_str += f"('{p1}', '{p2}'): {freq}\n"
-
-        output_str += "\nNota: Questa è una rappresentazione testuale. Per una visualizzazione grafica della rete, sarebbero necessarie librerie aggiuntive (es. NetworkX, Matplotlib)."
-        self._display_output("Rete di Co-occorrenze", output_str)
-        messagebox.showinfo("Rete di Co-occorrenze", "Analisi delle co-occorrenze completata. I risultati sono nell'area di output.", parent=self.root)
+        def calcola(controllo):
+            grafo = grafo_cooccorrenze(modello, window_size, stopwords, peso_minimo=peso_minimo, archi_per_nodo=archi_per_nodo or None,
+                                       avanzamento=lambda frazione, messaggio: controllo.aggiorna(frazione * 0.5, f"Co-occorrenze: {messaggio}"),
+                                       verifica=controllo.verifica)
+            if numpy_disponibile:
+                calcola_layout_grafo(grafo, avanzamento=lambda frazione, messaggio: controllo.aggiorna(0.5 + frazione * 0.5, messaggio),
+                                     verifica=controllo.verifica)
+            if percorso:
+                scrivi_grafo(grafo, percorso)
+            return grafo
+
+        def mostra(grafo):
+            output_str = f"Grafo delle co-occorrenze (finestra: {window_size} parole): {grafo.num_nodi} nodi, {grafo.num_archi} archi.\n"
+            if percorso:
+                output_str += f"Salvato in: {percorso}\n"
+            self._display_output("Grafo Co-occorrenze", output_str)
+            if visualizza and grafo.num_nodi:
+                figura_grafo(grafo, f"Rete di Co-occorrenze (finestra: {window_size} parole)")
+                plt.show()
+
+        self.esecutore.avvia("Grafo co-occorrenze", calcola, al_termine=mostra,
+                             in_errore=self._errore_analisi("Errore Grafo Co-occorrenze"))
+
+
+# --- Modalità Batch a Riga di Comando ---
+# Le stesse analisi della GUI, senza Tkinter: pensata per pipeline e job pianificati (cron).
+# Ogni esecuzione è indipendente e scrive l'output in modo atomico, quindi più job possono girare in parallelo.
+
+FORMATI_OUTPUT_CLI = ("json", "csv", "parquet")
+
+class ErroreRigaDiComando(Exception):
+    """Errore di input o di ambiente della modalità batch: riportato su stderr con codice di uscita 1."""
+    pass
+
+def _avanzamento_cli(argomenti):
+    """Callback di avanzamento che scrive su stderr (solo con --verboso), al più una riga per punto percentuale."""
+    if not argomenti.verboso:
+        return None
+    ultimo = [None]
+    def avanzamento(frazione, messaggio):
+        stato = (messaggio, None if frazione is None else int(frazione * 100))
+        if stato != ultimo[0]:
+            ultimo[0] = stato
+            percentuale = "" if frazione is None else f"[{stato[1]:3d}%] "
+            print(f"{percentuale}{messaggio}", file=sys.stderr, flush=True)
+    return avanzamento
+
+def _apri_modello_cli(argomenti):
+    """Costruisce il modello del corpus da file, cartelle o da un indice SQLite (.db) salvato in precedenza."""
+    modello, problemi = apri_corpus(argomenti.corpus, estensione=argomenti.estensione, ricorsivo=argomenti.ricorsivo,
+                                    streaming=argomenti.streaming, max_processi=argomenti.processi,
+                                    avanzamento=_avanzamento_cli(argomenti),
+                                    limite_in_memoria=argomenti.limite_memoria * 1024 * 1024 if argomenti.limite_memoria else None)
+    for problema in problemi:
+        print(f"Attenzione: {problema}", file=sys.stderr)
+    return modello
+
+def _stopwords_cli(argomenti):
+    """Stopwords per le analisi lessicali: quelle italiane di default, un file (una per riga) o nessuna."""
+    if argomenti.nessuna_stopword:
+        return frozenset()
+    if argomenti.stopwords:
+        with open(argomenti.stopwords, 'r', encoding='utf-8') as f:
+            return frozenset(riga.strip().lower() for riga in f if riga.strip() and not riga.lstrip().startswith('#'))
+    return STOPWORDS_ITALIANE
+
+def _richiedi_nltk_cli():
+    if not nltk_disponibile:
+        raise ErroreRigaDiComando("La libreria NLTK è necessaria per questa analisi. Installa con: pip install nltk")
+    if not nltk_punkt_disponibile:
+        raise ErroreRigaDiComando("Il pacchetto 'punkt' di NLTK è necessario per questa analisi. Scaricalo eseguendo in Python: nltk.download('punkt')")
+
+# Ogni analisi restituisce (parametri, riepilogo, righe): le righe sono dizionari con le stesse chiavi,
+# esportati come elenco JSON, righe CSV o tabella Parquet
+
+def _cli_frequenza(modello, argomenti):
+    stopwords = _stopwords_cli(argomenti)
+    if argomenti.lemmi:
+        annotato = _annotazione_cli(modello, argomenti, lemmi=True)
+        righe = [{"rango": rango, **asdict(termine)}
+                 for rango, termine in enumerate(termini_per_pos(annotato, '*', argomenti.numero, stopwords, lemmi=True), 1)]
+        return ({"numero": argomenti.numero, "stopwords": len(stopwords), "lemmi": True, "versione_tagger": annotato.versione_tagger},
+                _riepilogo_annotazione_cli(annotato), righe)
+    righe = [{"rango": rango, **asdict(termine)}
+             for rango, termine in enumerate(termini_piu_frequenti(modello, argomenti.numero, stopwords), 1)]
+    return ({"numero": argomenti.numero, "stopwords": len(stopwords)},
+            {"parole": modello.num_parole(stopwords), "termini_distinti": len(modello.frequenze(stopwords))},
+            righe)
+
+def _righe_collocazioni_cli(collocazioni):
+    righe = []
+    for rango, colloc in enumerate(collocazioni, 1):
+        riga = {"rango": rango, "ngramma": colloc.testo, **asdict(colloc)}
+        del riga["parole"]
+        righe.append(riga)
+    return righe
+
+def _cli_collocazioni(modello, argomenti):
+    stopwords = _stopwords_cli(argomenti)
+    if argomenti.lemmi:
+        if argomenti.misura != "frequenza":
+            raise ErroreRigaDiComando("Con --lemmi le collocazioni sono ordinate solo per frequenza (--misura frequenza).")
+        annotato = _annotazione_cli(modello, argomenti, lemmi=True)
+        righe = _righe_collocazioni_cli(collocazioni_per_pos(annotato, ['*'] * argomenti.n, argomenti.numero, stopwords, lemmi=True))
+        return ({"n": argomenti.n, "numero": argomenti.numero, "misura": argomenti.misura, "stopwords": len(stopwords),
+                 "lemmi": True, "versione_tagger": annotato.versione_tagger}, _riepilogo_annotazione_cli(annotato), righe)
+    num_parole = modello.num_parole(stopwords)
+    righe = []
+    if num_parole >= argomenti.n:
+        if argomenti.misura == "frequenza":
+            collocazioni = collocazioni_piu_frequenti(modello, argomenti.n, argomenti.numero, stopwords,
+                                                      avanzamento=_avanzamento_cli(argomenti))
+        else:
+            collocazioni = collocazioni_per_associazione(modello, argomenti.n, argomenti.numero, argomenti.misura,
+                                                         argomenti.frequenza_minima, stopwords, avanzamento=_avanzamento_cli(argomenti))
+        righe = _righe_collocazioni_cli(collocazioni)
+    return ({"n": argomenti.n, "numero": argomenti.numero, "misura": argomenti.misura,
+             "frequenza_minima": argomenti.frequenza_minima, "stopwords": len(stopwords)}, {"parole": num_parole}, righe)
+
+def _cli_cooccorrenze(modello, argomenti):
+    stopwords = _stopwords_cli(argomenti)
+    num_parole = modello.num_parole(stopwords)
+    righe = []
+    if num_parole >= argomenti.finestra:
+        coppie = cooccorrenze_piu_frequenti(modello, argomenti.finestra, argomenti.numero, stopwords,
+                                            avanzamento=_avanzamento_cli(argomenti))
+        righe = [{"rango": rango, **asdict(coppia)} for rango, coppia in enumerate(coppie, 1)]
+    return ({"finestra": argomenti.finestra, "numero": argomenti.numero, "stopwords": len(stopwords)}, {"parole": num_parole}, righe)
+
+def _cli_rete(modello, argomenti):
+    stopwords = _stopwords_cli(argomenti)
+    formato_grafo = None
+    if argomenti.grafo:
+        formato_grafo = FORMATI_GRAFO.get(os.path.splitext(argomenti.grafo)[1].lower())
+        if formato_grafo is None:
+            raise ErroreRigaDiComando(f"Estensione del grafo non riconosciuta: usa una tra {', '.join(FORMATI_GRAFO)}")
+    if argomenti.immagine and not (numpy_disponibile and matplotlib_disponibile):
+        raise ErroreRigaDiComando("L'immagine del grafo richiede numpy e matplotlib. Installa con: pip install numpy matplotlib")
+
+    grafo = grafo_cooccorrenze(modello, argomenti.finestra, stopwords, peso_minimo=argomenti.peso_minimo,
+                               archi_per_nodo=argomenti.archi_per_nodo, avanzamento=_avanzamento_cli(argomenti))
+    if argomenti.immagine or (argomenti.grafo and numpy_disponibile and not argomenti.senza_layout):
+        calcola_layout_grafo(grafo, iterazioni=argomenti.iterazioni, avanzamento=_avanzamento_cli(argomenti))
+    if argomenti.grafo:
+        _scrittura_atomica_cli(argomenti.grafo, lambda percorso: scrivi_grafo(grafo, percorso, formato_grafo))
+    if argomenti.immagine:
+        figura = figura_grafo(grafo, f"Rete di Co-occorrenze (finestra: {argomenti.finestra} parole)")
+        formato_immagine = os.path.splitext(argomenti.immagine)[1].lstrip('.').lower() or 'png'
+        try:
+            _scrittura_atomica_cli(argomenti.immagine, lambda percorso: figura.savefig(percorso, format=formato_immagine, dpi=150))
+        finally:
+            plt.close(figura)
+
+    parole = grafo.parole
+    righe = [{"sorgente": parole[sorgente], "destinazione": parole[destinazione], "peso": int(peso)}
+             for sorgente, destinazione, peso in zip(grafo.sorgenti, grafo.destinazioni, grafo.pesi)]
+    return ({"finestra": argomenti.finestra, "peso_minimo": argomenti.peso_minimo, "archi_per_nodo": argomenti.archi_per_nodo,
+             "stopwords": len(stopwords)}, {"nodi": grafo.num_nodi, "archi": grafo.num_archi}, righe)
+
+def _cli_kwic(modello, argomenti):
+    risultato = cerca_kwic(modello, argomenti.query, argomenti.contesto, limite=argomenti.limite, pigro=True)
+    return ({"query": argomenti.query, "contesto": argomenti.contesto, "limite": argomenti.limite},
+            {"occorrenze": risultato.occorrenze_totali}, (asdict(occorrenza) for occorrenza in risultato.contesti))
+
+def _cli_concordanza(modello, argomenti):
+    unita = "caratteri" if argomenti.caratteri else "token"
+    ampiezza = AMPIEZZA_CONTESTO_CONCORDANZE[unita] if argomenti.contesto is None else argomenti.contesto
+    risultato = cerca_concordanza(modello, argomenti.query, ampiezza, unita, limite=argomenti.limite, pigro=True,
+                                  avanzamento=_avanzamento_cli(argomenti))
+    return ({"query": argomenti.query, "contesto": ampiezza, "unita": unita,
+             "limite": argomenti.limite}, {"occorrenze": risultato.occorrenze_totali},
+            (asdict(occorrenza) for occorrenza in risultato.contesti))
+
+def _cli_gulpease(modello, argomenti):
+    _richiedi_nltk_cli()
+    if argomenti.distribuzione:
+        distribuzione = distribuzione_gulpease(modello, argomenti.finestra, argomenti.peggiori)
+        riepilogo = {campo.name: getattr(distribuzione, campo.name) for campo in fields(distribuzione)
+                     if campo.name not in ("media_mobile", "peggiori")}
+        # La media mobile ha un valore per frase: nel riepilogo ne bastano al più 'punti' lungo il testo
+        passo = max(1, -(-len(distribuzione.media_mobile) // max(1, argomenti.punti)))
+        riepilogo["media_mobile"] = distribuzione.media_mobile[::passo]
+        return ({"distribuzione": True, "finestra": argomenti.finestra, "peggiori": argomenti.peggiori, "punti": argomenti.punti},
+                riepilogo, [asdict(frase) for frase in distribuzione.peggiori])
+    if argomenti.per_frase:
+        risultati = analisi_gulpease_per_frase(modello)
+        return {"per_frase": True}, {"frasi": len(risultati)}, (asdict(frase) for frase in risultati)
+    risultato = analisi_gulpease(modello)
+    return {"per_frase": False}, {"frasi": risultato.frasi, "parole": risultato.parole}, [asdict(risultato)]
+
+def _cli_leggibilita(modello, argomenti):
+    _richiedi_nltk_cli()
+    risultati = analisi_leggibilita(modello, per_documento=argomenti.per_documento)
+    corpus = risultati[0]
+    return ({"per_documento": argomenti.per_documento}, {"frasi": corpus.frasi, "parole": corpus.parole, "documenti": len(modello.documenti)},
+            [asdict(risultato) for risultato in risultati])
+
+def _cli_grice(modello, argomenti):
+    _richiedi_nltk_cli()
+    risultato = analisi_griceana(modello, argomenti.lingua)
+    righe = [{"indicatore": "quantita_modo", **asdict(problema)} for problema in risultato.problemi_quantita_modo]
+    righe += [{"indicatore": "ripetizione", "frase": None, "parole": None, "tipo": None, "testo": parola}
+              for parola in risultato.ripetizioni]
+    righe += [{"indicatore": "hedging", "frase": None, "parole": None, "tipo": None, "testo": termine}
+              for termine in risultato.indicatori_hedging]
+    riepilogo = {"frasi": risultato.frasi, "token": risultato.token, "lunghezza_media": risultato.lunghezza_media}
+    return {"lingua": argomenti.lingua}, riepilogo, righe
+
+def _annotazione_cli(modello, argomenti, lemmi=False):
+    """Annotazione POS (e lemmi) del corpus con il backend scelto, dalla cache se già calcolata."""
+    _richiedi_nltk_cli() # La segmentazione in frasi e token è sempre quella di NLTK
+    try:
+        backend = backend_annotazione(argomenti.backend, argomenti.lingua, argomenti.modello_tagger)
+    except ValueError as e:
+        raise ErroreRigaDiComando(str(e)) from None
+    if lemmi and not backend.fornisce_lemmi:
+        raise ErroreRigaDiComando(f"Il backend '{backend.nome}' non fornisce i lemmi: usa --backend spacy o --backend stanza.")
+    cartella = False if argomenti.senza_cache else argomenti.cache
+    return annota_pos_corpus(modello, argomenti.lingua, backend, cartella, argomenti.processi, avanzamento=_avanzamento_cli(argomenti))
+
+def _riepilogo_annotazione_cli(annotato):
+    riepilogo = {"token": len(annotato), "frasi": annotato.num_frasi, "dalla_cache": annotato.dalla_cache,
+                 "forme_distinte": len(annotato.unita()[0])}
+    if annotato.lemmi is not None:
+        riepilogo["lemmi_distinti"] = len(annotato.unita(lemmi=True)[0])
+    return riepilogo
+
+def _cli_pos(modello, argomenti):
+    try:
+        schema = leggi_schema_pos(argomenti.schema) if argomenti.schema else None
+    except ValueError as e:
+        raise ErroreRigaDiComando(str(e)) from None
+    annotato = _annotazione_cli(modello, argomenti, argomenti.lemmi)
+    parametri = {"lingua": argomenti.lingua, "schema": schema, "lemmi": argomenti.lemmi, "versione_tagger": annotato.versione_tagger}
+    riepilogo = {**_riepilogo_annotazione_cli(annotato), "tag": dict(annotato.frequenze_tag().most_common())}
+    if schema is None:
+        righe = ({"token": token, "tag": tag, "lemma": annotato.lemma(i)}
+                 for i, (token, tag) in enumerate(itertools.islice(annotato, argomenti.limite)))
+        return {**parametri, "limite": argomenti.limite}, riepilogo, righe
+    stopwords = _stopwords_cli(argomenti)
+    parametri.update({"numero": argomenti.numero, "stopwords": len(stopwords)})
+    if len(schema) == 1:
+        return parametri, riepilogo, [{"rango": rango, **asdict(termine)} for rango, termine
+                                      in enumerate(termini_per_pos(annotato, schema[0], argomenti.numero, stopwords, argomenti.lemmi), 1)]
+    return parametri, riepilogo, _righe_collocazioni_cli(collocazioni_per_pos(annotato, schema, argomenti.numero, stopwords, argomenti.lemmi))
+
+def _cli_tensore(modello, argomenti):
+    if not numpy_disponibile:
+        raise ErroreRigaDiComando("Il tensore narrativo richiede numpy. Installa con: pip install numpy")
+    dimensioni = {}
+    for testo in argomenti.dimensione:
+        try:
+            dimensioni.update(leggi_dimensioni_tensore(testo))
+        except ValueError as e:
+            raise ErroreRigaDiComando(str(e)) from None
+    tensore = costruisci_tensore_narrativo(modello, dimensioni, argomenti.segmento or None, argomenti.presenza,
+                                           avanzamento=_avanzamento_cli(argomenti))
+    try:
+        for selezione in argomenti.seleziona:
+            dimensione, _, elementi = selezione.partition('=')
+            tensore = tensore.seleziona(dimensione.strip(), [e.strip() for e in elementi.split(',') if e.strip()])
+        if argomenti.mantieni:
+            tensore = tensore.mantieni(*(d.strip() for d in argomenti.mantieni.split(',') if d.strip()))
+    except ValueError as e:
+        raise ErroreRigaDiComando(str(e)) from None
+    righe = ({**dict(zip(tensore.dimensioni, etichette)), "valore": valore}
+             for etichette, valore in itertools.islice(tensore.celle(), argomenti.limite))
+    return ({"dimensioni": dimensioni, "segmento": argomenti.segmento, "presenza": argomenti.presenza,
+             "seleziona": argomenti.seleziona, "mantieni": argomenti.mantieni, "limite": argomenti.limite},
+            {"forma": dict(zip(tensore.dimensioni, tensore.forma)), "celle_non_nulle": tensore.nnz, "totale": tensore.totale()}, righe)
+
+def _codici_propp_cli(testo):
+    return [codice.strip().upper() for codice in testo.split(',') if codice.strip()]
+
+def _cli_propp_permutazioni(modello, argomenti):
+    codici = _codici_propp_cli(argomenti.codici)
+    if argomenti.vincolate or argomenti.vincoli:
+        precedenze, adiacenze = leggi_vincoli_propp(argomenti.vincoli)
+        if argomenti.vincolate:
+            precedenze, adiacenze = list(PRECEDENZE_PROPP) + precedenze, list(ADIACENZE_PROPP) + adiacenze
+        permutazioni = TrameProppVincolate(codici, precedenze, adiacenze)
+        vincoli = formatta_vincoli_propp(permutazioni.precedenze, permutazioni.adiacenze)
+    else:
+        permutazioni = genera_trame_propp(codici)
+        vincoli = None
+    if argomenti.inizio < 1:
+        raise ErroreRigaDiComando("--inizio deve essere almeno 1.")
+    if argomenti.campione is not None:
+        coppie = ((rango, permutazioni.codici_di(rango)) for rango in permutazioni.campione(argomenti.campione, argomenti.seme))
+    else:
+        coppie = permutazioni.righe(argomenti.inizio - 1, argomenti.limite)
+    # Le trame restano un generatore: JSON e CSV le scrivono una alla volta
+    righe = ({"numero": rango + 1, "codici": ",".join(codici_trama), "trama": permutazioni.descrizione(codici_trama)}
+             for rango, codici_trama in coppie)
+    return ({"codici": codici, "vincoli": vincoli, "inizio": argomenti.inizio, "limite": argomenti.limite,
+             "campione": argomenti.campione, "seme": argomenti.seme},
+            {"totale": permutazioni.numero, "permutazioni": math.factorial(len(codici))}, righe)
+
+def _cli_propp_combinazioni(modello, argomenti):
+    codici = _codici_propp_cli(argomenti.codici)
+    sottoinsiemi = genera_sottoinsiemi_propp(codici, argomenti.k)
+    if argomenti.inizio < 1:
+        raise ErroreRigaDiComando("--inizio deve essere almeno 1.")
+    statistiche = statistiche_combinazioni_propp(codici, argomenti.k)
+    parametri = {"codici": codici, "k": argomenti.k, "inizio": argomenti.inizio, "limite": argomenti.limite,
+                 "campione": argomenti.campione, "seme": argomenti.seme, "solo_conteggi": argomenti.solo_conteggi}
+    riepilogo = {"totale": sottoinsiemi.numero, **asdict(statistiche)}
+    if argomenti.solo_conteggi: # Nessuna enumerazione: una riga per conteggio
+        righe = [{"misura": misura, "valore": valore} for misura, valore in asdict(statistiche).items() if misura != "per_fase"]
+        righe += [{"misura": f"per_fase:{fase}", "valore": valore} for fase, valore in statistiche.per_fase.items()]
+        return parametri, riepilogo, righe
+    if argomenti.campione is not None:
+        coppie = ((rango, sottoinsiemi.codici_di(rango)) for rango in sottoinsiemi.campione(argomenti.campione, argomenti.seme))
+    else:
+        coppie = sottoinsiemi.righe(argomenti.inizio - 1, argomenti.limite)
+    righe = ({"numero": rango + 1, "codici": ",".join(codici_sottoinsieme), "sottoinsieme": sottoinsiemi.descrizione(codici_sottoinsieme)}
+             for rango, codici_sottoinsieme in coppie)
+    return parametri, riepilogo, righe
+
+def _cli_propp_diagrammi(modello, argomenti):
+    if not graphviz_disponibile:
+        raise ErroreRigaDiComando("La libreria 'graphviz' (e il programma 'dot') è necessaria. Installa con: pip install graphviz")
+    if (argomenti.sequenze is None) == (argomenti.codici is None):
+        raise ErroreRigaDiComando("Indica le sequenze da disegnare con --sequenze FILE oppure con --codici (permutazioni).")
+    if argomenti.inizio < 1:
+        raise ErroreRigaDiComando("--inizio deve essere almeno 1.")
+    if argomenti.codici is not None:
+        permutazioni = genera_trame_propp(_codici_propp_cli(argomenti.codici))
+        numero = argomenti.limite if argomenti.limite is not None else permutazioni.numero - argomenti.inizio + 1
+        sequenze = ((rango + 1, codici) for rango, codici in permutazioni.righe(argomenti.inizio - 1, numero))
+        totale = min(numero, permutazioni.numero - argomenti.inizio + 1)
+    else:
+        sequenze = itertools.islice(leggi_sequenze_propp(argomenti.sequenze), argomenti.inizio - 1,
+                                    None if argomenti.limite is None else argomenti.inizio - 1 + argomenti.limite)
+        totale = None
+    try:
+        risultato = renderizza_sequenze_propp(sequenze, argomenti.cartella, argomenti.formato_diagrammi,
+                                              processi=argomenti.processi, colonne=argomenti.colonne,
+                                              fogli_contatti=not argomenti.senza_foglio, totale=totale)
+    except graphviz.backend.execute.ExecutableNotFound:
+        raise ErroreRigaDiComando("Eseguibile Graphviz (dot) non trovato: installalo e aggiungilo al PATH (https://graphviz.org/download/).") from None
+    righe = [{"numero": numero, "codici": ",".join(codici), "file": os.path.join(risultato.cartella, nome), "dalla_cache": in_cache}
+             for numero, codici, nome, in_cache in risultato.diagrammi]
+    parametri = {"sequenze": argomenti.sequenze, "codici": argomenti.codici, "inizio": argomenti.inizio, "limite": argomenti.limite,
+                 "cartella": argomenti.cartella, "formato_diagrammi": argomenti.formato_diagrammi}
+    riepilogo = {"diagrammi": len(risultato.diagrammi), "disegnati": risultato.renderizzati,
+                 "dalla_cache": risultato.dalla_cache, "fogli_contatti": risultato.fogli_contatti}
+    return parametri, riepilogo, righe
+
+def _scrivi_json_cli(f, intestazione, righe):
+    """Scrive il documento JSON emettendo le righe una alla volta (anche da un generatore)."""
+    f.write(json.dumps(intestazione, ensure_ascii=False)[:-1] + ', "risultati": [')
+    for i, riga in enumerate(righe):
+        f.write(("," if i else "") + "\n  " + json.dumps(riga, ensure_ascii=False))
+    f.write("\n]}\n")
+
+def _scrivi_csv_cli(f, righe):
+    scrittore = None
+    for riga in righe:
+        if scrittore is None:
+            scrittore = csv.DictWriter(f, fieldnames=list(riga))
+            scrittore.writeheader()
+        scrittore.writerow(riga)
+
+def _scrivi_output_cli(nome_analisi, parametri, riepilogo, righe, formato, percorso_output):
+    """Scrive i risultati su stdout o, in modo atomico, su file (file temporaneo nella stessa cartella + os.replace)."""
+    intestazione = {"analisi": nome_analisi, "parametri": parametri, "riepilogo": riepilogo}
+    if formato == "parquet":
+        if not pyarrow_disponibile:
+            raise ErroreRigaDiComando("La libreria 'pyarrow' è necessaria per l'output Parquet. Installa con: pip install pyarrow")
+        if not percorso_output:
+            raise ErroreRigaDiComando("L'output Parquet richiede un file di destinazione (--output).")
+    if not percorso_output:
+        if formato == "json":
+            _scrivi_json_cli(sys.stdout, intestazione, righe)
+        else:
+            _scrivi_csv_cli(sys.stdout, righe)
+        sys.stdout.flush()
+        return
+
+    def scrivi(percorso_temporaneo):
+        if formato == "parquet":
+            tabella = pa.Table.from_pylist(list(righe))
+            # Analisi, parametri e riepilogo viaggiano nei metadati dello schema
+            tabella = tabella.replace_schema_metadata({"strumenti_testuali": json.dumps(intestazione, ensure_ascii=False)})
+            pq.write_table(tabella, percorso_temporaneo)
+        else:
+            with open(percorso_temporaneo, 'w', encoding='utf-8', newline='') as f:
+                if formato == "json":
+                    _scrivi_json_cli(f, intestazione, righe)
+                else:
+                    _scrivi_csv_cli(f, righe)
+    _scrittura_atomica_cli(percorso_output, scrivi)
+
+def _scrittura_atomica_cli(percorso, scrivi):
+    """Chiama scrivi(percorso_temporaneo) su un file nella stessa cartella e lo rinomina in 'percorso' solo a scrittura completata."""
+    descrittore, percorso_temporaneo = tempfile.mkstemp(prefix=".strumenti_testuali_", suffix=".tmp",
+                                                        dir=os.path.dirname(os.path.abspath(percorso)))
+    os.close(descrittore)
+    try:
+        scrivi(percorso_temporaneo)
+        os.replace(percorso_temporaneo, percorso)
+    except BaseException:
+        if os.path.exists(percorso_temporaneo):
+            os.remove(percorso_temporaneo)
+        raise
+
+def _parser_cli():
+    parser = argparse.ArgumentParser(
+        prog=os.path.basename(sys.argv[0]),
+        description="Strumenti Testuali Usai - modalità batch senza interfaccia grafica. "
+                    "Senza argomenti il programma avvia l'interfaccia grafica.")
+    sottocomandi = parser.add_subparsers(dest="analisi", metavar="ANALISI", required=True)
+
+    comuni = argparse.ArgumentParser(add_help=False)
+    comuni.add_argument("--formato", choices=FORMATI_OUTPUT_CLI, default="json", help="formato dell'output (default: json)")
+    comuni.add_argument("-o", "--output", help="file di destinazione (default: stdout; obbligatorio per parquet)")
+    comuni.add_argument("-v", "--verboso", action="store_true", help="mostra l'avanzamento su stderr")
+
+    corpus = argparse.ArgumentParser(add_help=False, parents=[comuni])
+    corpus.add_argument("corpus", nargs="+", help="file o cartelle del corpus, oppure un indice SQLite (.db)")
+    corpus.add_argument("--estensione", default=".txt", help="estensione dei file letti dalle cartelle (default: .txt)")
+    corpus.add_argument("-r", "--ricorsivo", action="store_true", help="cerca i file anche nelle sottocartelle")
+    corpus.add_argument("--streaming", action="store_true", help="legge i file a blocchi senza caricarli in memoria")
+    corpus.add_argument("--limite-memoria", type=int, default=LIMITE_IN_MEMORIA_STREAMING // (1024 * 1024), metavar="MB",
+                        help="con --streaming, MB di file oltre i quali KWIC, frasi, leggibilità e POS sono rifiutati "
+                             f"invece di caricare tutto in memoria (0: nessun limite; default: {LIMITE_IN_MEMORIA_STREAMING // (1024 * 1024)})")
+    corpus.add_argument("--processi", type=int, default=None, help="numero massimo di processi per il caricamento e per l'annotazione POS")
+
+    con_stopwords = argparse.ArgumentParser(add_help=False, parents=[corpus])
+    con_stopwords.add_argument("--stopwords", help="file di stopwords (una per riga) al posto di quelle italiane di default")
+    con_stopwords.add_argument("--nessuna-stopword", action="store_true", help="non esclude alcuna stopword")
+
+    lessicali = argparse.ArgumentParser(add_help=False, parents=[con_stopwords])
+    lessicali.add_argument("-n", "--numero", type=int, default=20, help="numero di risultati più frequenti (default: 20)")
+
+    annotazione = argparse.ArgumentParser(add_help=False)
+    annotazione.add_argument("--lingua", default="italian", help="lingua per la segmentazione NLTK e il modello del tagger (default: italian)")
+    annotazione.add_argument("--backend", choices=list(BACKEND_ANNOTAZIONE), default=None,
+                             help="tagger/lemmatizzatore (default: il primo disponibile per la lingua, nell'ordine elencato)")
+    annotazione.add_argument("--modello-tagger", default=None, help="modello del backend al posto di quello della lingua (es. it_core_news_lg)")
+    annotazione.add_argument("--cache", help="cartella delle annotazioni salvate (default: cache utente o STRUMENTI_TESTUALI_CACHE)")
+    annotazione.add_argument("--senza-cache", action="store_true", help="annota sempre da capo, senza leggere né salvare la cache")
+
+    p = sottocomandi.add_parser("frequenza", parents=[lessicali, annotazione], help="termini più frequenti")
+    p.add_argument("--lemmi", action="store_true", help="conta i lemmi invece delle forme (richiede un backend che lemmatizza)")
+    p.set_defaults(esegui=_cli_frequenza)
+    p = sottocomandi.add_parser("collocazioni", parents=[lessicali, annotazione], help="n-grammi più frequenti")
+    p.add_argument("--lemmi", action="store_true", help="n-grammi di lemmi invece che di forme, nella stessa frase (solo --misura frequenza)")
+    p.add_argument("--n", type=int, default=2, help="dimensione degli n-grammi (default: 2)")
+    p.add_argument("--misura", choices=MISURE_ASSOCIAZIONE, default="frequenza",
+                   help="ordinamento: frequenza grezza o misura di associazione (default: frequenza)")
+    p.add_argument("--frequenza-minima", type=int, default=FREQUENZA_MINIMA_ASSOCIAZIONE,
+                   help=f"scarta i candidati meno frequenti, solo con --misura diversa da frequenza (default: {FREQUENZA_MINIMA_ASSOCIAZIONE})")
+    p.set_defaults(esegui=_cli_collocazioni)
+    p = sottocomandi.add_parser("cooccorrenze", parents=[lessicali], help="coppie di termini co-occorrenti")
+    p.add_argument("--finestra", type=int, default=3, help="dimensione della finestra di contesto (default: 3)")
+    p.set_defaults(esegui=_cli_cooccorrenze)
+    p = sottocomandi.add_parser("rete", parents=[con_stopwords], help="grafo delle co-occorrenze (lista di archi, GEXF, GraphML, immagine)")
+    p.add_argument("--finestra", type=int, default=3, help="dimensione della finestra di contesto (default: 3)")
+    p.add_argument("--peso-minimo", type=int, default=2, help="scarta gli archi con meno co-occorrenze (default: 2)")
+    p.add_argument("--archi-per-nodo", type=int, default=None, help="tiene solo gli archi più pesanti di ogni parola")
+    p.add_argument("--grafo", help="salva il grafo: .gexf, .graphml, .csv o .tsv (lista di archi)")
+    p.add_argument("--immagine", help="disegna il layout del grafo (.png, .svg, .pdf; richiede matplotlib)")
+    p.add_argument("--iterazioni", type=int, default=50, help="iterazioni del layout a forze (default: 50)")
+    p.add_argument("--senza-layout", action="store_true", help="non calcola le posizioni dei nodi nel file del grafo")
+    p.set_defaults(esegui=_cli_rete)
+    p = sottocomandi.add_parser("kwic", parents=[corpus], help="parola chiave nel contesto")
+    p.add_argument("query", help="parola o frase da cercare (* come carattere jolly)")
+    p.add_argument("--contesto", type=int, default=5, help="token di contesto a sinistra e a destra (default: 5)")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di occorrenze esportate")
+    p.set_defaults(esegui=_cli_kwic)
+    p = sottocomandi.add_parser("concordanza", parents=[corpus], help="concordanza di una sottostringa qualsiasi (indice dei suffissi)")
+    p.add_argument("query", help="sottostringa da cercare: frammento di parola, espressione, punteggiatura")
+    p.add_argument("--contesto", type=int, default=None, help="ampiezza del contesto per lato (default: 5 token o 40 caratteri)")
+    p.add_argument("--caratteri", action="store_true", help="misura il contesto in caratteri invece che in token")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di occorrenze esportate")
+    p.set_defaults(esegui=_cli_concordanza)
+    p = sottocomandi.add_parser("gulpease", parents=[corpus], help="indice di leggibilità Gulpease (italiano)")
+    p.add_argument("--per-frase", action="store_true", help="calcola l'indice per ogni frase")
+    p.add_argument("--distribuzione", action="store_true",
+                   help="percentili, istogramma e media mobile degli indici delle frasi; righe: le frasi meno leggibili")
+    p.add_argument("--finestra", type=int, default=FINESTRA_MEDIA_MOBILE_GULPEASE,
+                   help=f"frasi della media mobile, con --distribuzione (default: {FINESTRA_MEDIA_MOBILE_GULPEASE})")
+    p.add_argument("--peggiori", type=int, default=10, help="frasi meno leggibili esportate, con --distribuzione (default: 10)")
+    p.add_argument("--punti", type=int, default=100, help="punti della media mobile nel riepilogo, con --distribuzione (default: 100)")
+    p.set_defaults(esegui=_cli_gulpease)
+    p = sottocomandi.add_parser("leggibilita", parents=[corpus], help="indici di leggibilità: Gulpease, Flesch-Vacca, Flesch-Kincaid, Gunning Fog, SMOG, LIX")
+    p.add_argument("--per-documento", action="store_true", help="aggiunge una riga per ogni documento dopo quella del corpus")
+    p.set_defaults(esegui=_cli_leggibilita)
+    p = sottocomandi.add_parser("grice", parents=[corpus], help="indicatori Griceani semplificati")
+    p.add_argument("--lingua", default="italian", help="lingua per la segmentazione NLTK (default: italian)")
+    p.set_defaults(esegui=_cli_grice)
+    p = sottocomandi.add_parser("pos", parents=[lessicali, annotazione],
+                                help="annotazione POS e lemmi (in cache) e termini o collocazioni filtrati per parte del discorso")
+    p.add_argument("--schema", help="una categoria o tag per i termini (es. 'nomi', 'NN|NNS'), più voci per le collocazioni "
+                                    f"(es. 'aggettivi nomi', '*' = qualsiasi tag); categorie: {', '.join(CATEGORIE_POS)}. "
+                                    "Senza schema esporta token, tag e lemmi")
+    p.add_argument("--lemmi", action="store_true", help="con --schema conta i lemmi invece delle forme")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di token esportati, senza --schema")
+    p.set_defaults(esegui=_cli_pos)
+    p = sottocomandi.add_parser("tensore", parents=[corpus], help="Tensore Narrativo: co-occorrenze di elementi narrativi per segmento")
+    p.add_argument("-d", "--dimensione", action="append", required=True,
+                   help="dimensione ed elementi, ripetibile (es. 'Personaggi: Eroe|Ivan, Antagonista'; '|' separa i sinonimi)")
+    p.add_argument("--segmento", type=int, default=0, help="parole per segmento (default: 0 = un segmento per documento)")
+    p.add_argument("--presenza", action="store_true", help="conta 1 per ogni combinazione presente invece del prodotto delle occorrenze")
+    p.add_argument("--seleziona", action="append", default=[], help="tiene solo alcuni elementi, ripetibile (es. 'Temi=Amore,Odio')")
+    p.add_argument("--mantieni", help="dimensioni da mantenere separate da virgola, sommando le altre (es. 'Personaggi,Segmenti')")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di celle esportate, dalla più alta")
+    p.set_defaults(esegui=_cli_tensore)
+    p = sottocomandi.add_parser("propp-permutazioni", parents=[comuni], help="trame da permutazioni di funzioni di Propp")
+    p.add_argument("codici", help="codici delle funzioni separati da virgola (es. F1,F8,F11)")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di trame esportate")
+    p.add_argument("--inizio", type=int, default=1, help="numero della prima trama esportata (default: 1)")
+    p.add_argument("--campione", type=int, default=None, help="esporta N trame scelte a caso invece di un tratto consecutivo")
+    p.add_argument("--seme", type=int, default=None, help="seme del generatore casuale (campioni riproducibili)")
+    p.add_argument("--vincolate", action="store_true",
+                   help="solo trame che rispettano i vincoli narratologici predefiniti (es. F2 prima di F3, F16 prima di F18)")
+    p.add_argument("--vincoli", default=None,
+                   help="vincoli aggiuntivi: 'F2<F3' (prima, anche non subito), 'F6<<F7' (subito dopo), separati da virgola")
+    p.set_defaults(esegui=_cli_propp_permutazioni, senza_corpus=True)
+    p = sottocomandi.add_parser("propp-combinazioni", parents=[comuni], help="sottoinsiemi di funzioni di Propp")
+    p.add_argument("codici", help="codici delle funzioni disponibili separati da virgola")
+    p.add_argument("k", type=int, help="numero di funzioni da scegliere")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di sottoinsiemi esportati")
+    p.add_argument("--inizio", type=int, default=1, help="numero del primo sottoinsieme esportato (default: 1)")
+    p.add_argument("--campione", type=int, default=None, help="esporta N sottoinsiemi scelti a caso invece di un tratto consecutivo")
+    p.add_argument("--seme", type=int, default=None, help="seme del generatore casuale (campioni riproducibili)")
+    p.add_argument("--solo-conteggi", action="store_true",
+                   help="solo i conteggi (combinazioni, disposizioni, per funzione e per fase), senza elencare i sottoinsiemi")
+    p.set_defaults(esegui=_cli_propp_combinazioni, senza_corpus=True)
+
+    p = sottocomandi.add_parser("propp-diagrammi", parents=[comuni], help="diagrammi Graphviz di molte sequenze di Propp")
+    p.add_argument("cartella", help="cartella dei diagrammi (fa anche da cache: le sequenze già disegnate non si ridisegnano)")
+    p.add_argument("--sequenze", default=None, help="file con una sequenza di codici per riga, o CSV con colonna 'codici'")
+    p.add_argument("--codici", default=None, help="in alternativa: disegna le permutazioni di questi codici (es. F8,F11,F16,F18)")
+    p.add_argument("--inizio", type=int, default=1, help="prima sequenza da disegnare (default: 1)")
+    p.add_argument("--limite", type=int, default=None, help="numero massimo di sequenze da disegnare")
+    p.add_argument("--formato-diagrammi", choices=["svg", "png", "pdf"], default="svg", help="formato dei diagrammi (default: svg)")
+    p.add_argument("--processi", type=int, default=None, help="processi 'dot' in parallelo (default: numero di CPU)")
+    p.add_argument("--colonne", type=int, default=3, help="colonne del foglio riassuntivo (default: 3)")
+    p.add_argument("--senza-foglio", action="store_true", help="non scrivere i fogli SVG riassuntivi (mai scritti per il formato pdf)")
+    p.set_defaults(esegui=_cli_propp_diagrammi, senza_corpus=True)
+    return parser
+
+def main_cli(argv=None):
+    """Punto di ingresso della modalità batch. Restituisce il codice di uscita (0 successo, 1 errore, 2 uso errato)."""
+    argomenti = _parser_cli().parse_args(argv)
+    try:
+        modello = None if getattr(argomenti, "senza_corpus", False) else _apri_modello_cli(argomenti)
+        parametri, riepilogo, righe = argomenti.esegui(modello, argomenti)
+        _scrivi_output_cli(argomenti.analisi, parametri, riepilogo, righe, argomenti.formato, argomenti.output)
+    except (ErroreRigaDiComando, ValueError, OSError, sqlite3.Error) as e:
+        print(f"Errore ({argomenti.analisi}): {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    return 0
 
 
 # --- Blocco Principale per l'Esecuzione dell'Applicazione ---
 
 if __name__ == '__main__':
+    # Con argomenti sulla riga di comando si esegue un'analisi batch, senza interfaccia grafica
+    if len(sys.argv) > 1:
+        sys.exit(main_cli())
+    if not tkinter_disponibile:
+        print("Tkinter non è disponibile: l'interfaccia grafica non può essere avviata. "
+              "Usa la modalità a riga di comando (--help per le opzioni).", file=sys.stderr)
+        sys.exit(1)
     # Inizializza la finestra principale di Tkinter
     radice = tk.Tk()
     # Crea un'istanza della classe principale dell'applicazione